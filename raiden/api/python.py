@@ -666,3 +666,22 @@ class RaidenAPI(object):
                 returned_events.append(new_event)
 
         return returned_events
+
+    def get_finished_transfers(self, from_block=None, to_block=None):
+        """ Return the summaries of the transfers this node finished
+        initiating, mediating or receiving in the block range (inclusive).
+        """
+        archived_transfers = self.raiden.transaction_log.get_archived_transfers(
+            from_block=from_block,
+            to_block=to_block,
+        )
+
+        return [
+            {
+                'identifier': archived.identifier,
+                'task': archived.task,
+                'block_number': archived.block_number,
+                'events': [type(event).__name__ for event in archived.events],
+            }
+            for archived in archived_transfers
+        ]
@@ -6,15 +6,23 @@ from ethereum.utils import decode_hex
 
 from raiden.raiden_service import RaidenService
 from raiden.settings import (
+    DEFAULT_ALARM_BLOCK_SOURCE,
     DEFAULT_NAT_INVITATION_TIMEOUT,
     DEFAULT_NAT_KEEPALIVE_RETRIES,
     DEFAULT_NAT_KEEPALIVE_TIMEOUT,
+    DEFAULT_PROTOCOL_ACK_COALESCING_WINDOW,
+    DEFAULT_PROTOCOL_HASH_RETENTION,
+    DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE,
+    DEFAULT_PROTOCOL_RECOVERY_POOL_SIZE,
     DEFAULT_PROTOCOL_RETRIES_BEFORE_BACKOFF,
+    DEFAULT_PROTOCOL_SEND_WINDOW,
     DEFAULT_PROTOCOL_THROTTLE_CAPACITY,
     DEFAULT_PROTOCOL_THROTTLE_FILL_RATE,
     DEFAULT_PROTOCOL_RETRY_INTERVAL,
     DEFAULT_REVEAL_TIMEOUT,
     DEFAULT_SETTLE_TIMEOUT,
+    DEFAULT_SNAPSHOT_INTERVAL,
+    DEFAULT_STARTUP_POOL_SIZE,
     INITIAL_PORT,
 )
 from raiden.network.transport import UDPTransport, TokenBucket
@@ -34,6 +42,9 @@ class App(object):  # pylint: disable=too-few-public-methods
         'reveal_timeout': DEFAULT_REVEAL_TIMEOUT,
         'settle_timeout': DEFAULT_SETTLE_TIMEOUT,
         'database_path': '',
+        'snapshot_interval': DEFAULT_SNAPSHOT_INTERVAL,
+        'startup_pool_size': DEFAULT_STARTUP_POOL_SIZE,
+        'block_source': DEFAULT_ALARM_BLOCK_SOURCE,
         'msg_timeout': 100.0,
         'protocol': {
             'retry_interval': DEFAULT_PROTOCOL_RETRY_INTERVAL,
@@ -43,6 +54,11 @@ class App(object):  # pylint: disable=too-few-public-methods
             'nat_invitation_timeout': DEFAULT_NAT_INVITATION_TIMEOUT,
             'nat_keepalive_retries': DEFAULT_NAT_KEEPALIVE_RETRIES,
             'nat_keepalive_timeout': DEFAULT_NAT_KEEPALIVE_TIMEOUT,
+            'recovery_pool_size': DEFAULT_PROTOCOL_RECOVERY_POOL_SIZE,
+            'recovery_batch_size': DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE,
+            'hash_retention': DEFAULT_PROTOCOL_HASH_RETENTION,
+            'ack_coalescing_window': DEFAULT_PROTOCOL_ACK_COALESCING_WINDOW,
+            'send_window': DEFAULT_PROTOCOL_SEND_WINDOW,
         },
         'rpc': True,
         'console': False,
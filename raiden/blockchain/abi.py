@@ -19,6 +19,7 @@ __all__ = (
     'CONTRACT_NETTING_CHANNEL',
     'CONTRACT_REGISTRY',
 
+    'EVENT_ADDRESS_REGISTERED',
     'EVENT_CHANNEL_NEW',
     'EVENT_CHANNEL_NEW_BALANCE',
     'EVENT_CHANNEL_CLOSED',
@@ -33,6 +34,7 @@ CONTRACT_HUMAN_STANDARD_TOKEN = 'human_standard_token'
 CONTRACT_NETTING_CHANNEL = 'netting_channel'
 CONTRACT_REGISTRY = 'registry'
 
+EVENT_ADDRESS_REGISTERED = 'AddressRegistered'
 EVENT_CHANNEL_NEW = 'ChannelNew'
 EVENT_CHANNEL_NEW_BALANCE = 'ChannelNewBalance'
 EVENT_CHANNEL_CLOSED = 'ChannelClosed'
@@ -128,6 +130,7 @@ class ContractManager():
         self.is_instantiated = False
         self.lock = Lock()
         self.event_to_contract = dict(
+            AddressRegistered=CONTRACT_ENDPOINT_REGISTRY,
             ChannelNew=CONTRACT_CHANNEL_MANAGER,
             ChannelNewBalance=CONTRACT_NETTING_CHANNEL,
             ChannelClosed=CONTRACT_NETTING_CHANNEL,
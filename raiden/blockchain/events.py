@@ -2,6 +2,7 @@
 import itertools
 from collections import namedtuple, defaultdict
 
+from gevent.pool import Pool
 from pyethapp.jsonrpc import address_decoder
 from ethereum import slogging
 
@@ -10,9 +11,11 @@ from raiden.blockchain.abi import (
     CONTRACT_CHANNEL_MANAGER,
     CONTRACT_NETTING_CHANNEL,
     CONTRACT_REGISTRY,
+    EVENT_CHANNEL_NEW,
+    EVENT_TOKEN_ADDED,
 )
 from raiden.utils import pex
-from raiden.network.rpc.client import get_filter_events
+from raiden.network.rpc.client import get_filter_events, get_logs
 
 from raiden.transfer.mediated_transfer.state_change import (
     ContractReceiveTokenAdded,
@@ -36,6 +39,10 @@ PyethappProxies = namedtuple(
     'PyethappProxies',
     ('registry', 'channel_managers', 'channelmanager_nettingchannels'),
 )
+LogsListener = namedtuple(
+    'LogsListener',
+    ('event_name', 'translator', 'event_ids'),
+)
 
 # Pyethapp's `new_filter` uses None to signal the absence of topics filters
 ALL_EVENTS = None
@@ -156,28 +163,55 @@ def get_all_netting_channel_events(
     )
 
 
-def get_relevant_proxies(pyethapp_chain, node_address, registry_address):
+def get_relevant_proxies(pyethapp_chain, node_address, registry_address, pool=None):
+    """ Return the proxies of the registry, of its channel managers and of the
+    channels of `node_address`.
+
+    The proxies are created concurrently by the greenlets of `pool`, each
+    proxy queries the node on creation, by default they are created one at a
+    time.
+    """
+    if pool is None:
+        pool = Pool(1)
+
     registry = pyethapp_chain.registry(registry_address)
 
-    channel_managers = list()
+    def netting_channel_or_none(channel_address):
+        # FIXME: implement proper cleanup of self-killed channel after close+settle
+        try:
+            return pyethapp_chain.netting_channel(channel_address)
+        except AddressWithoutCode:
+            log.debug(
+                'Settled channel found when starting raiden. Safely ignored',
+                channel_address=pex(channel_address)
+            )
+
+    channel_managers = pool.map(pyethapp_chain.manager, registry.manager_addresses())
+    participating_channels = pool.map(
+        lambda channel_manager: channel_manager.channels_by_participant(node_address),
+        channel_managers,
+    )
+
+    # the channels of all managers are created by the same map to keep the
+    # pool busy
+    manager_channel_addresses = [
+        (channel_manager.address, channel_address)
+        for channel_manager, channel_addresses in zip(channel_managers, participating_channels)
+        for channel_address in channel_addresses
+    ]
+    netting_channels = pool.map(
+        netting_channel_or_none,
+        [channel_address for _, channel_address in manager_channel_addresses],
+    )
+
     manager_channels = defaultdict(list)
+    for channel_manager in channel_managers:
+        manager_channels[channel_manager.address] = list()
 
-    for channel_manager_address in registry.manager_addresses():
-        channel_manager = pyethapp_chain.manager(channel_manager_address)
-        channel_managers.append(channel_manager)
-
-        participating_channels = channel_manager.channels_by_participant(node_address)
-        netting_channels = []
-        for channel_address in participating_channels:
-            # FIXME: implement proper cleanup of self-killed channel after close+settle
-            try:
-                netting_channels.append(pyethapp_chain.netting_channel(channel_address))
-            except AddressWithoutCode:
-                log.debug(
-                    'Settled channel found when starting raiden. Safely ignored',
-                    channel_address=pex(channel_address)
-                )
-        manager_channels[channel_manager_address] = netting_channels
+    for (channel_manager_address, _), netting_channel in zip(
+            manager_channel_addresses, netting_channels):
+        if netting_channel is not None:
+            manager_channels[channel_manager_address].append(netting_channel)
 
     proxies = PyethappProxies(
         registry,
@@ -263,7 +297,8 @@ class PyethappBlockchainEvents(object):
 
         return result
 
-    def poll_state_change(self):
+    def poll_state_change(self, current_block=None):
+        # pylint: disable=unused-argument
         for event in self.poll_all_event_listeners():
             yield pyethapp_event_to_state_change(event)
 
@@ -324,3 +359,118 @@ class PyethappBlockchainEvents(object):
         )
         for channel in all_netting_channels:
             self.add_netting_channel_listener(channel)
+
+
+class LogsBlockchainEvents(object):
+    """ Polls the events of all the registered contracts with a single
+    eth_getLogs per block range, instead of a filter per contract.
+
+    The filters cost one eth_getFilterChanges per contract and block, and
+    one filter per netting channel kept alive in the ethereum node. Here
+    the listeners are a mapping from the contract address to the events of
+    interest, so the polling cost does not depend on the number of
+    channels.
+    """
+
+    def __init__(self, jsonrpc_client):
+        self.client = jsonrpc_client
+        self.address_to_listener = dict()
+
+        # The last block with processed logs. A filter only reports the logs
+        # created after its installation, this keeps the same behavior, the
+        # state of a contract is queried when it is registered and the logs
+        # are polled from the next block on.
+        self.last_block = None
+
+    def poll_state_change(self, current_block=None):
+        if not self.address_to_listener:
+            return
+
+        if current_block is None:
+            current_block = self.client.blocknumber()
+
+        if current_block <= self.last_block:
+            return
+
+        from_block = self.last_block + 1
+
+        log_events = get_logs(
+            self.client,
+            self.address_to_listener.keys(),
+            from_block,
+            current_block,
+        )
+
+        # only advanced once the logs were fetched, if the request fails the
+        # same range is queried on the next poll
+        self.last_block = current_block
+
+        for log_event in log_events:
+            listener = self.address_to_listener.get(log_event['address'])
+            topics = log_event['topics']
+
+            # the listener was uninstalled or the event is not of interest
+            if listener is None or not topics or topics[0] not in listener.event_ids:
+                continue
+
+            decoded_event = listener.translator.decode_event(topics, log_event['data'])
+
+            yield pyethapp_event_to_state_change(
+                PyethappEvent(log_event['address'], decoded_event)
+            )
+
+    def uninstall_all_event_listeners(self):
+        self.address_to_listener = dict()
+
+    def add_event_listener(self, event_name, contract_address, translator, event_ids):
+        if self.last_block is None:
+            self.last_block = self.client.blocknumber()
+
+        self.address_to_listener[contract_address] = LogsListener(
+            event_name,
+            translator,
+            frozenset(event_ids),
+        )
+
+    def add_registry_listener(self, registry_proxy):
+        registry_address = registry_proxy.address
+
+        self.add_event_listener(
+            'Registry {}'.format(pex(registry_address)),
+            registry_address,
+            CONTRACT_MANAGER.get_translator(CONTRACT_REGISTRY),
+            [CONTRACT_MANAGER.get_event_id(EVENT_TOKEN_ADDED)],
+        )
+
+    def add_channel_manager_listener(self, channel_manager_proxy):
+        manager_address = channel_manager_proxy.address
+
+        self.add_event_listener(
+            'ChannelManager {}'.format(pex(manager_address)),
+            manager_address,
+            CONTRACT_MANAGER.get_translator('channel_manager'),
+            [CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_NEW)],
+        )
+
+    def add_netting_channel_listener(self, netting_channel_proxy):
+        channel_address = netting_channel_proxy.address
+        translator = CONTRACT_MANAGER.get_translator('netting_channel')
+
+        self.add_event_listener(
+            'NettingChannel Event {}'.format(pex(channel_address)),
+            channel_address,
+            translator,
+            translator.event_data.keys(),
+        )
+
+    def add_proxies_listeners(self, pyethapp_proxies):
+        self.add_registry_listener(pyethapp_proxies.registry)
+
+        for manager in pyethapp_proxies.channel_managers:
+            self.add_channel_manager_listener(manager)
+
+        all_netting_channels = itertools.chain(
+            *pyethapp_proxies.channelmanager_nettingchannels.itervalues()
+        )
+        for channel in all_netting_channels:
+            self.add_netting_channel_listener(channel)
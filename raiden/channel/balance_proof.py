@@ -43,6 +43,11 @@ class BalanceProof(object):
         # The latest known balance proof that can be used on-chain
         self.balance_proof = balance_proof
 
+        # The merkle tree of all the pending and unclaimed locks, it's kept in
+        # sync with the dictionaries above to avoid rebuilding it for every
+        # lock and locksroot check
+        self.merkletree = Merkletree([])
+
     def unclaimed_merkletree(self):
         all_locks = self.hashlocks_to_pendinglocks.values()
         all_locks.extend(self.hashlocks_to_unclaimedlocks.values())
@@ -55,12 +60,10 @@ class BalanceProof(object):
         ]
 
     def generate_merkle_tree(self):
-        all_lockhashes = self.unclaimed_merkletree()
-        return Merkletree(all_lockhashes)
+        return self.merkletree
 
     def merkleroot_for_unclaimed(self):
-        tree = self.generate_merkle_tree()
-        return tree.merkleroot or EMPTY_MERKLE_ROOT
+        return self.merkletree.merkleroot or EMPTY_MERKLE_ROOT
 
     def is_pending(self, hashlock):
         """ True if a secret is not known for the given `hashlock`. """
@@ -98,11 +101,11 @@ class BalanceProof(object):
         if not self.is_known(lock.hashlock):
             raise ValueError('hashlock is not registered')
 
-        leaves = self.unclaimed_merkletree()
-        leaves.remove(lockhashed)
-        new_locksroot = Merkletree(leaves).merkleroot
+        self.merkletree.remove(lockhashed)
+        new_locksroot = self.merkletree.merkleroot
 
         if balance_proof.locksroot != new_locksroot:
+            self.merkletree.add(lockhashed)
             raise InvalidLocksRoot(new_locksroot, balance_proof.locksroot)
 
         if lock.hashlock in self.hashlocks_to_pendinglocks:
@@ -121,11 +124,11 @@ class BalanceProof(object):
         if self.is_known(lock.hashlock):
             raise ValueError('hashlock is already registered')
 
-        leaves = self.unclaimed_merkletree()
-        leaves.append(lockhashed)
-        new_locksroot = Merkletree(leaves).merkleroot
+        self.merkletree.add(lockhashed)
+        new_locksroot = self.merkletree.merkleroot
 
         if balance_proof.locksroot != new_locksroot:
+            self.merkletree.remove(lockhashed)
             raise InvalidLocksRoot(new_locksroot, balance_proof.locksroot)
 
         self.hashlocks_to_pendinglocks[lock.hashlock] = PendingLock(lock, lockhashed)
@@ -175,27 +178,39 @@ class BalanceProof(object):
         if self.is_pending(hashlock):
             pendinglock = self.hashlocks_to_pendinglocks[hashlock]
             del self.hashlocks_to_pendinglocks[hashlock]
+            self.merkletree.remove(pendinglock.lockhashed)
             return pendinglock.lock
 
         elif self.is_unclaimed(hashlock):
             unclaimedlock = self.hashlocks_to_unclaimedlocks[hashlock]
             del self.hashlocks_to_unclaimedlocks[hashlock]
+            self.merkletree.remove(unclaimedlock.lockhashed)
             return unclaimedlock.lock
 
         raise ValueError('Unknown hashlock')
 
     def get_known_unlocks(self):
-        """ Generate unlocking proofs for the known secrets. """
+        """ Generate unlocking proofs for the known secrets.
 
+        The lock hashes cached in the partial proofs are used and all the
+        merkle proofs are computed in a single pass over the tree.
+        """
         tree = self.generate_merkle_tree()
+        partialproofs = self.hashlocks_to_unclaimedlocks.values()
+
+        merkle_proofs = tree.make_proofs(
+            partialproof.lockhashed
+            for partialproof in partialproofs
+        )
 
         return [
-            self.compute_proof_for_lock(
+            UnlockProof(
+                merkle_proof,
+                # forcing bytes because ethereum.abi doesnt work with bytearray
+                bytes(partialproof.lock.as_bytes),
                 partialproof.secret,
-                partialproof.lock,
-                tree,
             )
-            for partialproof in self.hashlocks_to_unclaimedlocks.itervalues()
+            for partialproof, merkle_proof in zip(partialproofs, merkle_proofs)
         ]
 
     def compute_proof_for_lock(self, secret, lock, tree=None):
@@ -214,6 +229,14 @@ class BalanceProof(object):
             secret,
         )
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        # snapshots taken before the merkle tree was kept in sync with the
+        # locks don't have it
+        if 'merkletree' not in state:
+            self.merkletree = Merkletree(self.unclaimed_merkletree())
+
     def __eq__(self, other):
         if isinstance(other, BalanceProof):
             return (
@@ -1,18 +1,17 @@
 # -*- coding: utf-8 -*-
 import logging
 
+import gevent
 from gevent.event import Event
 from ethereum import slogging
 from ethereum.utils import encode_hex
 
 from raiden.messages import (
-    EMPTY_MERKLE_ROOT,
     DirectTransfer,
     Lock,
     LockedTransfer,
     Secret,
 )
-from raiden.mtree import Merkletree
 from raiden.utils import sha3, pex, lpex
 from raiden.exceptions import (
     InsufficientBalance,
@@ -36,16 +35,27 @@ from raiden.transfer.mediated_transfer.state_change import (
 log = slogging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
+def settle_exception_handler(greenlet):
+    log.error('settle failed', error=str(greenlet.exception))
+
+
 class ChannelExternalState(object):
     # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, register_channel_for_hashlock, netting_channel):
+    def __init__(self, register_channel_for_hashlock, netting_channel, blocks=None):
         self.register_channel_for_hashlock = register_channel_for_hashlock
         self.netting_channel = netting_channel
 
-        self._opened_block = netting_channel.opened()
-        self._closed_block = netting_channel.closed()
-        self._settled_block = netting_channel.settled()
+        # the (opened, closed, settled) blocks are queried unless they were
+        # already fetched with the channel details
+        if blocks is None:
+            blocks = (
+                netting_channel.opened(),
+                netting_channel.closed(),
+                netting_channel.settled(),
+            )
+
+        self._opened_block, self._closed_block, self._settled_block = blocks
 
         self.close_event = Event()
         self.settle_event = Event()
@@ -144,9 +154,18 @@ class ChannelExternalState(object):
         return self.netting_channel.withdraw(unlock_proofs)
 
     def settle(self):
+        """ Settle the channel in a new greenlet and return it.
+
+        This is called by the alarm task, which must not wait for the
+        transaction to be mined, and the channels that expire on the same
+        block are settled by transactions sent back to back.
+        """
         if not self._called_settle:
             self._called_settle = True
-            return self.netting_channel.settle()
+
+            settle = gevent.spawn(self.netting_channel.settle)
+            settle.link_exception(settle_exception_handler)
+            return settle
 
 
 class Channel(object):
@@ -437,24 +456,25 @@ class Channel(object):
 
         # nonce is changed only when a transfer is un/registered, if the test
         # fails either we are out of sync, a message out of order, or it's a
-        # forged transfer
+        # forged transfer. The balance proofs of the sender are kept by the
+        # receiving end, so is its last nonce.
         is_invalid_nonce = (
             transfer.nonce < 1 or
             (
-                from_state.nonce is not None and
-                transfer.nonce != from_state.nonce + 1
+                to_state.nonce is not None and
+                transfer.nonce != to_state.nonce + 1
             )
         )
         if is_invalid_nonce:
             if log.isEnabledFor(logging.WARN):
                 log.warn(
-                    'Received out of order transfer from %s. Expected '
+                    'Received out of order transfer from %s. Last '
                     'nonce: %s but got nonce: %s',
                     pex(transfer.sender),
-                    from_state.nonce,
+                    to_state.nonce,
                     transfer.nonce,
                     from_=pex(transfer.sender),
-                    expected_nonce=from_state.nonce,
+                    last_nonce=to_state.nonce,
                     nonce=transfer.nonce,
                 )
             raise InvalidNonce(transfer)
@@ -594,17 +614,29 @@ class Channel(object):
                 to=pex(to_state.address),
                 transfer=repr(transfer),
                 transferred_amount=from_state.transferred_amount,
-                nonce=from_state.nonce,
+                nonce=to_state.nonce,
                 current_locksroot=pex(to_state.balance_proof.merkleroot_for_unclaimed()),
             )
 
     def get_nonce(self):
-        if self.our_state.nonce:
-            return self.our_state.nonce
+        """ Return the nonce of our last transfer, the balance proofs sent are
+        kept by the partner's end.
+        """
+        if self.partner_state.nonce:
+            return self.partner_state.nonce
 
         # 0 must not be used since in the netting contract it represents null.
         return 1
 
+    def get_next_partner_nonce(self):
+        """ Return the nonce of the next transfer from the partner, each
+        transfer increments it by one, starting from `get_nonce() + 1`.
+        """
+        if self.our_state.nonce:
+            return self.our_state.nonce + 1
+
+        return 2
+
     def create_directtransfer(self, amount, identifier):
         """ Return a DirectTransfer message.
 
@@ -750,10 +782,9 @@ class Channel(object):
 
         lock = to_.balance_proof.get_lock_by_hashlock(hashlock)
         lockhashed = sha3(lock.as_bytes)
-        leafs = to_.balance_proof.unclaimed_merkletree()
-        leafs.remove(lockhashed)
+        merkletree = to_.balance_proof.merkletree
 
-        locksroot_with_pending_lock_removed = Merkletree(leafs).merkleroot or EMPTY_MERKLE_ROOT
+        locksroot_with_pending_lock_removed = merkletree.merkleroot_without(lockhashed)
         transferred_amount = from_.transferred_amount(to_) + lock.amount
 
         nonce = self.get_nonce() + 1
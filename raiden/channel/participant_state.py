@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 from ethereum import slogging
 
-from raiden.mtree import Merkletree
 from raiden.utils import sha3
 
 log = slogging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -65,11 +64,8 @@ class ChannelEndState(object):
         """ Compute the resulting merkle root if the lock `include` is added in
         the tree.
         """
-        leafs = self.balance_proof.unclaimed_merkletree()
-        leafs.append(sha3(include.as_bytes))
-        locksroot = Merkletree(leafs).merkleroot
-
-        return locksroot
+        lockhashed = sha3(include.as_bytes)
+        return self.balance_proof.merkletree.merkleroot_with(lockhashed)
 
     # api design: using specialized methods to force the user to register the
     # transfer and the lock in a single step
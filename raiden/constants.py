@@ -21,3 +21,7 @@ NETTINGCHANNEL_SETTLE_TIMEOUT_MIN = 6
 
 # TODO: add this as an attribute of the transport class
 UDP_MAX_MESSAGE_SIZE = 1200
+
+# Upper bound of the per channel send window, the receivers hold back and keep
+# the Acks for this many messages so nodes with different windows interoperate
+PROTOCOL_MAX_SEND_WINDOW = 32
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
+import struct
 from collections import namedtuple, Counter
 
+from raiden.encoding.encoders import integer
+
 __all__ = ('Field', 'namedbuffer', 'buffer_for',)
 
+UINT64_MASK = 2 ** 64 - 1
+
 
 Field = namedtuple(
     'Field',
@@ -54,6 +59,180 @@ def compute_slices(fields_spec):
     return name_to_slice
 
 
+def fit(value, size_bytes, name):
+    """ Left pad `value` to `size_bytes`, the same way a namedbuffer does. """
+    length = len(value)
+
+    if length > size_bytes:
+        msg = 'value with length {length} for {attr} is too big'.format(
+            length=length,
+            attr=name,
+        )
+        raise ValueError(msg)
+
+    return b'\x00' * (size_bytes - length) + bytes(value)
+
+
+def compile_codec(buffer_name, fields_spec):  # noqa (ignore ciclomatic complexity)
+    """ Generates the functions to pack and unpack all the fields of a buffer
+    with a single call to a precompiled `struct.Struct`.
+
+    Integer fields of 8 bytes are handled by struct directly, integer fields of
+    32 bytes are split into four 64 bit words. The remaining fields are packed
+    as strings and use the field encoder, if any. The generated code follows
+    the same rules as the namedbuffer attributes, so the output is byte for
+    byte the same.
+
+    Returns:
+        tuple: (struct, fields_type, record_type, unpack_from, pack_into, pack)
+    """
+    # pylint: disable=exec-used,too-many-locals
+    fields = [
+        field
+        for field in fields_spec
+        if not isinstance(field, Pad)
+    ]
+    names = [field.name for field in fields]
+
+    fields_type = namedtuple('{}_fields'.format(buffer_name), names)
+    record_type = type(
+        '{}_record'.format(buffer_name),
+        (object,),
+        {'__slots__': tuple(names)},
+    )
+
+    struct_format = ['>']
+    namespace = {
+        'fit': fit,
+        'fields_type': fields_type,
+        'UINT64_MASK': UINT64_MASK,
+    }
+    unpacked_variables = []
+    unpacked_values = []
+    pack_lines = []
+    pack_arguments = []
+
+    for position, field in enumerate(fields_spec):
+        if isinstance(field, Pad):
+            struct_format.append(field.format_string)
+            continue
+
+        variable = 'v{}'.format(position)
+        encoder = field.encoder
+        size_bytes = field.size_bytes
+
+        is_integer = isinstance(encoder, integer)
+        is_constant = is_integer and encoder.minimum == encoder.maximum
+
+        if is_integer and not is_constant and size_bytes in (8, 32):
+            words = size_bytes // 8
+            words_variables = [
+                '{}_{}'.format(variable, word)
+                for word in range(words)
+            ]
+            shifts = [
+                64 * (words - word - 1)
+                for word in range(words)
+            ]
+
+            struct_format.append('{}Q'.format(words))
+            unpacked_variables.extend(words_variables)
+            unpacked_values.append(' | '.join(
+                '({} << {})'.format(word_variable, shift)
+                for word_variable, shift in zip(words_variables, shifts)
+            ))
+
+            namespace['validate_' + variable] = encoder.validate
+            pack_lines.append('{v} = values.{name}'.format(v=variable, name=field.name))
+            pack_lines.append('validate_{v}({v})'.format(v=variable))
+            pack_arguments.extend(
+                '({} >> {}) & UINT64_MASK'.format(variable, shift)
+                for shift in shifts
+            )
+
+        else:
+            struct_format.append('{}s'.format(size_bytes))
+            unpacked_variables.append(variable)
+
+            if encoder:
+                namespace['decode_' + variable] = encoder.decode
+                unpacked_values.append('decode_{v}({v})'.format(v=variable))
+            else:
+                unpacked_values.append(variable)
+
+            if is_constant:
+                # The cmdid is not part of the message values
+                constant = encoder.minimum
+                if not isinstance(constant, bytes):
+                    constant = encoder.encode(constant, size_bytes)
+
+                namespace['constant_' + variable] = fit(constant, size_bytes, field.name)
+                pack_arguments.append('constant_{v}'.format(v=variable))
+                continue
+
+            pack_lines.append('{v} = values.{name}'.format(v=variable, name=field.name))
+
+            if encoder:
+                namespace['validate_' + variable] = encoder.validate
+                namespace['encode_' + variable] = encoder.encode
+                pack_lines.append('validate_{v}({v})'.format(v=variable))
+                pack_lines.append('{v} = encode_{v}({v}, {size})'.format(
+                    v=variable,
+                    size=size_bytes,
+                ))
+
+            pack_lines.append(
+                'if len({v}) != {size} or type({v}) is not bytes: '
+                '{v} = fit({v}, {size}, {name!r})'.format(
+                    v=variable,
+                    size=size_bytes,
+                    name=field.name,
+                )
+            )
+            pack_arguments.append(variable)
+
+    compiled = struct.Struct(''.join(struct_format))
+    namespace['struct_unpack_from'] = compiled.unpack_from
+    namespace['struct_pack_into'] = compiled.pack_into
+    namespace['struct_pack'] = compiled.pack
+
+    pack_body = ''.join(
+        '    {}\n'.format(line)
+        for line in pack_lines
+    )
+    pack_arguments = ', '.join(pack_arguments)
+
+    source = (
+        'def unpack_from(data, offset=0):\n'
+        '    ({variables},) = struct_unpack_from(data, offset)\n'
+        '    return fields_type({values})\n'
+        '\n'
+        'def pack_into(buffer_, values, offset=0):\n'
+        '{pack_body}'
+        '    struct_pack_into(buffer_, offset, {arguments})\n'
+        '\n'
+        'def pack(values):\n'
+        '{pack_body}'
+        '    return struct_pack({arguments})\n'
+    ).format(
+        variables=', '.join(unpacked_variables),
+        values=', '.join(unpacked_values),
+        pack_body=pack_body,
+        arguments=pack_arguments,
+    )
+
+    exec(compile(source, '<{} codec>'.format(buffer_name), 'exec'), namespace)
+
+    return (
+        compiled,
+        fields_type,
+        record_type,
+        staticmethod(namespace['unpack_from']),
+        staticmethod(namespace['pack_into']),
+        staticmethod(namespace['pack']),
+    )
+
+
 def namedbuffer(buffer_name, fields_spec):  # noqa (ignore ciclomatic complexity)
     """ Class factory, returns a class to wrap a buffer instance and expose the
     data as fields.
@@ -98,6 +277,15 @@ def namedbuffer(buffer_name, fields_spec):  # noqa (ignore ciclomatic complexity
     names_slices = compute_slices(fields_spec)
     sorted_names = sorted(names_fields.keys())
 
+    (
+        compiled,
+        fields_type,
+        record_type,
+        unpack_from,
+        pack_into,
+        pack,
+    ) = compile_codec(buffer_name, fields_spec)
+
     @staticmethod
     def get_bytes_from(buffer_, name):
         slice_ = names_slices[name]
@@ -179,6 +367,16 @@ def namedbuffer(buffer_name, fields_spec):  # noqa (ignore ciclomatic complexity
         'format': fields_format,
         'size': size,
         'get_bytes_from': get_bytes_from,
+
+        # Precompiled codec to (un)pack all the fields at once, unpack_from
+        # returns a fields_type and the pack functions accept any object with
+        # the fields as attributes, e.g. a record_type.
+        'struct': compiled,
+        'fields_type': fields_type,
+        'record_type': record_type,
+        'unpack_from': unpack_from,
+        'pack_into': pack_into,
+        'pack': pack,
     }
 
     return type(buffer_name, (), attributes)
@@ -3,7 +3,7 @@ import struct
 
 from ethereum import slogging
 
-from raiden.constants import UINT64_MAX, UINT256_MAX
+from raiden.constants import UDP_MAX_MESSAGE_SIZE, UINT64_MAX, UINT256_MAX
 from raiden.encoding.encoders import integer, optional_bytes
 from raiden.encoding.format import (
     buffer_for,
@@ -38,6 +38,7 @@ def make_message(message, **attrs):
 
 ACK_CMDID = 0
 PING_CMDID = 1
+ACKS_CMDID = 2
 SECRETREQUEST_CMDID = 3
 SECRET_CMDID = 4
 DIRECTTRANSFER_CMDID = 5
@@ -47,6 +48,7 @@ REVEALSECRET_CMDID = 11
 
 ACK = to_bigendian(ACK_CMDID)
 PING = to_bigendian(PING_CMDID)
+ACKS = to_bigendian(ACKS_CMDID)
 SECRETREQUEST = to_bigendian(SECRETREQUEST_CMDID)
 SECRET = to_bigendian(SECRET_CMDID)
 REVEALSECRET = to_bigendian(REVEALSECRET_CMDID)
@@ -80,6 +82,9 @@ fee = make_field('fee', 32, '32s', integer(0, UINT256_MAX))
 
 optional_secret = make_field('secret', 32, '32s', optional_bytes())
 
+# bit flags, nodes that don't know about it read the byte as padding
+capabilities = make_field('capabilities', 1, '1s', integer(0, 255))
+
 signature = make_field('signature', 65, '65s')
 
 Ack = namedbuffer(
@@ -92,13 +97,26 @@ Ack = namedbuffer(
     ]
 )
 
+# The header of a batched Ack, followed by up to ACKS_MAX_ECHOS echo hashes
+Acks = namedbuffer(
+    'acks',
+    [
+        cmdid(ACKS),  # [0:1]
+        pad(3),       # [1:4]
+        sender,       # [4:24]
+    ]
+)
+
+ACKS_MAX_ECHOS = (UDP_MAX_MESSAGE_SIZE - Acks.size) // echo.size_bytes
+
 Ping = namedbuffer(
     'ping',
     [
-        cmdid(PING),  # [0:1]
-        pad(3),       # [1:4]
-        nonce,        # [4:12]
-        signature,    # [12:77]
+        cmdid(PING),   # [0:1]
+        capabilities,  # [1:2]
+        pad(2),        # [2:4]
+        nonce,         # [4:12]
+        signature,     # [12:77]
     ]
 )
 
@@ -211,6 +229,7 @@ Lock = namedbuffer(
 
 CMDID_MESSAGE = {
     ACK: Ack,
+    ACKS: Acks,
     PING: Ping,
     SECRETREQUEST: SecretRequest,
     SECRET: Secret,
@@ -242,3 +261,40 @@ def wrap(data):
         return
 
     return message
+
+
+def unpack(data):
+    ''' Try to decode data into the message fields, might return None if the
+    data is invalid.
+
+    This is equivalent to `wrap` but all the fields are decoded at once with
+    the message type precompiled struct.
+    '''
+    try:
+        first_byte = data[0]
+    except IndexError:
+        log.warn('data is empty')
+        return
+
+    try:
+        message_type = CMDID_MESSAGE[first_byte]
+    except KeyError:
+        log.error('unknown cmdid %s', first_byte)
+        return
+
+    if message_type is Acks:
+        # the header is followed by at least one echo hash
+        echos_size = len(data) - Acks.size
+        valid_size = (
+            echos_size > 0 and
+            echos_size % echo.size_bytes == 0 and
+            echos_size // echo.size_bytes <= ACKS_MAX_ECHOS
+        )
+    else:
+        valid_size = len(data) == message_type.size
+
+    if not valid_size:
+        log.error('trying to decode invalid message')
+        return
+
+    return message_type.unpack_from(data)
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import itertools
 import logging
 
 import gevent
@@ -9,14 +8,25 @@ from raiden.messages import (
     RevealSecret,
     SecretRequest,
 )
+from raiden.transfer.architecture import StateManager
+from raiden.transfer.mediated_transfer import (
+    initiator,
+    mediator,
+)
+from raiden.transfer.mediated_transfer import target as target_task
 from raiden.transfer.mediated_transfer.state_change import (
+    ActionInitInitiator,
+    ActionInitMediator,
+    ActionInitTarget,
     ContractReceiveBalance,
     ContractReceiveClosed,
     ContractReceiveNewChannel,
     ContractReceiveSettled,
     ContractReceiveTokenAdded,
     ContractReceiveWithdraw,
+    ReceiveSecretReveal,
 )
+from raiden.transfer.state_change import Block
 from raiden.transfer.events import (
     EventTransferSentSuccess,
     EventTransferSentFailed,
@@ -36,6 +46,7 @@ from raiden.transfer.mediated_transfer.events import (
     SendSecretRequest,
 )
 from raiden.utils import sha3, pex
+from raiden.utils.deadline_heap import DeadlineHeap
 
 log = slogging.get_logger(__name__)  # pylint: disable=invalid-name
 UNEVENTEFUL_EVENTS = (
@@ -49,54 +60,292 @@ UNEVENTEFUL_EVENTS = (
     ContractSendWithdraw,
 )
 
+# The state changes that create a new state manager
+INIT_TO_STATE_TRANSITION = {
+    ActionInitInitiator: initiator.state_transition,
+    ActionInitMediator: mediator.state_transition,
+    ActionInitTarget: target_task.state_transition,
+}
+
+# The task names used in the transfers archive
+STATE_TRANSITION_TO_TASK = {
+    initiator.state_transition: 'initiator',
+    mediator.state_transition: 'mediator',
+    target_task.state_transition: 'target',
+}
+
+# The functions that compute the next block a state manager must be woken up
+STATE_TRANSITION_TO_NEXT_DEADLINE = {
+    initiator.state_transition: initiator.next_deadline,
+    mediator.state_transition: mediator.next_deadline,
+    target_task.state_transition: target_task.next_deadline,
+}
+
+# The number of stale entries tolerated in the deadline index, the finished
+# managers are referenced by their entries until the deadline
+DEADLINE_INDEX_SLACK = 1024
+
+# The state changes that are dispatched to all the state managers when they
+# are logged without an identifier
+ALL_TASKS_STATE_CHANGES = (
+    Block,
+    ReceiveSecretReveal,
+)
+
 
 class StateMachineEventHandler(object):
     def __init__(self, raiden):
         self.raiden = raiden
 
+        # The state managers are only woken up by the blocks that may change
+        # them, the skipped blocks are applied with the latest block before
+        # any other state change is dispatched.
+        self.block_number = 0
+        self.deadlines = DeadlineHeap()
+        self.manager_to_deadline = dict()
+
+        # The identifiers of the transfers split in parts with a failed part,
+        # the result is set once the other parts are finished
+        self.failed_transfers = set()
+
+    def log_and_dispatch_block(self, state_change):
+        """Log a Block, dispatch it to the state managers that have a deadline
+        up to the block and log generated events"""
+        block_number = state_change.block_number
+        self.block_number = max(self.block_number, block_number)
+        state_change_id = self.raiden.transaction_log.log(state_change)
+
+        for identifier, manager in self.deadlines.expire(block_number):
+            deadline = self.manager_to_deadline.get(id(manager))
+
+            # stale entry, the manager was rescheduled or finished
+            if deadline is None or deadline > block_number:
+                continue
+
+            events = self.dispatch(manager, state_change, identifier)
+            self.log_events(state_change_id, identifier, manager, events)
+
     def log_and_dispatch_to_all_tasks(self, state_change):
         """Log a state change, dispatch it to all state managers and log generated events"""
         state_change_id = self.raiden.transaction_log.log(state_change)
-        manager_lists = self.raiden.identifier_to_statemanagers.itervalues()
-
-        for manager in itertools.chain(*manager_lists):
-            events = self.dispatch(manager, state_change)
-            self.raiden.transaction_log.log_events(
-                state_change_id,
-                events,
-                self.raiden.get_block_number()
-            )
+
+        # the finished managers are removed while iterating
+        for identifier, manager_list in self.raiden.identifier_to_statemanagers.items():
+            for manager in list(manager_list):
+                events = self.dispatch(manager, state_change, identifier)
+                self.log_events(state_change_id, identifier, manager, events)
 
     def log_and_dispatch_by_identifier(self, identifier, state_change):
         """Log a state change, dispatch it to the state manager corresponding to `idenfitier`
         and log generated events"""
-        state_change_id = self.raiden.transaction_log.log(state_change)
-        manager_list = self.raiden.identifier_to_statemanagers[identifier]
-
-        for manager in manager_list:
-            events = self.dispatch(manager, state_change)
-            self.raiden.transaction_log.log_events(
-                state_change_id,
-                events,
-                self.raiden.get_block_number()
-            )
+        state_change_id = self.raiden.transaction_log.log(state_change, identifier)
+        manager_list = self.raiden.identifier_to_statemanagers.get(identifier, ())
 
-    def log_and_dispatch(self, state_manager, state_change):
+        for manager in list(manager_list):
+            events = self.dispatch(manager, state_change, identifier)
+            self.log_events(state_change_id, identifier, manager, events)
+
+    def log_and_dispatch(self, state_manager, state_change, identifier=None):
         """Log a state change, dispatch it to the given state manager and log generated events"""
-        state_change_id = self.raiden.transaction_log.log(state_change)
-        events = self.dispatch(state_manager, state_change)
+        state_change_id = self.raiden.transaction_log.log(state_change, identifier)
+        events = self.dispatch(state_manager, state_change, identifier)
+        self.log_events(state_change_id, identifier, state_manager, events)
+
+    def log_events(self, state_change_id, identifier, state_manager, events):
+        """Log the events generated by a state manager and archive the manager
+        if it finished"""
+        block_number = self.raiden.get_block_number()
         self.raiden.transaction_log.log_events(
             state_change_id,
             events,
-            self.raiden.get_block_number()
+            block_number,
         )
 
-    def dispatch(self, state_manager, state_change):
-        all_events = state_manager.dispatch(state_change)
+        if state_manager.current_state is None:
+            self.archive(identifier, state_manager, state_change_id, block_number, events)
+
+    def archive(self, identifier, state_manager, state_change_id, block_number, events):
+        """ Remove the finished `state_manager` from the in-flight transfers,
+        only a summary with the events of its last state change is kept in
+        the log.
+        """
+        identifier_to_statemanagers = self.raiden.identifier_to_statemanagers
+        manager_list = identifier_to_statemanagers.get(identifier)
+
+        if manager_list is not None:
+            # the managers compare by state, the finished ones are all equal
+            manager_list[:] = [
+                manager
+                for manager in manager_list
+                if manager is not state_manager
+            ]
+
+            if not manager_list:
+                del identifier_to_statemanagers[identifier]
+                self.raiden.identifier_to_results.pop(identifier, None)
+                self.failed_transfers.discard(identifier)
+
+        self.manager_to_deadline.pop(id(state_manager), None)
+        if len(self.deadlines) > 2 * len(self.manager_to_deadline) + DEADLINE_INDEX_SLACK:
+            self.schedule_all()
+
+        self.raiden.transaction_log.archive_transfer(
+            identifier,
+            STATE_TRANSITION_TO_TASK[state_manager.state_transition],
+            state_change_id,
+            block_number,
+            events,
+        )
+
+    def replay(self, state_changes):
+        """ Apply the logged `state_changes` to the state managers, following
+        the same routing used when they were logged.
+
+        This is used on recovery to bring the state managers of a snapshot up
+        to date. The resulting events were already logged and handled, so
+        they are not handled again.
+
+        The replay is deterministic, the secrets of the initiators come from
+        the seeded generator logged with the ActionInitInitiator. The channels
+        are not rebuilt: the transfers and balance proofs registered with them
+        after the snapshot are not logged as state changes, so the channels
+        are only as recent as the snapshot.
+        """
+        identifier_to_statemanagers = self.raiden.identifier_to_statemanagers
+        replayed = 0
+
+        for state_change_id, identifier, state_change in state_changes:
+            if isinstance(state_change, Block):
+                self.block_number = max(self.block_number, state_change.block_number)
+
+            state_transition = INIT_TO_STATE_TRANSITION.get(type(state_change))
+
+            if state_transition is not None:
+                state_manager = StateManager(state_transition, None)
+                identifier_to_statemanagers[identifier].append(state_manager)
+                dispatch_to = [(identifier, state_manager)]
+
+            elif identifier is not None:
+                dispatch_to = [
+                    (identifier, manager)
+                    for manager in identifier_to_statemanagers.get(identifier, ())
+                ]
+
+            elif isinstance(state_change, ALL_TASKS_STATE_CHANGES):
+                dispatch_to = [
+                    (manager_identifier, manager)
+                    for manager_identifier, manager_list in identifier_to_statemanagers.items()
+                    for manager in manager_list
+                ]
+
+            else:
+                continue
+
+            for manager_identifier, manager in dispatch_to:
+                events = manager.dispatch(state_change)
+
+                # the summary is idempotent, the manager may have been
+                # archived before the crash
+                if manager.current_state is None:
+                    self.archive(
+                        manager_identifier,
+                        manager,
+                        state_change_id,
+                        self.block_number,
+                        events,
+                    )
+
+            replayed += 1
+
+        self.schedule_all()
+
+        return replayed
+
+    def schedule(self, state_manager, identifier):
+        """ Index `state_manager` by the next block it must be woken up. """
+        state = state_manager.current_state
+        next_deadline = STATE_TRANSITION_TO_NEXT_DEADLINE.get(state_manager.state_transition)
+
+        deadline = None
+        if state is not None and next_deadline is not None:
+            deadline = next_deadline(state)
+
+        if deadline is None:
+            self.manager_to_deadline.pop(id(state_manager), None)
+
+        elif self.manager_to_deadline.get(id(state_manager)) != deadline:
+            self.manager_to_deadline[id(state_manager)] = deadline
+            self.deadlines.schedule(deadline, (identifier, state_manager))
+
+    def schedule_all(self):
+        """ Rebuild the deadline index from all the state managers. """
+        self.deadlines.clear()
+        self.manager_to_deadline.clear()
+
+        for identifier, manager_list in self.raiden.identifier_to_statemanagers.iteritems():
+            for manager in manager_list:
+                self.schedule(manager, identifier)
+
+    def catch_up(self, state_manager):
+        """ Dispatch the latest block to a state manager that skipped it. """
+        state = state_manager.current_state
+
+        if state is not None and state.block_number < self.block_number:
+            return state_manager.dispatch(Block(self.block_number))
+
+        return list()
+
+    def has_pending_parts(self, identifier, state_manager):
+        """ True if a part of the transfer `identifier` other than
+        `state_manager` is not finished.
+
+        The finished parts are archived, and the parts that were not
+        dispatched yet are in the list too.
+        """
+        return any(
+            manager is not state_manager and
+            manager.state_transition is initiator.state_transition
+            for manager in self.raiden.identifier_to_statemanagers.get(identifier, ())
+        )
+
+    def finish_part(self, state_manager, event):
+        """ Set the result of the transfer once all of its parts finished.
+
+        A transfer split in parts succeeds if all the parts succeeded. A part
+        can only be cancelled before its secret is revealed, so the other
+        parts are not cancelled when one fails and may still unlock: a failed
+        transfer may have paid part of the amount to the target.
+        """
+        identifier = event.identifier
+
+        if isinstance(event, EventTransferSentFailed):
+            self.failed_transfers.add(identifier)
+
+        if self.has_pending_parts(identifier, state_manager):
+            return
+
+        success = identifier not in self.failed_transfers
+        self.failed_transfers.discard(identifier)
+
+        for result in self.raiden.identifier_to_results.get(identifier, ()):
+            if not result.ready():
+                result.set(success)
+
+    def dispatch(self, state_manager, state_change, identifier=None):
+        if isinstance(state_change, Block):
+            all_events = state_manager.dispatch(state_change)
+        else:
+            all_events = self.catch_up(state_manager)
+            all_events.extend(state_manager.dispatch(state_change))
 
         for event in all_events:
             self.on_event(event)
 
+            if isinstance(event, (EventTransferSentSuccess, EventTransferSentFailed)):
+                self.finish_part(state_manager, event)
+
+        self.schedule(state_manager, identifier)
+
         return all_events
 
     def on_event(self, event):
@@ -170,13 +419,9 @@ class StateMachineEventHandler(object):
             )
             self.raiden.send_async(receiver, refund_transfer)
 
-        elif isinstance(event, EventTransferSentSuccess):
-            for result in self.raiden.identifier_to_results[event.identifier]:
-                result.set(True)
-
-        elif isinstance(event, EventTransferSentFailed):
-            for result in self.raiden.identifier_to_results[event.identifier]:
-                result.set(False)
+        elif isinstance(event, (EventTransferSentSuccess, EventTransferSentFailed)):
+            # the result is set by finish_part, once all the parts finished
+            pass
         elif isinstance(event, UNEVENTEFUL_EVENTS):
             pass
         elif isinstance(event, EventUnlockFailed):
@@ -262,6 +507,8 @@ class StateMachineEventHandler(object):
         graph = self.raiden.token_to_channelgraph[token_address]
         channel = graph.address_to_channel[channel_address]
 
+        # the balances cached by the proxy are outdated
+        channel.external_state.netting_channel.invalidate_balances()
         channel.state_transition(state_change)
 
         if channel.contract_balance == 0:
@@ -279,6 +526,7 @@ class StateMachineEventHandler(object):
         channel_address = state_change.channel_address
         channel = self.raiden.find_channel_by_address(channel_address)
         channel.state_transition(state_change)
+        self.raiden.schedule_settlement(channel)
 
     def handle_settled(self, state_change):
         channel_address = state_change.channel_address
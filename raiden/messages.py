@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
+import cachetools
 from ethereum.slogging import getLogger
 from ethereum.utils import big_endian_to_int
 
 from raiden.encoding import messages, signing
 from raiden.encoding.format import buffer_for
 from raiden.encoding.signing import recover_publickey
+from raiden.settings import SENDER_CACHE_SIZE
 from raiden.utils import publickey_to_address, sha3, ishash, pex
 from raiden.transfer.state import BalanceProofState
 
 __all__ = (
     'Ack',
+    'Acks',
     'Ping',
     'SecretRequest',
     'Secret',
@@ -23,6 +26,10 @@ __all__ = (
 log = getLogger(__name__)  # pylint: disable=invalid-name
 EMPTY_MERKLE_ROOT = b'\x00' * 32
 
+# Ping capabilities flags
+CAPABILITY_ACKS = 0x01  # the node understands batched Acks
+CAPABILITY_SEND_WINDOW = 0x02  # the node holds back out of order envelope messages
+
 
 def assert_envelope_values(nonce, channel, transferred_amount, locksroot):
     if nonce <= 0:
@@ -63,6 +70,89 @@ def decode(data):
     return klass.decode(data)
 
 
+def recover_publickey_or_error(messagedata, signature):
+    """ Recover the public key that signed `messagedata`, returning the
+    exception instead of raising it.
+
+    This does not log nor switch greenlets, so it can be used from a native
+    thread.
+    """
+    try:
+        return recover_publickey(messagedata, signature)
+    except Exception as e:  # pylint: disable=broad-except
+        return e
+
+
+def sender_from_recovery(cache_key, publickey):
+    """ Returns the sender address for the result of
+    `recover_publickey_or_error` and stores it in the `SENDER_CACHE`, or logs
+    the error and returns None if the recovery failed.
+    """
+    if isinstance(publickey, ValueError):
+        # raised if the signature has the wrong length
+        log.error('invalid signature')
+        return
+
+    if isinstance(publickey, TypeError):
+        # raised if the PublicKey instantiation failed
+        log.error('invalid key data: {}'.format(publickey.message))
+        return
+
+    if isinstance(publickey, Exception):
+        # secp256k1 is using bare Exception classes: raised if the recovery failed
+        log.error('error while recovering pubkey: {}'.format(publickey.message))
+        return
+
+    sender = publickey_to_address(publickey)
+    SENDER_CACHE.put(cache_key, sender)
+    return sender
+
+
+class SenderCache(object):
+    """ LRU cache of the senders recovered from message signatures.
+
+    Retransmissions of a message that was not acknowledged yet carry the same
+    signature, the cache avoids recovering the public key again for these.
+
+    The key is the hash of the signed data *and* the signature, a different
+    signature over the same data is recovered on its own, so an invalid or
+    foreign signature cannot be attributed to a cached sender.
+
+    Each entry holds a 32 bytes key and a 20 bytes address, `maxsize` bounds
+    the number of entries.
+    """
+
+    def __init__(self, maxsize):
+        self.cache = cachetools.LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data_that_was_signed, signature):
+        return sha3(data_that_was_signed + signature)
+
+    def get(self, cache_key):
+        sender = self.cache.get(cache_key)
+
+        if sender is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return sender
+
+    def put(self, cache_key, sender):
+        self.cache[cache_key] = sender
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+SENDER_CACHE = SenderCache(SENDER_CACHE_SIZE)
+
+
 class MessageHashable(object):
     pass
 
@@ -70,36 +160,91 @@ class MessageHashable(object):
 class Message(MessageHashable):
     # pylint: disable=no-member
 
+    # The wire encoding and the hashes derived from it are cached, the cache
+    # is only valid for the current values of the fields and it's dropped
+    # whenever a public attribute is set. Nested structures, i.e. the Lock,
+    # are assumed to be immutable.
+    _cache = None
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_'):
+            self.__dict__['_cache'] = None
+
+        object.__setattr__(self, name, value)
+
+    def _cached(self):
+        cache = self._cache
+
+        if cache is None:
+            cache = dict()
+            self.__dict__['_cache'] = cache
+
+        return cache
+
     @property
     def hash(self):
-        packed = self.packed()
-        return sha3(packed.data)
+        cache = self._cached()
+
+        if 'hash' not in cache:
+            cache['hash'] = sha3(self.encode())
+
+        return cache['hash']
+
+    def echohash(self, receiver_address):
+        """ Return the hash used to acknowledge this message when sent to
+        `receiver_address`.
+        """
+        cache = self._cached()
+        key = ('echohash', receiver_address)
+
+        if key not in cache:
+            cache[key] = sha3(self.encode() + receiver_address)
+
+        return cache[key]
 
     def __eq__(self, other):
         return isinstance(other, self.__class__) and self.hash == other.hash
 
     def __hash__(self):
-        return big_endian_to_int(self.hash)
+        cache = self._cached()
+
+        if 'hash_int' not in cache:
+            cache['hash_int'] = big_endian_to_int(self.hash)
+
+        return cache['hash_int']
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __repr__(self):
-        packed = self.packed()
-
         return '<{klass} [msghash={msghash}]>'.format(
             klass=self.__class__.__name__,
-            msghash=pex(sha3(packed.data)),
+            msghash=pex(self.hash),
         )
 
     @classmethod
-    def decode(cls, packed):
-        packed = messages.wrap(packed)
-        return cls.unpack(packed)
+    def decode(cls, data):
+        packed = messages.unpack(data)
+
+        if packed is None:
+            return
+
+        message = cls.unpack(packed)
+
+        # keep the received buffer instead of packing the message again
+        message._cached()['data'] = bytes(data)
+        return message
 
     def encode(self):
-        packed = self.packed()
-        return bytes(packed.data)
+        cache = self._cached()
+
+        if 'data' not in cache:
+            klass = messages.CMDID_MESSAGE[self.cmdid]
+            record = klass.record_type()
+            self.pack(record)
+            cache['data'] = klass.pack(record)
+
+        return cache['data']
 
     def packed(self):
         klass = messages.CMDID_MESSAGE[self.cmdid]
@@ -122,52 +267,66 @@ class SignedMessage(Message):
 
     def sign(self, private_key, node_address):
         """ Sign message using `private_key`. """
-        packed = self.packed()
+        klass = messages.CMDID_MESSAGE[self.cmdid]
 
-        field = type(packed).fields_spec[-1]
+        field = klass.fields_spec[-1]
         assert field.name == 'signature', 'signature is not the last field'
 
         # this slice must be from the end of the buffer
-        message_data = packed.data[:-field.size_bytes]
+        message_data = self.encode()[:-field.size_bytes]
         signature = signing.sign(message_data, private_key)
 
-        packed.signature = signature
-
         self.sender = node_address
         self.signature = signature
 
-    @classmethod
-    def decode(cls, data):
-        packed = messages.wrap(data)
-
-        if packed is None:
-            return
+        self._cached()['data'] = message_data + signature
 
+    @classmethod
+    def signed_data(cls, data):
+        """ Returns the data covered by the signature and the signature of the
+        encoded message `data`.
+        """
         # signature must be at the end
-        message_type = type(packed)
+        message_type = messages.CMDID_MESSAGE[data[0]]
         signature = message_type.fields_spec[-1]
         assert signature.name == 'signature', 'signature is not the last field'
 
         data_that_was_signed = data[:-signature.size_bytes]
         message_signature = data[-signature.size_bytes:]
 
-        try:
-            publickey = recover_publickey(data_that_was_signed, message_signature)
-        except ValueError:
-            # raised if the signature has the wrong length
-            log.error('invalid signature')
-            return
-        except TypeError as e:
-            # raised if the PublicKey instantiation failed
-            log.error('invalid key data: {}'.format(e.message))
+        return data_that_was_signed, message_signature
+
+    @classmethod
+    def decode(cls, data):
+        packed = messages.unpack(data)
+
+        if packed is None:
             return
-        except Exception as e:  # pylint: disable=broad-except
-            # secp256k1 is using bare Exception classes: raised if the recovery failed
-            log.error('error while recovering pubkey: {}'.format(e.message))
+
+        data_that_was_signed, message_signature = cls.signed_data(data)
+
+        cache_key = SENDER_CACHE.key(data_that_was_signed, message_signature)
+        sender = SENDER_CACHE.get(cache_key)
+
+        if sender is None:
+            publickey = recover_publickey_or_error(data_that_was_signed, message_signature)
+            sender = sender_from_recovery(cache_key, publickey)
+
+        return cls.decode_recovered(packed, data, data_that_was_signed, sender)
+
+    @classmethod
+    def decode_recovered(cls, packed, data, data_that_was_signed, sender):
+        """ Instantiate the message from the `packed` fields and the `sender`
+        recovered from its signature, `sender` is None if the recovery failed.
+        """
+        if sender is None:
             return
 
         message = cls.unpack(packed)  # pylint: disable=no-member
-        message.sender = publickey_to_address(publickey)
+        message.sender = sender
+
+        # keep the received buffer instead of packing the message again
+        message._cached()['data'] = bytes(data)
         return message
 
 
@@ -181,49 +340,65 @@ class EnvelopeMessage(SignedMessage):
 
     @property
     def message_hash(self):
-        packed = self.packed()
-        klass = type(packed)
+        cache = self._cached()
 
-        field = klass.fields_spec[-1]
-        assert field.name == 'signature', 'signature is not the last field'
+        if 'message_hash' not in cache:
+            klass = messages.CMDID_MESSAGE[self.cmdid]
 
-        data = packed.data
-        message_data = data[:-field.size_bytes]
-        message_hash = sha3(message_data)
+            field = klass.fields_spec[-1]
+            assert field.name == 'signature', 'signature is not the last field'
+
+            message_data = self.encode()[:-field.size_bytes]
+            cache['message_hash'] = sha3(message_data)
 
-        return message_hash
+        return cache['message_hash']
+
+    @property
+    def data_to_sign(self):
+        """ The balance proof data that is signed by the sender. """
+        cache = self._cached()
+
+        if 'data_to_sign' not in cache:
+            klass = messages.CMDID_MESSAGE[self.cmdid]
+            data = self.encode()
+
+            nonce = klass.get_bytes_from(data, 'nonce')
+            transferred_amount = klass.get_bytes_from(data, 'transferred_amount')
+            locksroot = klass.get_bytes_from(data, 'locksroot')
+            channel_address = klass.get_bytes_from(data, 'channel')
+            message_hash = self.message_hash
+
+            cache['data_to_sign'] = (
+                nonce + transferred_amount + locksroot + channel_address + message_hash
+            )
+
+        return cache['data_to_sign']
 
     def sign(self, private_key, node_address):
-        packed = self.packed()
-        klass = type(packed)
+        klass = messages.CMDID_MESSAGE[self.cmdid]
 
         field = klass.fields_spec[-1]
         assert field.name == 'signature', 'signature is not the last field'
 
-        data = packed.data
-        nonce = klass.get_bytes_from(data, 'nonce')
-        transferred_amount = klass.get_bytes_from(data, 'transferred_amount')
-        locksroot = klass.get_bytes_from(data, 'locksroot')
-        channel_address = klass.get_bytes_from(data, 'channel')
+        # the message hash and the data to sign don't depend on the signature
+        data_to_sign = self.data_to_sign
         message_hash = self.message_hash
-
-        data_to_sign = nonce + transferred_amount + locksroot + channel_address + message_hash
+        message_data = self.encode()[:-field.size_bytes]
         signature = signing.sign(data_to_sign, private_key)
 
-        packed.signature = signature
-
         self.sender = node_address
         self.signature = signature
 
-    @classmethod
-    def decode(cls, data):
-        packed = messages.wrap(data)
-
-        if packed is None:
-            return
+        cache = self._cached()
+        cache['data'] = message_data + signature
+        cache['message_hash'] = message_hash
+        cache['data_to_sign'] = data_to_sign
 
-        # signature must be at the end
-        message_type = type(packed)
+    @classmethod
+    def signed_data(cls, data):
+        # the balance proof is signed, the message itself is covered by the
+        # message_hash
+        message_type = messages.CMDID_MESSAGE[data[0]]
         signature = message_type.fields_spec[-1]
         assert signature.name == 'signature', 'signature is not the last field'
 
@@ -240,23 +415,22 @@ class EnvelopeMessage(SignedMessage):
             nonce + transferred_amount + locksroot + channel_address + message_hash
         )
 
-        try:
-            publickey = recover_publickey(data_that_was_signed, message_signature)
-        except ValueError:
-            # raised if the signature has the wrong length
-            log.error('invalid signature')
-            return
-        except TypeError as e:
-            # raised if the PublicKey instantiation failed
-            log.error('invalid key data: {}'.format(e.message))
-            return
-        except Exception as e:  # pylint: disable=broad-except
-            # secp256k1 is using bare Exception classes: raised if the recovery failed
-            log.error('error while recovering pubkey: {}'.format(e.message))
-            return
+        return data_that_was_signed, message_signature
+
+    @classmethod
+    def decode_recovered(cls, packed, data, data_that_was_signed, sender):
+        message = super(EnvelopeMessage, cls).decode_recovered(
+            packed,
+            data,
+            data_that_was_signed,
+            sender,
+        )
+
+        if message is not None:
+            cache = message._cached()
+            cache['message_hash'] = data_that_was_signed[-32:]
+            cache['data_to_sign'] = data_that_was_signed
 
-        message = cls.unpack(packed)  # pylint: disable=no-member
-        message.sender = publickey_to_address(publickey)
         return message
 
     def to_balanceproof(self):
@@ -302,22 +476,88 @@ class Ack(Message):
         )
 
 
+class Acks(Message):
+    """ A batch of Acks for messages from the same node, sent only to nodes
+    that advertised CAPABILITY_ACKS.
+
+    The encoding is a fixed header followed by the echo hashes, it is limited
+    to `messages.ACKS_MAX_ECHOS` hashes to fit in a single packet.
+    """
+    cmdid = messages.ACKS
+
+    def __init__(self, sender, echos):
+        super(Acks, self).__init__()
+
+        if not echos:
+            raise ValueError('echos cannot be empty')
+
+        if len(echos) > messages.ACKS_MAX_ECHOS:
+            raise ValueError('too many echos')
+
+        self.sender = sender
+        self.echos = tuple(echos)
+
+    @classmethod
+    def decode(cls, data):
+        packed = messages.unpack(data)
+
+        if packed is None:
+            return
+
+        header_size = messages.Acks.size
+        echo_size = messages.echo.size_bytes
+        echos = [
+            data[start:start + echo_size]
+            for start in range(header_size, len(data), echo_size)
+        ]
+
+        message = cls(packed.sender, echos)
+        message._cached()['data'] = bytes(data)
+        return message
+
+    def encode(self):
+        cache = self._cached()
+
+        if 'data' not in cache:
+            klass = messages.Acks
+            record = klass.record_type()
+            self.pack(record)
+            cache['data'] = klass.pack(record) + b''.join(self.echos)
+
+        return cache['data']
+
+    def pack(self, packed):
+        packed.sender = self.sender
+
+    def __repr__(self):
+        return '<{} [echohashes:{}]>'.format(
+            self.__class__.__name__,
+            len(self.echos),
+        )
+
+
 class Ping(SignedMessage):
-    """ Ping, should be responded by an Ack message. """
+    """ Ping, should be responded by an Ack message.
+
+    The `capabilities` are flags for the optional protocol features supported
+    by the sender, older nodes see it as padding.
+    """
     cmdid = messages.PING
 
-    def __init__(self, nonce):
+    def __init__(self, nonce, capabilities=0):
         super(Ping, self).__init__()
         self.nonce = nonce
+        self.capabilities = capabilities
 
     @staticmethod
     def unpack(packed):
-        ping = Ping(packed.nonce)
+        ping = Ping(packed.nonce, packed.capabilities)
         ping.signature = packed.signature
         return ping
 
     def pack(self, packed):
         packed.nonce = self.nonce
+        packed.capabilities = self.capabilities
         packed.signature = self.signature
 
 
@@ -591,19 +831,18 @@ class Lock(MessageHashable):
     @property
     def as_bytes(self):
         if self._asbytes is None:
-            packed = messages.Lock(buffer_for(messages.Lock))
-            packed.amount = self.amount
-            packed.expiration = self.expiration
-            packed.hashlock = self.hashlock
+            self._asbytes = messages.Lock.pack(self)
 
-            self._asbytes = packed.data
-
-        # convert bytearray to bytes
-        return bytes(self._asbytes)
+        return self._asbytes
 
     @classmethod
     def from_bytes(cls, serialized):
-        packed = messages.Lock(serialized)
+        if len(serialized) != messages.Lock.size:
+            raise ValueError('data buffer has the wrong size, expected {}'.format(
+                messages.Lock.size,
+            ))
+
+        packed = messages.Lock.unpack_from(serialized)
 
         return cls(
             packed.amount,
@@ -887,6 +1126,7 @@ class RefundTransfer(MediatedTransfer):
 
 CMDID_TO_CLASS = {
     messages.ACK: Ack,
+    messages.ACKS: Acks,
     messages.PING: Ping,
     messages.SECRETREQUEST: SecretRequest,
     messages.SECRET: Secret,
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import division
 
+from bisect import bisect_left
+
 from raiden.utils import sha3
 from raiden.exceptions import HashLengthNot32
 from raiden.messages import EMPTY_MERKLE_ROOT
@@ -39,6 +41,41 @@ def merkletreelayers(elements):
         yield elements
 
 
+def merkletreelayers_from(layers, elements, idx):
+    """ computes the layers of the merkletree for `elements`, reusing the
+    hashes from `layers` that are not affected by a change at position `idx`.
+
+    `layers` must be the layers of a tree whose leafs are equal to `elements`
+    up to `idx`, only the nodes that cover a leaf at or after `idx` are
+    rehashed. """
+
+    result = [elements]
+    level = 1
+
+    if len(elements) == 0:
+        result.append([""])
+
+    while len(elements) > 1:
+        idx = idx // 2
+
+        if level < len(layers):
+            parents = layers[level][:idx]
+        else:
+            parents = []
+
+        pairs = range(idx * 2, len(elements), 2)
+        parents.extend(
+            hash_pair(elements[i], elements[i + 1] if i + 1 < len(elements) else None)
+            for i in pairs
+        )
+
+        result.append(parents)
+        elements = parents
+        level += 1
+
+    return result
+
+
 def merkleproof_from_layers(layers, idx):
     proof = []
     for layer in layers:
@@ -49,6 +86,24 @@ def merkleproof_from_layers(layers, idx):
     return proof
 
 
+def merkleproofs_from_layers(layers, indexes):
+    """ computes the proofs for all the leafs at `indexes` in one pass over
+    the layers, the proofs are returned in the same order as `indexes`. """
+    proofs = [[] for _ in indexes]
+    indexes = list(indexes)
+
+    for layer in layers:
+        layer_length = len(layer)
+
+        for position, idx in enumerate(indexes):
+            pair_idx = idx - 1 if idx % 2 else idx + 1
+            if pair_idx < layer_length:
+                proofs[position].append(layer[pair_idx])
+            indexes[position] = idx // 2
+
+    return proofs
+
+
 def check_proof(proof, root, hash_):
     for x in proof:
         hash_ = hash_pair(hash_, x)
@@ -57,6 +112,12 @@ def check_proof(proof, root, hash_):
 
 
 class Merkletree(object):
+    """ A merkle tree with sorted leafs.
+
+    The tree can be updated in place with `add` and `remove`, only the nodes
+    to the right of the changed leaf are rehashed, the root is cached.
+    """
+
     def __init__(self, elements):
         elements = list(elements)  # consume generators
 
@@ -77,9 +138,104 @@ class Merkletree(object):
         """ Return the root element of the merkle tree. """
         return self._layers[-1][0] or EMPTY_MERKLE_ROOT
 
+    @property
+    def leafs(self):
+        """ Return a copy of the sorted leafs. """
+        return list(self._layers[0])
+
+    def __len__(self):
+        return len(self._layers[0])
+
+    def __contains__(self, element):
+        return self._position(element) is not None
+
+    def _position(self, element):
+        leafs = self._layers[0]
+        idx = bisect_left(leafs, element)
+
+        if idx < len(leafs) and leafs[idx] == element:
+            return idx
+
+        return None
+
+    def _layers_with(self, element):
+        if not isinstance(element, (str, bytes)):
+            raise ValueError('all elements must be str')
+
+        if len(element) != 32:
+            raise HashLengthNot32()
+
+        leafs = self._layers[0]
+        idx = bisect_left(leafs, element)
+
+        if idx < len(leafs) and leafs[idx] == element:
+            raise ValueError('Duplicated element')
+
+        elements = list(leafs)
+        elements.insert(idx, element)
+        return merkletreelayers_from(self._layers, elements, idx)
+
+    def _layers_without(self, element):
+        idx = self._position(element)
+
+        if idx is None:
+            raise ValueError('Unknown element')
+
+        elements = list(self._layers[0])
+        del elements[idx]
+        return merkletreelayers_from(self._layers, elements, idx)
+
+    def merkleroot_with(self, element):
+        """ Return the root of the tree if `element` was added, the tree is
+        not changed.
+        """
+        return self._layers_with(element)[-1][0] or EMPTY_MERKLE_ROOT
+
+    def merkleroot_without(self, element):
+        """ Return the root of the tree if `element` was removed, the tree is
+        not changed.
+        """
+        return self._layers_without(element)[-1][0] or EMPTY_MERKLE_ROOT
+
+    def add(self, element):
+        """ Insert `element` in the tree. """
+        self._layers = self._layers_with(element)
+
+    def remove(self, element):
+        """ Remove `element` from the tree. """
+        self._layers = self._layers_without(element)
+
     def make_proof(self, element):
         """ The proof contains all elements between `element` and `root`.
             If on all of [element] + proof is recursively hash_pair applied one
             gets the root.
         """
-        return merkleproof_from_layers(self._layers, self._layers[0].index(element))
+        idx = self._position(element)
+
+        if idx is None:
+            raise ValueError('Unknown element')
+
+        return merkleproof_from_layers(self._layers, idx)
+
+    def make_proofs(self, elements):
+        """ Return the proofs for all the `elements`, in the same order.
+
+        The positions of the leafs are indexed once and the proofs are
+        computed in a single pass over the layers, this is used to withdraw
+        many locks at once.
+        """
+        leaf_position = {
+            leaf: idx
+            for idx, leaf in enumerate(self._layers[0])
+        }
+
+        indexes = list()
+        for element in elements:
+            idx = leaf_position.get(element)
+
+            if idx is None:
+                raise ValueError('Unknown element')
+
+            indexes.append(idx)
+
+        return merkleproofs_from_layers(self._layers, indexes)
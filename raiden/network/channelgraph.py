@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 import logging
 from collections import namedtuple
-from heapq import heappush, heappop
+from heapq import heappop
 
-import networkx
+import cachetools
 from ethereum import slogging
 
+from raiden.settings import DISTANCE_CACHE_SIZE, MAX_TRANSFER_PARTS
 from raiden.utils import isaddress, pex
 from raiden.transfer.state import (
     RouteState,
@@ -15,6 +16,7 @@ from raiden.transfer.state import (
 from raiden.channel.netting_channel import (
     Channel,
 )
+from raiden.network.graph import AddressGraph
 from raiden.network.protocol import (
     NODE_NETWORK_UNKNOWN,
     NODE_NETWORK_REACHABLE,
@@ -44,8 +46,8 @@ def make_graph(edge_list):
             the graph.
 
     Returns:
-        Graph A networkx.Graph instance were the graph nodes are nodes in the
-            network and the edges are nodes that have a channel between them.
+        AddressGraph: A graph were the nodes are nodes in the network and
+            the edges are nodes that have a channel between them.
     """
 
     for edge in edge_list:
@@ -57,12 +59,8 @@ def make_graph(edge_list):
         if not isaddress(origin) or not isaddress(destination):
             raise ValueError('All values in edge_list must be valid addresses')
 
-    graph = networkx.Graph()  # undirected graph, for bidirectional channels
-
-    for first, second in edge_list:
-        graph.add_edge(first, second)
-
-    return graph
+    # undirected graph, for bidirectional channels
+    return AddressGraph(edge_list)
 
 
 def channel_to_routestate(channel, node_address):
@@ -90,27 +88,24 @@ def channel_to_routestate(channel, node_address):
     return state
 
 
-def ordered_neighbors(nx_graph, our_address, target_address):
-    paths = list()
-
-    try:
-        all_neighbors = networkx.all_neighbors(nx_graph, our_address)
-    except networkx.NetworkXError:
-        # If `our_address` is not in the graph, no channels opened with the
-        # address
+def ordered_neighbors(graph, our_address, target_address):
+    """ Return a heap of (distance to `target_address`, neighbor) for the
+    neighbors of `our_address` that have a path to the target.
+    """
+    # If `our_address` is not in the graph, no channels opened with the
+    # address
+    if our_address not in graph or target_address not in graph:
         return []
 
-    for neighbor in all_neighbors:
-        try:
-            length = networkx.shortest_path_length(
-                nx_graph,
-                neighbor,
-                target_address,
-            )
-            heappush(paths, (length, neighbor))
-        except networkx.NetworkXNoPath:
-            pass
+    all_neighbors = graph.neighbors(our_address)
+    distances = graph.distances_to(all_neighbors, target_address)
+    paths = [
+        (distance, neighbor)
+        for neighbor, distance in distances.iteritems()
+    ]
 
+    # a sorted list is a heap
+    paths.sort()
     return paths
 
 
@@ -126,19 +121,13 @@ def get_best_routes(
     transfer. The result is ordered from the best to worst path.
     """
 
-    # XXX: consider using multiple channels for a single transfer. Useful
-    # for cases were the `amount` is larger than what is available
-    # individually in any of the channels.
-    #
-    # One possible approach is to _not_ filter these channels based on the
-    # distributable amount, but to sort them based on available balance and
-    # let the task use as many as required to finish the transfer.
+    # Transfers larger than the distributable amount of every channel are
+    # split by `get_multipath_routes`.
 
     online_nodes = list()
     unknown_nodes = list()
 
-    neighbors_heap = ordered_neighbors(
-        channel_graph.graph,
+    neighbors_heap = channel_graph.ordered_neighbors(
         our_address,
         target_address,
     )
@@ -186,6 +175,93 @@ def get_best_routes(
     return online_nodes + unknown_nodes
 
 
+def split_transfer(routes, amount, max_parts=MAX_TRANSFER_PARTS):
+    """ Split `amount` over at most `max_parts` of the `routes`.
+
+    The routes with the largest available balance are used first, to use as
+    few locks as possible, ties are kept in the `routes` order. Each of the
+    remaining routes is a fallback of a single part, so that the parts never
+    compete for the balance of a channel after a refund.
+
+    Returns:
+        list: A list of two-tuples (amount, routes), one for each part, the
+        first route is the one that carries the part. The list is empty if
+        the routes don't have enough balance.
+    """
+    by_balance = sorted(routes, key=lambda route: route.available_balance, reverse=True)
+    used_routes = by_balance[:max_parts]
+
+    if sum(route.available_balance for route in used_routes) < amount:
+        return list()
+
+    parts = list()
+    remaining = amount
+    for route in used_routes:
+        if remaining <= 0:
+            break
+
+        part_amount = min(route.available_balance, remaining)
+        parts.append((part_amount, [route]))
+        remaining -= part_amount
+
+    used_addresses = set(part_routes[0].node_address for _, part_routes in parts)
+    for route in routes:
+        if route.node_address in used_addresses:
+            continue
+
+        candidates = [
+            part_routes
+            for amount_of_part, part_routes in parts
+            if amount_of_part <= route.available_balance
+        ]
+
+        if candidates:
+            min(candidates, key=len).append(route)
+
+    return parts
+
+
+def get_multipath_routes(
+        channel_graph,
+        nodeaddresses_statuses,
+        our_address,
+        target_address,
+        amount,
+        previous_address=None,
+        max_parts=MAX_TRANSFER_PARTS):
+
+    """ Return the parts in which a transfer of `amount` can be mediated, a
+    list of two-tuples (amount, routes).
+
+    A single part with the routes from `get_best_routes` is used if any
+    channel can carry the whole amount, otherwise the amount is split by
+    `split_transfer`.
+    """
+    available_routes = get_best_routes(
+        channel_graph,
+        nodeaddresses_statuses,
+        our_address,
+        target_address,
+        amount,
+        previous_address,
+    )
+
+    if available_routes:
+        return [(amount, available_routes)]
+
+    # every channel with a distributable balance can carry a part
+    funded_routes = get_best_routes(
+        channel_graph,
+        nodeaddresses_statuses,
+        our_address,
+        target_address,
+        1,
+        previous_address,
+    )
+
+    return split_transfer(funded_routes, amount, max_parts)
+
+
 class ChannelGraph(object):
     """ Has Graph based on the channels and can find path between participants. """
 
@@ -203,6 +279,10 @@ class ChannelGraph(object):
         graph = make_graph(edge_list)
         self.address_to_channel = dict()
         self.graph = graph
+
+        # the distances from our neighbors to a target, valid until the
+        # graph changes
+        self.distances_cache = cachetools.LRUCache(maxsize=DISTANCE_CACHE_SIZE)
         self.our_address = our_address
         self.partneraddress_to_channel = dict()
         self.token_address = token_address
@@ -222,8 +302,7 @@ class ChannelGraph(object):
         if isinstance(other, ChannelGraph):
             return (
                 self.address_to_channel == other.address_to_channel and
-                # networkx.classes.graph.Graph has no __eq__
-                self.graph.__dict__ == other.graph.__dict__ and
+                self.graph == other.graph and
                 self.our_address == other.our_address and
                 self.partneraddress_to_channel == other.partneraddress_to_channel and
                 self.token_address == other.token_address and
@@ -280,7 +359,7 @@ class ChannelGraph(object):
         if not isaddress(source) or not isaddress(target):
             raise ValueError('both source and target must be valid addresses')
 
-        return networkx.all_shortest_paths(self.graph, source, target)
+        return self.graph.all_shortest_paths(source, target)
 
     def get_paths_of_length(self, source, num_hops=1):
         """ Searchs for all nodes that are `num_hops` away.
@@ -292,7 +371,7 @@ class ChannelGraph(object):
         # return a dictionary keyed by targets
         # with a list of nodes in a shortest path
         # from the source to one of the targets.
-        all_paths = networkx.shortest_path(self.graph, source)
+        all_paths = self.graph.shortest_paths(source)
 
         return [
             path
@@ -302,10 +381,7 @@ class ChannelGraph(object):
 
     def has_path(self, source_address, target_address):
         """ True if there is a connecting path regardless of the number of hops. """
-        try:
-            return networkx.has_path(self.graph, source_address, target_address)
-        except networkx.NetworkXError:
-            return False
+        return self.graph.has_path(source_address, target_address)
 
     def has_channel(self, source_address, target_address):
         """ True if there is a channel connecting both addresses. """
@@ -314,10 +390,25 @@ class ChannelGraph(object):
     def add_path(self, from_address, to_address):
         """ Add a new edge into the network. """
         self.graph.add_edge(from_address, to_address)
+        self.distances_cache.clear()
 
     def remove_path(self, from_address, to_address):
         """ Remove an edge from the network. """
         self.graph.remove_edge(from_address, to_address)
+        self.distances_cache.clear()
+
+    def ordered_neighbors(self, our_address, target_address):
+        """ Cached version of `ordered_neighbors`, the returned heap belongs to
+        the caller.
+        """
+        key = (our_address, target_address)
+        paths = self.distances_cache.get(key)
+
+        if paths is None:
+            paths = ordered_neighbors(self.graph, our_address, target_address)
+            self.distances_cache[key] = paths
+
+        return list(paths)
 
     def channel_can_transfer(self, partner_address):
         """ True if the channel with `partner_address` is open and has spendable funds. """
@@ -326,7 +417,7 @@ class ChannelGraph(object):
 
     def get_neighbours(self):
         """ Get all neihbours adjacent to self.our_address. """
-        try:
-            return networkx.all_neighbors(self.graph, self.our_address)
-        except networkx.NetworkXError:
+        if self.our_address not in self.graph:
             return []
+
+        return self.graph.neighbors(self.our_address)
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 import socket
+import time
 
+import cachetools
 from ethereum import slogging
+from gevent.pool import Pool
+from pyethapp.jsonrpc import address_decoder
+from pyethapp.rpc_client import JSONRPCClientReplyError
 
+from raiden.blockchain.abi import CONTRACT_ENDPOINT_REGISTRY, CONTRACT_MANAGER
 from raiden.exceptions import UnknownAddress
+from raiden.settings import CACHE_TTL, UNKNOWN_ADDRESS_CACHE_SIZE
 from raiden.utils import (
     host_port_to_endpoint,
     isaddress,
@@ -47,11 +54,29 @@ class Discovery(object):
                 return nodeid
         return None
 
+    def start(self, node_addresses, pool=None):
+        """ Start following the endpoint changes and fetch the endpoints of
+        `node_addresses`. """
+        pass
+
+    def poll_endpoint_changes(self, current_block=None):
+        """ Apply the endpoint changes, called once per block. """
+        pass
+
+    def stop(self):
+        pass
+
 
 class ContractDiscovery(Discovery):
     """ Raiden node discovery.
 
     Allows registering and looking up by endpoint (host, port) for node_address.
+
+    The endpoints are cached for all the nodes and kept up to date with the
+    AddressRegistered events, the unknown addresses are cached for
+    `CACHE_TTL` seconds. Every lookup is counted in `hits` or `misses`, the
+    seconds spent on the on-chain lookups are added to `lookup_time` and the
+    slowest one is kept in `max_lookup_time`.
     """
 
     def __init__(self, node_address, discovery_proxy):
@@ -59,6 +84,16 @@ class ContractDiscovery(Discovery):
 
         self.node_address = node_address
         self.discovery_proxy = discovery_proxy
+        self.unknown_addresses = cachetools.TTLCache(
+            maxsize=UNKNOWN_ADDRESS_CACHE_SIZE,
+            ttl=CACHE_TTL,
+        )
+        self.registration_filter = None
+
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time = 0
+        self.max_lookup_time = 0
 
     def register(self, node_address, host, port):
         if node_address != self.node_address:
@@ -90,6 +125,7 @@ class ContractDiscovery(Discovery):
         else:
             endpoint = host_port_to_endpoint(host, port)
             self.discovery_proxy.register_endpoint(node_address, endpoint)
+            self.update(node_address, (host, port))
             log.info(
                 'registered endpoint in discovery',
                 node_address=pex(node_address),
@@ -98,10 +134,81 @@ class ContractDiscovery(Discovery):
             )
 
     def get(self, node_address):
-        endpoint = self.discovery_proxy.endpoint_by_address(node_address)
+        host_port = self.nodeid_to_hostport.get(node_address)
+
+        if host_port is not None:
+            self.hits += 1
+            return host_port
+
+        if node_address in self.unknown_addresses:
+            self.hits += 1
+            raise UnknownAddress('Unknown address {}'.format(pex(node_address)))
+
+        self.misses += 1
+        start = time.time()
+        try:
+            endpoint = self.discovery_proxy.endpoint_by_address(node_address)
+        except UnknownAddress:
+            self.unknown_addresses[node_address] = True
+            raise
+        finally:
+            elapsed = time.time() - start
+            self.lookup_time += elapsed
+            self.max_lookup_time = max(self.max_lookup_time, elapsed)
+
         host_port = split_endpoint(endpoint)
+        self.nodeid_to_hostport[node_address] = host_port
         return host_port
 
+    def update(self, node_address, host_port):
+        self.unknown_addresses.pop(node_address, None)
+        self.nodeid_to_hostport[node_address] = host_port
+
+    def start(self, node_addresses, pool=None):
+        """ Start following the endpoint changes and fetch the endpoints of
+        `node_addresses`.
+
+        The filter is installed first so that no change is lost, the
+        endpoints are fetched concurrently by the greenlets of `pool`.
+        """
+        if pool is None:
+            pool = Pool(1)
+
+        self.registration_filter = self.discovery_proxy.addressregistered_filter()
+
+        def fetch(node_address):
+            try:
+                self.get(node_address)
+            except UnknownAddress:
+                pass
+
+        pool.map(fetch, node_addresses)
+
+    def poll_endpoint_changes(self, current_block=None):  # pylint: disable=unused-argument
+        if self.registration_filter is None:
+            return
+
+        try:
+            log_events = self.registration_filter.changes()
+        except JSONRPCClientReplyError:
+            # the node lost the filter, the changes since the last poll are
+            # unknown, the endpoints are fetched again on demand
+            log.warning('endpoint registration filter lost, installing a new one')
+            self.registration_filter = self.discovery_proxy.addressregistered_filter()
+            self.nodeid_to_hostport = dict()
+            return
+
+        translator = CONTRACT_MANAGER.get_translator(CONTRACT_ENDPOINT_REGISTRY)
+        for log_event in log_events:
+            event = translator.decode_event(log_event['topics'], log_event['data'])
+            node_address = address_decoder(event['eth_address'])
+            self.update(node_address, split_endpoint(event['socket']))
+
+    def stop(self):
+        if self.registration_filter is not None:
+            self.registration_filter.uninstall()
+            self.registration_filter = None
+
     def nodeid_by_host_port(self, host_port):
         host, port = host_port
         endpoint = host_port_to_endpoint(host, port)
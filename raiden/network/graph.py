@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+
+
+class AddressGraph(object):
+    """ Undirected graph of the channels in a token network.
+
+    The addresses are interned to integer indexes, each node keeps a list
+    with the indexes of its neighbors and the queries work on the indexes.
+    The index of a node is a single int object shared by all the lists, so
+    an edge costs two list slots instead of the dictionaries of a
+    networkx.Graph.
+
+    Nodes are never removed, removing the last channel of a node keeps it in
+    the graph, as networkx does.
+    """
+
+    def __init__(self, edge_list=()):
+        self.address_to_index = dict()
+        self.addresses = list()
+        self.adjacency = list()
+
+        for first, second in edge_list:
+            self.add_edge(first, second)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, address):
+        return address in self.address_to_index
+
+    def __iter__(self):
+        return iter(self.addresses)
+
+    def __eq__(self, other):
+        if isinstance(other, AddressGraph):
+            return (
+                set(self.addresses) == set(other.addresses) and
+                self.edges() == other.edges()
+            )
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def add_node(self, address):
+        """ Return the index of `address`, adding it to the graph if needed. """
+        index = self.address_to_index.get(address)
+
+        if index is None:
+            index = len(self.addresses)
+            self.address_to_index[address] = index
+            self.addresses.append(address)
+            self.adjacency.append(list())
+
+        return index
+
+    def add_edge(self, first, second):
+        """ Add a channel between `first` and `second`, adding an existing
+        channel does nothing.
+        """
+        first_index = self.add_node(first)
+        second_index = self.add_node(second)
+
+        first_neighbors = self.adjacency[first_index]
+        if second_index not in first_neighbors:
+            first_neighbors.append(second_index)
+
+            if first_index != second_index:
+                self.adjacency[second_index].append(first_index)
+
+    def remove_edge(self, first, second):
+        """ Remove the channel between `first` and `second`.
+
+        Raises:
+            ValueError: If there is no such channel.
+        """
+        if not self.has_edge(first, second):
+            raise ValueError('there is no edge between the given addresses')
+
+        first_index = self.address_to_index[first]
+        second_index = self.address_to_index[second]
+
+        self.adjacency[first_index].remove(second_index)
+        if first_index != second_index:
+            self.adjacency[second_index].remove(first_index)
+
+    def has_edge(self, first, second):
+        first_index = self.address_to_index.get(first)
+        second_index = self.address_to_index.get(second)
+
+        if first_index is None or second_index is None:
+            return False
+
+        return second_index in self.adjacency[first_index]
+
+    def nodes(self):
+        return list(self.addresses)
+
+    def edges(self):
+        """ Return a set with a frozenset of the two addresses of each channel. """
+        addresses = self.addresses
+        return set(
+            frozenset((addresses[index], addresses[neighbor]))
+            for index, neighbors in enumerate(self.adjacency)
+            for neighbor in neighbors
+        )
+
+    def neighbors(self, address):
+        """ Return the addresses with a channel to `address`.
+
+        Raises:
+            KeyError: If `address` is not in the graph.
+        """
+        addresses = self.addresses
+        return [
+            addresses[neighbor]
+            for neighbor in self.adjacency[self.address_to_index[address]]
+        ]
+
+    def has_path(self, source, target):
+        """ True if `source` and `target` are connected, regardless of the
+        number of hops.
+        """
+        return self.shortest_path_length(source, target) is not None
+
+    def shortest_path_length(self, source, target):
+        """ The number of hops from `source` to `target`, None if there is no
+        path or one of the addresses is not in the graph.
+        """
+        if source not in self.address_to_index or target not in self.address_to_index:
+            return None
+
+        return self.distances_to([source], target).get(source)
+
+    def distances_to(self, sources, target):
+        """ Return a dict with the distance from each of `sources` that has a
+        path to `target`.
+
+        Each distance is computed with a bidirectional breadth first search,
+        the searches share the half that starts from the target, so each
+        search starts where the previous ones left it.
+        """
+        address_to_index = self.address_to_index
+        adjacency = self.adjacency
+        target_index = address_to_index[target]
+
+        target_distances = {target_index: 0}
+        target_frontier = [target_index]
+        target_depth = 0
+
+        distances = dict()
+        for source in sources:
+            source_index = address_to_index[source]
+
+            if source_index in target_distances:
+                distances[source] = target_distances[source_index]
+                continue
+
+            # invariant: the nodes visited from the source and from the
+            # target are disjoint
+            visited = set([source_index])
+            frontier = [source_index]
+            depth = 0
+
+            while frontier and target_frontier:
+                met = False
+
+                if len(frontier) <= len(target_frontier):
+                    depth += 1
+                    next_frontier = list()
+
+                    for node in frontier:
+                        for adjacent in adjacency[node]:
+                            if adjacent not in visited:
+                                visited.add(adjacent)
+                                next_frontier.append(adjacent)
+                                met = met or adjacent in target_distances
+
+                    frontier = next_frontier
+
+                else:
+                    target_depth += 1
+                    next_frontier = list()
+
+                    for node in target_frontier:
+                        for adjacent in adjacency[node]:
+                            if adjacent not in target_distances:
+                                target_distances[adjacent] = target_depth
+                                next_frontier.append(adjacent)
+                                met = met or adjacent in visited
+
+                    target_frontier = next_frontier
+
+                # the searches were disjoint one level before, so this is
+                # the shortest distance
+                if met:
+                    distances[source] = depth + target_depth
+                    break
+
+        return distances
+
+    def shortest_path_predecessors(self, source_index):
+        """ Return the predecessors on the shortest paths from `source_index`
+        of every node reachable from it, as a dict keyed by index.
+
+        The predecessors of a node are in the order they were reached.
+        """
+        adjacency = self.adjacency
+        distance = {source_index: 0}
+        predecessors = {source_index: []}
+        queue = deque([source_index])
+
+        while queue:
+            node = queue.popleft()
+            next_distance = distance[node] + 1
+
+            for adjacent in adjacency[node]:
+                adjacent_distance = distance.get(adjacent)
+
+                if adjacent_distance is None:
+                    distance[adjacent] = next_distance
+                    predecessors[adjacent] = [node]
+                    queue.append(adjacent)
+
+                elif adjacent_distance == next_distance:
+                    predecessors[adjacent].append(node)
+
+        return predecessors
+
+    def shortest_paths(self, source):
+        """ Return a dict with a shortest path from `source` to every node
+        reachable from it, the paths are lists of addresses.
+
+        Raises:
+            KeyError: If `source` is not in the graph.
+        """
+        addresses = self.addresses
+        adjacency = self.adjacency
+        source_index = self.address_to_index[source]
+
+        # the paths of addresses keyed by the index of the last node
+        index_paths = {source_index: [source]}
+        frontier = [source_index]
+
+        while frontier:
+            next_frontier = list()
+
+            for node in frontier:
+                path = index_paths[node]
+
+                for adjacent in adjacency[node]:
+                    if adjacent not in index_paths:
+                        index_paths[adjacent] = path + [addresses[adjacent]]
+                        next_frontier.append(adjacent)
+
+            frontier = next_frontier
+
+        return {
+            path[-1]: path
+            for path in index_paths.itervalues()
+        }
+
+    def all_shortest_paths(self, source, target):
+        """ Generate every shortest path from `source` to `target`, as lists
+        of addresses.
+
+        Raises:
+            KeyError: If `source` or `target` are not in the graph.
+            ValueError: If there is no path between them.
+        """
+        addresses = self.addresses
+        source_index = self.address_to_index[source]
+        target_index = self.address_to_index[target]
+
+        predecessors = self.shortest_path_predecessors(source_index)
+
+        if target_index not in predecessors:
+            raise ValueError('there is no path between the given addresses')
+
+        # depth first walk from the target back to the source, the stack
+        # keeps the position in the predecessors of each node of the path
+        stack = [[target_index, 0]]
+        while stack:
+            node, position = stack[-1]
+
+            if node == source_index:
+                yield [addresses[index] for index, _ in reversed(stack)]
+
+            node_predecessors = predecessors[node]
+            if position < len(node_predecessors):
+                stack[-1][1] = position + 1
+                stack.append([node_predecessors[position], 0])
+            else:
+                stack.pop()
@@ -1,16 +1,14 @@
 # -*- coding: utf-8 -*-
 import logging
-import random
+import time
 from collections import (
+    deque,
     namedtuple,
     defaultdict,
 )
-from itertools import repeat
 
-import cachetools
 import gevent
 from gevent.event import (
-    _AbstractLinkable,
     AsyncResult,
     Event,
 )
@@ -26,14 +24,31 @@ from raiden.exceptions import (
     UnknownTokenAddress,
 )
 from raiden.constants import (
+    PROTOCOL_MAX_SEND_WINDOW,
     UDP_MAX_MESSAGE_SIZE,
 )
 from raiden.settings import (
-    CACHE_TTL,
+    DEFAULT_PROTOCOL_HASH_RETENTION,
+    DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE,
+    DEFAULT_PROTOCOL_SEND_WINDOW,
+    DEFAULT_PROTOCOL_TIMER_TICK,
 )
-from raiden.messages import decode, Ack, Ping, SignedMessage
+from raiden.encoding import messages as encoding_messages
+from raiden.encoding.messages import ACKS_MAX_ECHOS
+from raiden.messages import (
+    decode,
+    Ack,
+    Acks,
+    CAPABILITY_ACKS,
+    CAPABILITY_SEND_WINDOW,
+    EnvelopeMessage,
+    Ping,
+    SignedMessage,
+)
+from raiden.network.recovery import SignatureRecovery
 from raiden.utils import isaddress, sha3, pex
-from raiden.utils.notifying_queue import NotifyingQueue
+from raiden.utils.retention import RetentionMap
+from raiden.utils.timer_wheel import TimerWheel
 
 log = slogging.get_logger(__name__)  # pylint: disable=invalid-name
 ping_log = slogging.get_logger(__name__ + '.ping')  # pylint: disable=invalid-name
@@ -54,6 +69,16 @@ NODE_NETWORK_UNKNOWN = 'unknown'
 NODE_NETWORK_UNREACHABLE = 'unreachable'
 NODE_NETWORK_REACHABLE = 'reachable'
 
+# The command ids of the EnvelopeMessages, these carry the channel nonce and
+# the receiver can restore their order, so they can be sent ahead of the
+# previous messages of the queue
+ENVELOPE_CMDIDS = frozenset([
+    encoding_messages.SECRET,
+    encoding_messages.DIRECTTRANSFER,
+    encoding_messages.MEDIATEDTRANSFER,
+    encoding_messages.REFUNDTRANSFER,
+])
+
 # GOALS:
 # - Each netting channel must have the messages processed in-order, the
 # protocol must detect unacknowledged messages and retry them.
@@ -65,23 +90,6 @@ NODE_NETWORK_REACHABLE = 'reachable'
 # handling messages.
 
 
-def event_first_of(*events):
-    """ Waits until one of `events` is set.
-
-    The event returned is /not/ cleared with any of the `events`, this value
-    must not be reused if the clearing behavior is used.
-    """
-    first_finished = Event()
-
-    if not all(isinstance(e, _AbstractLinkable) for e in events):
-        raise ValueError('all events must be linkable')
-
-    for event in events:
-        event.rawlink(lambda _: first_finished.set())
-
-    return first_finished
-
-
 def timeout_exponential_backoff(retries, timeout, maximum):
     """ Timeouts generator with an exponential backoff strategy.
 
@@ -103,264 +111,439 @@ def timeout_exponential_backoff(retries, timeout, maximum):
         yield maximum
 
 
-def retry(protocol, data, receiver_address, event_stop, timeout_backoff):
-    """ Send data until it's acknowledged.
-
-    Exits when the first of the following happen:
+def is_envelope(messagedata):
+    return messagedata[:1] in ENVELOPE_CMDIDS
 
-    - The packet is acknowledged.
-    - Event_stop is set.
-    - The iterator timeout_backoff runs out of values.
 
-    Returns:
-        bool: True if the message was acknowledged, False otherwise.
+class ChannelQueue(object):
+    """ The messages for a (receiver, token) pair, in the order they must be
+    delivered. The messages are kept until they are acknowledged.
     """
 
-    async_result = protocol.send_raw_with_result(
-        data,
-        receiver_address,
+    def __init__(self, on_put):
+        self.messages = deque()
+        self.on_put = on_put
+
+    def put(self, messagedata):
+        """ Add new item to the queue. """
+        self.messages.append(messagedata)
+        self.on_put()
+
+    def peek(self, index=0):
+        return self.messages[index]
+
+    def get(self):
+        """ Removes and returns the head of the queue. """
+        return self.messages.popleft()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def copy(self):
+        """ Copies the current queue items. """
+        return list(self.messages)
+
+
+class InFlightState(object):
+    """ Sending state of a message of a ChannelQueue. """
+    __slots__ = (
+        'messagedata',
+        'async_result',
+        'backoff',
+        'generation',
+        'acked',
+        'paused',
     )
 
-    event_quit = event_first_of(
-        async_result,
-        event_stop,
+    def __init__(self, messagedata, backoff, generation):
+        self.messagedata = messagedata
+        self.async_result = None
+        self.backoff = backoff
+
+        # identifies the timers and callbacks of this message
+        self.generation = generation
+
+        # acknowledged, but removed from the queue only with the previous ones
+        self.acked = False
+
+        # waiting for the node to become reachable
+        self.paused = False
+
+
+class QueueState(object):
+    """ Sending state of a ChannelQueue. """
+    __slots__ = (
+        'receiver_address',
+        'queue',
+        'inflight',
+        'generation_to_inflight',
+        'generation',
     )
 
-    for timeout in timeout_backoff:
+    def __init__(self, receiver_address, queue):
+        self.receiver_address = receiver_address
+        self.queue = queue
+
+        # the first messages of the queue that are in flight, in queue order
+        self.inflight = deque()
+        self.generation_to_inflight = dict()
+
+        # the generation of the last message sent, the timers and callbacks of
+        # a message are ignored once it's acknowledged
+        self.generation = 0
+
+
+class PeerState(object):
+    """ Health check state of a node. """
+    __slots__ = (
+        'address',
+        'events',
+        'ping_nonce',
+        'ping_data',
+        'async_result',
+        'attempts',
+        'generation',
+        'checking',
+        'queue_keys',
+    )
 
-        if event_quit.wait(timeout=timeout) is True:
-            break
+    def __init__(self, address, events, ping_nonce):
+        self.address = address
+        self.events = events
+        self.ping_nonce = ping_nonce
+
+        self.ping_data = None
+        self.async_result = None
+        self.attempts = 0
+        self.generation = 0
+        self.checking = False
+        self.queue_keys = list()
+
+
+class SendScheduler(object):
+    """ Sends the messages of all the channel queues and the health check
+    Pings of a node from a single greenlet.
+
+    Each queue has up to `window` EnvelopeMessages in flight to the nodes
+    that advertised CAPABILITY_SEND_WINDOW, and one message otherwise; any
+    other message is sent alone since its order can not be restored by the
+    receiver. Every message is retransmitted on its own timer until it's
+    acknowledged. Retransmissions and Pings are timers in a TimerWheel, this
+    greenlet only wakes up when a message is queued, an Ack arrives, or a tick
+    with timers elapses.
+
+    The health of a node is shared by all the queues to that node, while it's
+    unreachable the retransmissions are paused and they are resumed once a
+    Ping is acknowledged.
+    """
 
-        protocol.send_raw_with_result(
-            data,
-            receiver_address,
-        )
+    def __init__(self, protocol, tick, window=1):
+        if not 0 < window <= PROTOCOL_MAX_SEND_WINDOW:
+            raise ValueError('window must be between 1 and {}'.format(
+                PROTOCOL_MAX_SEND_WINDOW,
+            ))
 
-    return async_result.ready()
+        self.protocol = protocol
+        self.wheel = TimerWheel(tick)
+        self.window = window
 
+        self.address_to_peer = dict()
+        self.key_to_queuestate = dict()
 
-def wait_recovery(event_stop, event_healthy):
-    event_first_of(
-        event_stop,
-        event_healthy,
-    ).wait()
+        # work to do on the next iteration, filled by callbacks
+        self.pending = deque()
+        self.event_wake = Event()
+        self.greenlet = None
 
-    if event_stop.is_set():
-        return
+        protocol.event_stop.rawlink(lambda _: self.event_wake.set())
 
-    # There may be multiple threads waiting, do not restart them all at
-    # once to avoid message flood.
-    gevent.sleep(random.random())
+    def wake(self, item):
+        self.pending.append(item)
+        self.event_wake.set()
 
+        if self.greenlet is None:
+            self.greenlet = gevent.spawn(self._run)
+            self.protocol.greenlets.append(self.greenlet)
 
-def retry_with_recovery(
-        protocol,
-        data,
-        receiver_address,
-        event_stop,
-        event_healthy,
-        event_unhealthy,
-        backoff):
-    """ Send data while the node is healthy until it's acknowledged.
+    def get_peer(self, receiver_address):
+        peer = self.address_to_peer.get(receiver_address)
 
-    Note:
-        backoff must be an infinite iterator, otherwise this task will
-        become a hot loop.
-    """
+        if peer is None:
+            ping_nonce = self.protocol.nodeaddresses_to_nonces.setdefault(
+                receiver_address,
+                {'nonce': 0},  # HACK: Allows the state to mutate the object
+            )
 
-    # The underlying unhealthy will be cleared, care must be taken to properly
-    # clear stop_or_unhealthy too.
-    stop_or_unhealthy = event_first_of(
-        event_stop,
-        event_unhealthy,
-    )
+            events = HealthEvents(
+                event_healthy=Event(),
+                event_unhealthy=Event(),
+            )
+
+            peer = PeerState(receiver_address, events, ping_nonce)
+            self.address_to_peer[receiver_address] = peer
 
-    acknowledged = False
-    while not event_stop.is_set() and not acknowledged:
+        return peer
+
+    def start_health_check(self, receiver_address):
+        peer = self.get_peer(receiver_address)
 
-        # Packets must not be sent to an unhealthy node, nor should the task
-        # wait for it to become available if the message has been acknowledged.
-        if event_unhealthy.is_set():
-            wait_recovery(
-                event_stop,
-                event_healthy,
+        if not peer.checking:
+            peer.checking = True
+
+            # The state of the node is unknown, the events are set to allow the
+            # queues to do work.
+            self.protocol.set_node_network_state(
+                receiver_address,
+                NODE_NETWORK_UNKNOWN,
             )
 
-            # Assume wait_recovery returned because unhealthy was cleared and
-            # continue execution, this is safe to do because event_stop is
-            # checked below.
-            stop_or_unhealthy.clear()
+            # Always call `clear` before `set`, since only `set` does
+            # context-switches it's easier to reason about tasks that are
+            # waiting on both events.
+            peer.events.event_unhealthy.clear()
+            peer.events.event_healthy.set()
 
-            if event_stop.is_set():
-                return
+            # Don't wait to send the first Ping
+            self.wake(('ping', receiver_address, peer.generation))
 
-        acknowledged = retry(
-            protocol,
-            data,
+        return peer.events
+
+    def get_channel_queue(self, receiver_address, token_address):
+        key = (
             receiver_address,
+            token_address,
+        )
 
-            # retry will stop when this event is set, allowing this task to
-            # wait for recovery when the node becomes unhealthy or to quit if
-            # the stop event is set.
-            stop_or_unhealthy,
+        queuestate = self.key_to_queuestate.get(key)
 
-            # Intentionally reusing backoff to restart from the last
-            # timeout/number of iterations.
-            backoff,
-        )
+        if queuestate is None:
+            queue = ChannelQueue(lambda: self.wake(('queue', key)))
+            queuestate = QueueState(receiver_address, queue)
+            self.key_to_queuestate[key] = queuestate
 
-    return acknowledged
+            self.start_health_check(receiver_address)
+            self.get_peer(receiver_address).queue_keys.append(key)
 
+        return queuestate.queue
 
-def single_queue_send(
-        protocol,
-        receiver_address,
-        queue,
-        event_stop,
-        event_healthy,
-        event_unhealthy,
-        message_retries,
-        message_retry_timeout,
-        message_retry_max_timeout):
+    def _run(self):
+        event_stop = self.protocol.event_stop
 
-    """ Handles a single message queue for `receiver_address`.
+        while not event_stop.is_set():
+            # Only poll while there are timers, an idle node sleeps until a
+            # message is queued
+            timeout = self.wheel.tick if self.wheel else None
+            self.event_wake.wait(timeout)
+            self.event_wake.clear()
 
-    Notes:
-    - This task must be the only consumer of queue.
-    - This task can be killed at any time, but the intended usage is to stop it
-      with the event_stop.
-    - If there are many queues for the same receiver_address, it is the
-      caller's responsibility to not start them together to avoid congestion.
-    """
+            if event_stop.is_set():
+                return
 
-    # A NotifyingQueue is required to implement cancelability, otherwise the
-    # task cannot be stoped while the greenlet waits for an element to be
-    # inserted in the queue.
-    if not isinstance(queue, NotifyingQueue):
-        raise ValueError('queue must be a NotifyingQueue.')
+            for item in self.wheel.expire():
+                self._handle(item)
 
-    # Reusing the event, clear must be carefully done
-    data_or_stop = event_first_of(
-        queue,
-        event_stop,
-    )
+            while self.pending:
+                self._handle(self.pending.popleft())
 
-    while True:
-        data_or_stop.wait()
+    def _handle(self, item):
+        kind = item[0]
 
-        if event_stop.is_set():
-            return
+        if kind == 'queue':
+            self._on_queue(item[1])
+        elif kind == 'acked':
+            self._on_acked(item[1], item[2])
+        elif kind == 'retry':
+            self._on_retry(item[1], item[2])
+        elif kind == 'ping':
+            self._on_ping(item[1], item[2])
+        elif kind == 'pong':
+            self._on_pong(item[1], item[2])
 
-        # The queue is not empty at this point, so this won't raise Empty.
-        # This task being the only consumer is a requirement.
-        data = queue.peek(block=False)
+    def _is_healthy(self, receiver_address):
+        return self.address_to_peer[receiver_address].events.event_healthy.is_set()
 
-        backoff = timeout_exponential_backoff(
-            message_retries,
-            message_retry_timeout,
-            message_retry_max_timeout,
-        )
+    def _window_for(self, receiver_address):
+        if self.window == 1:
+            return 1
 
-        acknowledged = retry_with_recovery(
-            protocol,
-            data,
-            receiver_address,
-            event_stop,
-            event_healthy,
-            event_unhealthy,
-            backoff,
-        )
+        capabilities = self.protocol.nodeaddresses_to_capabilities.get(receiver_address, 0)
+        if capabilities & CAPABILITY_SEND_WINDOW:
+            return self.window
+
+        return 1
 
-        if acknowledged:
-            queue.get()
+    def _on_queue(self, key):
+        queuestate = self.key_to_queuestate[key]
+        queue = queuestate.queue
+        inflight = queuestate.inflight
+        window = self._window_for(queuestate.receiver_address)
 
-            # Checking the length of the queue does not trigger a
-            # context-switch, so it's safe to assume the length of the queue
-            # won't change under our feet and when a new item will be added the
-            # event will be set again.
-            if not queue:
-                data_or_stop.clear()
+        while len(inflight) < window and len(inflight) < len(queue):
+            messagedata = queue.peek(len(inflight))
 
-                if event_stop.is_set():
+            # only consecutive envelope messages are sent ahead of the
+            # previous ones, anything else waits for the in flight messages
+            if inflight:
+                if not is_envelope(messagedata) or not is_envelope(inflight[-1].messagedata):
                     return
 
+            queuestate.generation += 1
+            backoff = timeout_exponential_backoff(
+                self.protocol.retries_before_backoff,
+                self.protocol.retry_interval,
+                self.protocol.retry_interval * 10,
+            )
+            message = InFlightState(messagedata, backoff, queuestate.generation)
 
-def healthcheck(
-        protocol,
-        receiver_address,
-        event_stop,
-        event_healthy,
-        event_unhealthy,
-        nat_keepalive_retries,
-        nat_keepalive_timeout,
-        nat_invitation_timeout,
-        ping_nonce):
-
-    """ Sends a periodical Ping to `receiver_address` to check its health. """
-
-    # The state of the node is unknown, the events are set to allow the tasks
-    # to do work.
-    protocol.set_node_network_state(
-        receiver_address,
-        NODE_NETWORK_UNKNOWN,
-    )
+            inflight.append(message)
+            queuestate.generation_to_inflight[message.generation] = message
 
-    # Always call `clear` before `set`, since only `set` does context-switches
-    # it's easier to reason about tasks that are waiting on both events.
-    event_unhealthy.clear()
-    event_healthy.set()
+            if self._is_healthy(queuestate.receiver_address):
+                self._transmit(key, queuestate, message)
+            else:
+                message.paused = True
 
-    # Don't wait to send the first Ping
-    sleep = 0
+    def _transmit(self, key, queuestate, message):
+        message.paused = False
+        generation = message.generation
 
-    while not event_stop.wait(sleep) is True:
-        sleep = nat_keepalive_timeout
+        try:
+            async_result = self.protocol.send_raw_with_result(
+                message.messagedata,
+                queuestate.receiver_address,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # e.g. the discovery failed, the message is retried on the next
+            # timeout
+            log.error('sending message failed', error=str(e))
+        else:
+            if message.async_result is not async_result:
+                message.async_result = async_result
+                async_result.rawlink(lambda _: self.wake(('acked', key, generation)))
 
-        ping_nonce['nonce'] += 1
-        data = protocol.get_ping(
-            ping_nonce['nonce'],
-        )
+        timeout = next(message.backoff)
+        self.wheel.schedule(time.time() + timeout, ('retry', key, generation))
 
-        # Send Ping a few times before setting the node as unreachable
-        acknowledged = retry(
-            protocol,
-            data,
-            receiver_address,
-            event_stop,
-            [nat_keepalive_timeout] * nat_keepalive_retries,
-        )
+    def _on_acked(self, key, generation):
+        queuestate = self.key_to_queuestate[key]
+        message = queuestate.generation_to_inflight.get(generation)
 
-        if event_stop.is_set():
+        if message is None or not message.async_result.value:
             return
 
-        if not acknowledged:
-            # The node is not healthy, clear the event to stop all queue
-            # tasks
-            protocol.set_node_network_state(
-                receiver_address,
-                NODE_NETWORK_UNREACHABLE,
-            )
-            event_healthy.clear()
-            event_unhealthy.set()
+        message.acked = True
+        del queuestate.generation_to_inflight[generation]
+
+        # the queue keeps the delivery order, the messages are removed once
+        # all the previous ones are acknowledged
+        inflight = queuestate.inflight
+        while inflight and inflight[0].acked:
+            inflight.popleft()
+            queuestate.queue.get()
+
+        self._on_queue(key)
+
+    def _on_retry(self, key, generation):
+        queuestate = self.key_to_queuestate[key]
+        message = queuestate.generation_to_inflight.get(generation)
 
-            # Retry until recovery, used for:
+        if message is None:
+            return
+
+        if message.async_result is not None and message.async_result.ready():
+            return
+
+        # Packets must not be sent to an unhealthy node, the retries are
+        # resumed by the Ping's Ack.
+        if self._is_healthy(queuestate.receiver_address):
+            self._transmit(key, queuestate, message)
+        else:
+            message.paused = True
+
+    def _on_ping(self, receiver_address, generation):
+        peer = self.address_to_peer[receiver_address]
+
+        if peer.generation != generation:
+            return
+
+        protocol = self.protocol
+
+        # the Ack arrived but its callback has not been handled yet
+        if peer.async_result is not None and peer.async_result.ready():
+            return self._on_pong(receiver_address, generation)
+
+        if peer.async_result is None:
+            peer.ping_nonce['nonce'] += 1
+            peer.ping_data = protocol.get_ping(peer.ping_nonce['nonce'])
+            peer.attempts = 0
+
+        if peer.attempts == protocol.nat_keepalive_retries:
+            # The node is not healthy, clear the event to pause all the
+            # queues, the Ping is retried until recovery for:
             # - Checking node status.
             # - Nat punching.
-            acknowledged = retry(
-                protocol,
-                data,
+            protocol.set_node_network_state(
                 receiver_address,
-                event_stop,
-                repeat(nat_invitation_timeout),
+                NODE_NETWORK_UNREACHABLE,
             )
+            peer.events.event_healthy.clear()
+            peer.events.event_unhealthy.set()
 
-        if acknowledged:
-            event_unhealthy.clear()
-            event_healthy.set()
-            protocol.set_node_network_state(
+        peer.attempts += 1
+
+        try:
+            async_result = protocol.send_raw_with_result(
+                peer.ping_data,
                 receiver_address,
-                NODE_NETWORK_REACHABLE,
             )
+        except Exception as e:  # pylint: disable=broad-except
+            log.error('sending ping failed', error=str(e))
+        else:
+            if peer.async_result is not async_result:
+                peer.async_result = async_result
+                async_result.rawlink(
+                    lambda _: self.wake(('pong', receiver_address, generation))
+                )
+
+        if peer.attempts > protocol.nat_keepalive_retries:
+            timeout = protocol.nat_invitation_timeout
+        else:
+            timeout = protocol.nat_keepalive_timeout
+
+        self.wheel.schedule(time.time() + timeout, ('ping', receiver_address, generation))
+
+    def _on_pong(self, receiver_address, generation):
+        peer = self.address_to_peer[receiver_address]
+
+        if peer.generation != generation or peer.async_result is None:
+            return
+
+        if not peer.async_result.value:
+            return
+
+        # invalidate the retry timer of the acknowledged Ping, the next timer
+        # sends a new one
+        peer.generation += 1
+        peer.async_result = None
+
+        peer.events.event_unhealthy.clear()
+        peer.events.event_healthy.set()
+        self.protocol.set_node_network_state(
+            receiver_address,
+            NODE_NETWORK_REACHABLE,
+        )
+
+        for key in peer.queue_keys:
+            queuestate = self.key_to_queuestate[key]
+
+            for message in queuestate.inflight:
+                if message.paused:
+                    self._transmit(key, queuestate, message)
+
+        self.wheel.schedule(
+            time.time() + self.protocol.nat_keepalive_timeout,
+            ('ping', receiver_address, peer.generation),
+        )
 
 
 class RaidenProtocol(object):
@@ -382,7 +565,14 @@ class RaidenProtocol(object):
             retries_before_backoff,
             nat_keepalive_retries,
             nat_keepalive_timeout,
-            nat_invitation_timeout):
+            nat_invitation_timeout,
+            recovery_pool_size=0,
+            recovery_batch_size=DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE,
+            hash_retention=DEFAULT_PROTOCOL_HASH_RETENTION,
+            ack_coalescing_window=0,
+            durability_barrier=None,
+            send_window=DEFAULT_PROTOCOL_SEND_WINDOW,
+            expected_nonce=None):
 
         self.transport = transport
         self.discovery = discovery
@@ -399,28 +589,70 @@ class RaidenProtocol(object):
 
         self.channel_queue = dict()  # TODO: Change keys to the channel address
         self.greenlets = list()
-        self.addresses_events = dict()
         self.nodeaddresses_networkstatuses = defaultdict(lambda: NODE_NETWORK_UNKNOWN)
 
         # Maps the echohash of received and *sucessfully* processed messages to
         # its Ack, used to ignored duplicate messages and resend the Ack.
-        self.receivedhashes_to_acks = dict()
-
-        # Maps the echohash to a SentMessageState
-        self.senthashes_to_states = dict()
+        #
+        # Each envelope message of a channel has the next nonce of its sender
+        # and the partner has at most PROTOCOL_MAX_SEND_WINDOW of them in
+        # flight, so the Acks are dropped once the channel nonce advances past
+        # the window, or after `hash_retention` seconds.
+        self.receivedhashes_to_acks = RetentionMap(hash_retention)
+
+        # Maps the (sender, channel) to the envelope messages received ahead
+        # of the channel nonce, by nonce. These are handled once the gap is
+        # filled and are not acknowledged until then.
+        self.channel_to_heldmessages = dict()
+
+        # Called with the sender and the channel of an envelope message, it
+        # returns the nonce of the next message or None if it's unknown. The
+        # order is checked before the message is handled, because the handlers
+        # have side effects before the channel rejects a wrong nonce.
+        self.expected_nonce = expected_nonce
+
+        # Maps the echohash to a SentMessageState, the retry tasks rely on
+        # the AsyncResult of a pending message, these are never evicted.
+        self.senthashes_to_states = RetentionMap(
+            hash_retention,
+            keep=lambda waitack: not waitack.async_result.ready(),
+        )
 
         # Maps the addresses to a dict with the latest nonce (using a dict
         # because python integers are immutable)
         self.nodeaddresses_to_nonces = dict()
 
-        cache = cachetools.TTLCache(
-            maxsize=50,
-            ttl=CACHE_TTL,
-        )
-        cache_wrapper = cachetools.cached(cache=cache)
-        self.get_host_port = cache_wrapper(discovery.get)
+        # The discovery caches the endpoints of all the nodes
+        self.get_host_port = discovery.get
+
+        # Up to `send_window` envelope messages per channel queue are sent
+        # without waiting for the previous Acks
+        self.scheduler = SendScheduler(self, DEFAULT_PROTOCOL_TIMER_TICK, send_window)
+
+        # Acks to nodes that advertised CAPABILITY_ACKS are delayed for up to
+        # `ack_coalescing_window` and sent in batches, zero disables it
+        self.ack_coalescing_window = ack_coalescing_window
+        self.capabilities = CAPABILITY_ACKS | CAPABILITY_SEND_WINDOW
+        self.nodeaddresses_to_capabilities = dict()
+        self.nodeaddresses_to_pendingacks = dict()
+
+        # Called before any packet is handed to the transport, the peers act
+        # on our messages so the state they depend on must be durable first
+        self.durability_barrier = durability_barrier
+
+        # With a pool size of zero the messages are decoded inline
+        self.recovery = None
+        if recovery_pool_size > 0:
+            self.recovery = SignatureRecovery(
+                self.receive_message,
+                recovery_pool_size,
+                recovery_batch_size,
+            )
 
     def start(self):
+        if self.recovery is not None:
+            self.recovery.start()
+
         self.transport.start()
 
     def stop_and_wait(self):
@@ -428,6 +660,10 @@ class RaidenProtocol(object):
         # socket can only be safely closed after all outgoing tasks are stopped
         self.transport.stop_accepting()
 
+        # Handle the packets that are waiting for the signature recovery
+        if self.recovery is not None:
+            self.recovery.stop_and_wait()
+
         # Stop processing the outgoing queues
         self.event_stop.set()
         gevent.wait(self.greenlets)
@@ -442,43 +678,16 @@ class RaidenProtocol(object):
             waitack.async_result.set(False)
 
     def get_health_events(self, receiver_address):
-        """ Starts a healthcheck taks for `receiver_address` and returns a
+        """ Starts a healthcheck for `receiver_address` and returns a
         HealthEvents with locks to react on its current state.
         """
-        if receiver_address not in self.addresses_events:
-            self.start_health_check(receiver_address)
-
-        return self.addresses_events[receiver_address]
+        return self.scheduler.start_health_check(receiver_address)
 
     def start_health_check(self, receiver_address):
-        """ Starts a task for healthchecking `receiver_address` if there is not
-        one yet.
+        """ Starts healthchecking `receiver_address` if it's not being checked
+        yet.
         """
-        if receiver_address not in self.addresses_events:
-            ping_nonce = self.nodeaddresses_to_nonces.setdefault(
-                receiver_address,
-                {'nonce': 0},  # HACK: Allows the task to mutate the object
-            )
-
-            events = HealthEvents(
-                event_healthy=Event(),
-                event_unhealthy=Event(),
-            )
-
-            self.addresses_events[receiver_address] = events
-
-            self.greenlets.append(gevent.spawn(
-                healthcheck,
-                self,
-                receiver_address,
-                self.event_stop,
-                events.event_healthy,
-                events.event_unhealthy,
-                self.nat_keepalive_retries,
-                self.nat_keepalive_timeout,
-                self.nat_invitation_timeout,
-                ping_nonce,
-            ))
+        self.scheduler.start_health_check(receiver_address)
 
     def get_channel_queue(self, receiver_address, token_address):
         key = (
@@ -489,24 +698,9 @@ class RaidenProtocol(object):
         if key in self.channel_queue:
             return self.channel_queue[key]
 
-        queue = NotifyingQueue()
+        queue = self.scheduler.get_channel_queue(receiver_address, token_address)
         self.channel_queue[key] = queue
 
-        events = self.get_health_events(receiver_address)
-
-        self.greenlets.append(gevent.spawn(
-            single_queue_send,
-            self,
-            receiver_address,
-            queue,
-            self.event_stop,
-            events.event_healthy,
-            events.event_unhealthy,
-            self.retries_before_backoff,
-            self.retry_interval,
-            self.retry_interval * 10,
-        ))
-
         if log.isEnabledFor(logging.DEBUG):
             log.debug(
                 'new queue created for',
@@ -530,7 +724,7 @@ class RaidenProtocol(object):
         # replied with an Ack, adding the receiver address into the echohash to
         # avoid these collisions.
         messagedata = message.encode()
-        echohash = sha3(messagedata + receiver_address)
+        echohash = message.echohash(receiver_address)
 
         if len(messagedata) > UDP_MAX_MESSAGE_SIZE:
             raise ValueError(
@@ -574,8 +768,12 @@ class RaidenProtocol(object):
         async_result = self.send_async(receiver_address, message)
         return async_result.wait(timeout=timeout)
 
-    def maybe_send_ack(self, receiver_address, ack_message):
-        """ Send ack_message to receiver_address if the transport is running. """
+    def maybe_send_ack(self, receiver_address, ack_message, acked_message=None):
+        """ Send ack_message to receiver_address if the transport is running.
+
+        If `acked_message` is an envelope message, the previous Acks of the
+        same channel are dropped.
+        """
         if not isaddress(receiver_address):
             raise ValueError('Invalid address {}'.format(pex(receiver_address)))
 
@@ -583,8 +781,67 @@ class RaidenProtocol(object):
             raise ValueError('Use maybe_send_ack only for Ack messages')
 
         messagedata = ack_message.encode()
-        self.receivedhashes_to_acks[ack_message.echo] = (receiver_address, messagedata)
-        self._maybe_send_ack(*self.receivedhashes_to_acks[ack_message.echo])
+
+        if isinstance(acked_message, EnvelopeMessage):
+            group = (receiver_address, acked_message.channel)
+            nonce = acked_message.nonce
+
+            self.receivedhashes_to_acks.retire(group, nonce - PROTOCOL_MAX_SEND_WINDOW + 1)
+            self.receivedhashes_to_acks.add(
+                ack_message.echo,
+                (receiver_address, messagedata),
+                group,
+                nonce,
+            )
+        else:
+            self.receivedhashes_to_acks[ack_message.echo] = (receiver_address, messagedata)
+
+        capabilities = self.nodeaddresses_to_capabilities.get(receiver_address, 0)
+
+        if self.ack_coalescing_window and capabilities & CAPABILITY_ACKS:
+            self._coalesce_ack(receiver_address, ack_message.echo, messagedata)
+        else:
+            self._maybe_send_ack(receiver_address, messagedata)
+
+    def _coalesce_ack(self, receiver_address, echohash, messagedata):
+        """ Delay the Ack for up to `ack_coalescing_window` seconds, to send it
+        in a single packet with the other Acks for `receiver_address`.
+        """
+        pending = self.nodeaddresses_to_pendingacks.get(receiver_address)
+
+        if pending is None:
+            pending = self.nodeaddresses_to_pendingacks[receiver_address] = list()
+            gevent.spawn_later(
+                self.ack_coalescing_window,
+                self._flush_acks,
+                receiver_address,
+            )
+
+        pending.append((echohash, messagedata))
+
+        if len(pending) == ACKS_MAX_ECHOS:
+            self._flush_acks(receiver_address)
+
+    def _flush_acks(self, receiver_address):
+        # the batch may have been sent already because it was full
+        pending = self.nodeaddresses_to_pendingacks.pop(receiver_address, None)
+
+        if not pending:
+            return
+
+        if len(pending) == 1:
+            _, messagedata = pending[0]
+        else:
+            acks = Acks(
+                self.raiden.address,
+                [echohash for echohash, _ in pending],
+            )
+            messagedata = acks.encode()
+
+        try:
+            self._maybe_send_ack(receiver_address, messagedata)
+        except (InvalidAddress, UnknownAddress) as e:
+            log.debug("Couldn't send the ACK", e=e)
 
     def _maybe_send_ack(self, receiver_address, messagedata):
         """ ACK must not go into the queue, otherwise nodes will deadlock
@@ -601,6 +858,9 @@ class RaidenProtocol(object):
         # This check verifies the udp socket is still available before trying
         # to send the ack. There must be *no context-switches after this test*.
         if self.transport.server.started:
+            if self.durability_barrier is not None:
+                self.durability_barrier()
+
             self.transport.send(
                 self.raiden,
                 host_port,
@@ -613,7 +873,7 @@ class RaidenProtocol(object):
         Note: Ping messages don't have an enforced ordering, so a Ping message
         with a higher nonce may be acknowledged first.
         """
-        message = Ping(nonce)
+        message = Ping(nonce, self.capabilities)
         self.raiden.sign(message)
         message_data = message.encode()
 
@@ -638,6 +898,9 @@ class RaidenProtocol(object):
             async_result = self.senthashes_to_states[echohash].async_result
 
         if not async_result.ready():
+            if self.durability_barrier is not None:
+                self.durability_barrier()
+
             self.transport.send(
                 self.raiden,
                 host_port,
@@ -659,31 +922,53 @@ class RaidenProtocol(object):
         if echohash in self.receivedhashes_to_acks:
             return self._maybe_send_ack(*self.receivedhashes_to_acks[echohash])
 
-        message = decode(data)
+        if self.recovery is not None:
+            self.recovery.put(data, echohash)
+        else:
+            message = decode(data)
+            self.receive_message(data, echohash, message)
 
-        if isinstance(message, Ack):
-            waitack = self.senthashes_to_states.get(message.echo)
+    def receive_ack(self, echohash):
+        waitack = self.senthashes_to_states.get(echohash)
 
-            if waitack is None:
-                if log.isEnabledFor(logging.DEBUG):
-                    log.debug(
-                        'ACK FOR UNKNOWN ECHO',
-                        node=pex(self.raiden.address),
-                        echohash=pex(message.echo),
-                    )
+        if waitack is None:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    'ACK FOR UNKNOWN ECHO',
+                    node=pex(self.raiden.address),
+                    echohash=pex(echohash),
+                )
 
-            else:
-                if log.isEnabledFor(logging.DEBUG):
-                    log.debug(
-                        'ACK RECEIVED',
-                        node=pex(self.raiden.address),
-                        receiver=pex(waitack.receiver_address),
-                        echohash=pex(message.echo),
-                    )
+        else:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    'ACK RECEIVED',
+                    node=pex(self.raiden.address),
+                    receiver=pex(waitack.receiver_address),
+                    echohash=pex(echohash),
+                )
+
+            waitack.async_result.set(True)
+
+    def receive_message(self, data, echohash, message):
+        """ Dispatch the decoded `message`, `message` is None if `data` is
+        not a valid message.
+        """
+        # A retransmission may have arrived while the message was waiting for
+        # the signature recovery
+        if echohash in self.receivedhashes_to_acks:
+            return self._maybe_send_ack(*self.receivedhashes_to_acks[echohash])
 
-                waitack.async_result.set(True)
+        if isinstance(message, Ack):
+            self.receive_ack(message.echo)
+
+        elif isinstance(message, Acks):
+            for echo in message.echos:
+                self.receive_ack(echo)
 
         elif isinstance(message, Ping):
+            self.nodeaddresses_to_capabilities[message.sender] = message.capabilities
+
             if ping_log.isEnabledFor(logging.DEBUG):
                 ping_log.debug(
                     'PING RECEIVED',
@@ -704,6 +989,10 @@ class RaidenProtocol(object):
             )
 
         elif isinstance(message, SignedMessage):
+            is_envelope_message = isinstance(message, EnvelopeMessage)
+            if is_envelope_message and not self._in_nonce_order(data, echohash, message):
+                return
+
             if log.isEnabledFor(logging.INFO):
                 log.info(
                     'MESSAGE RECEIVED',
@@ -717,26 +1006,10 @@ class RaidenProtocol(object):
                 self.raiden.on_message(message, echohash)
 
                 # only send the Ack if the message was handled without exceptions
-                ack = Ack(
-                    self.raiden.address,
-                    echohash,
-                )
+                self._send_ack(message.sender, echohash, message)
 
-                try:
-                    if log.isEnabledFor(logging.DEBUG):
-                        log.debug(
-                            'SENDING ACK',
-                            node=pex(self.raiden.address),
-                            to=pex(message.sender),
-                            echohash=pex(echohash),
-                        )
-
-                    self.maybe_send_ack(
-                        message.sender,
-                        ack,
-                    )
-                except (InvalidAddress, UnknownAddress) as e:
-                    log.debug("Couldn't send the ACK", e=e)
+                if isinstance(message, EnvelopeMessage):
+                    self._release_held(message)
 
             except (UnknownAddress, InvalidNonce, TransferWhenClosed, TransferUnwanted) as e:
                 log.DEV('maybe unwanted transfer', e=e)
@@ -745,8 +1018,119 @@ class RaidenProtocol(object):
                 if log.isEnabledFor(logging.WARN):
                     log.warn(str(e))
 
+            except ValueError as e:
+                # The channel rejected the message, a retransmission would be
+                # rejected too. The Ack stops the retries, otherwise the
+                # message would block the partner's queue.
+                if log.isEnabledFor(logging.ERROR):
+                    log.error(
+                        'INVALID MESSAGE REJECTED',
+                        node=pex(self.raiden.address),
+                        message=message,
+                        error=str(e),
+                    )
+
+                self._send_ack(message.sender, echohash, message)
+
         elif log.isEnabledFor(logging.ERROR):
             log.error(
                 'Invalid message',
                 message=data.encode('hex'),
             )
+
+    def _send_ack(self, receiver_address, echohash, acked_message=None):
+        ack = Ack(
+            self.raiden.address,
+            echohash,
+        )
+
+        try:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    'SENDING ACK',
+                    node=pex(self.raiden.address),
+                    to=pex(receiver_address),
+                    echohash=pex(echohash),
+                )
+
+            self.maybe_send_ack(
+                receiver_address,
+                ack,
+                acked_message,
+            )
+        except (InvalidAddress, UnknownAddress) as e:
+            log.debug("Couldn't send the ACK", e=e)
+
+    def _in_nonce_order(self, data, echohash, message):
+        """ True if the envelope `message` has the next nonce of its channel,
+        or if the next nonce is unknown.
+
+        A message ahead of the channel nonce is held back until the previous
+        messages are handled. An older message is a stale retransmission or a
+        replay, it's not handled but it's acknowledged, otherwise the sender
+        would retry it forever.
+        """
+        if self.expected_nonce is None:
+            return True
+
+        expected_nonce = self.expected_nonce(message.sender, message.channel)
+
+        if expected_nonce is None or message.nonce == expected_nonce:
+            return True
+
+        if message.nonce > expected_nonce:
+            self._hold_back(data, echohash, message, expected_nonce)
+
+        else:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    'STALE MESSAGE DROPPED',
+                    node=pex(self.raiden.address),
+                    message=message,
+                    expected_nonce=expected_nonce,
+                )
+
+            # the nonce is behind the channel's, the Ack is not retired by it
+            self._send_ack(message.sender, echohash)
+
+        return False
+
+    def _hold_back(self, data, echohash, message, expected_nonce):
+        """ Keep an envelope message that arrived ahead of the channel nonce,
+        it's handled after the previous messages.
+        """
+        group = (message.sender, message.channel)
+        held = self.channel_to_heldmessages.get(group)
+
+        if held is None:
+            held = self.channel_to_heldmessages[group] = dict()
+
+        # the partner can not be further ahead than its send window, a message
+        # that does not fit is not acknowledged and the partner retries it
+        too_far = message.nonce - expected_nonce >= PROTOCOL_MAX_SEND_WINDOW
+        if too_far or (message.nonce not in held and len(held) >= PROTOCOL_MAX_SEND_WINDOW - 1):
+            if not held:
+                del self.channel_to_heldmessages[group]
+            return
+
+        held[message.nonce] = (data, echohash, message)
+
+    def _release_held(self, message):
+        """ Handle the held message that follows `message`, if any. """
+        group = (message.sender, message.channel)
+        held = self.channel_to_heldmessages.get(group)
+
+        if held is None:
+            return
+
+        # the held messages up to the channel nonce are stale, e.g. forged
+        for nonce in [nonce for nonce in held if nonce <= message.nonce]:
+            del held[nonce]
+
+        next_message = held.pop(message.nonce + 1, None)
+
+        if not held:
+            del self.channel_to_heldmessages[group]
+
+        if next_message is not None:
+            self.receive_message(*next_message)
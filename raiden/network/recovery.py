@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import gevent
+from gevent.queue import Queue
+from gevent.threadpool import ThreadPool
+from ethereum import slogging
+
+from raiden.encoding import messages
+from raiden.messages import (
+    CMDID_TO_CLASS,
+    SENDER_CACHE,
+    SignedMessage,
+    recover_publickey_or_error,
+    sender_from_recovery,
+)
+
+log = slogging.get_logger(__name__)  # pylint: disable=invalid-name
+
+# sentinel used to stop the greenlets
+STOP = object()
+
+
+def recover_batch(signed_batch):
+    """ Recover the public keys for a batch of `(data_that_was_signed,
+    signature)` pairs, None entries are skipped.
+
+    This runs in a native thread, it must not use the hub nor log.
+    """
+    return [
+        recover_publickey_or_error(*signed) if signed is not None else None
+        for signed in signed_batch
+    ]
+
+
+class SignatureRecovery(object):
+    """ Decodes incoming packets, recovering the message senders in a pool of
+    native threads.
+
+    The public key recovery is the most expensive step of handling a message
+    and the secp256k1 library releases the GIL while doing it, so recovering
+    in a thread pool lets a node use more than one core for incoming
+    traffic.
+
+    Packets are queued as they arrive and submitted to the pool in batches of
+    up to `batch_size`, to amortize the cost of the thread handoff. Decoded
+    messages are handed to `callback` on the hub, in the same order the
+    packets arrived, so the per-sender ordering is preserved.
+    """
+
+    def __init__(self, callback, pool_size, batch_size):
+        self.callback = callback
+        self.batch_size = batch_size
+        self.pool = ThreadPool(pool_size)
+
+        self.packets = Queue()
+        # bounded, so that at most one batch per thread is waiting for the
+        # pool and the memory used by a burst of packets is limited
+        self.batches = Queue(maxsize=pool_size)
+        self.greenlets = list()
+
+    def start(self):
+        self.greenlets = [
+            gevent.spawn(self._submit_batches),
+            gevent.spawn(self._deliver_batches),
+        ]
+
+    def stop_and_wait(self):
+        """ Stop the pipeline, packets that were already queued are handled
+        before this returns.
+        """
+        self.packets.put(STOP)
+        gevent.wait(self.greenlets)
+        self.pool.kill()
+
+    def put(self, data, echohash):
+        """ Queue the packet `data` for decoding.
+
+        The framing of the packet is validated and the `SENDER_CACHE` is
+        checked right away, only the signature recovery is deferred to the
+        pool.
+        """
+        klass = CMDID_TO_CLASS[data[0]]
+        packed = messages.unpack(data)
+
+        signed = None
+        cache_key = None
+        sender = None
+
+        if packed is not None and issubclass(klass, SignedMessage):
+            signed = klass.signed_data(data)
+            cache_key = SENDER_CACHE.key(*signed)
+            sender = SENDER_CACHE.get(cache_key)
+
+        self.packets.put((data, echohash, klass, packed, signed, cache_key, sender))
+
+    def _submit_batches(self):
+        running = True
+
+        while running:
+            batch = [self.packets.get()]
+
+            while (
+                    len(batch) < self.batch_size and
+                    batch[-1] is not STOP and
+                    not self.packets.empty()):
+                batch.append(self.packets.get())
+
+            if batch[-1] is STOP:
+                batch.pop()
+                running = False
+
+            if batch:
+                # only the packets with an unknown sender need the recovery
+                signed_batch = [
+                    signed if sender is None else None
+                    for _, _, _, _, signed, _, sender in batch
+                ]
+                async_result = self.pool.spawn(recover_batch, signed_batch)
+                self.batches.put((batch, async_result))
+
+        self.batches.put(STOP)
+
+    def _deliver_batches(self):
+        for batch, async_result in iter(self.batches.get, STOP):
+            publickeys = async_result.get()
+
+            for packet, publickey in zip(batch, publickeys):
+                data, echohash, klass, packed, signed, cache_key, sender = packet
+
+                if packed is None:
+                    message = None
+                elif signed is None:
+                    message = klass.decode(data)
+                else:
+                    if sender is None:
+                        sender = sender_from_recovery(cache_key, publickey)
+
+                    message = klass.decode_recovered(
+                        packed,
+                        data,
+                        signed[0],
+                        sender,
+                    )
+
+                try:
+                    self.callback(data, echohash, message)
+                except Exception:  # pylint: disable=broad-except
+                    # a failing message must not stop the delivery of the
+                    # following ones
+                    log.exception('error while handling message')
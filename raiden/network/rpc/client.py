@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
-from time import time as now
+import json
+from collections import namedtuple
 
 import rlp
 import gevent
+from gevent.event import AsyncResult
 from gevent.lock import Semaphore
 from ethereum import slogging
 from ethereum import _solidity
@@ -15,8 +17,15 @@ from pyethapp.jsonrpc import (
     data_decoder,
     data_encoder,
     default_gasprice,
+    default_startgas,
+    quantity_encoder,
+)
+from pyethapp.rpc_client import (
+    topic_encoder,
+    JSONRPCClient,
+    JSONRPCClientReplyError,
+    block_tag_encoder,
 )
-from pyethapp.rpc_client import topic_encoder, JSONRPCClient, block_tag_encoder
 import requests
 
 from raiden import messages
@@ -29,7 +38,9 @@ from raiden.exceptions import (
 )
 from raiden.constants import NETTINGCHANNEL_SETTLE_TIMEOUT_MIN, DISCOVERY_REGISTRATION_GAS
 from raiden.settings import (
+    DEFAULT_ALARM_WAIT_TIME,
     DEFAULT_POLL_TIMEOUT,
+    DEFAULT_TRANSACTION_POLL_INTERVAL,
     GAS_LIMIT,
     GAS_PRICE,
 )
@@ -47,6 +58,7 @@ from raiden.blockchain.abi import (
     CONTRACT_NETTING_CHANNEL,
     CONTRACT_REGISTRY,
 
+    EVENT_ADDRESS_REGISTERED,
     EVENT_CHANNEL_NEW,
     EVENT_TOKEN_ADDED,
 )
@@ -55,6 +67,14 @@ from raiden.exceptions import SamePeerAddress
 log = slogging.getLogger(__name__)  # pylint: disable=invalid-name
 solidity = _solidity.get_solidity()  # pylint: disable=invalid-name
 
+MinedTransaction = namedtuple(
+    'MinedTransaction',
+    ('transaction_hash', 'receipt', 'threw'),
+)
+
+# The constant functions of the netting channel used by `detail`
+DETAIL_FUNCTIONS = ('addressAndBalance', 'settleTimeout')
+
 # Coding standard for this module:
 #
 # - Be sure to reflect changes to this module in the test
@@ -73,8 +93,14 @@ class JSONRPCPollTimeoutException(Exception):
 def check_transaction_threw(client, transaction_hash):
     """Check if the transaction threw or if it executed properly"""
     encoded_transaction = data_encoder(transaction_hash.decode('hex'))
-    transaction = client.call('eth_getTransactionByHash', encoded_transaction)
-    receipt = client.call('eth_getTransactionReceipt', encoded_transaction)
+
+    batch = BatchCall(client)
+    transaction = batch.call('eth_getTransactionByHash', encoded_transaction)
+    receipt = batch.call('eth_getTransactionReceipt', encoded_transaction)
+    batch.execute()
+
+    transaction = transaction.get()
+    receipt = receipt.get()
     if int(transaction['gas'], 0) != int(receipt['gasUsed'], 0):
         return None
     else:
@@ -82,79 +108,23 @@ def check_transaction_threw(client, transaction_hash):
 
 
 def patch_send_transaction(client, nonce_offset=0):
-    """Check if the remote supports pyethapp's extended jsonrpc spec for local tx signing.
-    If not, replace the `send_transaction` method with a more generic one.
+    """ Replace the `send_transaction` method with the one of a
+    TransactionManager, the transactions are signed locally and the nonces are
+    assigned by the manager.
+
+    This is necessary to support remotes that don't support pyethapp's
+    extended specs, and all the transactions of the client must take their
+    nonce from the same manager.
     """
-    patch_necessary = False
+    client.transaction_manager = TransactionManager(client, nonce_offset)
+    client.send_transaction = client.transaction_manager.send_transaction
 
-    try:
-        client.call('eth_nonce', encode_hex(client.sender), 'pending')
-    except:
-        patch_necessary = True
-        client.last_nonce_update = 0
-        client.current_nonce = None
-        client.nonce_lock = Semaphore()
-
-    def send_transaction(sender, to, value=0, data='', startgas=GAS_LIMIT,
-                         gasprice=GAS_PRICE, nonce=None):
-        """Custom implementation for `pyethapp.rpc_client.JSONRPCClient.send_transaction`.
-        This is necessary to support other remotes that don't support pyethapp's extended specs.
-        @see https://github.com/ethereum/pyethapp/blob/develop/pyethapp/rpc_client.py#L359
-        """
-        def get_nonce():
-            """Eventually syncing nonce counter.
-            This will keep a local nonce counter that is only syncing against
-            the remote every `UPDATE_INTERVAL`.
-
-            If the remote counter is lower than the current local counter,
-            it will wait for the remote to catch up.
-            """
-            with client.nonce_lock:
-                UPDATE_INTERVAL = 5.
-                query_time = now()
-                needs_update = abs(query_time - client.last_nonce_update) > UPDATE_INTERVAL
-                not_initialized = client.current_nonce is None
-                if needs_update or not_initialized:
-                    nonce = _query_nonce()
-                    # we may have hammered the server and not all tx are
-                    # registered as `pending` yet
-                    while nonce < client.current_nonce:
-                        log.debug(
-                            "nonce on server too low; retrying",
-                            server=nonce,
-                            local=client.current_nonce
-                        )
-                        nonce = _query_nonce()
-                        query_time = now()
-                    client.current_nonce = nonce
-                    client.last_nonce_update = query_time
-                else:
-                    client.current_nonce += 1
-                return client.current_nonce
-
-        def _query_nonce():
-            pending_transactions_hex = client.call(
-                'eth_getTransactionCount',
-                address_encoder(sender),
-                'pending',
-            )
-            pending_transactions = int(pending_transactions_hex, 16)
-            nonce = pending_transactions + nonce_offset
-            return nonce
 
-        nonce = get_nonce()
+def get_transaction_manager(client):
+    if getattr(client, 'transaction_manager', None) is None:
+        patch_send_transaction(client)
 
-        tx = Transaction(nonce, gasprice, startgas, to, value, data)
-        assert hasattr(client, 'privkey') and client.privkey
-        tx.sign(client.privkey)
-        result = client.call(
-            'eth_sendRawTransaction',
-            data_encoder(rlp.encode(tx)),
-        )
-        return result[2 if result.startswith('0x') else 0:]
-
-    if patch_necessary:
-        client.send_transaction = send_transaction
+    return client.transaction_manager
 
 
 def patch_send_message(client, pool_maxsize=50):
@@ -189,6 +159,98 @@ def patch_send_message(client, pool_maxsize=50):
     client.transport.send_message = send_message
 
 
+class BatchCall(object):
+    """ Queue JSON-RPC requests and send them in a single JSON-RPC 2.0 batch,
+    using one HTTP round trip instead of one per request.
+
+    Each queued request returns an AsyncResult which is set by `execute`,
+    with the decoded result or with a JSONRPCClientReplyError if the node
+    replied with an error.
+    """
+
+    def __init__(self, jsonrpc_client):
+        self.client = jsonrpc_client
+        self.queued = list()
+
+    def _queue(self, method, args, decode=None):
+        request = self.client.protocol.create_request(method, args)
+        result = AsyncResult()
+        self.queued.append((request, result, decode))
+        return result
+
+    def call(self, method, *args):
+        """ Queue a request, the arguments follow `JSONRPCClient.call`. """
+        return self._queue(method, args)
+
+    def contract_call(self, method_proxy, *args, **kargs):
+        """ Queue a call to a constant function of a contract proxy, e.g.
+        `batch.contract_call(proxy.settleTimeout)`, the result is decoded as
+        by `method_proxy.call`.
+        """
+        translator = method_proxy.translator
+        function_name = method_proxy.function_name
+
+        json_data = {
+            'from': address_encoder(method_proxy.sender),
+            'to': data_encoder(method_proxy.contract_address),
+            'value': quantity_encoder(kargs.get('value', 0)),
+            'gasPrice': quantity_encoder(kargs.get('gasprice', default_gasprice)),
+            'gas': quantity_encoder(kargs.get('startgas', default_startgas)),
+            'data': data_encoder(translator.encode(function_name, args)),
+        }
+
+        def decode(result):
+            result = data_decoder(result)
+
+            if result:
+                result = translator.decode(function_name, result)
+                result = result[0] if len(result) == 1 else result
+
+            return result
+
+        return self._queue('eth_call', (json_data, 'latest'), decode)
+
+    def execute(self):
+        """ Send the queued requests and set their results. """
+        queued = self.queued
+        self.queued = list()
+
+        if not queued:
+            return
+
+        batch_request = self.client.protocol.create_batch_request([
+            request
+            for request, _, _ in queued
+        ])
+        reply = self.client.transport.send_message(batch_request.serialize())
+
+        replies = json.loads(reply)
+        if not isinstance(replies, list):
+            # the node does not support batches or the batch is invalid
+            message = replies.get('error', {}).get('message', 'Invalid batch reply')
+            error = JSONRPCClientReplyError(message)
+            for _, result, _ in queued:
+                result.set_exception(error)
+            raise error
+
+        id_to_reply = {
+            response.get('id'): response
+            for response in replies
+        }
+
+        for request, result, decode in queued:
+            response = id_to_reply.get(request.unique_id)
+
+            if response is None:
+                result.set_exception(JSONRPCClientReplyError('Missing reply in the batch'))
+            elif 'error' in response:
+                result.set_exception(JSONRPCClientReplyError(response['error']['message']))
+            elif decode is not None:
+                result.set(decode(response['result']))
+            else:
+                result.set(response['result'])
+
+
 def new_filter(jsonrpc_client, contract_address, topics, from_block=None, to_block=None):
     """ Custom new filter implementation to handle bad encoding from geth rpc. """
     if isinstance(from_block, int):
@@ -229,12 +291,33 @@ def get_filter_events(jsonrpc_client, contract_address, topics, from_block=None,
         ]
 
     filter_changes = jsonrpc_client.call('eth_getLogs', json_data)
+    return decode_log_events(filter_changes)
+
+
+def get_logs(jsonrpc_client, addresses, from_block, to_block):
+    """ Return the logs of all the contracts at `addresses` in the blocks from
+    `from_block` to `to_block`, inclusive, using a single eth_getLogs.
+    """
+    json_data = {
+        'fromBlock': hex(from_block),
+        'toBlock': hex(to_block),
+        'address': [
+            address_encoder(normalize_address(address))
+            for address in addresses
+        ],
+    }
+
+    filter_changes = jsonrpc_client.call('eth_getLogs', json_data)
+    return decode_log_events(filter_changes)
 
+
+def decode_log_events(filter_changes):
+    """ Decode the logs returned by eth_getLogs and eth_getFilterChanges. """
     # geth could return None
     if filter_changes is None:
         return []
 
-    result = []
+    result = list()
     for log_event in filter_changes:
         address = address_decoder(log_event['address'])
         data = data_decoder(log_event['data'])
@@ -265,6 +348,9 @@ def decode_topic(topic):
 def estimate_and_transact(classobject, callobj, *args):
     """Estimate gas using eth_estimateGas. Multiply by 2 to make sure sufficient gas is provided
     Limit maximum gas to GAS_LIMIT to avoid exceeding blockgas limit
+
+    The transaction is sent by the TransactionManager of the client, the
+    returned AsyncResult is set with a MinedTransaction once it's mined.
     """
     estimated_gas = callobj.estimate_gas(
         *args,
@@ -272,12 +358,203 @@ def estimate_and_transact(classobject, callobj, *args):
         gasprice=classobject.gasprice
     )
     estimated_gas = min(estimated_gas * 2, GAS_LIMIT)
-    transaction_hash = callobj.transact(
+    return get_transaction_manager(classobject.client).transact(
+        callobj,
         *args,
         startgas=estimated_gas,
         gasprice=classobject.gasprice
     )
-    return transaction_hash
+
+
+def wait_mined(async_result, timeout=None):
+    """ Wait for the transaction of `async_result` to be mined and return
+    its MinedTransaction.
+
+    On a timeout the transaction is abandoned, the TransactionManager stops
+    polling its receipt and checks its nonce against the node before the next
+    transaction, because the transaction may have been dropped by the node.
+    """
+    try:
+        return async_result.get(timeout=timeout)
+    except gevent.Timeout:
+        error = JSONRPCPollTimeoutException('timeout when polling for transaction')
+        async_result.set_exception(error)
+        raise error
+
+
+class TransactionManager(object):
+    """ Sends the transactions of the client's account back to back and
+    tracks their receipts.
+
+    The nonces are assigned locally, the node is queried for the transaction
+    count on the first transaction, when it rejects one, e.g. because the
+    account was used by another client, and after a transaction was
+    abandoned, because a dropped transaction leaves a nonce gap that the node
+    does not reject. The receipts of all the pending transactions are polled
+    by a single greenlet with one batch every `poll_interval` seconds.
+    """
+
+    def __init__(self, client, nonce_offset=0, poll_interval=DEFAULT_TRANSACTION_POLL_INTERVAL):
+        self.client = client
+        self.nonce_offset = nonce_offset
+        self.poll_interval = poll_interval
+
+        self.nonce = None
+        self.nonce_lock = Semaphore()
+
+        # set once a transaction was abandoned, the nonce is checked against
+        # the node before the next transaction
+        self.nonce_unsynced = False
+
+        # Maps the hash of the pending transactions to its AsyncResult and
+        # startgas, the transactions that use all the gas threw
+        self.transactionhash_to_pending = dict()
+        self.receipts_poller = None
+
+    def query_nonce(self):
+        pending_transactions_hex = self.client.call(
+            'eth_getTransactionCount',
+            address_encoder(self.client.sender),
+            'pending',
+        )
+        return int(pending_transactions_hex, 16) + self.nonce_offset
+
+    def send_transaction(self, sender, to, value=0, data='', startgas=GAS_LIMIT,
+                         gasprice=GAS_PRICE, nonce=None):
+        """ Custom implementation for `pyethapp.rpc_client.JSONRPCClient.send_transaction`,
+        the `nonce` is assigned by the manager.
+        """
+        # pylint: disable=unused-argument,too-many-arguments
+        with self.nonce_lock:
+            self._forget_abandoned()
+
+            if self.nonce is None:
+                self.nonce = self.query_nonce()
+
+            elif self.nonce_unsynced:
+                nonce = self.query_nonce()
+                if nonce != self.nonce:
+                    log.warning('nonce out of sync', local=self.nonce, node=nonce)
+                    self.nonce = nonce
+
+            self.nonce_unsynced = False
+
+            try:
+                transaction_hash = self._send_raw(self.nonce, to, value, data, startgas, gasprice)
+            except JSONRPCClientReplyError:
+                nonce = self.query_nonce()
+                if nonce == self.nonce:
+                    raise
+
+                log.warning('nonce out of sync', local=self.nonce, node=nonce)
+                self.nonce = nonce
+                transaction_hash = self._send_raw(self.nonce, to, value, data, startgas, gasprice)
+
+            # the nonce is used only once the node accepted the transaction
+            self.nonce += 1
+
+        return transaction_hash
+
+    def _send_raw(self, nonce, to, value, data, startgas, gasprice):
+        # pylint: disable=too-many-arguments
+        transaction = Transaction(nonce, gasprice, startgas, to, value, data)
+        transaction.sign(self.client.privkey)
+        result = self.client.call(
+            'eth_sendRawTransaction',
+            data_encoder(rlp.encode(transaction)),
+        )
+        return result[2 if result.startswith('0x') else 0:]
+
+    def transact(self, callobj, *args, **kwargs):
+        """ Send a transaction to the contract function `callobj` without
+        waiting for it to be mined.
+
+        Return:
+            AsyncResult: set with the MinedTransaction.
+        """
+        startgas = kwargs.get('startgas', GAS_LIMIT)
+        gasprice = kwargs.get('gasprice', GAS_PRICE)
+
+        transaction_hash = self.send_transaction(
+            self.client.sender,
+            callobj.contract_address,
+            data=callobj.translator.encode(callobj.function_name, args),
+            startgas=startgas,
+            gasprice=gasprice,
+        )
+
+        return self.track(transaction_hash, startgas)
+
+    def track(self, transaction_hash, startgas):
+        async_result = AsyncResult()
+        self.transactionhash_to_pending[transaction_hash] = (async_result, startgas)
+
+        if self.receipts_poller is None:
+            self.receipts_poller = gevent.spawn(self._poll_receipts)
+
+        return async_result
+
+    def _forget_abandoned(self):
+        """ Stop polling the receipts of the transactions abandoned by
+        `wait_mined`.
+        """
+        abandoned = [
+            transaction_hash
+            for transaction_hash, (async_result, _) in self.transactionhash_to_pending.items()
+            if async_result.ready()
+        ]
+
+        for transaction_hash in abandoned:
+            log.warning('transaction abandoned', transaction_hash=transaction_hash)
+            del self.transactionhash_to_pending[transaction_hash]
+            self.nonce_unsynced = True
+
+    def _poll_receipts(self):
+        while self.transactionhash_to_pending:
+            gevent.sleep(self.poll_interval)
+
+            self._forget_abandoned()
+            if not self.transactionhash_to_pending:
+                break
+
+            batch = BatchCall(self.client)
+            receipts = [
+                (transaction_hash, batch.call(
+                    'eth_getTransactionReceipt',
+                    data_encoder(transaction_hash.decode('hex')),
+                ))
+                for transaction_hash in self.transactionhash_to_pending
+            ]
+
+            try:
+                batch.execute()
+            except Exception as e:  # pylint: disable=broad-except
+                log.error('polling the transaction receipts failed', error=str(e))
+                continue
+
+            for transaction_hash, receipt in receipts:
+                try:
+                    receipt = receipt.get()
+                except JSONRPCClientReplyError:
+                    continue
+
+                # the transaction is pending
+                if receipt is None or receipt.get('blockNumber') is None:
+                    continue
+
+                async_result, startgas = self.transactionhash_to_pending.pop(transaction_hash)
+
+                # abandoned while the receipts were polled
+                if async_result.ready():
+                    continue
+
+                async_result.set(MinedTransaction(
+                    transaction_hash,
+                    receipt,
+                    int(receipt['gasUsed'], 0) == startgas,
+                ))
+
+        self.receipts_poller = None
 
 
 class BlockChainService(object):
@@ -350,14 +627,17 @@ class BlockChainService(object):
 
     def next_block(self):
         target_block_number = self.block_number() + 1
-        current_block = target_block_number
+        current_block = target_block_number - 1
 
-        while not current_block >= target_block_number:
+        while current_block < target_block_number:
+            gevent.sleep(DEFAULT_ALARM_WAIT_TIME)
             current_block = self.block_number()
-            gevent.sleep(0.5)
 
         return current_block
 
+    def new_block_filter(self):
+        return BlockFilter(self.client)
+
     def token(self, token_address):
         """ Return a proxy to interact with a token. """
         if token_address not in self.address_to_token:
@@ -486,33 +766,7 @@ class Filter(object):
 
     def _query_filter(self, function):
         filter_changes = self.client.call(function, self.filter_id_raw)
-
-        # geth could return None
-        if filter_changes is None:
-            return []
-
-        result = list()
-        for log_event in filter_changes:
-            address = address_decoder(log_event['address'])
-            data = data_decoder(log_event['data'])
-            topics = [
-                decode_topic(topic)
-                for topic in log_event['topics']
-            ]
-            block_number = log_event.get('blockNumber')
-            if not block_number:
-                block_number = 0
-            else:
-                block_number = int(block_number, 0)
-
-            result.append({
-                'topics': topics,
-                'data': data,
-                'address': address,
-                'block_number': block_number,
-            })
-
-        return result
+        return decode_log_events(filter_changes)
 
     def changes(self):
         return self._query_filter('eth_getFilterChanges')
@@ -527,6 +781,25 @@ class Filter(object):
         )
 
 
+class BlockFilter(object):
+    """ Filter of the new blocks, `changes` returns the hashes of the blocks
+    mined since the previous call. """
+
+    def __init__(self, jsonrpc_client):
+        self.client = jsonrpc_client
+        self.filter_id_raw = jsonrpc_client.call('eth_newBlockFilter')
+
+    def changes(self):
+        # geth could return None
+        return self.client.call('eth_getFilterChanges', self.filter_id_raw) or []
+
+    def uninstall(self):
+        self.client.call(
+            'eth_uninstallFilter',
+            self.filter_id_raw,
+        )
+
+
 class Discovery(object):
     """On chain smart contract raiden node discovery: allows registering
     endpoints (host, port) for your ethereum-/raiden-address and looking up
@@ -599,6 +872,27 @@ class Discovery(object):
     def version(self):
         return self.proxy.contract_version.call()
 
+    def addressregistered_filter(self, from_block=None, to_block=None):
+        """ Install a new filter for AddressRegistered events.
+
+        Return:
+            Filter: The filter instance.
+        """
+        topics = [CONTRACT_MANAGER.get_event_id(EVENT_ADDRESS_REGISTERED)]
+
+        filter_id_raw = new_filter(
+            self.client,
+            self.address,
+            topics,
+            from_block=from_block,
+            to_block=to_block
+        )
+
+        return Filter(
+            self.client,
+            filter_id_raw,
+        )
+
 
 class Token(object):
     def __init__(
@@ -638,34 +932,32 @@ class Token(object):
         # `self.address` is one of the participants (maybe add this logic into
         # `NettingChannel` and keep this straight forward)
 
-        transaction_hash = estimate_and_transact(
+        async_result = estimate_and_transact(
             self,
             self.proxy.approve,
             contract_address,
             allowance,
         )
 
-        self.client.poll(transaction_hash.decode('hex'), timeout=self.poll_timeout)
-        receipt_or_none = check_transaction_threw(self.client, transaction_hash)
-        if receipt_or_none:
-            raise TransactionThrew('Approve', receipt_or_none)
+        transaction = wait_mined(async_result, timeout=self.poll_timeout)
+        if transaction.threw:
+            raise TransactionThrew('Approve', transaction.receipt)
 
     def balance_of(self, address):
         """ Return the balance of `address`. """
         return self.proxy.balanceOf.call(address)
 
     def transfer(self, to_address, amount):
-        transaction_hash = estimate_and_transact(
+        async_result = estimate_and_transact(
             self,
             self.proxy.transfer,  # pylint: disable=no-member
             to_address,
             amount,
         )
 
-        self.client.poll(transaction_hash.decode('hex'))
-        receipt_or_none = check_transaction_threw(self.client, transaction_hash)
-        if receipt_or_none:
-            raise TransactionThrew('Transfer', receipt_or_none)
+        transaction = wait_mined(async_result)
+        if transaction.threw:
+            raise TransactionThrew('Transfer', transaction.receipt)
 
         # TODO: check Transfer event
 
@@ -703,16 +995,15 @@ class Registry(object):
         return self.proxy.channelManagerByToken.call(token_address)
 
     def add_token(self, token_address):
-        transaction_hash = estimate_and_transact(
+        async_result = estimate_and_transact(
             self,
             self.proxy.addToken,
             token_address,
         )
 
-        self.client.poll(transaction_hash.decode('hex'), timeout=self.poll_timeout)
-        receipt_or_none = check_transaction_threw(self.client, transaction_hash)
-        if receipt_or_none:
-            raise TransactionThrew('AddToken', receipt_or_none)
+        transaction = wait_mined(async_result, timeout=self.poll_timeout)
+        if transaction.threw:
+            raise TransactionThrew('AddToken', transaction.receipt)
 
         channel_manager_address_encoded = self.proxy.channelManagerByToken.call(
             token_address,
@@ -820,16 +1111,16 @@ class ChannelManager(object):
         else:
             other = peer1
 
-        transaction_hash = estimate_and_transact(
+        async_result = estimate_and_transact(
             self,
             self.proxy.newChannel,
             other,
             settle_timeout,
         )
 
-        self.client.poll(transaction_hash.decode('hex'), timeout=self.poll_timeout)
+        transaction = wait_mined(async_result, timeout=self.poll_timeout)
 
-        if check_transaction_threw(self.client, transaction_hash):
+        if transaction.threw:
             raise DuplicatedChannelError('Duplicated channel')
 
         netting_channel_results_encoded = self.proxy.getChannelWith.call(
@@ -904,6 +1195,50 @@ class ChannelManager(object):
         )
 
 
+class NettingChannelCache(object):
+    """ Results of the constant functions of a netting channel contract.
+
+    The settle timeout, the token address and the opened block are set when
+    the contract is created and are cached forever. The closed and settled
+    blocks only change once, from zero to the block of the transaction, and
+    are cached when non-zero. The participants and their balances are cached
+    until `invalidate_balances` is called for a deposit.
+    """
+
+    IMMUTABLE = ('settleTimeout', 'tokenAddress', 'opened')
+    MONOTONIC = ('closed', 'settled')
+    BALANCES = ('addressAndBalance',)
+
+    def __init__(self):
+        self.values = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, function_name):
+        value = self.values.get(function_name)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def put(self, function_name, value):
+        # an empty result is a failed call
+        if value == '':
+            return
+
+        if function_name in self.MONOTONIC and value == 0:
+            return
+
+        self.values[function_name] = value
+
+    def invalidate_balances(self):
+        for function_name in self.BALANCES:
+            self.values.pop(function_name, None)
+
+
 class NettingChannel(object):
     def __init__(
             self,
@@ -914,17 +1249,6 @@ class NettingChannel(object):
             poll_timeout=DEFAULT_POLL_TIMEOUT):
         # pylint: disable=too-many-arguments
 
-        result = jsonrpc_client.call(
-            'eth_getCode',
-            address_encoder(channel_address),
-            'latest',
-        )
-
-        if result == '0x':
-            raise AddressWithoutCode('Netting channel address {} does not contain code'.format(
-                address_encoder(channel_address),
-            ))
-
         proxy = jsonrpc_client.new_abi_contract(
             CONTRACT_MANAGER.get_abi(CONTRACT_NETTING_CHANNEL),
             address_encoder(channel_address),
@@ -936,20 +1260,90 @@ class NettingChannel(object):
         self.startgas = startgas
         self.gasprice = gasprice
         self.poll_timeout = poll_timeout
-
-        # check we are a participant of the given channel
         self.node_address = privatekey_to_address(self.client.privkey)
-        self.detail(self.node_address)
+        self.cache = NettingChannelCache()
+
+        # check the contract exists and we are a participant of the given
+        # channel, with a single request
+        batch = BatchCall(jsonrpc_client)
+        code = batch.call('eth_getCode', address_encoder(channel_address), 'latest')
+        queued = self._queue_calls(batch, DETAIL_FUNCTIONS)
+        batch.execute()
+
+        if code.get() == '0x':
+            raise AddressWithoutCode('Netting channel address {} does not contain code'.format(
+                address_encoder(channel_address),
+            ))
+
+        self._detail(*self._results(DETAIL_FUNCTIONS, queued))
+
+    def _queue_calls(self, batch, function_names):
+        """ Queue in `batch` the calls to the constant functions that are not
+        cached, return the cached values and the results of the queued calls.
+        """
+        queued = list()
+
+        for function_name in function_names:
+            value = self.cache.get(function_name)
+
+            if value is None:
+                value = batch.contract_call(
+                    getattr(self.proxy, function_name),
+                    startgas=self.startgas,
+                )
+
+            queued.append(value)
+
+        return queued
+
+    def _results(self, function_names, queued):
+        """ Return the values of `queued`, caching the results of the calls. """
+        results = list()
+
+        for function_name, value in zip(function_names, queued):
+            if isinstance(value, AsyncResult):
+                value = value.get()
+                self.cache.put(function_name, value)
+
+            results.append(value)
+
+        return results
+
+    def _call(self, *function_names):
+        """ Return the values of the constant functions, the ones not cached
+        are called with a single request. """
+        batch = BatchCall(self.client)
+        queued = self._queue_calls(batch, function_names)
+        batch.execute()
+
+        return self._results(function_names, queued)
+
+    def invalidate_balances(self):
+        """ Drop the cached balances, called when a ChannelNewBalance event is
+        received for this channel. """
+        self.cache.invalidate_balances()
 
     def token_address(self):
-        return address_decoder(self.proxy.tokenAddress.call())
+        token_address, = self._call('tokenAddress')
+        return address_decoder(token_address)
 
     def detail(self, our_address):
         """`our_address` is an argument used only in mock_client.py but is also
         kept here to maintain a consistent interface"""
-        our_address = self.client.sender
-        data = self.proxy.addressAndBalance.call(startgas=self.startgas)
-        settle_timeout = self.proxy.settleTimeout.call(startgas=self.startgas)
+        return self._detail(*self._call(*DETAIL_FUNCTIONS))
+
+    def detail_and_blocks(self, our_address):
+        """ Return the `detail` and the (opened, closed, settled) blocks of the
+        channel, with a single request. """
+        results = self._call(*(DETAIL_FUNCTIONS + ('opened', 'closed', 'settled')))
+
+        detail = self._detail(*results[:2])
+        return detail, tuple(results[2:])
+
+    def _detail(self, data, settle_timeout):
+        # `client.sender` derives the address from the private key on every
+        # access, this is the same address computed once
+        our_address = self.node_address
 
         if data == '':
             raise RuntimeError('addressAndBalance call failed.')
@@ -982,16 +1376,20 @@ class NettingChannel(object):
         ))
 
     def settle_timeout(self):
-        settle_timeout = self.proxy.settleTimeout.call()
+        settle_timeout, = self._call('settleTimeout')
         return settle_timeout
 
     def can_transfer(self):
-        if self.proxy.closed.call() != 0:
+        closed, opened, data, settle_timeout = self._call(
+            *(('closed', 'opened') + DETAIL_FUNCTIONS)
+        )
+
+        if closed != 0:
             return False
 
         return (
-            self.proxy.opened.call() != 0 and
-            self.detail(None)['our_balance'] > 0
+            opened != 0 and
+            self._detail(data, settle_timeout)['our_balance'] > 0
         )
 
     def deposit(self, amount):
@@ -1011,29 +1409,36 @@ class NettingChannel(object):
                 current_balance,
             ))
 
-        transaction_hash = estimate_and_transact(self, self.proxy.deposit, amount)
+        async_result = estimate_and_transact(self, self.proxy.deposit, amount)
+
+        transaction = wait_mined(async_result, timeout=self.poll_timeout)
+
+        # the balance may have changed even if the deposit threw, e.g. for a
+        # concurrent deposit of the partner
+        self.cache.invalidate_balances()
 
-        self.client.poll(transaction_hash.decode('hex'), timeout=self.poll_timeout)
-        receipt_or_none = check_transaction_threw(self.client, transaction_hash)
-        if receipt_or_none:
-            raise TransactionThrew('Deposit', receipt_or_none)
+        if transaction.threw:
+            raise TransactionThrew('Deposit', transaction.receipt)
 
         log.info('deposit called', contract=pex(self.address), amount=amount)
 
     def opened(self):
-        return self.proxy.opened.call()
+        opened, = self._call('opened')
+        return opened
 
     def closed(self):
-        return self.proxy.closed.call()
+        closed, = self._call('closed')
+        return closed
 
     def closing_address(self):
         return address_decoder(self.proxy.closingAddress())
 
     def settled(self):
-        return self.proxy.settled.call()
+        settled, = self._call('settled')
+        return settled
 
     def close(self, nonce, transferred_amount, locksroot, extra_hash, signature):
-        transaction_hash = estimate_and_transact(
+        async_result = estimate_and_transact(
             self,
             self.proxy.close,
             nonce,
@@ -1054,10 +1459,7 @@ class NettingChannel(object):
                 signature=encode_hex(signature),
             )
 
-            self.client.poll(
-                transaction_hash.decode('hex'),
-                timeout=self.poll_timeout,
-            )
+            wait_mined(async_result, timeout=self.poll_timeout)
         except (InvalidTransaction, JSONRPCPollTimeoutException):
             log.critical(
                 'close failed',
@@ -1082,7 +1484,7 @@ class NettingChannel(object):
 
     def update_transfer(self, nonce, transferred_amount, locksroot, extra_hash, signature):
         if signature:
-            transaction_hash = estimate_and_transact(
+            async_result = estimate_and_transact(
                 self,
                 self.proxy.updateTransfer,
                 nonce,
@@ -1093,10 +1495,7 @@ class NettingChannel(object):
             )
 
             try:
-                self.client.poll(
-                    transaction_hash.decode('hex'),
-                    timeout=self.poll_timeout,
-                )
+                wait_mined(async_result, timeout=self.poll_timeout)
             except (InvalidTransaction, JSONRPCPollTimeoutException):
                 log.critical(
                     'updateTransfer failed',
@@ -1131,21 +1530,26 @@ class NettingChannel(object):
             contract=pex(self.address),
         )
 
+        # all the withdraws are sent back to back and mined together, the
+        # proofs are independent of each other
+        pending = list()
         for merkle_proof, locked_encoded, secret in unlock_proofs:
             if isinstance(locked_encoded, messages.Lock):
                 raise ValueError('unlock must be called with a lock encoded `.as_bytes`')
 
             merkleproof_encoded = ''.join(merkle_proof)
 
-            transaction_hash = estimate_and_transact(
+            async_result = estimate_and_transact(
                 self,
                 self.proxy.withdraw,
                 locked_encoded,
                 merkleproof_encoded,
                 secret,
             )
+            pending.append((async_result, locked_encoded, secret))
 
-            self.client.poll(transaction_hash.decode('hex'), timeout=self.poll_timeout)
+        for async_result, locked_encoded, secret in pending:
+            wait_mined(async_result, timeout=self.poll_timeout)
 
             # TODO: check if the ChannelSecretRevealed event was emitted and if
             # it wasn't raise an error
@@ -1160,15 +1564,14 @@ class NettingChannel(object):
             )
 
     def settle(self):
-        transaction_hash = estimate_and_transact(
+        async_result = estimate_and_transact(
             self,
             self.proxy.settle,
         )
 
-        self.client.poll(transaction_hash.decode('hex'), timeout=self.poll_timeout)
-        receipt_or_none = check_transaction_threw(self.client, transaction_hash)
-        if receipt_or_none:
-            raise TransactionThrew('Settle', receipt_or_none)
+        transaction = wait_mined(async_result, timeout=self.poll_timeout)
+        if transaction.threw:
+            raise TransactionThrew('Settle', transaction.receipt)
 
         # TODO: check if the ChannelSettled event was emitted and if it wasn't raise an error
         log.info('settle called', contract=pex(self.address))
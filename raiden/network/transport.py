@@ -139,6 +139,10 @@ class DummyNetwork(object):
         self.transports = dict()
         self.counter = 0
 
+        # one way delay of the packets in seconds, used to simulate far away
+        # nodes
+        self.latency = 0
+
     def register(self, transport, host, port):
         """ Register a new node in the dummy network. """
         assert isinstance(transport, DummyTransport)
@@ -155,7 +159,15 @@ class DummyNetwork(object):
     def send(self, sender, host_port, bytes_):
         self.track_send(sender, host_port, bytes_)
         receive_end = self.transports[host_port].receive
-        gevent.spawn_later(0.00000000001, receive_end, bytes_)
+        gevent.spawn_later(self.latency or 0.00000000001, receive_end, bytes_)
+
+
+class DummyServer(object):
+    """ Tracks the started state, like the DatagramServer of the UDPTransport.
+    """
+
+    def __init__(self):
+        self.started = False
 
 
 class DummyTransport(object):
@@ -173,6 +185,7 @@ class DummyTransport(object):
         self.host = host
         self.port = port
         self.protocol = protocol
+        self.server = DummyServer()
 
         self.network.register(self, host, port)
         self.throttle_policy = throttle_policy
@@ -191,13 +204,13 @@ class DummyTransport(object):
         self.protocol.receive(data)
 
     def stop(self):
-        pass
+        self.server.started = False
 
     def stop_accepting(self):
         pass
 
     def start(self):
-        pass
+        self.server.started = True
 
 
 class UnreliableTransport(DummyTransport):
@@ -3,36 +3,42 @@
 import os
 import sys
 import itertools
+import logging
 import cPickle as pickle
 import random
+import time
 from collections import defaultdict
 
 import filelock
 import gevent
 from gevent.event import AsyncResult
+from gevent.pool import Pool
 from coincurve import PrivateKey
 from ethereum import slogging
 from ethereum.utils import encode_hex
 
-from raiden.network.rpc.client import JSONRPCPollTimeoutException
+from raiden.network.rpc.client import BlockChainService, JSONRPCPollTimeoutException
 from raiden.constants import (
     UINT64_MAX,
     NETTINGCHANNEL_SETTLE_TIMEOUT_MIN,
 )
 from raiden.blockchain.events import (
     get_relevant_proxies,
+    LogsBlockchainEvents,
     PyethappBlockchainEvents,
 )
 from raiden.event_handler import StateMachineEventHandler
 from raiden.message_handler import RaidenMessageHandler
 from raiden.tasks import (
     AlarmTask,
+    BLOCK_SOURCES,
 )
 from raiden.token_swap import GreenletTasksDispatcher
 from raiden.transfer.architecture import StateManager
 from raiden.transfer.state_change import Block
 from raiden.transfer.state import (
     RoutesState,
+    CHANNEL_STATE_CLOSED,
     CHANNEL_STATE_SETTLED,
 )
 from raiden.transfer.mediated_transfer import (
@@ -70,6 +76,7 @@ from raiden.channel.netting_channel import (
 from raiden.exceptions import InvalidAddress, AddressWithoutCode
 from raiden.network.channelgraph import (
     get_best_routes,
+    get_multipath_routes,
     channel_to_routestate,
     ChannelGraph,
     ChannelDetails,
@@ -89,6 +96,7 @@ from raiden.utils import (
     privatekey_to_address,
     sha3,
 )
+from raiden.utils.deadline_heap import DeadlineHeap
 
 log = slogging.get_logger(__name__)  # pylint: disable=invalid-name
 # register filelock logger
@@ -101,12 +109,16 @@ def create_default_identifier():
 
 
 def load_snapshot(serialization_file):
+    """ Load the snapshot file used by older versions, the snapshots are now
+    stored in the state change log.
+    """
     if os.path.exists(serialization_file):
         with open(serialization_file, 'rb') as handler:
             return pickle.load(handler)
 
 
-def save_snapshot(serialization_file, raiden):
+def snapshot_state(raiden):
+    """ Return the node state that is not recovered from the blockchain. """
     all_channels = [
         ChannelSerialization(channel)
         for network in raiden.token_to_channelgraph.values()
@@ -122,7 +134,10 @@ def save_snapshot(serialization_file, raiden):
         }
         all_queues.append(queue_data)
 
-    data = {
+    # don't persist the Acks that are past the retention period
+    raiden.protocol.receivedhashes_to_acks.expire()
+
+    return {
         'channels': all_channels,
         'queues': all_queues,
         'receivedhashes_to_acks': raiden.protocol.receivedhashes_to_acks,
@@ -131,13 +146,22 @@ def save_snapshot(serialization_file, raiden):
         'registry_address': ROPSTEN_REGISTRY_ADDRESS,
     }
 
-    with open(serialization_file, 'wb') as handler:
-        # __slots__ without __getstate__ require `-1`
-        pickle.dump(
-            data,
-            handler,
-            protocol=-1,
-        )
+
+def spawn_result(pool, function, *args):
+    """ Run `function` in a greenlet of `pool` and return an AsyncResult set
+    with its return value, `get` re-raises its exception with the original
+    traceback.
+    """
+    result = AsyncResult()
+
+    def run():
+        try:
+            result.set(function(*args))
+        except Exception as e:  # pylint: disable=broad-except
+            result.set_exception(e, exc_info=sys.exc_info())
+
+    pool.spawn(run)
+    return result
 
 
 def endpoint_registry_exception_handler(greenlet):
@@ -162,11 +186,34 @@ def endpoint_registry_exception_handler(greenlet):
 
 
 class RandomSecretGenerator(object):  # pylint: disable=too-few-public-methods
-    def __next__(self):  # pylint: disable=no-self-use
-        return os.urandom(32)
+    """ Generates the secrets of a transfer from a random seed.
+
+    The secrets are derived from the seed and a counter, so the generator
+    serialized with the ActionInitInitiator yields the same secrets when the
+    state change is replayed.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = os.urandom(32)
+
+        self.seed = seed
+        self.count = 0
+
+    def __next__(self):
+        self.count += 1
+        return sha3(self.seed + str(self.count))
 
     next = __next__
 
+    def __eq__(self, other):
+        if isinstance(other, RandomSecretGenerator):
+            return self.seed == other.seed and self.count == other.count
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
 
 class RaidenService(object):
     """ A Raiden node. """
@@ -198,7 +245,12 @@ class RaidenService(object):
         # released/withdrawn but not when the secret is registered.
         self.token_to_hashlock_to_channels = defaultdict(lambda: defaultdict(list))
 
+        # The closed channels indexed by the first block after the
+        # settlement period, the only block they need to see
+        self.settlement_deadlines = DeadlineHeap()
+
         self.chain = chain
+        self.discovery = discovery
         self.config = config
         self.privkey = private_key_bin
         self.address = privatekey_to_address(private_key_bin)
@@ -213,6 +265,13 @@ class RaidenService(object):
 
         self.private_key = PrivateKey(private_key_bin)
         self.pubkey = self.private_key.public_key.format(compressed=False)
+
+        self.transaction_log = StateChangeLog(
+            storage_instance=StateChangeLogSQLiteBackend(
+                database_path=config['database_path']
+            )
+        )
+
         self.protocol = RaidenProtocol(
             transport,
             discovery,
@@ -222,6 +281,13 @@ class RaidenService(object):
             config['protocol']['nat_keepalive_retries'],
             config['protocol']['nat_keepalive_timeout'],
             config['protocol']['nat_invitation_timeout'],
+            config['protocol']['recovery_pool_size'],
+            config['protocol']['recovery_batch_size'],
+            config['protocol']['hash_retention'],
+            config['protocol']['ack_coalescing_window'],
+            durability_barrier=self.transaction_log.flush,
+            send_window=config['protocol']['send_window'],
+            expected_nonce=self.get_expected_nonce,
         )
 
         # TODO: remove this cyclic dependency
@@ -229,27 +295,25 @@ class RaidenService(object):
 
         self.message_handler = RaidenMessageHandler(self)
         self.state_machine_event_handler = StateMachineEventHandler(self)
-        self.pyethapp_blockchain_events = PyethappBlockchainEvents()
+
+        # The JSON-RPC chain polls the events of all the contracts with a
+        # single eth_getLogs, the tester chain only supports filters.
+        if isinstance(chain, BlockChainService):
+            self.pyethapp_blockchain_events = LogsBlockchainEvents(chain.client)
+        else:
+            self.pyethapp_blockchain_events = PyethappBlockchainEvents()
+
         self.greenlet_task_dispatcher = GreenletTasksDispatcher()
         self.on_message = self.message_handler.on_message
-        self.alarm = AlarmTask(chain)
+        self.alarm = AlarmTask(chain, BLOCK_SOURCES[config['block_source']](chain))
         self._blocknumber = None
 
-        self.transaction_log = StateChangeLog(
-            storage_instance=StateChangeLogSQLiteBackend(
-                database_path=config['database_path']
-            )
-        )
-
         if config['database_path'] != ':memory:':
             self.database_dir = os.path.dirname(config['database_path'])
             self.lock_file = os.path.join(self.database_dir, '.lock')
             self.snapshot_dir = os.path.join(self.database_dir, 'snapshots')
             self.serialization_file = os.path.join(self.snapshot_dir, 'data.pickle')
 
-            if not os.path.exists(self.snapshot_dir):
-                os.makedirs(self.snapshot_dir)
-
             # Prevent concurrent acces to the same db
             self.db_lock = filelock.FileLock(self.lock_file)
         else:
@@ -259,6 +323,14 @@ class RaidenService(object):
             self.serialization_file = None
             self.db_lock = None
 
+        # Snapshots are taken only after the state is restored, otherwise the
+        # log would be compacted before it's replayed
+        self.state_restored = False
+        self.snapshot_state_change_id = None
+
+        # Seconds spent on each phase of the startup
+        self.startup_timings = dict()
+
         # If the endpoint registration fails the node will quit, this must
         # finish before starting the protocol
         endpoint_registration_event.join()
@@ -279,12 +351,34 @@ class RaidenService(object):
         # is mined, and the alarm starts polling at block C.
         self.register_registry(self.chain.default_registry.address)
 
+        # The endpoints of the partners are fetched before the protocol
+        # starts, a lookup on the send path is a call to the ethereum node
+        start = time.time()
+        partners = set(
+            partner_address
+            for graph in self.token_to_channelgraph.itervalues()
+            for partner_address in graph.partneraddress_to_channel
+        )
+        self.discovery.start(partners, Pool(self.config['startup_pool_size']))
+        self.alarm.register_callback(self.discovery.poll_endpoint_changes)
+        self.record_startup_phase('discovery', start)
+
         # Restore from snapshot must come after registering the registry as we
         # need to know the registered tokens to populate `token_to_channelgraph`
         if self.database_dir is not None:
             self.db_lock.acquire(timeout=0)
             assert self.db_lock.is_locked
+
+            start = time.time()
             self.restore_from_snapshots()
+            self.record_startup_phase('restore', start)
+
+        if log.isEnabledFor(logging.INFO):
+            log.info(
+                'startup timings',
+                node=pex(self.address),
+                **self.startup_timings
+            )
 
         # Start the protocol after the registry is queried to avoid warning
         # about unknown channels.
@@ -293,6 +387,14 @@ class RaidenService(object):
         # Health check needs the protocol layer
         self.start_neighbours_healthcheck()
 
+    def record_startup_phase(self, phase, start):
+        """ Record the duration of the startup `phase` that began at `start`
+        and return the current time, the start of the next phase.
+        """
+        now = time.time()
+        self.startup_timings[phase] = now - start
+        return now
+
     def start_neighbours_healthcheck(self):
         for graph in self.token_to_channelgraph.values():
             for neighbour in graph.get_neighbours():
@@ -314,10 +416,12 @@ class RaidenService(object):
         # uninstalled before the alarm task is fully stopped the callback
         # `poll_blockchain_events` will fail.
         self.pyethapp_blockchain_events.uninstall_all_event_listeners()
+        self.discovery.stop()
+        self.transaction_log.flush()
 
         # save the state after all tasks are done
-        if self.serialization_file:
-            save_snapshot(self.serialization_file, self)
+        if self.state_restored:
+            self.snapshot()
 
         if self.db_lock is not None:
             self.db_lock.release()
@@ -325,19 +429,68 @@ class RaidenService(object):
     def __repr__(self):
         return '<{} {}>'.format(self.__class__.__name__, pex(self.address))
 
+    def snapshot(self):
+        """ Snapshot the node state after the last logged state change, the
+        older state changes are compacted away.
+        """
+        state_change_id = self.transaction_log.last_state_change_id
+        self.transaction_log.snapshot(state_change_id, snapshot_state(self))
+        self.snapshot_state_change_id = state_change_id
+
+    def maybe_snapshot(self):
+        """ Snapshot once `snapshot_interval` state changes were logged since
+        the last snapshot, this bounds the number of state changes replayed on
+        recovery.
+        """
+        if not self.state_restored:
+            return
+
+        last_state_change_id = self.transaction_log.last_state_change_id or 0
+        since_snapshot = last_state_change_id - (self.snapshot_state_change_id or 0)
+
+        if since_snapshot >= self.config['snapshot_interval']:
+            self.snapshot()
+
     def restore_from_snapshots(self):
-        data = load_snapshot(self.serialization_file)
-        data_exists_and_is_recent = (
-            data is not None and
-            'registry_address' in data and
-            data['registry_address'] == ROPSTEN_REGISTRY_ADDRESS
+        """ Restore the latest snapshot and replay the state changes that
+        were logged after it.
+        """
+        snapshot = self.transaction_log.get_snapshot()
+
+        if snapshot is not None:
+            state_change_id, data = snapshot
+        else:
+            # The file snapshot of an older version is taken on stop, after
+            # every state change is logged
+            data = load_snapshot(self.serialization_file)
+            state_change_id = None
+            if data is not None:
+                state_change_id = self.transaction_log.last_state_change_id
+
+        data_is_outdated = (
+            data is not None and (
+                'registry_address' not in data or
+                data['registry_address'] != ROPSTEN_REGISTRY_ADDRESS
+            )
         )
 
-        if data_exists_and_is_recent:
+        # The state of a different registry is not restored nor replayed
+        if data_is_outdated:
+            data = None
+            state_change_id = self.transaction_log.last_state_change_id
+
+        if data is not None:
+            # The channels are queried concurrently and restored in order
+            pool = Pool(self.config['startup_pool_size'])
+            chain_states = [
+                spawn_result(pool, self.query_restored_channel, channel)
+                for channel in data['channels']
+            ]
+
             first_channel = True
-            for channel in data['channels']:
+            for channel, chain_state in zip(data['channels'], chain_states):
                 try:
-                    self.restore_channel(channel)
+                    self.restore_channel(channel, chain_state.get())
                     first_channel = False
                 except AddressWithoutCode as e:
                     log.warn(
@@ -356,26 +509,49 @@ class RaidenService(object):
                     else:
                         raise
 
+            pool.kill()
+
             for restored_queue in data['queues']:
                 self.restore_queue(restored_queue)
 
-            self.protocol.receivedhashes_to_acks = data['receivedhashes_to_acks']
+            # the retention period restarts, this also loads the plain dicts
+            # of older snapshots
+            for echohash, ack in data['receivedhashes_to_acks'].iteritems():
+                self.protocol.receivedhashes_to_acks.add(echohash, ack)
+
             self.protocol.nodeaddresses_to_nonces = data['nodeaddresses_to_nonces']
 
             self.restore_transfer_states(data['transfers'])
 
+        # The channels and queues restored above are those of the snapshot,
+        # only the state managers are brought up to date by the replay
+        replayed = self.state_machine_event_handler.replay(
+            self.transaction_log.get_state_changes_after(state_change_id),
+        )
+        self.snapshot_state_change_id = state_change_id
+        self.state_restored = True
+
+        if log.isEnabledFor(logging.INFO):
+            log.info(
+                'state restored',
+                node=pex(self.address),
+                snapshot_state_change_id=state_change_id,
+                replayed_state_changes=replayed,
+            )
+
     def set_block_number(self, blocknumber):
         state_change = Block(blocknumber)
-        self.state_machine_event_handler.log_and_dispatch_to_all_tasks(state_change)
+        self.state_machine_event_handler.log_and_dispatch_block(state_change)
 
-        for graph in self.token_to_channelgraph.itervalues():
-            for channel in graph.address_to_channel.itervalues():
-                channel.state_transition(state_change)
+        for channel in self.settlement_deadlines.expire(blocknumber):
+            channel.state_transition(state_change)
 
         # To avoid races, only update the internal cache after all the state
         # tasks have been updated.
         self._blocknumber = blocknumber
 
+        self.maybe_snapshot()
+
     def set_node_network_state(self, node_address, network_state):
         for graph in self.token_to_channelgraph.itervalues():
             channel = graph.partneraddress_to_channel.get(node_address)
@@ -390,10 +566,10 @@ class RaidenService(object):
         return self._blocknumber
 
     def poll_blockchain_events(self, current_block=None):
-        # pylint: disable=unused-argument
         on_statechange = self.state_machine_event_handler.on_blockchain_statechange
+        state_changes = self.pyethapp_blockchain_events.poll_state_change(current_block)
 
-        for state_change in self.pyethapp_blockchain_events.poll_state_change():
+        for state_change in state_changes:
             on_statechange(state_change)
 
     def find_channel_by_address(self, netting_channel_address_bin):
@@ -405,6 +581,20 @@ class RaidenService(object):
 
         raise ValueError('unknown channel {}'.format(encode_hex(netting_channel_address_bin)))
 
+    def get_expected_nonce(self, sender, netting_channel_address_bin):
+        """ Return the nonce of the next envelope message from `sender` in the
+        channel, None if the channel or the sender are unknown.
+        """
+        try:
+            channel = self.find_channel_by_address(netting_channel_address_bin)
+        except ValueError:
+            return None
+
+        if channel.partner_state.address != sender:
+            return None
+
+        return channel.get_next_partner_nonce()
+
     def sign(self, message):
         """ Sign message inplace. """
         if not isinstance(message, SignedMessage):
@@ -563,7 +753,7 @@ class RaidenService(object):
             del self.token_to_hashlock_to_channels[token_address][hashlock]
 
     def get_channel_details(self, token_address, netting_channel):
-        channel_details = netting_channel.detail(self.address)
+        channel_details, blocks = netting_channel.detail_and_blocks(self.address)
         our_state = ChannelEndState(
             channel_details['our_address'],
             channel_details['our_balance'],
@@ -589,6 +779,7 @@ class RaidenService(object):
         external_state = ChannelExternalState(
             register_channel_for_hashlock,
             netting_channel,
+            blocks,
         )
 
         channel_detail = ChannelDetails(
@@ -602,16 +793,23 @@ class RaidenService(object):
 
         return channel_detail
 
-    def restore_channel(self, serialized_channel):
-        token_address = serialized_channel.token_address
-
+    def query_restored_channel(self, serialized_channel):
+        """ Return the proxy, the details and the (opened, closed, settled)
+        blocks of `serialized_channel`, the `chain_state` of restore_channel.
+        """
         netting_channel = self.chain.netting_channel(
             serialized_channel.channel_address,
         )
 
         # restoring balances from the blockchain since the serialized
         # value could be falling behind.
-        channel_details = netting_channel.detail(self.address)
+        channel_details, blocks = netting_channel.detail_and_blocks(self.address)
+
+        return netting_channel, channel_details, blocks
+
+    def restore_channel(self, serialized_channel, chain_state):
+        token_address = serialized_channel.token_address
+        netting_channel, channel_details, blocks = chain_state
 
         # our_address is checked by detail
         assert channel_details['partner_address'] == serialized_channel.partner_address
@@ -638,6 +836,7 @@ class RaidenService(object):
         external_state = ChannelExternalState(
             register_channel_for_hashlock,
             netting_channel,
+            blocks,
         )
         details = ChannelDetails(
             serialized_channel.channel_address,
@@ -653,6 +852,7 @@ class RaidenService(object):
         channel = graph.address_to_channel.get(
             serialized_channel.channel_address,
         )
+        self.schedule_settlement(channel)
 
         channel.our_state.balance_proof = serialized_channel.our_balance_proof
         channel.partner_state.balance_proof = serialized_channel.partner_balance_proof
@@ -670,30 +870,58 @@ class RaidenService(object):
             queue.put(messagedata)
 
     def restore_transfer_states(self, transfer_states):
+        # the snapshots of older versions keep the finished managers
+        for identifier, manager_list in transfer_states.items():
+            manager_list[:] = [
+                manager
+                for manager in manager_list
+                if manager.current_state is not None
+            ]
+
+            if not manager_list:
+                del transfer_states[identifier]
+
         self.identifier_to_statemanagers = transfer_states
 
     def register_registry(self, registry_address):
+        # The proxies and the channel details are queried concurrently, the
+        # pool bounds the requests in flight to the node
+        pool = Pool(self.config['startup_pool_size'])
+        start = time.time()
+
         proxies = get_relevant_proxies(
             self.chain,
             self.address,
             registry_address,
+            pool,
         )
+        start = self.record_startup_phase('proxies', start)
 
         # Install the filters first to avoid missing changes, as a consequence
         # some events might be applied twice.
         self.pyethapp_blockchain_events.add_proxies_listeners(proxies)
+        start = self.record_startup_phase('listeners', start)
 
-        for manager in proxies.channel_managers:
-            token_address = manager.token_address()
-            manager_address = manager.address
+        managers_data = pool.map(
+            lambda manager: (manager.token_address(), manager.channels_addresses()),
+            proxies.channel_managers,
+        )
+        token_channels = [
+            (token_address, channel)
+            for manager, (token_address, _) in zip(proxies.channel_managers, managers_data)
+            for channel in proxies.channelmanager_nettingchannels[manager.address]
+        ]
+        all_channels_detail = iter(pool.map(
+            lambda token_channel: self.get_channel_details(*token_channel),
+            token_channels,
+        ))
+        start = self.record_startup_phase('channels', start)
 
-            channels_detail = list()
+        for manager, (token_address, edge_list) in zip(proxies.channel_managers, managers_data):
+            manager_address = manager.address
             netting_channels = proxies.channelmanager_nettingchannels[manager_address]
-            for channel in netting_channels:
-                detail = self.get_channel_details(token_address, channel)
-                channels_detail.append(detail)
+            channels_detail = list(itertools.islice(all_channels_detail, len(netting_channels)))
 
-            edge_list = manager.channels_addresses()
             graph = ChannelGraph(
                 self.address,
                 manager_address,
@@ -705,12 +933,17 @@ class RaidenService(object):
             self.manager_to_token[manager_address] = token_address
             self.token_to_channelgraph[token_address] = graph
 
+            for channel in graph.address_to_channel.itervalues():
+                self.schedule_settlement(channel)
+
             self.tokens_to_connectionmanagers[token_address] = ConnectionManager(
                 self,
                 token_address,
                 graph
             )
 
+        self.record_startup_phase('graphs', start)
+
     def channel_manager_is_registered(self, manager_address):
         return manager_address in self.manager_to_token
 
@@ -745,6 +978,9 @@ class RaidenService(object):
         self.manager_to_token[manager_address] = token_address
         self.token_to_channelgraph[token_address] = graph
 
+        for channel in graph.address_to_channel.itervalues():
+            self.schedule_settlement(channel)
+
         self.tokens_to_connectionmanagers[token_address] = ConnectionManager(
             self,
             token_address,
@@ -758,6 +994,15 @@ class RaidenService(object):
         detail = self.get_channel_details(token_address, netting_channel)
         graph = self.token_to_channelgraph[token_address]
         graph.add_channel(detail)
+        self.schedule_settlement(graph.address_to_channel[channel_address])
+
+    def schedule_settlement(self, channel):
+        """ Wake up `channel` with the first block after its settlement period
+        if it is closed, the earlier blocks don't change it.
+        """
+        if channel.state == CHANNEL_STATE_CLOSED:
+            settlement_end = channel.external_state.closed_block + channel.settle_timeout
+            self.settlement_deadlines.schedule(settlement_end + 1, channel)
 
     def connection_manager_for_token(self, token_address):
         if not isaddress(token_address):
@@ -858,6 +1103,11 @@ class RaidenService(object):
               or intermediary channels.
             - Network speed, making the transfer sufficiently fast so it doesn't
               expire.
+
+        A transfer larger than any channel is split in parts, the result is
+        set once all the parts finished and it's False if any part failed.
+        The parts that succeeded are not reverted, so a failed transfer may
+        have paid part of the `amount` to the target.
         """
 
         async_result = self.start_mediated_transfer(
@@ -943,7 +1193,9 @@ class RaidenService(object):
         async_result = AsyncResult()
         graph = self.token_to_channelgraph[token_address]
 
-        available_routes = get_best_routes(
+        # transfers larger than any channel are split in parts, each part is
+        # an initiator task with its own lock and the same identifier
+        transfer_parts = get_multipath_routes(
             graph,
             self.protocol.nodeaddresses_networkstatuses,
             self.address,
@@ -952,7 +1204,7 @@ class RaidenService(object):
             None,
         )
 
-        if not available_routes:
+        if not transfer_parts:
             async_result.set(False)
             return async_result
 
@@ -961,52 +1213,60 @@ class RaidenService(object):
         if identifier is None:
             identifier = create_default_identifier()
 
-        route_state = RoutesState(available_routes)
         our_address = self.address
         block_number = self.get_block_number()
 
-        transfer_state = LockedTransferState(
-            identifier=identifier,
-            amount=amount,
-            token=token_address,
-            initiator=self.address,
-            target=target,
-            expiration=None,
-            hashlock=None,
-            secret=None,
-        )
+        init_parts = list()
+        for part_amount, available_routes in transfer_parts:
+            route_state = RoutesState(available_routes)
+
+            transfer_state = LockedTransferState(
+                identifier=identifier,
+                amount=part_amount,
+                token=token_address,
+                initiator=self.address,
+                target=target,
+                expiration=None,
+                hashlock=None,
+                secret=None,
+            )
 
-        # Issue #489
-        #
-        # Raiden may fail after a state change using the random generator is
-        # handled but right before the snapshot is taken. If that happens on
-        # the next initialization when raiden is recovering and applying the
-        # pending state changes a new secret will be generated and the
-        # resulting events won't match, this breaks the architecture model,
-        # since it's assumed the re-execution of a state change will always
-        # produce the same events.
-        #
-        # TODO: Removed the secret generator from the InitiatorState and add
-        # the secret into all state changes that require one, this way the
-        # secret will be serialized with the state change and the recovery will
-        # use the same /random/ secret.
-        random_generator = RandomSecretGenerator()
-
-        init_initiator = ActionInitInitiator(
-            our_address=our_address,
-            transfer=transfer_state,
-            routes=route_state,
-            random_generator=random_generator,
-            block_number=block_number,
-        )
+            # Issue #489
+            #
+            # Raiden may fail after a state change using the random generator is
+            # handled but right before the snapshot is taken. If that happens on
+            # the next initialization when raiden is recovering and applying the
+            # pending state changes the secrets must be the same, it's assumed
+            # the re-execution of a state change will always produce the same
+            # events. The generator is seeded, it's serialized with the
+            # ActionInitInitiator and the replay generates the same secrets.
+            random_generator = RandomSecretGenerator()
+
+            init_initiator = ActionInitInitiator(
+                our_address=our_address,
+                transfer=transfer_state,
+                routes=route_state,
+                random_generator=random_generator,
+                block_number=block_number,
+            )
+
+            init_parts.append((StateManager(initiator.state_transition, None), init_initiator))
 
-        state_manager = StateManager(initiator.state_transition, None)
-        self.state_machine_event_handler.log_and_dispatch(state_manager, init_initiator)
+        # The managers are registered before the dispatch, the event handler
+        # archives them once they are finished, which may be right away, and
+        # the result is set once all the parts are finished.
+        for state_manager, _ in init_parts:
+            self.identifier_to_statemanagers[identifier].append(state_manager)
+        self.identifier_to_results[identifier].append(async_result)
 
         # TODO: implement the network timeout raiden.config['msg_timeout'] and
         # cancel the current transfer if it hapens (issue #374)
-        self.identifier_to_statemanagers[identifier].append(state_manager)
-        self.identifier_to_results[identifier].append(async_result)
+        for state_manager, init_initiator in init_parts:
+            self.state_machine_event_handler.log_and_dispatch(
+                state_manager,
+                init_initiator,
+                identifier,
+            )
 
         return async_result
 
@@ -1044,11 +1304,14 @@ class RaidenService(object):
         )
 
         state_manager = StateManager(mediator.state_transition, None)
-
-        self.state_machine_event_handler.log_and_dispatch(state_manager, init_mediator)
-
         self.identifier_to_statemanagers[identifier].append(state_manager)
 
+        self.state_machine_event_handler.log_and_dispatch(
+            state_manager,
+            init_mediator,
+            identifier,
+        )
+
     def target_mediated_transfer(self, message):
         graph = self.token_to_channelgraph[message.token]
         from_channel = graph.partneraddress_to_channel[message.sender]
@@ -1065,8 +1328,12 @@ class RaidenService(object):
             block_number,
         )
 
-        state_manager = StateManager(target_task.state_transition, None)
-        self.state_machine_event_handler.log_and_dispatch(state_manager, init_target)
-
         identifier = message.identifier
+        state_manager = StateManager(target_task.state_transition, None)
         self.identifier_to_statemanagers[identifier].append(state_manager)
+
+        self.state_machine_event_handler.log_and_dispatch(
+            state_manager,
+            init_target,
+            identifier,
+        )
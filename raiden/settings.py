@@ -4,6 +4,10 @@ from ethereum.utils import denoms, int_to_big_endian
 INITIAL_PORT = 40001
 
 CACHE_TTL = 60
+SENDER_CACHE_SIZE = 4096
+DISTANCE_CACHE_SIZE = 1024  # number of targets
+UNKNOWN_ADDRESS_CACHE_SIZE = 1024
+MAX_TRANSFER_PARTS = 4  # number of locks used by a mediated transfer
 ESTIMATED_BLOCK_TIME = 7
 GAS_LIMIT = 3141592  # Morden's gasLimit.
 GAS_LIMIT_HEX = '0x' + int_to_big_endian(GAS_LIMIT).encode('hex')
@@ -13,11 +17,27 @@ DEFAULT_PROTOCOL_RETRIES_BEFORE_BACKOFF = 5
 DEFAULT_PROTOCOL_THROTTLE_CAPACITY = 10.
 DEFAULT_PROTOCOL_THROTTLE_FILL_RATE = 10.
 DEFAULT_PROTOCOL_RETRY_INTERVAL = 1.
+DEFAULT_PROTOCOL_RECOVERY_POOL_SIZE = 4
+DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE = 32
+DEFAULT_PROTOCOL_HASH_RETENTION = 60 * 60
+DEFAULT_PROTOCOL_TIMER_TICK = 0.1
+DEFAULT_PROTOCOL_ACK_COALESCING_WINDOW = 0.005
+DEFAULT_PROTOCOL_SEND_WINDOW = 8  # unacknowledged messages per channel queue
+
+DEFAULT_LOG_GROUP_COMMIT_SIZE = 256
+DEFAULT_LOG_GROUP_COMMIT_LATENCY = 0.1
+DEFAULT_SNAPSHOT_INTERVAL = 10000  # state changes
+DEFAULT_STARTUP_POOL_SIZE = 20  # concurrent requests while loading the channels
+
+DEFAULT_ALARM_BLOCK_SOURCE = 'polling'
+DEFAULT_ALARM_WAIT_TIME = 0.5  # seconds between polls once a block is due
+DEFAULT_ALARM_MAX_WAIT_TIME = 5.
 
 DEFAULT_REVEAL_TIMEOUT = 10
 DEFAULT_SETTLE_TIMEOUT = DEFAULT_REVEAL_TIMEOUT * 9
 DEFAULT_EVENTS_POLL_TIMEOUT = 0.5
 DEFAULT_POLL_TIMEOUT = 180
+DEFAULT_TRANSACTION_POLL_INTERVAL = 0.5
 DEFAULT_JOINABLE_FUNDS_TARGET = 0.4
 DEFAULT_INITIAL_CHANNEL_TARGET = 3
 DEFAULT_WAIT_FOR_SETTLE = True
@@ -2,6 +2,7 @@
 import time
 
 from ethereum import slogging
+from pyethapp.rpc_client import JSONRPCClientReplyError
 
 import gevent
 from gevent.event import AsyncResult
@@ -9,6 +10,11 @@ from gevent.queue import (
     Queue,
 )
 
+from raiden.settings import (
+    DEFAULT_ALARM_MAX_WAIT_TIME,
+    DEFAULT_ALARM_WAIT_TIME,
+)
+
 REMOVE_CALLBACK = object()
 log = slogging.get_logger(__name__)  # pylint: disable=invalid-name
 
@@ -25,21 +31,108 @@ class Task(gevent.Greenlet):
         self.response_queue = Queue()
 
 
-class AlarmTask(Task):
-    """ Task to notify when a block is mined. """
+class PollingBlockSource(object):
+    """ Learns the block number with one eth_blockNumber per poll. """
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    def start(self):
+        return self.chain.block_number()
+
+    def block_number(self):
+        return self.chain.block_number()
+
+    def stop(self):
+        pass
+
+
+class FilterBlockSource(object):
+    """ Learns about the new blocks with a eth_newBlockFilter, a poll without
+    a new block is an empty eth_getFilterChanges and the block number is
+    queried only once a block is mined.
+
+    The nodes uninstall the filters that are not polled for a while and lose
+    them on a restart, in which case a new filter is installed.
+    """
 
     def __init__(self, chain):
+        self.chain = chain
+        self.block_filter = None
+        self.current_block = None
+
+    def start(self):
+        self.block_filter = self.chain.new_block_filter()
+        self.current_block = self.chain.block_number()
+        return self.current_block
+
+    def block_number(self):
+        try:
+            new_blocks = self.block_filter.changes()
+        except JSONRPCClientReplyError:
+            log.warning('block filter lost, installing a new one')
+            return self.start()
+
+        if new_blocks:
+            self.current_block = self.chain.block_number()
+
+        return self.current_block
+
+    def stop(self):
+        try:
+            self.block_filter.uninstall()
+        except JSONRPCClientReplyError:
+            pass
+
+
+BLOCK_SOURCES = {
+    'filter': FilterBlockSource,
+    'polling': PollingBlockSource,
+}
+
+
+class AlarmTask(Task):
+    """ Task to notify when a block is mined.
+
+    The wait between two polls of the block source is halved as the expected
+    time of the next block approaches, from at most `max_wait_time` down to
+    `wait_time`, once the block is due it's polled every `wait_time`. The
+    expected time is based on `estimate_blocktime` and is adjusted with the
+    intervals of the detected blocks.
+
+    A block is mined at some point after the poll that didn't see it, the
+    time since that poll is the worst case of the detection lag, it's added
+    to `detection_lag` and the largest one is kept in `max_detection_lag`.
+    """
+
+    def __init__(
+            self,
+            chain,
+            block_source=None,
+            wait_time=DEFAULT_ALARM_WAIT_TIME,
+            max_wait_time=DEFAULT_ALARM_MAX_WAIT_TIME):
+
         super(AlarmTask, self).__init__()
 
+        if block_source is None:
+            block_source = PollingBlockSource(chain)
+
         self.callbacks = list()
         self.stop_event = AsyncResult()
         self.chain = chain
+        self.block_source = block_source
         self.last_block_number = None
 
-        # TODO: Start with a larger wait_time and decrease it as the
-        # probability of a new block increases.
-        self.wait_time = 0.5
-        self.last_loop = time.time()
+        self.wait_time = wait_time
+        self.max_wait_time = max_wait_time
+        self.blocktime = None
+        self.last_block_time = None
+        self.last_poll = None
+
+        self.polls = 0
+        self.detected_blocks = 0
+        self.detection_lag = 0
+        self.max_detection_lag = 0
 
     def register_callback(self, callback):
         """ Register a new callback.
@@ -62,14 +155,14 @@ class AlarmTask(Task):
     def _run(self):  # pylint: disable=method-hidden
         log.debug('starting block number', block_number=self.last_block_number)
 
-        sleep_time = 0
+        sleep_time = self.next_wait_time(time.time())
         while self.stop_event.wait(sleep_time) is not True:
             self.poll_for_new_block()
 
-            # we want this task to iterate in the tick of `wait_time`, so take
-            # into account how long we spent executing one tick.
-            self.last_loop = time.time()
-            work_time = self.last_loop - self.last_loop
+            # the callbacks are executed by the poll, take into account how
+            # long they took
+            now = time.time()
+            work_time = now - self.last_poll
             if work_time > self.wait_time:
                 log.warning(
                     'alarm loop is taking longer than the wait time',
@@ -78,13 +171,22 @@ class AlarmTask(Task):
                 )
                 sleep_time = 0.001
             else:
-                sleep_time = self.wait_time - work_time
+                sleep_time = self.next_wait_time(now)
 
         # stopping
         self.callbacks = list()
+        self.block_source.stop()
+
+    def next_wait_time(self, now):
+        """ Seconds to wait before the next poll. """
+        remaining = self.last_block_time + self.blocktime - now
+        return min(max(remaining / 2.0, self.wait_time), self.max_wait_time)
 
     def poll_for_new_block(self):
-        current_block = self.chain.block_number()
+        previous_poll = self.last_poll
+        current_block = self.block_source.block_number()
+        self.last_poll = time.time()
+        self.polls += 1
 
         if current_block > self.last_block_number + 1:
             difference = current_block - self.last_block_number - 1
@@ -94,13 +196,25 @@ class AlarmTask(Task):
             )
 
         if current_block != self.last_block_number:
+            lag = self.last_poll - previous_poll
+            self.detected_blocks += 1
+            self.detection_lag += lag
+            self.max_detection_lag = max(self.max_detection_lag, lag)
+
+            if current_block > self.last_block_number:
+                interval = self.last_poll - self.last_block_time
+                interval /= current_block - self.last_block_number
+                self.blocktime = self.blocktime * 0.9 + interval * 0.1
+
             log.debug(
                 'new block',
                 number=current_block,
-                timestamp=self.last_loop,
+                timestamp=self.last_poll,
+                lag=lag,
             )
 
             self.last_block_number = current_block
+            self.last_block_time = self.last_poll
             remove = list()
             for callback in self.callbacks:
                 try:
@@ -115,12 +229,14 @@ class AlarmTask(Task):
                 self.callbacks.remove(callback)
 
     def start(self):
-        self.last_block_number = self.chain.block_number()
+        self.last_block_number = self.block_source.start()
+        self.blocktime = self.chain.estimate_blocktime()
+        self.last_block_time = self.last_poll = time.time()
         super(AlarmTask, self).start()
 
     def stop_and_wait(self):
         self.stop_event.set(True)
-        gevent.wait(self)
+        gevent.wait([self])
 
     def stop_async(self):
         self.stop_event.set(True)
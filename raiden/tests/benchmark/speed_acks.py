@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+""" Throughput of the message acknowledgment with the DummyTransport, with
+single Acks and with the Acks coalesced in batches.
+"""
+from __future__ import print_function
+
+import time
+
+import gevent
+
+from raiden.network.discovery import Discovery
+from raiden.network.transport import DummyTransport
+from raiden.tests.utils.messages import make_direct_transfer
+from raiden.tests.utils.protocol import ProtocolNode
+from raiden.utils import sha3
+
+ITERATIONS = 5000  # number of transfers
+QUEUES = 50
+WINDOWS = (0, 0.001, 0.005)
+
+
+def run_transfers(iterations, window, port):
+    discovery = Discovery()
+    node0 = ProtocolNode(discovery, '127.0.0.1', port, ack_coalescing_window=window)
+    node1 = ProtocolNode(discovery, '127.0.0.1', port + 1, ack_coalescing_window=window)
+
+    for node in (node0, node1):
+        node.protocol.start()
+
+    node0.protocol.start_health_check(node1.address)
+    gevent.sleep(0.1)
+
+    transfers = list()
+    for position in range(iterations):
+        token = sha3(str(position % QUEUES))[:20]
+        transfer = make_direct_transfer(token=token, nonce=position // QUEUES + 1)
+        node0.sign(transfer)
+        transfers.append(transfer)
+
+    packets = [0]
+
+    def track_send(sender, host_port, bytes_):  # pylint: disable=unused-argument
+        packets[0] += 1
+
+    DummyTransport.network.on_send_cbs.append(track_send)
+
+    start = time.time()
+    results = [
+        node0.protocol.send_async(node1.address, queued_transfer)
+        for queued_transfer in transfers
+    ]
+    gevent.wait(results)
+    elapsed = time.time() - start
+
+    DummyTransport.network.on_send_cbs.remove(track_send)
+
+    for node in (node0, node1):
+        node.protocol.stop_and_wait()
+
+    print('window {}: {} transfers {} packets {}s {} transfers/s'.format(
+        window,
+        iterations,
+        packets[0],
+        elapsed,
+        iterations / elapsed,
+    ))
+
+
+def test_acks(iterations=ITERATIONS):
+    for position, window in enumerate(WINDOWS):
+        run_transfers(iterations, window, 46000 + position * 2)
+
+
+def test_all(iterations=ITERATIONS):
+    test_acks(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
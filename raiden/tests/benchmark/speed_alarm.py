@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+""" Requests per block and block detection lag of the AlarmTask while
+`iterations` blocks are mined on a fake chain.
+
+The fixed polling queries the block number every `WAIT_TIME`, the adaptive
+polling halves the wait as the next block approaches, with one eth_blockNumber
+per poll or with a block filter. The blocks are mined every `BLOCK_TIME`
+seconds, the times are scaled down from a 15 seconds block time and a 0.5
+seconds wait.
+"""
+from __future__ import print_function
+
+import time
+
+import gevent
+
+from raiden.tasks import AlarmTask, BLOCK_SOURCES
+from raiden.tests.utils.jsonrpc import BlockChainServiceMock, JSONRPCClientMock
+
+ITERATIONS = 20  # number of blocks
+BLOCK_TIME = 0.15
+WAIT_TIME = 0.005
+MAX_WAIT_TIME = BLOCK_TIME / 3
+
+
+def run_alarm(iterations, block_source, max_wait_time):
+    client = JSONRPCClientMock()
+    chain = BlockChainServiceMock(client, BLOCK_TIME)
+    alarm = AlarmTask(
+        chain,
+        BLOCK_SOURCES[block_source](chain),
+        wait_time=WAIT_TIME,
+        max_wait_time=max_wait_time,
+    )
+
+    lags = list()
+    alarm.register_callback(
+        lambda block_number: lags.append(time.time() - chain.mined_at[block_number])
+    )
+
+    alarm.start()
+    chain.start_mining()
+    gevent.sleep(BLOCK_TIME * (iterations + 0.5))
+    chain.stop_mining()
+    alarm.stop_and_wait()
+
+    return client.requests, lags
+
+
+def test_alarm(iterations=ITERATIONS):
+    runs = (
+        ('fixed polling', 'polling', WAIT_TIME),
+        ('adaptive polling', 'polling', MAX_WAIT_TIME),
+        ('adaptive filter', 'filter', MAX_WAIT_TIME),
+    )
+
+    for name, block_source, max_wait_time in runs:
+        requests, lags = run_alarm(iterations, block_source, max_wait_time)
+
+        print('{}: {} blocks {:.1f} requests per block lag average {:.1f}ms max {:.1f}ms'.format(
+            name,
+            len(lags),
+            float(sum(requests.values())) / len(lags),
+            sum(lags) / len(lags) * 1000,
+            max(lags) * 1000,
+        ))
+
+
+def test_all(iterations=ITERATIONS):
+    test_alarm(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+""" Cost of a new block with thousands of in-flight transfers, dispatching
+every block to every state manager and dispatching it only to the state
+managers with a deadline up to the block.
+
+The transfers are target tasks with the lock expirations spread over the
+next `EXPIRATION_SPREAD` blocks, so a few tasks expire with each block.
+"""
+from __future__ import print_function
+
+import time
+from collections import defaultdict
+
+from raiden.event_handler import StateMachineEventHandler
+from raiden.tests.utils import factories
+from raiden.transfer.architecture import StateManager
+from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
+from raiden.transfer.mediated_transfer import target
+from raiden.transfer.mediated_transfer.state_change import ActionInitTarget
+from raiden.transfer.state_change import Block
+
+ITERATIONS = 10000  # number of in-flight transfers
+BLOCKS = 200
+EXPIRATION_SPREAD = 2000
+
+
+class Raiden(object):
+    def __init__(self):
+        self.transaction_log = StateChangeLog(
+            storage_instance=StateChangeLogSQLiteBackend(database_path=':memory:')
+        )
+        self.identifier_to_statemanagers = defaultdict(list)
+        self.identifier_to_results = defaultdict(list)
+        self.block_number = 1
+
+    def get_block_number(self):
+        return self.block_number
+
+
+class EventHandler(StateMachineEventHandler):
+    def on_event(self, event):
+        pass
+
+
+def make_handler(iterations):
+    raiden = Raiden()
+    handler = EventHandler(raiden)
+    our_address = factories.ADDR
+    block_number = raiden.block_number
+
+    for identifier in range(iterations):
+        expiration = block_number + factories.UNIT_REVEAL_TIMEOUT
+        expiration += identifier % EXPIRATION_SPREAD
+
+        from_route, from_transfer = factories.make_from(
+            1,
+            our_address,
+            expiration,
+        )
+        init = ActionInitTarget(our_address, from_route, from_transfer, block_number)
+
+        manager = StateManager(target.state_transition, None)
+        raiden.identifier_to_statemanagers[identifier].append(manager)
+        handler.log_and_dispatch(manager, init, identifier)
+
+    return raiden, handler
+
+
+def run_blocks(raiden, dispatch_block):
+    start = time.time()
+
+    for block_number in range(raiden.block_number + 1, raiden.block_number + BLOCKS + 1):
+        dispatch_block(Block(block_number))
+        raiden.block_number = block_number
+
+    return time.time() - start
+
+
+def count_pending(raiden):
+    return sum(
+        1
+        for managers in raiden.identifier_to_statemanagers.itervalues()
+        for manager in managers
+        if manager.current_state is not None
+    )
+
+
+def test_block_dispatch(iterations=ITERATIONS):
+    raiden, handler = make_handler(iterations)
+    all_tasks = run_blocks(raiden, handler.log_and_dispatch_to_all_tasks)
+    all_pending = count_pending(raiden)
+
+    raiden, handler = make_handler(iterations)
+    due_tasks = run_blocks(raiden, handler.log_and_dispatch_block)
+    due_pending = count_pending(raiden)
+
+    assert all_pending == due_pending
+
+    print('{} transfers {} blocks, {} pending at the end'.format(
+        iterations,
+        BLOCKS,
+        due_pending,
+    ))
+    print('all tasks: {}s {}ms/block'.format(all_tasks, all_tasks * 1000 / BLOCKS))
+    print('due tasks: {}s {}ms/block'.format(due_tasks, due_tasks * 1000 / BLOCKS))
+
+
+def test_all(iterations=ITERATIONS):
+    test_block_dispatch(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
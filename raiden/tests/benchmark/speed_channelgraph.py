@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+""" Memory and query time of the channel graph backends, the AddressGraph
+used by the ChannelGraph and a networkx.Graph, for token networks with
+random channels between 20-byte addresses.
+
+The queries are the ones of the ChannelGraph: the neighbor ranking used by
+`get_best_routes`, `has_path`, `get_shortest_paths` and the single source
+shortest paths of `get_paths_of_length`.
+"""
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+import networkx
+
+from raiden.network.channelgraph import ordered_neighbors
+from raiden.network.graph import AddressGraph
+from raiden.tests.utils.factories import make_address
+
+ITERATIONS = 100  # number of queries of each kind
+NETWORKS = (  # nodes, channels
+    (2500, 10000),
+    (25000, 100000),
+)
+SINGLE_SOURCE_FRACTION = 20  # the single source queries visit the whole graph
+
+
+def deep_size(root):
+    """ The size of the containers and objects reachable from `root`, the
+    strings are not counted since the addresses are shared with the rest of
+    the node. """
+    seen = set()
+    pending = [root]
+    size = 0
+
+    while pending:
+        obj = pending.pop()
+
+        if id(obj) in seen or isinstance(obj, basestring):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            pending.extend(obj.iterkeys())
+            pending.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            pending.append(obj.__dict__)
+
+    return size / (1024.0 * 1024.0)
+
+
+def networkx_ordered_neighbors(nx_graph, our_address, target_address):
+    paths = list()
+
+    if our_address not in nx_graph or target_address not in nx_graph:
+        return paths
+
+    for neighbor in nx_graph.neighbors(our_address):
+        try:
+            length = networkx.shortest_path_length(nx_graph, neighbor, target_address)
+            paths.append((length, neighbor))
+        except networkx.NetworkXNoPath:
+            pass
+
+    paths.sort()
+    return paths
+
+
+def networkx_shortest_paths(nx_graph, source, target):
+    try:
+        return list(networkx.all_shortest_paths(nx_graph, source, target))
+    except networkx.NetworkXNoPath:
+        return list()
+
+
+def address_shortest_paths(graph, source, target):
+    try:
+        return list(graph.all_shortest_paths(source, target))
+    except ValueError:
+        return list()
+
+
+def measure(query, pairs):
+    start = time.time()
+
+    for source, target in pairs:
+        query(source, target)
+
+    return (time.time() - start) * 1000 / len(pairs)
+
+
+def test_channelgraph(iterations=ITERATIONS):
+    for number_of_nodes, number_of_channels in NETWORKS:
+        random.seed(number_of_nodes)
+        topology = networkx.gnm_random_graph(
+            number_of_nodes,
+            number_of_channels,
+            seed=number_of_nodes,
+        )
+        addresses = [make_address() for _ in range(number_of_nodes)]
+        edge_list = [
+            (addresses[first], addresses[second])
+            for first, second in topology.edges()
+        ]
+        del topology
+
+        graph = AddressGraph(edge_list)
+        nx_graph = networkx.Graph(edge_list)
+
+        print('{} nodes {} channels'.format(number_of_nodes, number_of_channels))
+        print('    memory: networkx {:.1f}MB address graph {:.1f}MB'.format(
+            deep_size(nx_graph),
+            deep_size(graph),
+        ))
+
+        nodes = graph.nodes()
+        pairs = [tuple(random.sample(nodes, 2)) for _ in range(iterations)]
+        sources = pairs[:max(1, iterations // SINGLE_SOURCE_FRACTION)]
+
+        queries = (
+            (
+                'ordered neighbors',
+                lambda source, target: networkx_ordered_neighbors(nx_graph, source, target),
+                lambda source, target: ordered_neighbors(graph, source, target),
+                pairs,
+            ),
+            (
+                'has path',
+                lambda source, target: networkx.has_path(nx_graph, source, target),
+                graph.has_path,
+                pairs,
+            ),
+            (
+                'all shortest paths',
+                lambda source, target: networkx_shortest_paths(nx_graph, source, target),
+                lambda source, target: address_shortest_paths(graph, source, target),
+                pairs,
+            ),
+            (
+                'single source paths',
+                lambda source, _: networkx.shortest_path(nx_graph, source),
+                lambda source, _: graph.shortest_paths(source),
+                sources,
+            ),
+        )
+
+        for name, nx_query, query, query_pairs in queries:
+            print('    {}: networkx {:.3f}ms address graph {:.3f}ms'.format(
+                name,
+                measure(nx_query, query_pairs),
+                measure(query, query_pairs),
+            ))
+
+
+def test_all(iterations=ITERATIONS):
+    test_channelgraph(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
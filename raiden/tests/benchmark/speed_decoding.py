@@ -7,7 +7,7 @@ import timeit
 import coincurve
 
 from raiden.utils import sha3, privatekey_to_address
-from raiden.messages import decode
+from raiden.messages import decode, SENDER_CACHE
 from raiden.messages import (
     Ack, DirectTransfer, Lock, MediatedTransfer, Ping,
     RefundTransfer, Secret, SecretRequest,
@@ -16,12 +16,14 @@ from raiden.messages import (
 PRIVKEY_BIN = 'x' * 32
 PRIVKEY = coincurve.PrivateKey(PRIVKEY_BIN)
 ADDRESS = privatekey_to_address(PRIVKEY_BIN)
-HASH = sha3(PRIVKEY)
+HASH = sha3(PRIVKEY_BIN)
 ITERATIONS = 1000000  # timeit default
 
 
 def run_timeit(message_name, message, iterations=ITERATIONS):
     data = message.encode()
+    messages_set = {message}
+    messages_dict = {message: None}
 
     def test_encode():
         message.encode()
@@ -29,10 +31,60 @@ def run_timeit(message_name, message, iterations=ITERATIONS):
     def test_decode():
         decode(data)
 
+    # the uncached versions pack the message or recover the sender on every
+    # call
+    def test_decode_uncached():
+        SENDER_CACHE.clear()
+        decode(data)
+
+    def test_encode_uncached():
+        bytes(message.packed().data)
+
+    def test_hash():
+        message.hash
+
+    def test_hash_uncached():
+        sha3(message.packed().data)
+
+    def test_membership():
+        message in messages_set  # pylint: disable=pointless-statement
+        message in messages_dict  # pylint: disable=pointless-statement
+
+    def test_membership_decoded():
+        decoded = decode(data)
+        decoded in messages_set  # pylint: disable=pointless-statement
+        decoded in messages_dict  # pylint: disable=pointless-statement
+
     encode_time = timeit.timeit(test_encode, number=iterations)
     decode_time = timeit.timeit(test_decode, number=iterations)
+    decode_uncached_time = timeit.timeit(test_decode_uncached, number=iterations)
+    encode_uncached_time = timeit.timeit(test_encode_uncached, number=iterations)
+    hash_time = timeit.timeit(test_hash, number=iterations)
+    hash_uncached_time = timeit.timeit(test_hash_uncached, number=iterations)
+    membership_time = timeit.timeit(test_membership, number=iterations)
+    membership_decoded_time = timeit.timeit(test_membership_decoded, number=iterations)
 
     print('{}: encode {} decode {}'.format(message_name, encode_time, decode_time))
+    print('{}: encode cached {} uncached {}'.format(
+        message_name,
+        encode_time,
+        encode_uncached_time,
+    ))
+    print('{}: decode cached {} uncached {}'.format(
+        message_name,
+        decode_time,
+        decode_uncached_time,
+    ))
+    print('{}: hash cached {} uncached {}'.format(
+        message_name,
+        hash_time,
+        hash_uncached_time,
+    ))
+    print('{}: set/dict membership {} decode and membership {}'.format(
+        message_name,
+        membership_time,
+        membership_decoded_time,
+    ))
 
 
 def test_ack(iterations=ITERATIONS):
@@ -82,6 +134,7 @@ def test_direct_transfer(iterations=ITERATIONS):
     identifier = 1
     nonce = 1
     token = ADDRESS
+    channel = ADDRESS
     balance = 1
     recipient = ADDRESS
     locksroot = HASH
@@ -90,6 +143,7 @@ def test_direct_transfer(iterations=ITERATIONS):
         identifier,
         nonce,
         token,
+        channel,
         balance,
         recipient,
         locksroot,
@@ -107,6 +161,7 @@ def test_mediated_transfer(iterations=ITERATIONS):
 
     nonce = 1
     token = ADDRESS
+    channel = ADDRESS
     balance = 1
     recipient = ADDRESS
     locksroot = sha3(ADDRESS)
@@ -116,6 +171,7 @@ def test_mediated_transfer(iterations=ITERATIONS):
         identifier,
         nonce,
         token,
+        channel,
         balance,
         recipient,
         locksroot,
@@ -138,17 +194,23 @@ def test_cancel_transfer(iterations=ITERATIONS):
     identifier = 1
     nonce = 1
     token = ADDRESS
+    channel = ADDRESS
     transferred_amount = 1
     recipient = ADDRESS
     locksroot = sha3(ADDRESS)
+    target = ADDRESS
+    initiator = ADDRESS
     msg = RefundTransfer(
         identifier,
         nonce,
         token,
+        channel,
         transferred_amount,
         recipient,
         locksroot,
         lock,
+        target,
+        initiator,
     )
     msg.sign(PRIVKEY, ADDRESS)
     run_timeit('RefundTransfer', msg, iterations=iterations)
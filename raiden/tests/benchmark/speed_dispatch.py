@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+""" Cost of dispatching a Block to a mediator against the size of its state
+tree, with the path copying transitions and with a deepcopy of the state
+before each transition as StateManager used to do.
+"""
+from __future__ import print_function
+
+import time
+from copy import deepcopy
+
+from raiden.tests.utils import factories
+from raiden.transfer.architecture import StateManager
+from raiden.transfer.mediated_transfer import mediator
+from raiden.transfer.mediated_transfer.state import (
+    MediationPairState,
+    MediatorState,
+)
+from raiden.transfer.state import RoutesState
+from raiden.transfer.state_change import Block
+
+ITERATIONS = 2000  # number of dispatched blocks
+SIZES = (
+    # (transfer pairs, available routes)
+    (1, 1),
+    (4, 10),
+    (16, 100),
+    (64, 1000),
+)
+EXPIRATION = 10 ** 9
+
+
+def make_mediator_state(number_of_pairs, number_of_routes):
+    routes = [
+        factories.make_route(factories.make_address(), available_balance=1)
+        for _ in range(number_of_routes)
+    ]
+    state = MediatorState(
+        factories.ADDR,
+        RoutesState(routes),
+        1,
+        factories.UNIT_HASHLOCK,
+    )
+
+    # a chain of refunds, A-N-B-N-C...
+    payer_route = factories.make_route(factories.make_address(), available_balance=1)
+    for position in range(number_of_pairs):
+        payee_route = factories.make_route(factories.make_address(), available_balance=1)
+        expiration = EXPIRATION - position * 2
+
+        pair = MediationPairState(
+            payer_route,
+            factories.make_transfer(1, factories.HOP6, factories.HOP2, expiration),
+            payee_route,
+            factories.make_transfer(1, factories.HOP6, factories.HOP2, expiration - 1),
+        )
+        state.transfers_pair.append(pair)
+        payer_route = payee_route
+
+    return state
+
+
+def deepcopy_transition(state, state_change):
+    return mediator.state_transition(deepcopy(state), state_change)
+
+
+def run_blocks(iterations, state_transition, state):
+    manager = StateManager(state_transition, state)
+
+    start = time.time()
+    for block_number in range(2, iterations + 2):
+        manager.dispatch(Block(block_number))
+    elapsed = time.time() - start
+
+    assert manager.current_state.block_number == iterations + 1
+    return elapsed
+
+
+def test_dispatch(iterations=ITERATIONS):
+    for number_of_pairs, number_of_routes in SIZES:
+        state = make_mediator_state(number_of_pairs, number_of_routes)
+
+        deepcopy_elapsed = run_blocks(iterations, deepcopy_transition, state)
+        path_copy_elapsed = run_blocks(iterations, mediator.state_transition, state)
+
+        print('pairs {} routes {}: deepcopy {}us path copy {}us per dispatch'.format(
+            number_of_pairs,
+            number_of_routes,
+            deepcopy_elapsed * 10 ** 6 / iterations,
+            path_copy_elapsed * 10 ** 6 / iterations,
+        ))
+
+
+def test_all(iterations=ITERATIONS):
+    test_dispatch(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
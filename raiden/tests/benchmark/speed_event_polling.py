@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+""" JSON-RPC round trips and polling time per block of the blockchain event
+sources, a filter per contract and a single eth_getLogs for all contracts.
+
+The node is the in memory JSON-RPC stand-in, every block `EVENTS_PER_BLOCK`
+random channels emit a ChannelNewBalance. The time with latency adds
+`LATENCY` seconds per round trip to the measured time, the requests are
+sequential in both sources.
+"""
+from __future__ import print_function
+
+import random
+import time
+
+from raiden.blockchain.abi import (
+    CONTRACT_MANAGER,
+    CONTRACT_NETTING_CHANNEL,
+    EVENT_CHANNEL_NEW_BALANCE,
+)
+from raiden.blockchain.events import (
+    LogsBlockchainEvents,
+    PyethappBlockchainEvents,
+    PyethappProxies,
+)
+from raiden.network.rpc.client import Filter, new_filter
+from raiden.tests.utils.factories import make_address
+from raiden.tests.utils.jsonrpc import JSONRPCClientMock
+
+ITERATIONS = 100  # number of blocks
+CHANNELS = (100, 1000, 2000)
+EVENTS_PER_BLOCK = 5
+LATENCY = 0.001  # seconds per round trip to a local node
+
+
+class Proxy(object):
+    """ The parts of the registry, manager and netting channel proxies used
+    to install the listeners. """
+
+    def __init__(self, client, address, topics):
+        self.client = client
+        self.address = address
+        self.topics = topics
+
+    def new_filter(self):
+        filter_id = new_filter(self.client, self.address, self.topics)
+        return Filter(self.client, filter_id)
+
+    tokenadded_filter = new_filter
+    channelnew_filter = new_filter
+    all_events_filter = new_filter
+
+
+def make_proxies(client, number_of_channels):
+    registry = Proxy(client, make_address(), [])
+    manager = Proxy(client, make_address(), [])
+    channels = [
+        Proxy(client, make_address(), None)
+        for _ in range(number_of_channels)
+    ]
+
+    return PyethappProxies(registry, [manager], {manager.address: channels})
+
+
+def run_polling(blockchain_events, client, channels, iterations):
+    translator = CONTRACT_MANAGER.get_translator(CONTRACT_NETTING_CHANNEL)
+    event_id = CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_NEW_BALANCE)
+    token_address = make_address()
+    rng = random.Random(len(channels))
+
+    client.requests.clear()
+    client.elapsed = 0
+    state_changes = 0
+    elapsed = 0
+
+    for _ in range(iterations):
+        client.next_block()
+
+        for channel in rng.sample(channels, EVENTS_PER_BLOCK):
+            client.add_log(
+                channel.address,
+                translator,
+                event_id,
+                token_address,
+                channel.address,
+                100,
+                client.block_number,
+            )
+
+        start = time.time()
+        state_changes += len(list(blockchain_events.poll_state_change(client.block_number)))
+        elapsed += time.time() - start
+
+    assert state_changes == iterations * EVENTS_PER_BLOCK
+    return sum(client.requests.values()), elapsed, client.elapsed
+
+
+def test_event_polling(iterations=ITERATIONS):
+    for number_of_channels in CHANNELS:
+        sources = (
+            ('filter per contract', lambda client: PyethappBlockchainEvents()),
+            ('single eth_getLogs', LogsBlockchainEvents),
+        )
+
+        for name, make_events in sources:
+            client = JSONRPCClientMock(block_number=1, latency=LATENCY)
+            proxies = make_proxies(client, number_of_channels)
+            channels = proxies.channelmanager_nettingchannels.values()[0]
+
+            blockchain_events = make_events(client)
+            blockchain_events.add_proxies_listeners(proxies)
+            startup_requests = sum(client.requests.values())
+
+            requests, elapsed, latency = run_polling(
+                blockchain_events,
+                client,
+                channels,
+                iterations,
+            )
+
+            print(
+                '{} channels {}: startup {} requests, {:.1f} requests/block '
+                '{:.2f}ms/block {:.2f}ms/block with {}ms latency'.format(
+                    number_of_channels,
+                    name,
+                    startup_requests,
+                    float(requests) / iterations,
+                    elapsed * 1000 / iterations,
+                    (elapsed + latency) * 1000 / iterations,
+                    LATENCY * 1000,
+                )
+            )
+
+
+def test_all(iterations=ITERATIONS):
+    test_event_polling(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
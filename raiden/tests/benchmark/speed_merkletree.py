@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+import timeit
+
+from raiden.channel.balance_proof import BalanceProof, UnlockPartialProof
+from raiden.messages import Lock
+from raiden.mtree import Merkletree
+from raiden.utils import sha3
+
+ITERATIONS = 100
+PENDING_LOCKS = (10, 100, 500, 1000)
+UNCLAIMED_LOCKS = (1000, 10000)
+
+
+def lockhashes(number_of_locks):
+    return [
+        sha3('lock:{}'.format(position))
+        for position in range(number_of_locks)
+    ]
+
+
+def run_timeit(number_of_locks, iterations=ITERATIONS):
+    """ Time the locksroot computation for a new lock with `number_of_locks`
+    pending locks, rebuilding the tree versus updating it in place.
+    """
+    leaves = lockhashes(number_of_locks)
+    new_leaf = sha3('new lock')
+    tree = Merkletree(leaves)
+
+    def test_rebuild():
+        all_leaves = list(leaves)
+        all_leaves.append(new_leaf)
+        Merkletree(all_leaves).merkleroot
+
+    def test_incremental():
+        tree.add(new_leaf)
+        tree.merkleroot
+        tree.remove(new_leaf)
+
+    def test_cached_root():
+        tree.merkleroot
+
+    rebuild_time = timeit.timeit(test_rebuild, number=iterations)
+
+    # add and remove are both timed, halve it to get the cost of one update
+    incremental_time = timeit.timeit(test_incremental, number=iterations) / 2
+    cached_time = timeit.timeit(test_cached_root, number=iterations)
+
+    print('{} locks: rebuild {} incremental {} cached root {}'.format(
+        number_of_locks,
+        rebuild_time,
+        incremental_time,
+        cached_time,
+    ))
+
+
+def test_register_locks(iterations=ITERATIONS):
+    """ Time registering `number_of_locks` locks one at a time, as it is done
+    by a mediator with a busy channel.
+    """
+    for number_of_locks in PENDING_LOCKS:
+        leaves = lockhashes(number_of_locks)
+
+        def test_rebuild():
+            registered = list()
+            for leaf in leaves:
+                registered.append(leaf)
+                Merkletree(registered).merkleroot
+
+        def test_incremental():
+            tree = Merkletree([])
+            for leaf in leaves:
+                tree.add(leaf)
+                tree.merkleroot
+
+        # registering is quadratic for the rebuild, scale the iterations down
+        number = max(iterations // number_of_locks, 1)
+        rebuild_time = timeit.timeit(test_rebuild, number=number)
+        incremental_time = timeit.timeit(test_incremental, number=number)
+
+        print('register {} locks: rebuild {} incremental {}'.format(
+            number_of_locks,
+            rebuild_time,
+            incremental_time,
+        ))
+
+
+def balance_proof_with_unclaimed_locks(number_of_locks):
+    balance_proof = BalanceProof(None)
+
+    for position in range(number_of_locks):
+        secret = sha3('secret:{}'.format(position))
+        lock = Lock(1, position, sha3(secret))
+        lockhashed = sha3(lock.as_bytes)
+
+        balance_proof.hashlocks_to_unclaimedlocks[lock.hashlock] = UnlockPartialProof(
+            lock,
+            lockhashed,
+            secret,
+        )
+        balance_proof.merkletree.add(lockhashed)
+
+    return balance_proof
+
+
+def test_unlock_proofs(iterations=ITERATIONS):
+    """ Time the unlock proofs to withdraw all the unclaimed locks of a
+    channel, one lock at a time versus all of them at once.
+    """
+    for number_of_locks in UNCLAIMED_LOCKS:
+        balance_proof = balance_proof_with_unclaimed_locks(number_of_locks)
+
+        def test_per_lock():
+            tree = balance_proof.generate_merkle_tree()
+            return [
+                balance_proof.compute_proof_for_lock(
+                    partialproof.secret,
+                    partialproof.lock,
+                    tree,
+                )
+                for partialproof in balance_proof.hashlocks_to_unclaimedlocks.itervalues()
+            ]
+
+        def test_bulk():
+            return balance_proof.get_known_unlocks()
+
+        assert sorted(test_per_lock()) == sorted(test_bulk())
+
+        number = max(iterations // 10, 1)
+        per_lock_time = timeit.timeit(test_per_lock, number=number) / number
+        bulk_time = timeit.timeit(test_bulk, number=number) / number
+
+        print('unlock proofs {} locks: per lock {} bulk {}'.format(
+            number_of_locks,
+            per_lock_time,
+            bulk_time,
+        ))
+
+
+def test_all(iterations=ITERATIONS):
+    for number_of_locks in PENDING_LOCKS:
+        run_timeit(number_of_locks, iterations=iterations)
+
+    test_register_locks(iterations=iterations)
+    test_unlock_proofs(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+""" Success rate and routing latency of mediated transfers using a single path
+and splitting the transfers larger than any channel in parts.
+
+The network is a scale-free graph where every new node opens `CHANNELS`
+channels, the balance of each side of a channel follows a log-normal
+distribution scaled by the degree of the participants, so a few hubs hold
+most of the capacity and the balances of a node's channels are skewed.
+
+Each transfer is simulated hop by hop: the initiator uses `get_best_routes`
+or `split_transfer` on its own channels, the mediators forward each part
+through the closest neighbor with enough balance and a dead end is refunded
+to the previous hop, which tries its next neighbor, up to `MAX_LOCKS` locks
+per part. A transfer fails if any of its parts fail, the balances change
+only for the transfers that succeed.
+"""
+from __future__ import print_function
+
+import random
+import time
+
+import networkx
+
+from raiden.network.channelgraph import ordered_neighbors, split_transfer
+from raiden.network.graph import AddressGraph
+from raiden.tests.utils.factories import make_route
+
+ITERATIONS = 2000  # number of transfers per mode
+NODES = 500
+CHANNELS = 2
+MEDIAN_BALANCE = 100
+BALANCE_SIGMA = 1.0
+AMOUNTS = (50, 200, 800)
+MAX_HOPS = 10
+MAX_LOCKS = 50
+
+
+class Network(object):
+    def __init__(self, seed):
+        rng = random.Random(seed)
+        self.graph = networkx.barabasi_albert_graph(NODES, CHANNELS, seed=seed)
+        self.balances = dict()
+
+        for first, second in self.graph.edges():
+            scale = MEDIAN_BALANCE * min(self.graph.degree(first), self.graph.degree(second))
+            scale /= CHANNELS
+
+            self.balances[first, second] = int(rng.lognormvariate(0, BALANCE_SIGMA) * scale)
+            self.balances[second, first] = int(rng.lognormvariate(0, BALANCE_SIGMA) * scale)
+
+        self.channels = AddressGraph(self.graph.edges())
+        self.neighbors_cache = dict()
+
+    def neighbors(self, node, target):
+        """ The neighbors of `node` ordered by the distance to `target`. """
+        key = (node, target)
+        neighbors = self.neighbors_cache.get(key)
+
+        if neighbors is None:
+            neighbors = [
+                neighbor
+                for _, neighbor in sorted(ordered_neighbors(self.channels, node, target))
+            ]
+            self.neighbors_cache[key] = neighbors
+
+        return neighbors
+
+    def routes(self, node, target, amount):
+        """ The routes of `node` with at least `amount` of balance, in the
+        order of `get_best_routes`. """
+        return [
+            make_route(str(neighbor), available_balance=self.balances[node, neighbor])
+            for neighbor in self.neighbors(node, target)
+            if self.balances[node, neighbor] >= amount
+        ]
+
+    def forward(self, path, target, amount, locked, budget):
+        """ Mediate `amount` from the last node of `path`, locking the balance
+        of the used channels, returns True if the target was reached. """
+        node = path[-1]
+
+        if node == target:
+            return True
+
+        if len(path) > MAX_HOPS:
+            return False
+
+        for neighbor in self.neighbors(node, target):
+            if neighbor in path or self.balances[node, neighbor] < amount:
+                continue
+
+            if not budget:
+                return False
+
+            budget.pop()
+            self.lock(node, neighbor, amount, locked)
+            if self.forward(path + [neighbor], target, amount, locked, budget):
+                return True
+
+            # refund, the lock is removed
+            self.unlock(node, neighbor, amount, locked)
+
+        return False
+
+    def lock(self, node, neighbor, amount, locked):
+        self.balances[node, neighbor] -= amount
+        locked.append((node, neighbor, amount))
+
+    def unlock(self, node, neighbor, amount, locked):
+        self.balances[node, neighbor] += amount
+        locked.remove((node, neighbor, amount))
+
+    def transfer(self, initiator, target, parts):
+        """ Mediate every part, the balances are kept only if all parts
+        reached the target. """
+        locked = list()
+
+        for part_amount, part_routes in parts:
+            for route in part_routes:
+                neighbor = int(route.node_address)
+
+                if self.balances[initiator, neighbor] < part_amount:
+                    continue
+
+                budget = [None] * MAX_LOCKS
+                self.lock(initiator, neighbor, part_amount, locked)
+                if self.forward([initiator, neighbor], target, part_amount, locked, budget):
+                    break
+
+                self.unlock(initiator, neighbor, part_amount, locked)
+
+            else:
+                for node, neighbor, amount in list(locked):
+                    self.unlock(node, neighbor, amount, locked)
+
+                return False
+
+        for node, neighbor, amount in locked:
+            self.balances[neighbor, node] += amount
+
+        return True
+
+
+def single_path(network, initiator, target, amount):
+    routes = network.routes(initiator, target, amount)
+
+    if not routes:
+        return list()
+
+    return [(amount, routes)]
+
+
+def multi_path(network, initiator, target, amount):
+    parts = single_path(network, initiator, target, amount)
+
+    if not parts:
+        parts = split_transfer(network.routes(initiator, target, 1), amount)
+
+    return parts
+
+
+def run_transfers(get_parts, amount, iterations):
+    network = Network(seed=amount)
+    rng = random.Random(amount)
+
+    succeeded = 0
+    rejected = 0
+    number_of_parts = 0
+    routing_elapsed = 0
+    total_elapsed = 0
+
+    for _ in range(iterations):
+        initiator, target = rng.sample(range(NODES), 2)
+
+        start = time.time()
+        parts = get_parts(network, initiator, target, amount)
+        routing_elapsed += time.time() - start
+
+        if not parts:
+            rejected += 1
+
+        elif network.transfer(initiator, target, parts):
+            succeeded += 1
+            number_of_parts += len(parts)
+
+        total_elapsed += time.time() - start
+
+    return succeeded, rejected, number_of_parts, routing_elapsed, total_elapsed
+
+
+def test_multipath(iterations=ITERATIONS):
+    print('{} nodes x {} channels, median balance {}'.format(NODES, CHANNELS, MEDIAN_BALANCE))
+
+    for amount in AMOUNTS:
+        for name, get_parts in (('single path', single_path), ('multi path', multi_path)):
+            result = run_transfers(get_parts, amount, iterations)
+            succeeded, rejected, number_of_parts, routing_elapsed, total_elapsed = result
+
+            print(
+                'amount {} {}: success {:.1%} rejected by the initiator {:.1%} '
+                'parts/transfer {:.2f} initiator {:.1f}us/transfer '
+                'total {:.1f}us/transfer'.format(
+                    amount,
+                    name,
+                    float(succeeded) / iterations,
+                    float(rejected) / iterations,
+                    float(number_of_parts) / max(succeeded, 1),
+                    routing_elapsed * 1e6 / iterations,
+                    total_elapsed * 1e6 / iterations,
+                )
+            )
+
+
+def test_all(iterations=ITERATIONS):
+    test_multipath(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+import time
+
+from raiden.messages import decode, Ping
+from raiden.network.recovery import SignatureRecovery
+from raiden.utils import sha3
+from raiden.tests.utils.factories import make_privkey_address
+
+ITERATIONS = 1000
+POOL_SIZES = (1, 2, 4, 8)
+BATCH_SIZE = 32
+
+
+def make_packets(number_of_packets):
+    privkey, address = make_privkey_address()
+
+    packets = list()
+    for nonce in range(number_of_packets):
+        ping = Ping(nonce=nonce)
+        ping.sign(privkey, address)
+        packets.append(ping.encode())
+
+    return packets
+
+
+def test_inline(iterations=ITERATIONS):
+    packets = make_packets(iterations)
+
+    start = time.time()
+    for data in packets:
+        decode(data)
+    elapsed = time.time() - start
+
+    print('inline {} packets: {}'.format(iterations, elapsed))
+
+
+def test_pool(iterations=ITERATIONS):
+    packets = make_packets(iterations)
+
+    for pool_size in POOL_SIZES:
+        recovery = SignatureRecovery(lambda *args: None, pool_size, BATCH_SIZE)
+        recovery.start()
+
+        start = time.time()
+        for data in packets:
+            recovery.put(data, sha3(data))
+        recovery.stop_and_wait()
+        elapsed = time.time() - start
+
+        print('pool {} threads {} packets: {}'.format(pool_size, iterations, elapsed))
+
+
+def test_all(iterations=ITERATIONS):
+    test_inline(iterations=iterations)
+    test_pool(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
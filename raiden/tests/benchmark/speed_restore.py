@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+""" Startup time of a node with a large state change log.
+
+The log is filled with `iterations` Block state changes, one in a hundred
+generated an event. Recovery by replaying the whole log is compared with the
+recovery from a snapshot taken DEFAULT_SNAPSHOT_INTERVAL state changes before
+the end of the log, after the older state changes were compacted.
+"""
+from __future__ import print_function
+
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+from raiden.event_handler import StateMachineEventHandler
+from raiden.settings import DEFAULT_SNAPSHOT_INTERVAL
+from raiden.tests.utils import factories
+from raiden.transfer.architecture import StateManager
+from raiden.transfer.events import EventTransferSentFailed
+from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
+from raiden.transfer.mediated_transfer.state_change import ActionInitTarget
+from raiden.transfer.state_change import Block
+
+ITERATIONS = 1000000  # number of state changes
+EVENT_EVERY = 100
+
+
+class Raiden(object):
+    def __init__(self, transaction_log):
+        self.transaction_log = transaction_log
+        self.identifier_to_statemanagers = defaultdict(list)
+
+
+def open_log(database_path):
+    return StateChangeLog(
+        storage_instance=StateChangeLogSQLiteBackend(database_path=database_path)
+    )
+
+
+def used_bytes(log):
+    conn = log.storage.conn
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return (page_count - freelist_count) * page_size
+
+
+def fill_log(log, iterations):
+    from_route, from_transfer = factories.make_from(
+        1,
+        factories.ADDR,
+        iterations + factories.UNIT_REVEAL_TIMEOUT,
+    )
+    init = ActionInitTarget(factories.ADDR, from_route, from_transfer, 1)
+    log.log(init, from_transfer.identifier)
+
+    event = EventTransferSentFailed(1, 'whatever')
+    for block_number in range(1, iterations):
+        state_change_id = log.log(Block(block_number))
+
+        if block_number % EVENT_EVERY == 0:
+            log.log_events(state_change_id, [event], block_number)
+
+    log.flush()
+
+
+def replay(log, state_change_id, transfers):
+    raiden = Raiden(log)
+    raiden.identifier_to_statemanagers = transfers
+
+    handler = StateMachineEventHandler(raiden)
+    return handler.replay(log.get_state_changes_after(state_change_id))
+
+
+def report(name, iterations, replayed, elapsed):
+    print('{}: log of {} replayed {} {}s'.format(
+        name,
+        iterations,
+        replayed,
+        elapsed,
+    ))
+
+
+def test_restore(iterations=ITERATIONS):
+    tmpdir = tempfile.mkdtemp()
+    database_path = os.path.join(tmpdir, 'log.db')
+
+    try:
+        log = open_log(database_path)
+
+        start = time.time()
+        fill_log(log, iterations)
+        print('fill: {} state changes {}s {} bytes'.format(
+            iterations,
+            time.time() - start,
+            used_bytes(log),
+        ))
+
+        start = time.time()
+        replayed = replay(open_log(database_path), None, defaultdict(list))
+        report('full replay', iterations, replayed, time.time() - start)
+
+        # the state managers at the snapshot point
+        snapshot_id = max(iterations - DEFAULT_SNAPSHOT_INTERVAL, 1)
+        raiden = Raiden(log)
+        StateMachineEventHandler(raiden).replay(itertools.takewhile(
+            lambda row: row[0] <= snapshot_id,
+            log.get_state_changes_after(None),
+        ))
+        transfers = raiden.identifier_to_statemanagers
+
+        start = time.time()
+        log.snapshot(snapshot_id, {'transfers': transfers})
+        print('snapshot and compaction: {}s {} bytes'.format(
+            time.time() - start,
+            used_bytes(log),
+        ))
+        del log
+
+        start = time.time()
+        log = open_log(database_path)
+        snapshot_id, data = log.get_snapshot()
+        replayed = replay(log, snapshot_id, data['transfers'])
+        report('snapshot replay', iterations, replayed, time.time() - start)
+
+        assert len(data['transfers']) == 1
+        assert isinstance(data['transfers'].values()[0][0], StateManager)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_all(iterations=ITERATIONS):
+    test_restore(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
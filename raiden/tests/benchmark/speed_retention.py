@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+""" Memory and lookup benchmarks for the protocol's echohash maps.
+
+Run each test in its own process for meaningful memory numbers, the maximum
+RSS never decreases.
+"""
+from __future__ import print_function
+
+import resource
+import timeit
+
+from raiden.channel import BalanceProof, Channel, ChannelEndState, ChannelExternalState
+from raiden.constants import PROTOCOL_MAX_SEND_WINDOW
+from raiden.tests.utils.factories import make_address, make_privkey_address
+from raiden.tests.utils.protocol import TOKEN_ADDRESS, NettingChannelMock
+from raiden.utils import sha3
+from raiden.utils.retention import RetentionMap
+
+ITERATIONS = 1000000
+CHANNELS = 1000
+ACK = ('x' * 20, 'y' * 53)
+
+
+def max_rss():
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def echohashes(number_of_entries):
+    return [sha3(str(position)) for position in xrange(number_of_entries)]
+
+
+def channel_nonces(number_of_entries):
+    """ The nonces of `number_of_entries` transfers sent by netting channels,
+    interleaving `CHANNELS` channels.
+    """
+    senders = list()
+    for _ in range(CHANNELS):
+        privkey, address = make_privkey_address()
+        channel = Channel(
+            ChannelEndState(address, number_of_entries, BalanceProof(None)),
+            ChannelEndState(make_address(), 0, BalanceProof(None)),
+            ChannelExternalState(None, NettingChannelMock(), blocks=(1, 0, 0)),
+            TOKEN_ADDRESS,
+            reveal_timeout=10,
+            settle_timeout=50,
+        )
+        senders.append((privkey, address, channel))
+
+    nonces = list()
+    for position in xrange(number_of_entries):
+        privkey, address, channel = senders[position % CHANNELS]
+
+        transfer = channel.create_directtransfer(1, position)
+        transfer.sign(privkey, address)
+        channel.register_transfer(1, transfer)
+
+        nonces.append(transfer.nonce)
+
+    return nonces
+
+
+def report(name, mapping, keys, insert_time, rss_before):
+    lookups = keys[-CHANNELS:]
+
+    def test_lookup():
+        for key in lookups:
+            key in mapping  # pylint: disable=pointless-statement
+
+    lookup_time = timeit.timeit(test_lookup, number=100) / (100 * len(lookups))
+
+    print('{}: {} inserted {} retained, insert {} lookup {} memory {}kb'.format(
+        name,
+        len(keys),
+        len(mapping),
+        insert_time,
+        lookup_time,
+        max_rss() - rss_before,
+    ))
+
+
+def test_dict(iterations=ITERATIONS):
+    """ The previous unbounded dict. """
+    keys = echohashes(iterations)
+    rss_before = max_rss()
+    mapping = dict()
+
+    def insert():
+        for key in keys:
+            mapping[key] = ACK
+
+    insert_time = timeit.timeit(insert, number=1)
+    report('dict', mapping, keys, insert_time, rss_before)
+
+
+def test_retention_nonce(iterations=ITERATIONS):
+    """ Acks retired by the channel nonce as RaidenProtocol.maybe_send_ack
+    does, keeping the send window of each of the `CHANNELS` channels.
+    """
+    keys = echohashes(iterations)
+    nonces = channel_nonces(iterations)
+    rss_before = max_rss()
+    mapping = RetentionMap(60 * 60)
+
+    def insert():
+        for position, key in enumerate(keys):
+            group = position % CHANNELS
+            nonce = nonces[position]
+
+            mapping.retire(group, nonce - PROTOCOL_MAX_SEND_WINDOW + 1)
+            mapping.add(key, ACK, group, nonce)
+
+    insert_time = timeit.timeit(insert, number=1)
+    report('retention nonce', mapping, keys, insert_time, rss_before)
+
+
+def test_retention_horizon(iterations=ITERATIONS):
+    """ Entries without a nonce, a fake clock advances one second per entry
+    and the horizon keeps the last `CHANNELS` seconds.
+    """
+    keys = echohashes(iterations)
+    rss_before = max_rss()
+    clock = [0]
+    mapping = RetentionMap(CHANNELS, clock=lambda: clock[0])
+
+    def insert():
+        for key in keys:
+            clock[0] += 1
+            mapping[key] = ACK
+
+    insert_time = timeit.timeit(insert, number=1)
+    report('retention horizon', mapping, keys, insert_time, rss_before)
+
+
+def test_all(iterations=ITERATIONS):
+    test_dict(iterations=iterations)
+    test_retention_nonce(iterations=iterations)
+    test_retention_horizon(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+""" Throughput of the neighbor ranking used by `get_best_routes`, in random
+networks where every node has `CHANNELS` channels.
+
+Three versions are compared:
+
+- a networkx shortest path search from each neighbor, the original
+  implementation,
+- the bidirectional searches sharing the half from the target,
+- the distance cache of the ChannelGraph, with the targets drawn from a
+  pool of `CACHED_TARGETS` addresses.
+"""
+from __future__ import print_function
+
+import random
+import time
+from heapq import heappush
+
+import networkx
+
+from raiden.network.channelgraph import ChannelGraph, ordered_neighbors
+from raiden.tests.utils.factories import make_address
+
+ITERATIONS = 200  # number of rankings per network and version
+NODES = (1000, 10000, 100000)
+CHANNELS = 5
+CACHED_TARGETS = 20
+
+
+def ordered_neighbors_per_neighbor(nx_graph, our_address, target_address):
+    paths = list()
+
+    for neighbor in networkx.all_neighbors(nx_graph, our_address):
+        try:
+            length = networkx.shortest_path_length(
+                nx_graph,
+                neighbor,
+                target_address,
+            )
+            heappush(paths, (length, neighbor))
+        except networkx.NetworkXNoPath:
+            pass
+
+    return paths
+
+
+def make_channelgraph(number_of_nodes):
+    random.seed(number_of_nodes)
+    topology = networkx.random_regular_graph(CHANNELS, number_of_nodes, seed=number_of_nodes)
+
+    addresses = [make_address() for _ in range(number_of_nodes)]
+    edge_list = [
+        (addresses[first], addresses[second])
+        for first, second in topology.edges()
+    ]
+
+    our_address = addresses[0]
+    channelgraph = ChannelGraph(our_address, make_address(), make_address(), edge_list, [])
+    return channelgraph, networkx.Graph(edge_list), addresses
+
+
+def run_rankings(rank, our_address, targets):
+    start = time.time()
+
+    for target_address in targets:
+        rank(our_address, target_address)
+
+    return time.time() - start
+
+
+def test_routing(iterations=ITERATIONS):
+    for number_of_nodes in NODES:
+        channelgraph, nx_graph, addresses = make_channelgraph(number_of_nodes)
+        our_address = channelgraph.our_address
+        graph = channelgraph.graph
+
+        targets = [random.choice(addresses) for _ in range(iterations)]
+        target_pool = addresses[-CACHED_TARGETS:]
+        cached_targets = [random.choice(target_pool) for _ in range(iterations)]
+
+        for target_address in targets[:10]:
+            assert (
+                ordered_neighbors(graph, our_address, target_address) ==
+                sorted(ordered_neighbors_per_neighbor(nx_graph, our_address, target_address))
+            )
+
+        configurations = (
+            (
+                'search per neighbor',
+                lambda our, target: ordered_neighbors_per_neighbor(nx_graph, our, target),
+                targets,
+            ),
+            (
+                'shared search',
+                lambda our, target: ordered_neighbors(graph, our, target),
+                targets,
+            ),
+            (
+                'distance cache',
+                channelgraph.ordered_neighbors,
+                cached_targets,
+            ),
+        )
+
+        for name, rank, rank_targets in configurations:
+            elapsed = run_rankings(rank, our_address, rank_targets)
+            print('{} x {} {}: {} paths/s'.format(
+                number_of_nodes,
+                CHANNELS,
+                name,
+                len(rank_targets) / elapsed,
+            ))
+
+
+def test_all(iterations=ITERATIONS):
+    test_routing(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+""" HTTP round trips and time of the netting channel proxy operations, with
+the sequential JSON-RPC requests of the contract proxies and with JSON-RPC
+2.0 batches and the cache of the netting channel proxy.
+
+The node is a local HTTP server replying with the in memory node mock, it
+waits `LATENCY` seconds per HTTP request to account for the round trip to
+a node that is not on the same host. The sequential requests are the ones
+made by the proxies before the batches were used.
+"""
+from __future__ import print_function
+
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from pyethapp.jsonrpc import address_decoder, address_encoder
+from pyethapp.rpc_client import JSONRPCClient
+
+from raiden.blockchain.abi import CONTRACT_MANAGER, CONTRACT_NETTING_CHANNEL
+from raiden.network.rpc.client import (
+    NettingChannel,
+    check_transaction_threw,
+    data_encoder,
+    patch_send_message,
+)
+from raiden.tests.utils.factories import make_address, make_privkey_address
+from raiden.tests.utils.jsonrpc import JSONRPCNodeMock
+from raiden.utils import privatekey_to_address
+
+ITERATIONS = 100  # number of channels
+LATENCY = 0.001  # seconds per HTTP request
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    pass
+
+
+def make_server(node):
+    class Handler(BaseHTTPRequestHandler):
+        # keep the connection alive as the nodes do, the headers and the
+        # body are written separately
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        # the idle connections are closed, so the interpreter can exit
+        timeout = 1
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            message = self.rfile.read(int(self.headers['Content-Length']))
+            time.sleep(LATENCY)
+            reply = node.send_message(message)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+def sequential_new_channel(client, our_address, channel_address):
+    if client.call('eth_getCode', address_encoder(channel_address), 'latest') == '0x':
+        raise ValueError('no code')
+
+    proxy = client.new_abi_contract(
+        CONTRACT_MANAGER.get_abi(CONTRACT_NETTING_CHANNEL),
+        address_encoder(channel_address),
+    )
+    data = proxy.addressAndBalance.call()
+    proxy.settleTimeout.call()
+
+    if our_address not in (address_decoder(data[0]), address_decoder(data[2])):
+        raise ValueError('not a participant')
+
+    return proxy
+
+
+def sequential_detail(channel):
+    return channel._detail(  # pylint: disable=protected-access
+        channel.proxy.addressAndBalance.call(startgas=channel.startgas),
+        channel.proxy.settleTimeout.call(startgas=channel.startgas),
+    )
+
+
+def sequential_can_transfer(channel):
+    if channel.proxy.closed.call() != 0:
+        return False
+
+    return channel.proxy.opened.call() != 0 and sequential_detail(channel)['our_balance'] > 0
+
+
+def sequential_check_transaction_threw(client, transaction_hash):
+    encoded_transaction = data_encoder(transaction_hash.decode('hex'))
+    transaction = client.call('eth_getTransactionByHash', encoded_transaction)
+    receipt = client.call('eth_getTransactionReceipt', encoded_transaction)
+    return transaction['gas'] != receipt['gasUsed']
+
+
+def batch_new_channel(client, our_address, channel_address):  # pylint: disable=unused-argument
+    return NettingChannel(client, channel_address)
+
+
+def batch_detail(channel):
+    return channel.detail(None)
+
+
+def batch_can_transfer(channel):
+    return channel.can_transfer()
+
+
+def measure(node, operation, arguments):
+    messages = node.messages
+    start = time.time()
+
+    results = [operation(*args) for args in arguments]
+
+    elapsed = time.time() - start
+    return results, node.messages - messages, elapsed
+
+
+def test_rpc_batch(iterations=ITERATIONS):
+    node = JSONRPCNodeMock()
+    server = make_server(node)
+
+    privkey = make_privkey_address()[0]
+    client = JSONRPCClient(
+        privkey=privkey.secret,
+        host='127.0.0.1',
+        port=server.server_address[1],
+        print_communication=False,
+    )
+    patch_send_message(client)
+
+    translator = CONTRACT_MANAGER.get_translator(CONTRACT_NETTING_CHANNEL)
+    our_address = privatekey_to_address(privkey.secret)
+    channel_addresses = [make_address() for _ in range(iterations)]
+    transaction_hashes = [make_address()[:16] * 2 for _ in range(iterations)]
+
+    for channel_address in channel_addresses:
+        node.add_contract(
+            channel_address,
+            translator,
+            addressAndBalance=lambda: (our_address, 10, make_address(), 20),
+            settleTimeout=lambda: 30,
+            opened=lambda: 1,
+            closed=lambda: 0,
+        )
+
+    for transaction_hash in transaction_hashes:
+        node.add_transaction(transaction_hash, gas=100, gas_used=50)
+
+    try:
+        for name, new_channel, detail, can_transfer, threw in (
+                (
+                    'sequential',
+                    sequential_new_channel,
+                    sequential_detail,
+                    sequential_can_transfer,
+                    sequential_check_transaction_threw,
+                ),
+                (
+                    'batch and cache',
+                    batch_new_channel,
+                    batch_detail,
+                    batch_can_transfer,
+                    check_transaction_threw,
+                ),
+        ):
+            channels = [NettingChannel(client, address) for address in channel_addresses]
+            threw_arguments = [
+                (client, transaction_hash.encode('hex'))
+                for transaction_hash in transaction_hashes
+            ]
+
+            operations = (
+                (
+                    'new proxy',
+                    new_channel,
+                    [(client, our_address, address) for address in channel_addresses],
+                ),
+                ('detail', detail, [(channel,) for channel in channels]),
+                ('can_transfer', can_transfer, [(channel,) for channel in channels]),
+                ('check_transaction_threw', threw, threw_arguments),
+            )
+
+            for operation_name, operation, arguments in operations:
+                _, messages, elapsed = measure(node, operation, arguments)
+
+                print('{} {}: {:.1f} requests/call {:.2f}ms/call'.format(
+                    name,
+                    operation_name,
+                    float(messages) / iterations,
+                    elapsed * 1000 / iterations,
+                ))
+    finally:
+        server.shutdown()
+
+
+def test_all(iterations=ITERATIONS):
+    test_rpc_batch(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+""" Idle CPU and memory of the outgoing queues.
+
+Compares the SendScheduler with the previous design of one greenlet per
+queue plus one health check greenlet per node. Every peer answers the Pings
+right away, so the nodes are healthy and the queues are empty.
+
+Run each test in its own process for meaningful memory numbers, the maximum
+RSS never decreases.
+"""
+from __future__ import print_function
+
+import resource
+
+import gevent
+from gevent.event import AsyncResult, Event
+
+from raiden.network.protocol import SendScheduler
+from raiden.settings import DEFAULT_PROTOCOL_TIMER_TICK
+
+ITERATIONS = 10000  # number of queues
+TOKENS = 2
+IDLE_SECONDS = 10
+NAT_KEEPALIVE_TIMEOUT = 5
+
+
+class Protocol(object):
+    def __init__(self):
+        self.event_stop = Event()
+        self.greenlets = list()
+        self.nodeaddresses_to_nonces = dict()
+
+        self.retries_before_backoff = 5
+        self.retry_interval = 1
+        self.nat_keepalive_retries = 5
+        self.nat_keepalive_timeout = NAT_KEEPALIVE_TIMEOUT
+        self.nat_invitation_timeout = 180
+
+    def set_node_network_state(self, node_address, node_state):
+        pass
+
+    def get_ping(self, nonce):
+        return 'ping'
+
+    def send_raw_with_result(self, data, receiver_address):
+        async_result = AsyncResult()
+        async_result.set(True)
+        return async_result
+
+
+def usage():
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    return rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss
+
+
+def report(name, number_of_queues, before, setup, idle):
+    print('{}: {} queues memory {}kb idle cpu {}s over {}s'.format(
+        name,
+        number_of_queues,
+        setup[1] - before[1],
+        idle[0] - setup[0],
+        IDLE_SECONDS,
+    ))
+
+
+def test_scheduler(iterations=ITERATIONS):
+    before = usage()
+    protocol = Protocol()
+    scheduler = SendScheduler(protocol, DEFAULT_PROTOCOL_TIMER_TICK)
+
+    for position in range(iterations):
+        receiver_address = str(position // TOKENS)
+        token_address = str(position % TOKENS)
+        scheduler.get_channel_queue(receiver_address, token_address)
+
+    # first round of Pings
+    gevent.sleep(1)
+    setup = usage()
+
+    gevent.sleep(IDLE_SECONDS)
+    idle = usage()
+
+    protocol.event_stop.set()
+    gevent.wait(protocol.greenlets)
+
+    report('scheduler', iterations, before, setup, idle)
+
+
+def test_greenlets(iterations=ITERATIONS):
+    """ The previous design, idle queue greenlets wait on their queue and the
+    health check greenlets wake up every NAT_KEEPALIVE_TIMEOUT.
+    """
+    before = usage()
+    event_stop = Event()
+
+    def single_queue_send(queue):
+        gevent.wait([queue, event_stop], count=1)
+
+    def healthcheck():
+        while not event_stop.wait(NAT_KEEPALIVE_TIMEOUT) is True:
+            async_result = AsyncResult()
+            async_result.set(True)
+            async_result.wait(1)
+
+    greenlets = list()
+    for position in range(iterations):
+        if position % TOKENS == 0:
+            greenlets.append(gevent.spawn(healthcheck))
+
+        greenlets.append(gevent.spawn(single_queue_send, Event()))
+
+    gevent.sleep(1)
+    setup = usage()
+
+    gevent.sleep(IDLE_SECONDS)
+    idle = usage()
+
+    event_stop.set()
+    gevent.wait(greenlets)
+
+    report('greenlets', iterations, before, setup, idle)
+
+
+def test_all(iterations=ITERATIONS):
+    test_greenlets(iterations=iterations)
+    test_scheduler(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
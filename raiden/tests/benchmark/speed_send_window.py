@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+""" Throughput of a single channel with the DummyTransport and an injected
+latency, sending one message per round trip and with a send window.
+
+The transfers are registered with a netting channel on both ends, the
+receiver holds back the transfers that arrive ahead of the channel nonce.
+"""
+from __future__ import print_function
+
+import time
+
+import gevent
+
+from raiden.network.discovery import Discovery
+from raiden.network.transport import DummyTransport
+from raiden.tests.utils.protocol import ChannelNode
+
+ITERATIONS = 200  # number of transfers
+LATENCY = 0.01  # one way, in seconds
+WINDOWS = (1, 4, 8, 16)
+
+
+def run_transfers(iterations, window, port):
+    discovery = Discovery()
+    node0 = ChannelNode(discovery, '127.0.0.1', port, send_window=window)
+    node1 = ChannelNode(discovery, '127.0.0.1', port + 1, send_window=window)
+
+    node0.open_channel(node1.address, balance=iterations)
+    node1.open_channel(node0.address, partner_balance=iterations)
+
+    for node in (node0, node1):
+        node.protocol.start()
+
+    # the Pings advertise the capabilities
+    node0.protocol.start_health_check(node1.address)
+    node1.protocol.start_health_check(node0.address)
+    gevent.sleep(LATENCY * 4)
+
+    transfers = [
+        node0.create_directtransfer(1, identifier)
+        for identifier in range(1, iterations + 1)
+    ]
+
+    packets = [0]
+
+    def track_send(sender, host_port, bytes_):  # pylint: disable=unused-argument
+        packets[0] += 1
+
+    DummyTransport.network.on_send_cbs.append(track_send)
+
+    start = time.time()
+    results = [
+        node0.protocol.send_async(node1.address, transfer)
+        for transfer in transfers
+    ]
+    gevent.wait(results)
+    elapsed = time.time() - start
+
+    DummyTransport.network.on_send_cbs.remove(track_send)
+
+    for node in (node0, node1):
+        node.protocol.stop_and_wait()
+
+    assert len(node1.messages) == iterations
+    assert node1.channel.partner_state.transferred_amount(node1.channel.our_state) == iterations
+
+    print('window {}: {} transfers {} packets {:.2f}s {:.0f} transfers/s'.format(
+        window,
+        iterations,
+        packets[0],
+        elapsed,
+        iterations / elapsed,
+    ))
+
+
+def test_send_window(iterations=ITERATIONS):
+    latency = DummyTransport.network.latency
+    DummyTransport.network.latency = LATENCY
+
+    try:
+        for position, window in enumerate(WINDOWS):
+            run_transfers(iterations, window, 46100 + position * 2)
+    finally:
+        DummyTransport.network.latency = latency
+
+
+def test_all(iterations=ITERATIONS):
+    test_send_window(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+""" Time to settle `iterations` channels, waiting for each settle transaction
+to be mined before sending the next one and sending all of them back to back
+with the TransactionManager.
+
+The tester chain mines every transaction as soon as it's sent, so the
+channels are settled on an in-memory JSON-RPC node that mines the pending
+transactions every `BLOCK_TIME` seconds. The time includes signing the
+transactions and recovering their sender in the node, which is the same for
+both.
+"""
+from __future__ import print_function
+
+import time
+
+import gevent
+from pyethapp.rpc_client import JSONRPCClient
+
+from raiden.network.rpc.client import TransactionManager
+from raiden.tests.utils.factories import make_address, make_privkey_address
+from raiden.tests.utils.jsonrpc import JSONRPCNodeMock
+
+ITERATIONS = 50  # number of channels
+BLOCK_TIME = 0.05
+POLL_INTERVAL = BLOCK_TIME / 10
+STARTGAS = 100000
+SETTLE_ABI = [{
+    'type': 'function',
+    'name': 'settle',
+    'constant': False,
+    'inputs': [],
+    'outputs': [],
+}]
+
+
+def mine(node):
+    while True:
+        gevent.sleep(BLOCK_TIME)
+        node.mine()
+
+
+def setup(number_of_channels):
+    node = JSONRPCNodeMock()
+    privkey = make_privkey_address()[0]
+    client = JSONRPCClient(privkey=privkey.secret, transport=node, print_communication=False)
+
+    manager = TransactionManager(client, poll_interval=POLL_INTERVAL)
+    channels = [
+        client.new_contract_proxy(SETTLE_ABI, make_address())
+        for _ in range(number_of_channels)
+    ]
+
+    return node, manager, channels
+
+
+def settle_sequentially(manager, channels):
+    for channel in channels:
+        manager.transact(channel.settle, startgas=STARTGAS).get()
+
+
+def settle_pipelined(manager, channels):
+    results = [
+        manager.transact(channel.settle, startgas=STARTGAS)
+        for channel in channels
+    ]
+
+    for result in results:
+        result.get()
+
+
+def test_settle(iterations=ITERATIONS):
+    for name, settle in (('sequential', settle_sequentially), ('pipelined', settle_pipelined)):
+        node, manager, channels = setup(iterations)
+        miner = gevent.spawn(mine, node)
+
+        start = time.time()
+        settle(manager, channels)
+        elapsed = time.time() - start
+
+        miner.kill()
+
+        print('{}: {} channels {} blocks {:.0f}ms {} messages'.format(
+            name,
+            iterations,
+            node.block_number,
+            elapsed * 1000,
+            node.messages,
+        ))
+
+
+def test_all(iterations=ITERATIONS):
+    test_settle(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+""" Startup time by phase of a node with `iterations` channels on the tester
+chain, loading the channels one at a time and with a pool of
+DEFAULT_STARTUP_POOL_SIZE greenlets.
+
+The tester chain runs in process, every call of a proxy waits `LATENCY`
+seconds to account for the round trip to a remote node, the requests batched
+by the JSON-RPC proxies are a single call. The node is started twice on the
+same database, the second start also restores the channels from the snapshot
+taken by the first one on stop.
+"""
+from __future__ import print_function
+
+import copy
+import os
+import shutil
+import tempfile
+import time
+
+import gevent
+
+from raiden.app import App
+from raiden.network.discovery import Discovery
+from raiden.network.transport import UDPTransport
+from raiden.network.utils import get_free_port
+from raiden.settings import (
+    DEFAULT_SETTLE_TIMEOUT,
+    DEFAULT_STARTUP_POOL_SIZE,
+    INITIAL_PORT,
+)
+from raiden.tests.fixtures.tester import tester_blockgas_limit, tester_state
+from raiden.tests.utils.factories import make_address
+from raiden.tests.utils.tester_client import (
+    BlockChainServiceTesterMock,
+    tester_deploy_contract,
+)
+from raiden.utils import privatekey_to_address, sha3
+
+ITERATIONS = 100  # number of channels
+LATENCY = 0.005  # seconds per round trip to the node
+POOL_SIZES = (1, DEFAULT_STARTUP_POOL_SIZE)
+PHASES = ('proxies', 'listeners', 'channels', 'graphs', 'discovery', 'restore')
+
+
+class LatencyProxy(object):
+    """ Waits `LATENCY` seconds on every call of the proxy methods. """
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+
+    def __getattr__(self, name):
+        attribute = getattr(self.proxy, name)
+
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            gevent.sleep(LATENCY)
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+class LatencyChain(BlockChainServiceTesterMock):
+    """ The proxies wait `LATENCY` seconds on every call and on creation,
+    the JSON-RPC proxies check the contract code. """
+
+    def registry(self, registry_address):
+        return LatencyProxy(super(LatencyChain, self).registry(registry_address))
+
+    def manager(self, manager_address):
+        if manager_address not in self.address_to_channelmanager:
+            gevent.sleep(LATENCY)
+
+        return LatencyProxy(super(LatencyChain, self).manager(manager_address))
+
+    def netting_channel(self, netting_channel_address):
+        if netting_channel_address not in self.address_to_nettingchannel:
+            gevent.sleep(LATENCY)
+
+        proxy = super(LatencyChain, self).netting_channel(netting_channel_address)
+        return LatencyProxy(proxy)
+
+
+def setup_chain(private_key, number_of_channels):
+    deploy_key = sha3('startup:deploy')
+    tester = tester_state(deploy_key, [private_key], tester_blockgas_limit())
+
+    registry_address = tester_deploy_contract(
+        tester,
+        deploy_key,
+        contract_name='Registry',
+        contract_file='Registry.sol',
+    )
+
+    chain = BlockChainServiceTesterMock(private_key, tester, registry_address)
+    token_address = chain.deploy_and_register_token(
+        contract_name='HumanStandardToken',
+        contract_file='HumanStandardToken.sol',
+        constructor_parameters=(10000, 'raiden', 2, 'Rd'),
+    )
+
+    our_address = privatekey_to_address(private_key)
+    partners = [make_address() for _ in range(number_of_channels)]
+
+    manager = chain.manager_by_token(token_address)
+    for partner_address in partners:
+        manager.new_netting_channel(our_address, partner_address, DEFAULT_SETTLE_TIMEOUT)
+
+    return tester, registry_address, partners
+
+
+def start_app(config, tester, registry_address, partners, ports):
+    private_key = config['privatekey_hex'].decode('hex')
+    chain = LatencyChain(private_key, tester, registry_address)
+
+    config = copy.deepcopy(config)
+    config['port'] = config['external_port'] = next(ports)
+
+    # the partners are never reached
+    discovery = Discovery()
+    for partner_address in partners:
+        discovery.register(partner_address, '127.0.0.1', INITIAL_PORT - 1)
+
+    start = time.time()
+    app = App(config, chain, discovery, UDPTransport)
+    elapsed = time.time() - start
+
+    return app, elapsed
+
+
+def print_timings(name, number_of_channels, pool_size, timings, elapsed):
+    print('{} {} channels pool of {}: {} total {:.0f}ms'.format(
+        name,
+        number_of_channels,
+        pool_size,
+        ' '.join(
+            '{} {:.0f}ms'.format(phase, timings[phase] * 1000)
+            for phase in PHASES
+            if phase in timings
+        ),
+        elapsed * 1000,
+    ))
+
+
+def test_startup(iterations=ITERATIONS):
+    private_key = sha3('startup:node')
+    tester, registry_address, partners = setup_chain(private_key, iterations)
+    ports = get_free_port('127.0.0.1', INITIAL_PORT)
+
+    for pool_size in POOL_SIZES:
+        tmpdir = tempfile.mkdtemp()
+
+        config = copy.deepcopy(App.DEFAULT_CONFIG)
+        config['host'] = config['external_ip'] = '127.0.0.1'
+        config['privatekey_hex'] = private_key.encode('hex')
+        config['database_path'] = os.path.join(tmpdir, 'log.db')
+        config['startup_pool_size'] = pool_size
+
+        try:
+            for name in ('start', 'restart'):
+                app, elapsed = start_app(
+                    config,
+                    tester,
+                    registry_address,
+                    partners,
+                    ports,
+                )
+                app.stop()
+
+                graph = app.raiden.token_to_channelgraph.values()[0]
+                assert len(graph.address_to_channel) == iterations
+
+                print_timings(name, iterations, pool_size, app.raiden.startup_timings, elapsed)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+def test_all(iterations=ITERATIONS):
+    test_startup(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
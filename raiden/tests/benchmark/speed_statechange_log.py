@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+""" Throughput of the state change log for direct transfers, with the
+database on disk and in memory, committing every write and with the group
+commit.
+
+Every transfer logs an ActionTransferDirect and its EventTransferSentSuccess,
+and a durability barrier is issued every `burst` transfers, as the protocol
+does before a message or a batch of Acks leaves the node.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+from raiden.settings import DEFAULT_LOG_GROUP_COMMIT_SIZE
+from raiden.tests.utils.factories import make_address
+from raiden.transfer.events import EventTransferSentSuccess
+from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
+from raiden.transfer.state_change import ActionTransferDirect
+
+ITERATIONS = 2000  # number of transfers
+BURSTS = (1, 16)
+
+
+def run_transfers(iterations, database_path, max_pending, burst):
+    log = StateChangeLog(
+        storage_instance=StateChangeLogSQLiteBackend(
+            database_path=database_path,
+            max_pending=max_pending,
+        )
+    )
+    token_address = make_address()
+    partner_address = make_address()
+
+    start = time.time()
+    for identifier in range(iterations):
+        state_change = ActionTransferDirect(
+            identifier,
+            1,
+            token_address,
+            partner_address,
+        )
+        state_change_id = log.log(state_change)
+        log.log_events(state_change_id, [EventTransferSentSuccess(identifier)], 1)
+
+        if identifier % burst == burst - 1:
+            log.flush()
+
+    log.flush()
+    return time.time() - start
+
+
+def report(name, iterations, elapsed):
+    print('{}: {} transfers {}s {} transfers/s'.format(
+        name,
+        iterations,
+        elapsed,
+        iterations / elapsed,
+    ))
+
+
+def test_log(iterations=ITERATIONS):
+    tmpdir = tempfile.mkdtemp()
+
+    try:
+        for position, burst in enumerate(BURSTS):
+            configurations = (
+                ('disk commit per write', 1),
+                ('disk group commit', DEFAULT_LOG_GROUP_COMMIT_SIZE),
+            )
+            for name, max_pending in configurations:
+                database_path = os.path.join(
+                    tmpdir,
+                    '{}-{}.db'.format(position, max_pending),
+                )
+                elapsed = run_transfers(iterations, database_path, max_pending, burst)
+                report('{} burst {}'.format(name, burst), iterations, elapsed)
+
+            elapsed = run_transfers(
+                iterations,
+                ':memory:',
+                DEFAULT_LOG_GROUP_COMMIT_SIZE,
+                burst,
+            )
+            report('memory burst {}'.format(burst), iterations, elapsed)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_all(iterations=ITERATIONS):
+    test_log(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+""" Memory and latency of a node after a large number of finished transfers,
+archiving the finished state managers and keeping them in memory.
+
+Every transfer is a target task that finishes with the balance proof. After
+the transfers the benchmark measures the latency of a broadcast state change
+(a ReceiveSecretReveal with an unknown secret, as sent for every Secret
+message), of a Block, and of a snapshot.
+"""
+from __future__ import print_function
+
+import cPickle as pickle
+import gc
+import os
+import resource
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+from raiden.event_handler import StateMachineEventHandler
+from raiden.tests.utils import factories
+from raiden.transfer.architecture import StateManager
+from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
+from raiden.transfer.mediated_transfer import target
+from raiden.transfer.mediated_transfer.state_change import (
+    ActionInitTarget,
+    ReceiveBalanceProof,
+    ReceiveSecretReveal,
+)
+from raiden.transfer.state_change import Block
+
+ITERATIONS = 1000000  # number of transfers
+
+
+class Raiden(object):
+    def __init__(self, database_path):
+        self.transaction_log = StateChangeLog(
+            storage_instance=StateChangeLogSQLiteBackend(database_path=database_path)
+        )
+        self.identifier_to_statemanagers = defaultdict(list)
+        self.identifier_to_results = defaultdict(list)
+        self.block_number = 1
+
+    def get_block_number(self):
+        return self.block_number
+
+
+class EventHandler(StateMachineEventHandler):
+    def on_event(self, event):
+        pass
+
+
+class KeepFinishedEventHandler(EventHandler):
+    """ The behavior prior to the archive, the finished managers are kept. """
+
+    def archive(self, identifier, state_manager, state_change_id, block_number, events):
+        pass
+
+
+def rss_mb():
+    """ The current resident set size, the maximum if it is not available. """
+    try:
+        with open('/proc/self/statm') as handler:
+            pages = int(handler.read().split()[1])
+        return pages * resource.getpagesize() / (1024.0 * 1024.0)
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_transfers(handler_class, iterations, database_path):
+    raiden = Raiden(database_path)
+    handler = handler_class(raiden)
+    our_address = factories.ADDR
+    block_number = raiden.block_number
+
+    from_route, from_transfer = factories.make_from(
+        1,
+        our_address,
+        block_number + factories.UNIT_REVEAL_TIMEOUT,
+    )
+    init = ActionInitTarget(our_address, from_route, from_transfer, block_number)
+    reveal = ReceiveSecretReveal(factories.UNIT_SECRET, from_route.node_address)
+
+    start = time.time()
+    for identifier in range(iterations):
+        manager = StateManager(target.state_transition, None)
+        raiden.identifier_to_statemanagers[identifier].append(manager)
+        handler.log_and_dispatch(manager, init, identifier)
+        handler.log_and_dispatch_by_identifier(identifier, reveal)
+
+        balance_proof = ReceiveBalanceProof(identifier, from_route.node_address, None)
+        handler.log_and_dispatch_by_identifier(identifier, balance_proof)
+    transfers_elapsed = time.time() - start
+
+    unknown_secret = ReceiveSecretReveal('unknown' * 4, from_route.node_address)
+    start = time.time()
+    handler.log_and_dispatch_to_all_tasks(unknown_secret)
+    broadcast_elapsed = time.time() - start
+
+    start = time.time()
+    handler.log_and_dispatch_block(Block(block_number + 1))
+    block_elapsed = time.time() - start
+
+    start = time.time()
+    snapshot_size = len(pickle.dumps(raiden.identifier_to_statemanagers, -1))
+    snapshot_elapsed = time.time() - start
+
+    gc.collect()
+    rss = rss_mb()
+
+    return {
+        'transfers': transfers_elapsed,
+        'broadcast': broadcast_elapsed,
+        'block': block_elapsed,
+        'snapshot': snapshot_elapsed,
+        'snapshot_size': snapshot_size,
+        'managers': sum(len(managers) for managers in raiden.identifier_to_statemanagers.values()),
+        'archived': len(raiden.transaction_log.get_archived_transfers()),
+        'rss': rss,
+    }
+
+
+def report(name, iterations, result):
+    print('{}: {} transfers {}s ({}us/transfer)'.format(
+        name,
+        iterations,
+        result['transfers'],
+        result['transfers'] * 1e6 / iterations,
+    ))
+    print('    in memory managers {} archived {} rss {}MB'.format(
+        result['managers'],
+        result['archived'],
+        result['rss'],
+    ))
+    print('    broadcast {}ms block {}ms snapshot {}ms {} bytes'.format(
+        result['broadcast'] * 1000,
+        result['block'] * 1000,
+        result['snapshot'] * 1000,
+        result['snapshot_size'],
+    ))
+
+
+def test_archive(iterations=ITERATIONS):
+    tmpdir = tempfile.mkdtemp()
+
+    try:
+        configurations = (
+            ('archive', EventHandler),
+            ('keep finished', KeepFinishedEventHandler),
+        )
+        for name, handler_class in configurations:
+            database_path = os.path.join(tmpdir, '{}.db'.format(handler_class.__name__))
+            report(name, iterations, run_transfers(handler_class, iterations, database_path))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_all(iterations=ITERATIONS):
+    test_archive(iterations=iterations)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', default='test_all', nargs='?')
+    parser.add_argument('-i', '--iterations', default=ITERATIONS, type=int)
+
+    args = parser.parse_args()
+
+    test_name = args.name
+    iterations = args.iterations
+
+    if test_name not in globals():
+        raise ValueError('unknow test name: {}'.format(test_name))
+
+    test_function = globals()[test_name]
+    test_function(iterations=iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -268,7 +268,7 @@ def test_query_events(raiden_chain, deposit, settle_timeout, events_poll_timeout
     settle_expiration = app0.raiden.chain.block_number() + settle_timeout + 1
     wait_until_block(app0.raiden.chain, settle_expiration)
 
-    channel1.external_state.settle()
+    channel1.external_state.settle().get()
 
     all_netting_channel_events = get_all_netting_channel_events(
         app0.raiden.chain,
@@ -3,7 +3,6 @@ import pytest
 
 from ethereum import slogging
 
-from raiden.raiden_service import load_snapshot
 from raiden.api.python import RaidenAPI
 
 log = slogging.get_logger(__name__)
@@ -36,7 +35,8 @@ def test_snapshotting(raiden_network, token_addresses):
     app2.stop()
 
     for app in [app0, app1, app2]:
-        data = load_snapshot(app.raiden.serialization_file)
+        state_change_id, data = app.raiden.transaction_log.get_snapshot()
+        assert state_change_id == app.raiden.transaction_log.last_state_change_id
 
         for serialized_channel in data['channels']:
             network = app.raiden.token_to_channelgraph[serialized_channel.token_address]
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import itertools
-import os
 
 import pytest
 import gevent
@@ -25,7 +24,7 @@ def test_close_raiden_app_leave_channels(raiden_network, blockchain_type):
 
     for app in raiden_network:
         app.stop(leave_channels=True)
-        assert os.path.exists(app.raiden.serialization_file)
+        assert app.raiden.transaction_log.get_snapshot() is not None
 
 
 @pytest.mark.parametrize('number_of_nodes', [2])
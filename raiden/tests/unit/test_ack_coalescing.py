@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import gevent
+
+from raiden.encoding import messages
+from raiden.network.discovery import Discovery
+from raiden.network.transport import DummyTransport
+from raiden.tests.utils.messages import make_direct_transfer
+from raiden.tests.utils.protocol import ProtocolNode
+from raiden.utils import sha3
+
+WINDOW = 0.01
+
+
+def send_transfers(node0, node1, number_of_transfers):
+    """ Send transfers in different queues, so that they are all in flight at
+    the same time, and return the cmdids of the packets sent by `node1`.
+    """
+    sent_cmdids = list()
+    node1_hostport = (node1.protocol.transport.host, node1.protocol.transport.port)
+
+    def track_send(sender, host_port, bytes_):  # pylint: disable=unused-argument
+        if host_port != node1_hostport:
+            sent_cmdids.append(bytes_[0])
+
+    DummyTransport.network.on_send_cbs.append(track_send)
+    try:
+        results = list()
+        for position in range(number_of_transfers):
+            transfer = make_direct_transfer(token=sha3(str(position))[:20])
+            node0.sign(transfer)
+            results.append(node0.protocol.send_async(node1.address, transfer))
+
+        gevent.wait(results, timeout=5)
+        assert all(result.get(block=False) for result in results)
+    finally:
+        DummyTransport.network.on_send_cbs.remove(track_send)
+
+    return sent_cmdids
+
+
+def make_nodes(port):
+    discovery = Discovery()
+    node0 = ProtocolNode(discovery, '127.0.0.1', port, ack_coalescing_window=WINDOW)
+    node1 = ProtocolNode(discovery, '127.0.0.1', port + 1, ack_coalescing_window=WINDOW)
+
+    for node in (node0, node1):
+        node.protocol.start()
+
+    return node0, node1
+
+
+def stop_nodes(*nodes):
+    for node in nodes:
+        node.protocol.stop_and_wait()
+
+
+def test_ack_coalescing():
+    node0, node1 = make_nodes(45001)
+
+    # the Ping advertises the capability
+    node0.protocol.start_health_check(node1.address)
+    gevent.sleep(WINDOW * 3)
+
+    sent_cmdids = send_transfers(node0, node1, 10)
+
+    assert len(node1.messages) == 10
+    assert sent_cmdids.count(messages.ACKS) == 1
+    assert messages.ACK not in sent_cmdids
+
+    stop_nodes(node0, node1)
+
+
+def test_ack_coalescing_legacy_peer():
+    node0, node1 = make_nodes(45011)
+
+    # a node that doesn't advertise batched acks gets a single Ack per message
+    node0.protocol.capabilities = 0
+    node0.protocol.start_health_check(node1.address)
+    gevent.sleep(WINDOW * 3)
+
+    sent_cmdids = send_transfers(node0, node1, 10)
+
+    assert len(node1.messages) == 10
+    assert sent_cmdids.count(messages.ACK) == 10
+    assert messages.ACKS not in sent_cmdids
+
+    stop_nodes(node0, node1)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import gevent
+import pytest
+
+from raiden.tasks import AlarmTask, BLOCK_SOURCES, FilterBlockSource
+from raiden.tests.utils.jsonrpc import BlockChainServiceMock, JSONRPCClientMock
+
+
+def test_filter_block_source():
+    client = JSONRPCClientMock(block_number=5)
+    chain = BlockChainServiceMock(client, block_time=1)
+    source = FilterBlockSource(chain)
+
+    assert source.start() == 5
+    assert source.block_number() == 5
+    assert client.requests['eth_blockNumber'] == 1
+
+    client.next_block()
+    client.next_block()
+    assert source.block_number() == 7
+    assert client.requests['eth_blockNumber'] == 2
+
+    # the filter is installed again if the node lost it
+    client.filters.clear()
+    client.next_block()
+    assert source.block_number() == 8
+    assert client.requests['eth_newBlockFilter'] == 2
+
+    source.stop()
+    assert not client.filters
+
+
+def test_alarm_wait_time():
+    chain = BlockChainServiceMock(JSONRPCClientMock(), block_time=8)
+    alarm = AlarmTask(chain, wait_time=0.5, max_wait_time=5)
+    alarm.blocktime = 8
+    alarm.last_block_time = 0
+
+    # the wait is halved as the next block approaches
+    assert alarm.next_wait_time(0) == 4
+    assert alarm.next_wait_time(6) == 1
+    assert alarm.next_wait_time(7.5) == 0.5
+
+    # once the block is due it's polled every wait_time
+    assert alarm.next_wait_time(20) == 0.5
+
+    alarm.blocktime = 100
+    assert alarm.next_wait_time(0) == 5
+
+
+@pytest.mark.parametrize('block_source', ['polling', 'filter'])
+def test_alarm_block_source(block_source):
+    block_time = 0.05
+    wait_time = 0.001
+    number_of_blocks = 20
+
+    client = JSONRPCClientMock()
+    chain = BlockChainServiceMock(client, block_time)
+    alarm = AlarmTask(
+        chain,
+        BLOCK_SOURCES[block_source](chain),
+        wait_time=wait_time,
+        max_wait_time=block_time,
+    )
+
+    blocks = list()
+    alarm.register_callback(blocks.append)
+
+    alarm.start()
+    chain.start_mining()
+    gevent.sleep(block_time * (number_of_blocks + 0.5))
+    chain.stop_mining()
+    alarm.stop_and_wait()
+
+    assert blocks == range(1, client.block_number + 1)
+    assert alarm.detected_blocks == len(blocks)
+    assert alarm.detection_lag / alarm.detected_blocks < block_time
+    assert alarm.max_detection_lag < block_time
+
+    # polling every wait_time would take a poll per millisecond
+    assert alarm.polls < number_of_blocks * block_time / wait_time / 4
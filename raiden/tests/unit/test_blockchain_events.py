@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+import gevent
+import pytest
+from gevent.pool import Pool
+from pyethapp.rpc_client import JSONRPCClientReplyError
+
+from raiden.blockchain.abi import (
+    CONTRACT_CHANNEL_MANAGER,
+    CONTRACT_MANAGER,
+    CONTRACT_NETTING_CHANNEL,
+    CONTRACT_REGISTRY,
+    EVENT_CHANNEL_CLOSED,
+    EVENT_CHANNEL_NEW,
+    EVENT_CHANNEL_NEW_BALANCE,
+    EVENT_TOKEN_ADDED,
+)
+from raiden.blockchain.events import (
+    LogsBlockchainEvents,
+    PyethappBlockchainEvents,
+    PyethappProxies,
+    get_relevant_proxies,
+)
+from raiden.exceptions import AddressWithoutCode
+from raiden.network.rpc.client import Filter, new_filter
+from raiden.tests.utils.factories import make_address
+from raiden.tests.utils.jsonrpc import JSONRPCClientMock
+from raiden.transfer.mediated_transfer.state_change import (
+    ContractReceiveBalance,
+    ContractReceiveClosed,
+    ContractReceiveNewChannel,
+    ContractReceiveTokenAdded,
+)
+
+Proxy = namedtuple('Proxy', ('address',))
+
+
+class Chain(object):
+    """ Creates the proxies of a registry, each creation waits for a round
+    trip and the requests in flight are tracked. """
+
+    def __init__(self, manager_channels, settled_channels):
+        self.manager_channels = manager_channels
+        self.settled_channels = settled_channels
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def round_trip(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        gevent.sleep(0.001)
+        self.in_flight -= 1
+
+    def registry(self, registry_address):
+        chain = self
+
+        class Registry(Proxy):
+            def manager_addresses(self):  # pylint: disable=no-self-use
+                return list(chain.manager_channels)
+
+        return Registry(registry_address)
+
+    def manager(self, manager_address):
+        chain = self
+        self.round_trip()
+
+        class Manager(Proxy):
+            def channels_by_participant(self, participant):  # pylint: disable=unused-argument
+                chain.round_trip()
+                return chain.manager_channels[self.address]
+
+        return Manager(manager_address)
+
+    def netting_channel(self, channel_address):
+        self.round_trip()
+
+        if channel_address in self.settled_channels:
+            raise AddressWithoutCode('settled')
+
+        return Proxy(channel_address)
+
+
+def registry_translator():
+    return CONTRACT_MANAGER.get_translator(CONTRACT_REGISTRY)
+
+
+def manager_translator():
+    return CONTRACT_MANAGER.get_translator(CONTRACT_CHANNEL_MANAGER)
+
+
+def channel_translator():
+    return CONTRACT_MANAGER.get_translator(CONTRACT_NETTING_CHANNEL)
+
+
+def event_id_by_name(translator, name):
+    for event_id, event in translator.event_data.items():
+        if event['name'] == name:
+            return event_id
+
+
+def as_tuple(state_change):
+    return type(state_change).__name__, sorted(vars(state_change).items())
+
+
+def emit_events(client, registry, manager, channel, participant):
+    """ Emit events from the three contract types, including an event not
+    reported as a state change, and return the expected state changes. """
+    token_address = make_address()
+    new_channel = make_address()
+    partner = make_address()
+
+    client.add_log(
+        registry,
+        registry_translator(),
+        CONTRACT_MANAGER.get_event_id(EVENT_TOKEN_ADDED),
+        token_address,
+        manager,
+    )
+    client.add_log(
+        manager,
+        manager_translator(),
+        CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_NEW),
+        new_channel,
+        participant,
+        partner,
+        30,
+    )
+    client.add_log(
+        manager,
+        manager_translator(),
+        event_id_by_name(manager_translator(), 'ChannelDeleted'),
+        participant,
+        make_address(),
+    )
+    client.add_log(
+        channel,
+        channel_translator(),
+        CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_NEW_BALANCE),
+        token_address,
+        participant,
+        100,
+        client.block_number,
+    )
+    client.add_log(
+        channel,
+        channel_translator(),
+        CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_CLOSED),
+        participant,
+        client.block_number,
+    )
+
+    return [
+        as_tuple(ContractReceiveTokenAdded(registry, token_address, manager)),
+        as_tuple(ContractReceiveNewChannel(manager, new_channel, participant, partner, 30)),
+        as_tuple(ContractReceiveBalance(
+            channel,
+            token_address,
+            participant,
+            100,
+            client.block_number,
+        )),
+        as_tuple(ContractReceiveClosed(channel, participant, client.block_number)),
+    ]
+
+
+def test_logs_events_single_request():
+    client = JSONRPCClientMock(block_number=10)
+    registry, manager, channel, participant = [make_address() for _ in range(4)]
+
+    blockchain_events = LogsBlockchainEvents(client)
+    blockchain_events.add_proxies_listeners(PyethappProxies(
+        Proxy(registry),
+        [Proxy(manager)],
+        {manager: [Proxy(channel)]},
+    ))
+
+    # logs emitted before the registration are not reported
+    emit_events(client, registry, manager, channel, participant)
+    client.next_block()
+    expected = emit_events(client, registry, manager, channel, participant)
+
+    # events of other contracts are ignored
+    client.add_log(
+        make_address(),
+        channel_translator(),
+        CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_CLOSED),
+        participant,
+        client.block_number,
+    )
+
+    client.requests.clear()
+    state_changes = blockchain_events.poll_state_change(client.block_number)
+    assert [as_tuple(state_change) for state_change in state_changes] == expected
+    assert client.requests == {'eth_getLogs': 1}
+
+    # the processed blocks are not queried again
+    client.requests.clear()
+    assert list(blockchain_events.poll_state_change(client.block_number)) == []
+    assert not client.requests
+
+    # the listeners added later share the same request
+    other_channel = make_address()
+    blockchain_events.add_netting_channel_listener(Proxy(other_channel))
+    client.next_block()
+    expected = emit_events(client, registry, manager, channel, participant)
+    expected += emit_events(client, registry, manager, other_channel, participant)
+
+    state_changes = blockchain_events.poll_state_change()
+    assert [as_tuple(state_change) for state_change in state_changes] == expected
+    assert client.requests == {'eth_getLogs': 1, 'eth_blockNumber': 1}
+
+    blockchain_events.uninstall_all_event_listeners()
+    client.next_block()
+    client.requests.clear()
+    assert list(blockchain_events.poll_state_change(client.block_number)) == []
+    assert not client.requests
+
+
+def test_logs_events_failed_request():
+    """ The blocks of a failed eth_getLogs are queried again. """
+    client = JSONRPCClientMock(block_number=10)
+    registry, manager, channel, participant = [make_address() for _ in range(4)]
+
+    blockchain_events = LogsBlockchainEvents(client)
+    blockchain_events.add_proxies_listeners(PyethappProxies(
+        Proxy(registry),
+        [Proxy(manager)],
+        {manager: [Proxy(channel)]},
+    ))
+
+    client.next_block()
+    expected = emit_events(client, registry, manager, channel, participant)
+
+    def failing_get_logs(json_data):  # pylint: disable=unused-argument
+        del client.eth_getLogs
+        raise JSONRPCClientReplyError('request timed out')
+
+    client.eth_getLogs = failing_get_logs
+    with pytest.raises(JSONRPCClientReplyError):
+        list(blockchain_events.poll_state_change(client.block_number))
+
+    client.next_block()
+    expected += emit_events(client, registry, manager, channel, participant)
+
+    state_changes = blockchain_events.poll_state_change(client.block_number)
+    assert [as_tuple(state_change) for state_change in state_changes] == expected
+
+
+def test_logs_events_match_filters():
+    """ The logs and the filters report the same state changes. """
+    client = JSONRPCClientMock(block_number=10)
+    registry, manager, participant = [make_address() for _ in range(3)]
+    channels = [make_address() for _ in range(5)]
+
+    logs_events = LogsBlockchainEvents(client)
+    filter_events = PyethappBlockchainEvents()
+
+    listeners = [
+        (registry, registry_translator(), [CONTRACT_MANAGER.get_event_id(EVENT_TOKEN_ADDED)]),
+        (manager, manager_translator(), [CONTRACT_MANAGER.get_event_id(EVENT_CHANNEL_NEW)]),
+    ]
+    listeners.extend(
+        (channel, channel_translator(), None)
+        for channel in channels
+    )
+
+    for address, translator, topics in listeners:
+        filter_id = new_filter(client, address, topics)
+        filter_events.add_event_listener('', Filter(client, filter_id), translator)
+
+    logs_events.add_registry_listener(Proxy(registry))
+    logs_events.add_channel_manager_listener(Proxy(manager))
+    for channel in channels:
+        logs_events.add_netting_channel_listener(Proxy(channel))
+
+    for _ in range(3):
+        client.next_block()
+        expected = list()
+        for channel in channels:
+            expected += emit_events(client, registry, manager, channel, participant)
+
+        logs_state_changes = [
+            as_tuple(state_change)
+            for state_change in logs_events.poll_state_change(client.block_number)
+        ]
+        filter_state_changes = [
+            as_tuple(state_change)
+            for state_change in filter_events.poll_state_change(client.block_number)
+        ]
+
+        # the filters are polled in the order of registration, the logs are
+        # in the order of emission
+        assert logs_state_changes == expected
+        assert sorted(filter_state_changes) == sorted(expected)
+
+
+def test_relevant_proxies_pool():
+    manager_channels = {
+        make_address(): [make_address() for _ in range(10)]
+        for _ in range(3)
+    }
+    settled_channels = set(channels[0] for channels in manager_channels.values())
+    chain = Chain(manager_channels, settled_channels)
+
+    proxies = get_relevant_proxies(chain, make_address(), make_address(), Pool(4))
+
+    assert [manager.address for manager in proxies.channel_managers] == list(manager_channels)
+    assert chain.max_in_flight == 4
+
+    # the settled channels are skipped and the order is kept
+    for manager_address, channels in manager_channels.items():
+        assert [
+            channel.address
+            for channel in proxies.channelmanager_nettingchannels[manager_address]
+        ] == channels[1:]
+
+    # by default the proxies are created one at a time
+    chain = Chain(manager_channels, settled_channels)
+    get_relevant_proxies(chain, make_address(), make_address())
+    assert chain.max_in_flight == 1
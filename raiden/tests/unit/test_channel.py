@@ -2,6 +2,8 @@
 # pylint: disable=too-many-locals,too-many-statements
 from __future__ import division
 
+import cPickle as pickle
+
 import pytest
 from ethereum import slogging
 
@@ -18,6 +20,8 @@ from raiden.messages import (
     LockedTransfer,
     Secret,
 )
+from raiden.mtree import Merkletree
+from raiden.transfer.state import BalanceProofState
 from raiden.utils import sha3
 from raiden.tests.utils.messages import make_mediated_transfer
 from raiden.tests.utils.transfer import assert_synched_channels, channel
@@ -209,6 +213,43 @@ def test_end_state():
     assert state2.balance_proof.merkleroot_for_unclaimed() == EMPTY_MERKLE_ROOT
 
 
+def test_balance_proof_legacy_pickle():
+    """ A BalanceProof pickled before it kept the merkle tree rebuilds it. """
+    balance_proof = BalanceProof(None)
+    secrets = [sha3('secret{}'.format(position)) for position in range(3)]
+
+    for nonce, secret in enumerate(secrets, 1):
+        lock = Lock(amount=nonce, expiration=100, hashlock=sha3(secret))
+        locksroot = balance_proof.merkletree.merkleroot_with(sha3(lock.as_bytes))
+        balance_proof.register_balanceproof_with_lock(
+            BalanceProofState(nonce, 0, locksroot, 'channel', 'hash', 'signature'),
+            lock,
+        )
+    balance_proof.register_secret(secrets[0])
+    locksroot = balance_proof.merkleroot_for_unclaimed()
+
+    # the state of the previous version, without the merkletree attribute
+    legacy_state = dict(balance_proof.__dict__)
+    del legacy_state['merkletree']
+    legacy_balance_proof = BalanceProof.__new__(BalanceProof)
+    legacy_balance_proof.__dict__.update(legacy_state)
+
+    loaded = pickle.loads(pickle.dumps(legacy_balance_proof, pickle.HIGHEST_PROTOCOL))
+
+    assert loaded == balance_proof
+    assert loaded.merkleroot_for_unclaimed() == locksroot
+    assert loaded.merkletree.merkleroot == Merkletree(loaded.unclaimed_merkletree()).merkleroot
+
+    loaded.release_lock_by_secret(secrets[0])
+    balance_proof.release_lock_by_secret(secrets[0])
+    assert loaded.merkleroot_for_unclaimed() == balance_proof.merkleroot_for_unclaimed()
+
+    # the current format keeps the tree as is
+    assert pickle.loads(pickle.dumps(balance_proof)).merkleroot_for_unclaimed() == (
+        balance_proof.merkleroot_for_unclaimed()
+    )
+
+
 def test_invalid_timeouts():
     token_address = make_address()
     reveal_timeout = 5
@@ -719,7 +760,7 @@ def test_register_invalid_transfer(raiden_network, settle_timeout):
     # handcrafted transfer because channel.create_transfer won't create it
     transfer2 = DirectTransfer(
         1,  # TODO: fill in identifier
-        nonce=channel0.get_nonce(),
+        nonce=channel0.get_nonce() + 1,
         token=channel0.token_address,
         channel=channel0.channel_address,
         transferred_amount=channel1.balance + balance0 + amount,
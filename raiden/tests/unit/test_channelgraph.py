@@ -1,6 +1,17 @@
 # -*- coding: utf-8 -*-
-from raiden.network.channelgraph import ChannelGraph, ChannelDetails
-from raiden.tests.utils.factories import make_address
+import random
+
+import networkx
+import pytest
+
+from raiden.network.channelgraph import (
+    ChannelGraph,
+    ChannelDetails,
+    ordered_neighbors,
+    split_transfer,
+)
+from raiden.network.graph import AddressGraph
+from raiden.tests.utils.factories import HOP1, HOP2, HOP3, HOP4, make_address, make_route
 
 
 class ParticipantStateMock(object):
@@ -61,3 +72,141 @@ def test_addchannel_must_not_overwrite():  # pylint: disable=too-many-locals
     graph.add_channel(channel_detail)
 
     assert first_instance is graph.address_to_channel[channel_address]
+
+
+def test_ordered_neighbors():
+    """ The single search must find the same distances as a search for each
+    neighbor.
+    """
+    random.seed(42)
+    addresses = [make_address() for _ in range(200)]
+    edge_list = [
+        (random.choice(addresses), random.choice(addresses))
+        for _ in range(300)
+    ]
+    edge_list = [(first, second) for first, second in edge_list if first != second]
+
+    graph = ChannelGraph(
+        addresses[0],
+        make_address(),
+        make_address(),
+        edge_list,
+        [],
+    )
+    nx_graph = networkx.Graph(edge_list)
+
+    for our_address in addresses[:20]:
+        for target_address in addresses[-20:]:
+            expected = list()
+
+            if our_address in nx_graph and target_address in nx_graph:
+                for neighbor in nx_graph.neighbors(our_address):
+                    try:
+                        distance = networkx.shortest_path_length(
+                            nx_graph,
+                            neighbor,
+                            target_address,
+                        )
+                    except networkx.NetworkXNoPath:
+                        continue
+                    expected.append((distance, neighbor))
+
+            assert ordered_neighbors(graph.graph, our_address, target_address) == sorted(expected)
+
+
+def test_address_graph():
+    """ The queries must match the ones of networkx. """
+    random.seed(43)
+    addresses = [make_address() for _ in range(100)]
+    edge_list = [
+        (random.choice(addresses), random.choice(addresses))
+        for _ in range(120)
+    ]
+    edge_list = [(first, second) for first, second in edge_list if first != second]
+
+    graph = AddressGraph(edge_list)
+    nx_graph = networkx.Graph(edge_list)
+
+    assert set(graph.nodes()) == set(nx_graph.nodes())
+    assert graph == AddressGraph(reversed(edge_list))
+
+    for first, second in edge_list:
+        assert graph.has_edge(second, first)
+        assert sorted(graph.neighbors(first)) == sorted(nx_graph.neighbors(first))
+
+    source = edge_list[0][0]
+    nx_paths = networkx.shortest_path(nx_graph, source)
+    paths = graph.shortest_paths(source)
+    assert sorted(paths) == sorted(nx_paths)
+
+    for target, path in paths.iteritems():
+        assert len(path) == len(nx_paths[target])
+        assert all(graph.has_edge(first, second) for first, second in zip(path, path[1:]))
+
+    for target in graph.nodes():
+        assert graph.has_path(source, target) == networkx.has_path(nx_graph, source, target)
+
+        if target in nx_paths:
+            assert (
+                sorted(graph.all_shortest_paths(source, target)) ==
+                sorted(networkx.all_shortest_paths(nx_graph, source, target))
+            )
+        else:
+            with pytest.raises(ValueError):
+                list(graph.all_shortest_paths(source, target))
+
+    first, second = edge_list[0]
+    graph.remove_edge(first, second)
+    assert not graph.has_edge(first, second)
+    assert first in graph
+
+    with pytest.raises(ValueError):
+        graph.remove_edge(first, second)
+
+    assert not graph.has_path(source, make_address())
+
+
+def test_ordered_neighbors_cache():
+    our_address, first, second, target = [make_address() for _ in range(4)]
+
+    graph = ChannelGraph(
+        our_address,
+        make_address(),
+        make_address(),
+        [(our_address, first), (first, second), (second, target)],
+        [],
+    )
+
+    assert graph.ordered_neighbors(our_address, target) == [(2, first)]
+
+    # the heap is consumed by the caller, the cache must not be changed
+    graph.ordered_neighbors(our_address, target).pop()
+    assert graph.ordered_neighbors(our_address, target) == [(2, first)]
+
+    graph.add_path(our_address, target)
+    assert graph.ordered_neighbors(our_address, target) == [(0, target), (2, first)]
+
+    graph.remove_path(our_address, target)
+    assert graph.ordered_neighbors(our_address, target) == [(2, first)]
+
+
+def test_split_transfer():
+    routes = [
+        make_route(HOP1, available_balance=10),
+        make_route(HOP2, available_balance=40),
+        make_route(HOP3, available_balance=30),
+        make_route(HOP4, available_balance=25),
+    ]
+
+    # the largest balances first, the unused route is the fallback of the
+    # part it can carry
+    parts = split_transfer(routes, 60, max_parts=3)
+    assert [(amount, [route.node_address for route in part_routes])
+            for amount, part_routes in parts] == [
+        (40, [HOP2]),
+        (20, [HOP3, HOP4]),
+    ]
+
+    assert sum(amount for amount, _ in split_transfer(routes, 105, max_parts=4)) == 105
+    assert split_transfer(routes, 105, max_parts=3) == list()
+    assert split_transfer(routes, 106, max_parts=4) == list()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import gevent
+import pytest
+from ethereum.abi import encode_abi
+from ethereum.utils import big_endian_to_int
+from gevent.pool import Pool
+from pyethapp.rpc_client import JSONRPCClientReplyError
+
+from raiden.blockchain.abi import CONTRACT_MANAGER, EVENT_ADDRESS_REGISTERED
+from raiden.exceptions import UnknownAddress
+from raiden.network.discovery import ContractDiscovery
+from raiden.tests.utils.factories import make_address
+
+
+class RegistrationFilter(object):
+    def __init__(self):
+        self.log_events = list()
+        self.lost = False
+        self.installed = True
+
+    def changes(self):
+        if self.lost:
+            raise JSONRPCClientReplyError('filter not found')
+
+        log_events = self.log_events
+        self.log_events = list()
+        return log_events
+
+    def uninstall(self):
+        self.installed = False
+
+
+class DiscoveryProxy(object):
+    """ The endpoint registry, every lookup waits for a round trip. """
+
+    def __init__(self):
+        self.address_to_endpoint = dict()
+        self.filters = list()
+        self.lookups = 0
+
+    def register(self, node_address, endpoint):
+        self.address_to_endpoint[node_address] = endpoint
+
+        for registration_filter in self.filters:
+            registration_filter.log_events.append({
+                'topics': [
+                    CONTRACT_MANAGER.get_event_id(EVENT_ADDRESS_REGISTERED),
+                    big_endian_to_int(node_address),
+                ],
+                'data': encode_abi(['string'], [endpoint]),
+            })
+
+    def endpoint_by_address(self, node_address):
+        self.lookups += 1
+        gevent.sleep(0.001)
+
+        if node_address not in self.address_to_endpoint:
+            raise UnknownAddress('Unknown address')
+
+        return self.address_to_endpoint[node_address]
+
+    def addressregistered_filter(self):
+        registration_filter = RegistrationFilter()
+        self.filters.append(registration_filter)
+        return registration_filter
+
+
+def test_contract_discovery_cache():
+    proxy = DiscoveryProxy()
+    discovery = ContractDiscovery(make_address(), proxy)
+
+    partners = [make_address() for _ in range(3)]
+    unknown = make_address()
+    for port, partner in enumerate(partners):
+        proxy.register(partner, '127.0.0.1:{}'.format(40001 + port))
+
+    # the partners are fetched concurrently on start
+    discovery.start(partners + [unknown], Pool(4))
+    assert proxy.lookups == 4
+    assert discovery.misses == 4
+    assert 0 < discovery.max_lookup_time <= discovery.lookup_time
+
+    for port, partner in enumerate(partners):
+        assert discovery.get(partner) == ('127.0.0.1', 40001 + port)
+
+    # the unknown addresses are cached too
+    with pytest.raises(UnknownAddress):
+        discovery.get(unknown)
+
+    assert proxy.lookups == 4
+    assert discovery.hits == 4
+
+    # the registrations update the cache
+    proxy.register(unknown, '127.0.0.2:40001')
+    proxy.register(partners[0], '127.0.0.2:40002')
+    discovery.poll_endpoint_changes()
+
+    assert discovery.get(unknown) == ('127.0.0.2', 40001)
+    assert discovery.get(partners[0]) == ('127.0.0.2', 40002)
+    assert proxy.lookups == 4
+
+    discovery.stop()
+    assert not proxy.filters[0].installed
+
+
+def test_contract_discovery_lost_filter():
+    proxy = DiscoveryProxy()
+    discovery = ContractDiscovery(make_address(), proxy)
+
+    partner = make_address()
+    proxy.register(partner, '127.0.0.1:40001')
+    discovery.start([partner])
+
+    # the changes since the last poll are unknown, the cache is dropped
+    proxy.filters[0].lost = True
+    proxy.register(partner, '127.0.0.1:40002')
+    discovery.poll_endpoint_changes()
+
+    assert len(proxy.filters) == 2
+    assert discovery.get(partner) == ('127.0.0.1', 40002)
+    assert proxy.lookups == 2
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from gevent.event import AsyncResult
+
+from raiden.event_handler import StateMachineEventHandler
+from raiden.raiden_service import RandomSecretGenerator
+from raiden.tests.utils import factories
+from raiden.transfer.architecture import StateManager
+from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
+from raiden.transfer.mediated_transfer import initiator, target
+from raiden.transfer.mediated_transfer.events import SendMediatedTransfer
+from raiden.transfer.mediated_transfer.state_change import (
+    ActionCancelRoute,
+    ActionInitInitiator,
+    ActionInitTarget,
+    ReceiveBalanceProof,
+    ReceiveSecretRequest,
+    ReceiveSecretReveal,
+)
+from raiden.transfer.state import RoutesState
+from raiden.transfer.state_change import Block
+from raiden.utils import sha3
+from raiden.utils.deadline_heap import DeadlineHeap
+
+
+class Raiden(object):
+    def __init__(self):
+        self.transaction_log = StateChangeLog(
+            storage_instance=StateChangeLogSQLiteBackend(database_path=':memory:')
+        )
+        self.identifier_to_statemanagers = defaultdict(list)
+        self.identifier_to_results = defaultdict(list)
+        self.block_number = 1
+
+    def get_block_number(self):
+        return self.block_number
+
+
+class RecordingEventHandler(StateMachineEventHandler):
+    def __init__(self, raiden):
+        super(RecordingEventHandler, self).__init__(raiden)
+        self.events = list()
+
+    def on_event(self, event):
+        self.events.append(event)
+
+
+class RecordingResult(object):
+    """ Records all the values the result is set to. """
+
+    def __init__(self):
+        self.values = list()
+
+    def ready(self):
+        return bool(self.values)
+
+    def set(self, value):
+        self.values.append(value)
+
+
+class FixedSecretGenerator(object):
+    def __init__(self, secret):
+        self.secret = secret
+
+    def next(self):
+        return self.secret
+
+
+def event_keys(events):
+    return sorted(
+        (type(event).__name__, getattr(event, 'identifier', None))
+        for event in events
+    )
+
+
+def test_deadline_heap():
+    deadlines = DeadlineHeap()
+
+    deadlines.schedule(30, 'c')
+    deadlines.schedule(10, 'a')
+    deadlines.schedule(10, 'b')
+    assert len(deadlines) == 3
+
+    assert deadlines.expire(9) == []
+    assert deadlines.expire(10) == ['a', 'b']
+    assert deadlines.expire(100) == ['c']
+    assert len(deadlines) == 0
+
+
+def test_block_dispatch_only_due_managers():
+    """ Dispatching the blocks only to the due state managers must produce
+    the same events and states as dispatching every block to every manager.
+    """
+    raiden = Raiden()
+    handler = RecordingEventHandler(raiden)
+    our_address = factories.ADDR
+    block_number = raiden.get_block_number()
+
+    managers = list()
+    every_block_managers = list()
+    every_block_events = list()
+
+    for identifier in range(10):
+        expiration = block_number + factories.UNIT_REVEAL_TIMEOUT + identifier * 3
+        from_route, from_transfer = factories.make_from(
+            identifier + 1,
+            our_address,
+            expiration,
+        )
+        init = ActionInitTarget(our_address, from_route, from_transfer, block_number)
+
+        manager = StateManager(target.state_transition, None)
+        raiden.identifier_to_statemanagers[identifier].append(manager)
+        handler.log_and_dispatch(manager, init, identifier)
+        managers.append(manager)
+
+        every_block_manager = StateManager(target.state_transition, None)
+        every_block_events.extend(every_block_manager.dispatch(init))
+        every_block_managers.append(every_block_manager)
+
+    for block_number in range(2, 40):
+        block = Block(block_number)
+
+        if block_number == 5:
+            # the secret is learned between deadlines, the managers must
+            # see the skipped blocks first
+            reveal = ReceiveSecretReveal(factories.UNIT_SECRET, factories.HOP6)
+            handler.log_and_dispatch_by_identifier(7, reveal)
+            every_block_events.extend(every_block_managers[7].dispatch(reveal))
+
+        handler.log_and_dispatch_block(block)
+        raiden.block_number = block_number
+
+        for manager in every_block_managers:
+            every_block_events.extend(manager.dispatch(block))
+
+    assert event_keys(handler.events) == event_keys(every_block_events)
+
+    for manager, every_block_manager in zip(managers, every_block_managers):
+        handler.catch_up(manager)
+        assert manager.current_state == every_block_manager.current_state
+
+    # the closed task is not woken up anymore
+    assert managers[7].current_state.state == 'waiting_close'
+    assert id(managers[7]) not in handler.manager_to_deadline
+
+
+def test_block_dispatch_skips_blocks():
+    raiden = Raiden()
+    handler = RecordingEventHandler(raiden)
+    our_address = factories.ADDR
+    block_number = raiden.get_block_number()
+    expiration = block_number + 20
+
+    from_route, from_transfer = factories.make_from(1, our_address, expiration)
+    init = ActionInitTarget(our_address, from_route, from_transfer, block_number)
+    manager = StateManager(target.state_transition, None)
+    raiden.identifier_to_statemanagers[1].append(manager)
+    handler.log_and_dispatch(manager, init, 1)
+
+    for block_number in range(2, expiration + 1):
+        handler.log_and_dispatch_block(Block(block_number))
+
+    # the manager was not woken up before the lock expired
+    assert manager.current_state.block_number == init.block_number
+
+    handler.log_and_dispatch_block(Block(expiration + 1))
+    assert manager.current_state is None
+    assert len(handler.manager_to_deadline) == 0
+
+
+def test_finished_transfers_are_archived():
+    raiden = Raiden()
+    handler = RecordingEventHandler(raiden)
+    log = raiden.transaction_log
+    our_address = factories.ADDR
+    block_number = raiden.get_block_number()
+
+    from_route, from_transfer = factories.make_from(
+        1,
+        our_address,
+        block_number + factories.UNIT_REVEAL_TIMEOUT,
+    )
+    identifier = from_transfer.identifier
+    init = ActionInitTarget(our_address, from_route, from_transfer, block_number)
+    manager = StateManager(target.state_transition, None)
+    raiden.identifier_to_statemanagers[identifier].append(manager)
+    raiden.identifier_to_results[identifier].append(None)
+
+    handler.log_and_dispatch(manager, init, identifier)
+    snapshot_id = log.last_state_change_id
+    log.snapshot(snapshot_id, {'transfers': raiden.identifier_to_statemanagers})
+
+    reveal = ReceiveSecretReveal(factories.UNIT_SECRET, from_route.node_address)
+    handler.log_and_dispatch_by_identifier(identifier, reveal)
+    assert log.get_archived_transfers() == []
+
+    balance_proof = ReceiveBalanceProof(identifier, from_route.node_address, None)
+    handler.log_and_dispatch_by_identifier(identifier, balance_proof)
+
+    # the finished manager is not kept in the hot maps nor woken up
+    assert identifier not in raiden.identifier_to_statemanagers
+    assert identifier not in raiden.identifier_to_results
+    assert len(handler.manager_to_deadline) == 0
+
+    archived = log.get_archived_transfers()
+    assert len(archived) == 1
+    assert archived[0].identifier == identifier
+    assert archived[0].task == 'target'
+    assert archived[0].state_change_id == log.last_state_change_id
+    assert event_keys(archived[0].events) == [
+        ('EventTransferReceivedSuccess', identifier),
+        ('EventWithdrawSuccess', identifier),
+    ]
+    assert log.get_archived_transfers(from_block=block_number + 1) == []
+
+    # the messages of a finished transfer don't recreate the entries
+    handler.log_and_dispatch_by_identifier(identifier, balance_proof)
+    assert identifier not in raiden.identifier_to_statemanagers
+
+    # the recovery finishes the task again without duplicating the summary
+    _, data = log.get_snapshot()
+    recovered = Raiden()
+    recovered.transaction_log = log
+    recovered.identifier_to_statemanagers = data['transfers']
+
+    recovered_handler = RecordingEventHandler(recovered)
+    recovered_handler.replay(log.get_state_changes_after(snapshot_id))
+    assert identifier not in recovered.identifier_to_statemanagers
+    assert len(log.get_archived_transfers()) == 1
+
+
+def start_transfer_parts(raiden, handler, identifier, parts, async_result):
+    """ Start an initiator task per part, registering all the managers
+    before the first dispatch as the RaidenService does.
+    """
+    our_address = factories.ADDR
+    target_address = factories.HOP3
+    block_number = raiden.get_block_number()
+
+    raiden.identifier_to_results[identifier].append(async_result)
+
+    inits = list()
+    for node_address, amount, available_balance, secret in parts:
+        transfer = factories.make_transfer(
+            amount,
+            our_address,
+            target_address,
+            None,
+            hashlock=None,
+            identifier=identifier,
+        )
+        routes = RoutesState([
+            factories.make_route(node_address, available_balance=available_balance),
+        ])
+        init = ActionInitInitiator(
+            our_address,
+            transfer,
+            routes,
+            FixedSecretGenerator(secret),
+            block_number,
+        )
+
+        manager = StateManager(initiator.state_transition, None)
+        raiden.identifier_to_statemanagers[identifier].append(manager)
+        inits.append((manager, init))
+
+    for manager, init in inits:
+        handler.log_and_dispatch(manager, init, identifier)
+
+
+def unlock_part(handler, identifier, part):
+    node_address, amount, _, secret = part
+    target_address = factories.HOP3
+
+    secret_request = ReceiveSecretRequest(identifier, amount, sha3(secret), target_address)
+    handler.log_and_dispatch_by_identifier(identifier, secret_request)
+    handler.log_and_dispatch_by_identifier(
+        identifier,
+        ReceiveSecretReveal(secret, node_address),
+    )
+
+
+def test_transfer_parts_result():
+    """ A transfer split in parts succeeds once all the parts succeeded. """
+    raiden = Raiden()
+    handler = RecordingEventHandler(raiden)
+    identifier = 7
+
+    parts = (
+        (factories.HOP1, 60, 60, 'a' * 32),
+        (factories.HOP2, 40, 40, 'b' * 32),
+    )
+    async_result = AsyncResult()
+    start_transfer_parts(raiden, handler, identifier, parts, async_result)
+
+    unlock_part(handler, identifier, parts[0])
+    assert not async_result.ready()
+    assert len(raiden.identifier_to_statemanagers[identifier]) == 1
+
+    unlock_part(handler, identifier, parts[1])
+    assert async_result.get_nowait() is True
+    assert identifier not in raiden.identifier_to_statemanagers
+    assert len(raiden.transaction_log.get_archived_transfers()) == 2
+
+
+def test_transfer_parts_failed():
+    """ A failed part fails the transfer once the other parts finished, even
+    if they succeeded.
+    """
+    raiden = Raiden()
+    handler = RecordingEventHandler(raiden)
+    identifier = 7
+
+    # the first part fails right away, before the second part is dispatched
+    parts = (
+        (factories.HOP1, 60, 10, 'a' * 32),
+        (factories.HOP2, 40, 40, 'b' * 32),
+    )
+    result = RecordingResult()
+    start_transfer_parts(raiden, handler, identifier, parts, result)
+
+    assert result.values == []
+    assert len(raiden.identifier_to_statemanagers[identifier]) == 1
+
+    # the target is paid the second part, the transfer failed
+    unlock_part(handler, identifier, parts[1])
+    assert result.values == [False]
+    assert identifier not in raiden.identifier_to_statemanagers
+    assert identifier not in handler.failed_transfers
+
+
+def test_replayed_initiator_secrets():
+    """ The initiator replayed after a crash uses the hashlocks of the
+    transfers that were sent, including the ones of the next routes.
+    """
+    raiden = Raiden()
+    handler = RecordingEventHandler(raiden)
+    identifier = 7
+
+    transfer = factories.make_transfer(
+        10,
+        factories.ADDR,
+        factories.HOP3,
+        None,
+        hashlock=None,
+        identifier=identifier,
+    )
+    routes = RoutesState([
+        factories.make_route(factories.HOP1, available_balance=10),
+        factories.make_route(factories.HOP2, available_balance=10),
+    ])
+    init = ActionInitInitiator(
+        factories.ADDR,
+        transfer,
+        routes,
+        RandomSecretGenerator(),
+        raiden.get_block_number(),
+    )
+
+    manager = StateManager(initiator.state_transition, None)
+    raiden.identifier_to_statemanagers[identifier].append(manager)
+    handler.log_and_dispatch(manager, init, identifier)
+    handler.log_and_dispatch_by_identifier(identifier, ActionCancelRoute(identifier))
+
+    sent_hashlocks = [
+        event.hashlock
+        for event in handler.events
+        if isinstance(event, SendMediatedTransfer)
+    ]
+    assert len(set(sent_hashlocks)) == 2
+
+    # the node crashed before a snapshot was taken
+    recovered = Raiden()
+    recovered.transaction_log = raiden.transaction_log
+
+    recovered_handler = RecordingEventHandler(recovered)
+    recovered_handler.replay(recovered.transaction_log.get_state_changes_after(None))
+
+    replayed_manager, = recovered.identifier_to_statemanagers[identifier]
+    replayed_state = replayed_manager.current_state
+    assert replayed_state.transfer.hashlock == sent_hashlocks[1]
+    assert [
+        canceled.hashlock
+        for canceled in replayed_state.canceled_transfers
+    ] == sent_hashlocks[:1]
+
@@ -2,11 +2,17 @@
 
 import pytest
 
+from raiden.encoding import messages
 from raiden.messages import (
     decode,
     Ack,
+    Acks,
+    CAPABILITY_ACKS,
+    Lock,
     Ping,
+    SENDER_CACHE,
 )
+from raiden.constants import UDP_MAX_MESSAGE_SIZE
 from raiden.utils import sha3
 from raiden.tests.utils.messages import (
     make_direct_transfer,
@@ -138,3 +144,144 @@ def test_direct_transfer_out_of_bounds_values():
     for args in DIRECT_TRANSFER_INVALID_VALUES:
         with pytest.raises(ValueError):
             make_direct_transfer(**args)
+
+
+def test_cache_invalidation():
+    direct_transfer = make_direct_transfer(nonce=1)
+    direct_transfer.sign(PRIVKEY, ADDRESS)
+
+    data = direct_transfer.encode()
+    message_hash = direct_transfer.message_hash
+    assert data == bytes(direct_transfer.packed().data)
+    assert direct_transfer.hash == sha3(data)
+
+    direct_transfer.nonce = 2
+    assert direct_transfer.encode() != data
+    assert direct_transfer.encode() == bytes(direct_transfer.packed().data)
+    assert direct_transfer.message_hash != message_hash
+
+    direct_transfer.sign(PRIVKEY, ADDRESS)
+    decoded = decode(direct_transfer.encode())
+    assert decoded.sender == ADDRESS
+    assert decoded == direct_transfer
+
+
+def test_decoded_keeps_buffer():
+    mediated_transfer = make_mediated_transfer()
+    mediated_transfer.sign(PRIVKEY, ADDRESS)
+
+    data = mediated_transfer.encode()
+    decoded = decode(data)
+
+    assert decoded.encode() is data
+    assert decoded.message_hash == mediated_transfer.message_hash
+    assert decoded.echohash(ADDRESS) == sha3(data + ADDRESS)
+    assert decoded in {mediated_transfer}
+
+
+@pytest.mark.parametrize('amount', [0, 2 ** 256 - 1])
+@pytest.mark.parametrize('nonce', [1, 2 ** 64 - 1])
+@pytest.mark.parametrize('transferred_amount', [0, 2 ** 64, 2 ** 256 - 1])
+def test_compiled_codec_compatibility(amount, nonce, transferred_amount):
+    mediated_transfer = make_mediated_transfer(
+        amount=amount,
+        nonce=nonce,
+        transferred_amount=transferred_amount,
+    )
+    mediated_transfer.sign(PRIVKEY, ADDRESS)
+
+    data = mediated_transfer.encode()
+    assert data == bytes(mediated_transfer.packed().data)
+
+    packed = messages.wrap(data)
+    unpacked = messages.unpack(data)
+    for name in unpacked._fields:
+        assert getattr(unpacked, name) == getattr(packed, name)
+
+    lock = mediated_transfer.lock
+    assert Lock.from_bytes(lock.as_bytes) == lock
+
+
+def test_sender_cache():
+    SENDER_CACHE.clear()
+
+    ping = Ping(nonce=42)
+    ping.sign(PRIVKEY, ADDRESS)
+    data = ping.encode()
+
+    assert decode(data).sender == ADDRESS
+    assert (SENDER_CACHE.hits, SENDER_CACHE.misses) == (0, 1)
+
+    # a retransmission doesn't recover the key again
+    assert decode(data).sender == ADDRESS
+    assert (SENDER_CACHE.hits, SENDER_CACHE.misses) == (1, 1)
+
+
+def test_sender_cache_poisoning():
+    SENDER_CACHE.clear()
+    other_privkey, other_address = make_privkey_address()
+
+    ping = Ping(nonce=42)
+    ping.sign(PRIVKEY, ADDRESS)
+    data = ping.encode()
+    assert decode(data).sender == ADDRESS
+
+    # the same payload signed by someone else is not attributed to the cached
+    # sender
+    other_ping = Ping(nonce=42)
+    other_ping.sign(other_privkey, other_address)
+    other_data = other_ping.encode()
+
+    assert other_data[:-65] == data[:-65]
+    assert decode(other_data).sender == other_address
+
+    # neither is an invalid signature
+    assert decode(data[:-65] + b'\x00' * 65) is None
+    assert SENDER_CACHE.hits == 0
+
+    transfer = make_direct_transfer()
+    transfer.sign(PRIVKEY, ADDRESS)
+    other_transfer = make_direct_transfer()
+    other_transfer.sign(other_privkey, other_address)
+
+    assert decode(transfer.encode()).sender == ADDRESS
+    assert decode(other_transfer.encode()).sender == other_address
+
+
+def test_acks_encoding():
+    echos = [sha3(str(position)) for position in range(messages.ACKS_MAX_ECHOS)]
+
+    acks = Acks(ADDRESS, echos[:3])
+    decoded = decode(acks.encode())
+    assert isinstance(decoded, Acks)
+    assert decoded.sender == ADDRESS
+    assert decoded.echos == tuple(echos[:3])
+
+    full = Acks(ADDRESS, echos)
+    assert len(full.encode()) <= UDP_MAX_MESSAGE_SIZE
+    assert decode(full.encode()).echos == tuple(echos)
+
+    with pytest.raises(ValueError):
+        Acks(ADDRESS, [])
+
+    with pytest.raises(ValueError):
+        Acks(ADDRESS, echos + [sha3('one too many')])
+
+    # the echos must be complete
+    data = acks.encode()
+    assert decode(data[:-1]) is None
+    assert decode(data[:messages.Acks.size]) is None
+
+
+def test_ping_capabilities():
+    ping = Ping(nonce=1)
+    ping.sign(PRIVKEY, ADDRESS)
+
+    # the capabilities of older nodes are the zeroed padding
+    assert ping.encode()[1:4] == b'\x00' * 3
+
+    ping = Ping(nonce=1, capabilities=CAPABILITY_ACKS)
+    ping.sign(PRIVKEY, ADDRESS)
+    decoded = decode(ping.encode())
+    assert decoded.capabilities == CAPABILITY_ACKS
+    assert decoded.sender == ADDRESS
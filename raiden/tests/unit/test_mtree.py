@@ -120,3 +120,74 @@ def test_many(tree_up_to=10):
             assert check_proof(merkle_proof, merkleroot, value)
 
         assert merkleroot == Merkletree(reversed(leaves)).merkleroot
+
+
+def test_make_proofs(tree_up_to=10):
+    for number_of_leaves in range(1, tree_up_to):
+        leaves = [
+            sha3(str(value))
+            for value in range(number_of_leaves)
+        ]
+        tree = Merkletree(leaves)
+
+        # the proofs are in the order of the elements, not of the leafs
+        merkle_proofs = tree.make_proofs(leaves)
+        assert merkle_proofs == [tree.make_proof(value) for value in leaves]
+
+        for value, merkle_proof in zip(leaves, merkle_proofs):
+            assert check_proof(merkle_proof, tree.merkleroot, value)
+
+    assert Merkletree([]).make_proofs([]) == []
+
+    with pytest.raises(ValueError):
+        tree.make_proofs([leaves[0], sha3('unknown')])
+
+
+def test_add_remove(tree_up_to=10):
+    leaves = [
+        sha3(str(value))
+        for value in range(tree_up_to)
+    ]
+
+    tree = Merkletree([])
+    for number_of_leaves, value in enumerate(leaves, 1):
+        expected_root = Merkletree(leaves[:number_of_leaves]).merkleroot
+        assert tree.merkleroot_with(value) == expected_root
+
+        tree.add(value)
+        assert tree.merkleroot == expected_root
+        assert value in tree
+
+        for added in leaves[:number_of_leaves]:
+            merkle_proof = tree.make_proof(added)
+            assert check_proof(merkle_proof, expected_root, added)
+
+    for number_of_leaves, value in enumerate(leaves):
+        expected_root = Merkletree(leaves[number_of_leaves + 1:]).merkleroot
+        assert tree.merkleroot_without(value) == expected_root
+
+        tree.remove(value)
+        assert tree.merkleroot == expected_root
+        assert value not in tree
+
+    assert len(tree) == 0
+    assert tree.merkleroot == EMPTY_MERKLE_ROOT
+
+
+def test_add_remove_invalid():
+    hash_0 = sha3('x')
+    tree = Merkletree([hash_0])
+
+    with pytest.raises(ValueError):
+        tree.add(hash_0)
+
+    with pytest.raises(HashLengthNot32):
+        tree.add('not32bytes')
+
+    with pytest.raises(ValueError):
+        tree.remove(sha3('y'))
+
+    with pytest.raises(ValueError):
+        tree.make_proof(sha3('y'))
+
+    assert tree.merkleroot == hash_0
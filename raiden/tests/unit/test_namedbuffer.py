@@ -66,3 +66,46 @@ def test_namedbuffer_does_not_expose_internals():
 def test_namedbuffer_type_exposes_details():
     assert SingleByte.format == '>B'
     assert SingleByte.fields_spec == [byte]
+
+
+def test_compiled_codec():
+    data = bytearray(100)
+    packed_data = HugeInt(data)
+
+    huge = 2 ** (8 * 100) - 1
+    packed_data.huge = huge
+
+    assert HugeInt.unpack_from(data).huge == huge
+
+    record = HugeInt.record_type()
+    record.huge = huge
+    assert HugeInt.pack(record) == bytes(data)
+
+    record.huge = -1
+    with pytest.raises(ValueError):
+        HugeInt.pack(record)
+
+
+def test_compiled_codec_uint256():
+    word = Field('word', 32, '32s', integer(0, 2 ** 256 - 1))
+    address = Field('address', 20, '20s', None)
+    Word = namedbuffer('Word', [word, address])
+
+    for value in (0, 1, 2 ** 64, 2 ** 128 + 2 ** 64 + 1, 2 ** 256 - 1):
+        data = bytearray(52)
+        packed_data = Word(data)
+        packed_data.word = value
+        packed_data.address = b'\x01' * 19
+
+        record = Word.record_type()
+        record.word = value
+        record.address = b'\x01' * 19
+        assert Word.pack(record) == bytes(data)
+
+        unpacked = Word.unpack_from(data)
+        assert unpacked.word == value
+        assert unpacked.address == packed_data.address
+
+    record.address = b'\x01' * 21
+    with pytest.raises(ValueError):
+        Word.pack(record)
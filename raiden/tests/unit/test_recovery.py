@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from raiden.messages import decode, Ack, Ping
+from raiden.network.recovery import SignatureRecovery
+from raiden.utils import sha3
+from raiden.tests.utils.messages import make_direct_transfer
+from raiden.tests.utils.factories import make_privkey_address
+
+PRIVKEY, ADDRESS = make_privkey_address()
+
+
+def run_recovery(packets, pool_size=2, batch_size=3):
+    received = list()
+
+    def callback(data, echohash, message):
+        received.append((data, echohash, message))
+
+    recovery = SignatureRecovery(callback, pool_size, batch_size)
+    recovery.start()
+
+    for data in packets:
+        recovery.put(data, sha3(data))
+
+    recovery.stop_and_wait()
+    return received
+
+
+def test_recovery_order_and_sender():
+    packets = list()
+    for nonce in range(10):
+        ping = Ping(nonce=nonce)
+        ping.sign(PRIVKEY, ADDRESS)
+        packets.append(ping.encode())
+
+    transfer = make_direct_transfer()
+    transfer.sign(PRIVKEY, ADDRESS)
+    packets.append(transfer.encode())
+
+    packets.append(Ack(ADDRESS, sha3('echo')).encode())
+
+    received = run_recovery(packets)
+
+    assert [data for data, _, _ in received] == packets
+    assert [echohash for _, echohash, _ in received] == [sha3(data) for data in packets]
+
+    for data, _, message in received:
+        expected = decode(data)
+        assert message == expected
+        assert message.encode() == data
+
+        if not isinstance(message, Ack):
+            assert message.sender == ADDRESS
+
+    assert received[-2][2].message_hash == transfer.message_hash
+    assert received[-2][2].data_to_sign == transfer.data_to_sign
+
+
+def test_recovery_invalid_signature():
+    ping = Ping(nonce=1)
+    ping.sign(PRIVKEY, ADDRESS)
+    valid = ping.encode()
+
+    # a zeroed signature fails the recovery, the following packet must still
+    # be delivered
+    invalid = valid[:-65] + b'\x00' * 65
+
+    received = run_recovery([invalid, valid], pool_size=1, batch_size=1)
+
+    assert len(received) == 2
+    assert received[0][2] is None
+    assert received[1][2].sender == ADDRESS
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from raiden.utils.retention import RetentionMap
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_retention_expire():
+    clock = Clock()
+    retention = RetentionMap(10, clock=clock)
+
+    retention['a'] = 1
+    clock.now = 5
+    retention['b'] = 2
+
+    assert retention == {'a': 1, 'b': 2}
+
+    clock.now = 11
+    retention.expire()
+    assert 'a' not in retention
+    assert retention['b'] == 2
+
+    # eviction also happens on insertion
+    clock.now = 16
+    retention['c'] = 3
+    assert retention == {'c': 3}
+
+
+def test_retention_keep():
+    clock = Clock()
+    pending = set(['a'])
+    retention = RetentionMap(10, keep=lambda value: value in pending, clock=clock)
+
+    retention['a'] = 'a'
+    retention['b'] = 'b'
+
+    clock.now = 11
+    retention.expire()
+    assert retention == {'a': 'a'}
+
+    # the entry gets a full retention period once it's not pending anymore
+    pending.clear()
+    clock.now = 21
+    retention.expire()
+    assert 'a' in retention
+
+    clock.now = 22
+    retention.expire()
+    assert len(retention) == 0
+
+
+def test_retention_retire():
+    clock = Clock()
+    retention = RetentionMap(10, clock=clock)
+
+    for nonce in range(1, 5):
+        retention.add(nonce, nonce, group='channel1', nonce=nonce)
+    retention.add('other', 'other', group='channel2', nonce=1)
+
+    retention.retire('channel1', 3)
+    assert retention == {3: 3, 4: 4, 'other': 'other'}
+
+    retention.retire('unknown', 10)
+    retention.retire('channel1', 10)
+    assert retention == {'other': 'other'}
+    assert retention.group_to_nonces.keys() == ['channel2']
+
+    # the group index doesn't outlive the entries
+    clock.now = 11
+    retention.expire()
+    assert len(retention) == 0
+    assert not retention.group_to_nonces
+    assert not retention.expiration_queue
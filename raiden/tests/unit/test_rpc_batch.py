@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+from ethereum.abi import ContractTranslator
+from pyethapp.rpc_client import JSONRPCClient, JSONRPCClientReplyError
+
+from raiden.blockchain.abi import CONTRACT_MANAGER, CONTRACT_NETTING_CHANNEL
+from raiden.exceptions import AddressWithoutCode
+from raiden.network.rpc.client import (
+    BatchCall,
+    NettingChannel,
+    check_transaction_threw,
+)
+from raiden.tests.utils.factories import make_address, make_privkey_address
+from raiden.tests.utils.jsonrpc import JSONRPCNodeMock
+
+ABI = [
+    {
+        'type': 'function',
+        'name': 'balanceOf',
+        'constant': True,
+        'inputs': [{'name': 'owner', 'type': 'address'}],
+        'outputs': [{'name': 'balance', 'type': 'uint256'}],
+    },
+    {
+        'type': 'function',
+        'name': 'participants',
+        'constant': True,
+        'inputs': [],
+        'outputs': [
+            {'name': 'first', 'type': 'address'},
+            {'name': 'second', 'type': 'address'},
+        ],
+    },
+]
+
+
+def make_client(node):
+    privkey, _ = make_privkey_address()
+    return JSONRPCClient(privkey=privkey.secret, transport=node, print_communication=False)
+
+
+def test_batch_call_single_message():
+    node = JSONRPCNodeMock()
+    client = make_client(node)
+
+    contract_address = make_address()
+    first, second = make_address(), make_address()
+    node.add_contract(
+        contract_address,
+        ContractTranslator(ABI),
+        balanceOf=lambda owner: 7 if owner.decode('hex') == first else 0,
+        participants=lambda: (first, second),
+    )
+    proxy = client.new_contract_proxy(ABI, contract_address)
+
+    batch = BatchCall(client)
+    code = batch.call('eth_getCode', '0x' + contract_address.encode('hex'), 'latest')
+    balance = batch.contract_call(proxy.balanceOf, first)
+    participants = batch.contract_call(proxy.participants)
+    unknown = batch.call('eth_unknownMethod')
+    batch.execute()
+
+    assert node.messages == 1
+    assert code.get() == '0x6060'
+
+    # same results as the sequential calls
+    assert balance.get() == proxy.balanceOf.call(first) == 7
+    assert participants.get() == proxy.participants.call()
+    assert node.messages == 3
+
+    with pytest.raises(JSONRPCClientReplyError):
+        unknown.get()
+
+    # an empty batch does not send a message
+    BatchCall(client).execute()
+    assert node.messages == 3
+
+
+def test_batch_call_not_supported():
+    class SingleRequestNode(JSONRPCNodeMock):
+        def send_message(self, message, expect_reply=True):
+            if isinstance(json.loads(message), list):
+                return json.dumps({
+                    'jsonrpc': '2.0',
+                    'id': None,
+                    'error': {'code': -32600, 'message': 'Invalid request'},
+                })
+
+            return super(SingleRequestNode, self).send_message(message, expect_reply)
+
+    client = make_client(SingleRequestNode())
+
+    batch = BatchCall(client)
+    result = batch.call('eth_getCode', '0x' + make_address().encode('hex'), 'latest')
+
+    with pytest.raises(JSONRPCClientReplyError):
+        batch.execute()
+
+    with pytest.raises(JSONRPCClientReplyError):
+        result.get()
+
+
+def test_check_transaction_threw():
+    node = JSONRPCNodeMock()
+    client = make_client(node)
+
+    succeeded = 'a' * 32
+    threw = 'b' * 32
+    node.add_transaction(succeeded, gas=100, gas_used=50)
+    node.add_transaction(threw, gas=100, gas_used=100)
+
+    assert check_transaction_threw(client, succeeded.encode('hex')) is None
+    assert check_transaction_threw(client, threw.encode('hex'))['gasUsed'] == '0x64'
+    assert node.messages == 2
+
+
+def test_netting_channel_requests():
+    node = JSONRPCNodeMock()
+    client = make_client(node)
+
+    our_address = client.sender
+    partner_address = make_address()
+    channel_address = make_address()
+    state = {'closed': 0}
+
+    node.add_contract(
+        channel_address,
+        CONTRACT_MANAGER.get_translator(CONTRACT_NETTING_CHANNEL),
+        addressAndBalance=lambda: (our_address, 10, partner_address, 20),
+        settleTimeout=lambda: 30,
+        opened=lambda: 1,
+        closed=lambda: state['closed'],
+        settled=lambda: 0,
+    )
+
+    channel = NettingChannel(client, channel_address)
+    assert node.messages == 1
+
+    detail = {
+        'our_address': our_address,
+        'our_balance': 10,
+        'partner_address': partner_address,
+        'partner_balance': 20,
+        'settle_timeout': 30,
+    }
+    assert channel.detail(our_address) == detail
+    assert node.messages == 1
+
+    assert channel.can_transfer()
+    state['closed'] = 5
+    assert not channel.can_transfer()
+    assert node.messages == 3
+
+    assert channel.detail_and_blocks(our_address) == (detail, (1, 5, 0))
+    assert node.messages == 4
+
+    with pytest.raises(AddressWithoutCode):
+        NettingChannel(client, make_address())
+    assert node.messages == 5
+
+
+def test_netting_channel_cache():
+    node = JSONRPCNodeMock()
+    client = make_client(node)
+
+    our_address = client.sender
+    partner_address = make_address()
+    token_address = make_address()
+    channel_address = make_address()
+    state = {'balance': 10, 'closed': 0}
+
+    node.add_contract(
+        channel_address,
+        CONTRACT_MANAGER.get_translator(CONTRACT_NETTING_CHANNEL),
+        addressAndBalance=lambda: (our_address, state['balance'], partner_address, 20),
+        settleTimeout=lambda: 30,
+        tokenAddress=lambda: token_address,
+        opened=lambda: 1,
+        closed=lambda: state['closed'],
+    )
+
+    channel = NettingChannel(client, channel_address)
+    node.requests.clear()
+
+    # the immutable values are cached forever
+    for _ in range(2):
+        assert channel.settle_timeout() == 30
+        assert channel.token_address() == token_address
+        assert channel.opened() == 1
+    assert node.requests == {'eth_call': 2}
+
+    # the closed block is cached once it's set
+    node.requests.clear()
+    assert channel.closed() == 0
+    assert channel.closed() == 0
+    state['closed'] = 7
+    assert channel.closed() == 7
+    assert channel.closed() == 7
+    assert node.requests == {'eth_call': 3}
+
+    # the balances are cached until a deposit
+    node.requests.clear()
+    state['balance'] = 15
+    assert channel.detail(our_address)['our_balance'] == 10
+    channel.invalidate_balances()
+    assert channel.detail(our_address)['our_balance'] == 15
+    assert node.requests == {'eth_call': 1}
+
+    assert channel.cache.hits == 8
+    assert channel.cache.misses == 8
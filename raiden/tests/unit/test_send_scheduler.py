@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import gevent
+from gevent.event import AsyncResult, Event
+
+from raiden.encoding.messages import DIRECTTRANSFER, REVEALSECRET
+from raiden.messages import CAPABILITY_SEND_WINDOW
+from raiden.network.protocol import (
+    NODE_NETWORK_REACHABLE,
+    NODE_NETWORK_UNREACHABLE,
+    SendScheduler,
+)
+from raiden.tests.utils.factories import make_address
+
+TICK = 0.01
+TIMEOUT = 0.05
+
+
+class Protocol(object):
+    """ The parts of RaidenProtocol used by the scheduler, recording the sent
+    packets instead of using a transport.
+    """
+
+    def __init__(self):
+        self.event_stop = Event()
+        self.greenlets = list()
+        self.nodeaddresses_to_nonces = dict()
+        self.nodeaddresses_networkstatuses = dict()
+        self.nodeaddresses_to_capabilities = dict()
+
+        self.retries_before_backoff = 2
+        self.retry_interval = TIMEOUT
+        self.nat_keepalive_retries = 2
+        self.nat_keepalive_timeout = TIMEOUT
+        self.nat_invitation_timeout = TIMEOUT
+
+        self.sent = list()
+        self.data_to_results = dict()
+
+    def set_node_network_state(self, node_address, node_state):
+        self.nodeaddresses_networkstatuses[node_address] = node_state
+
+    def get_ping(self, nonce):
+        return 'ping{}'.format(nonce)
+
+    def send_raw_with_result(self, data, receiver_address):
+        self.sent.append(data)
+        return self.data_to_results.setdefault(data, AsyncResult())
+
+    def ack(self, data):
+        self.data_to_results.setdefault(data, AsyncResult()).set(True)
+
+    def sent_messages(self):
+        return [data for data in self.sent if not data.startswith('ping')]
+
+    def stop(self):
+        self.event_stop.set()
+        gevent.wait(self.greenlets)
+
+
+def test_scheduler_order():
+    protocol = Protocol()
+    scheduler = SendScheduler(protocol, TICK)
+    receiver = make_address()
+
+    queue = scheduler.get_channel_queue(receiver, 'token')
+    other_queue = scheduler.get_channel_queue(receiver, 'other token')
+
+    queue.put('m1')
+    queue.put('m2')
+    other_queue.put('o1')
+    gevent.sleep(TICK)
+
+    # only the heads are in flight
+    assert protocol.sent_messages() == ['m1', 'o1']
+
+    protocol.ack('m1')
+    gevent.sleep(TICK)
+    assert protocol.sent_messages() == ['m1', 'o1', 'm2']
+    assert queue.copy() == ['m2']
+
+    protocol.ack('m2')
+    protocol.ack('o1')
+    gevent.sleep(TICK)
+    assert len(queue) == 0
+    assert len(other_queue) == 0
+
+    protocol.stop()
+
+
+def test_scheduler_retry():
+    protocol = Protocol()
+    scheduler = SendScheduler(protocol, TICK)
+    receiver = make_address()
+
+    # keep the node healthy
+    protocol.ack('ping1')
+
+    queue = scheduler.get_channel_queue(receiver, 'token')
+    queue.put('m1')
+    gevent.sleep(TIMEOUT * 2 + TICK * 3)
+
+    assert protocol.sent_messages().count('m1') >= 2
+
+    protocol.ack('m1')
+    gevent.sleep(TICK)
+    assert len(queue) == 0
+
+    protocol.stop()
+
+
+def test_scheduler_unhealthy():
+    protocol = Protocol()
+    scheduler = SendScheduler(protocol, TICK)
+    receiver = make_address()
+
+    queue = scheduler.get_channel_queue(receiver, 'token')
+    queue.put('m1')
+
+    retries = protocol.nat_keepalive_retries
+    gevent.sleep(retries * TIMEOUT + TICK * 5)
+
+    statuses = protocol.nodeaddresses_networkstatuses
+    assert statuses[receiver] == NODE_NETWORK_UNREACHABLE
+
+    # the retransmissions are paused while the node is unreachable
+    sent = len(protocol.sent_messages())
+    gevent.sleep(TIMEOUT * 3)
+    assert len(protocol.sent_messages()) == sent
+
+    protocol.ack('ping1')
+    gevent.sleep(TICK * 2)
+    assert statuses[receiver] == NODE_NETWORK_REACHABLE
+    assert len(protocol.sent_messages()) == sent + 1
+
+    protocol.stop()
+
+
+def test_scheduler_window():
+    protocol = Protocol()
+    scheduler = SendScheduler(protocol, TICK, window=3)
+    receiver = make_address()
+    protocol.nodeaddresses_to_capabilities[receiver] = CAPABILITY_SEND_WINDOW
+
+    # keep the node healthy
+    protocol.ack('ping1')
+
+    transfers = [DIRECTTRANSFER + str(position) for position in range(4)]
+    reveal = REVEALSECRET + 'r'
+
+    queue = scheduler.get_channel_queue(receiver, 'token')
+    for messagedata in transfers[:2] + [reveal] + transfers[2:]:
+        queue.put(messagedata)
+    gevent.sleep(TICK)
+
+    # the envelope messages are sent ahead, the other messages are sent alone
+    assert protocol.sent_messages() == transfers[:2]
+
+    # only the unacknowledged message is retransmitted, the queue keeps the
+    # order until it's acknowledged
+    protocol.ack(transfers[1])
+    gevent.sleep(TIMEOUT + TICK * 3)
+    assert protocol.sent_messages()[2:] == [transfers[0]]
+    assert len(queue) == 5
+
+    protocol.ack(transfers[0])
+    gevent.sleep(TICK)
+    assert protocol.sent_messages()[3:] == [reveal]
+
+    protocol.ack(reveal)
+    gevent.sleep(TICK)
+    assert protocol.sent_messages()[4:] == transfers[2:]
+
+    protocol.ack(transfers[2])
+    protocol.ack(transfers[3])
+    gevent.sleep(TICK)
+    assert len(queue) == 0
+
+    protocol.stop()
+
+
+def test_scheduler_window_legacy_peer():
+    protocol = Protocol()
+    scheduler = SendScheduler(protocol, TICK, window=3)
+    receiver = make_address()
+
+    transfers = [DIRECTTRANSFER + str(position) for position in range(2)]
+
+    queue = scheduler.get_channel_queue(receiver, 'token')
+    for messagedata in transfers:
+        queue.put(messagedata)
+    gevent.sleep(TICK)
+
+    # the node did not advertise the window, one message at a time
+    assert protocol.sent_messages() == transfers[:1]
+
+    protocol.stop()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import gevent
+
+from raiden.encoding import messages
+from raiden.network.discovery import Discovery
+from raiden.network.transport import DummyTransport
+from raiden.tests.utils.messages import make_direct_transfer
+from raiden.tests.utils.protocol import CHANNEL_ADDRESS, TOKEN_ADDRESS, ChannelNode
+from raiden.transfer.state_change import ReceiveTransferDirect
+from raiden.utils import sha3
+
+
+def make_nodes(port, **kwargs):
+    discovery = Discovery()
+    node0 = ChannelNode(discovery, '127.0.0.1', port, **kwargs)
+    node1 = ChannelNode(discovery, '127.0.0.1', port + 1, **kwargs)
+
+    node0.open_channel(node1.address)
+    node1.open_channel(node0.address)
+
+    for node in (node0, node1):
+        node.protocol.start()
+
+    # the Pings advertise the capabilities
+    node0.protocol.start_health_check(node1.address)
+    node1.protocol.start_health_check(node0.address)
+    gevent.sleep(0.01)
+
+    return node0, node1
+
+
+def stop_nodes(*nodes):
+    for node in nodes:
+        node.protocol.stop_and_wait()
+
+
+def make_transfers(node, number_of_transfers):
+    return [
+        node.create_directtransfer(10, identifier)
+        for identifier in range(1, number_of_transfers + 1)
+    ]
+
+
+def receive(node, transfer):
+    data = transfer.encode()
+    echohash = sha3(data + node.address)
+    node.protocol.receive_message(data, echohash, transfer)
+    return echohash
+
+
+def logged_identifiers(node):
+    return [
+        state_change.identifier
+        for _, _, state_change in node.transaction_log.get_state_changes_after(0)
+        if isinstance(state_change, ReceiveTransferDirect)
+    ]
+
+
+def dispatched_identifiers(node):
+    return [
+        identifier
+        for identifier, _ in node.state_machine_event_handler.dispatched
+    ]
+
+
+def test_channel_nonces():
+    """ The channel assigns an increasing nonce to each transfer it sends. """
+    node0, node1 = make_nodes(45131)
+    transfers = make_transfers(node0, 3)
+
+    assert [transfer.nonce for transfer in transfers] == [2, 3, 4]
+    assert node1.channel.get_next_partner_nonce() == 2
+
+    for transfer in transfers:
+        node1.channel.register_transfer(1, transfer)
+
+    assert node1.channel.get_next_partner_nonce() == 5
+    assert node0.channel.get_nonce() == 4
+
+    stop_nodes(node0, node1)
+
+
+def test_send_window():
+    node0, node1 = make_nodes(45101, send_window=4)
+    transfers = make_transfers(node0, 6)
+
+    sent_cmdids = list()
+
+    def track_send(sender, host_port, bytes_):  # pylint: disable=unused-argument
+        if sender is node0:
+            sent_cmdids.append(bytes_[0])
+
+    DummyTransport.network.on_send_cbs.append(track_send)
+    try:
+        results = [
+            node0.protocol.send_async(node1.address, transfer)
+            for transfer in transfers
+        ]
+        gevent.wait(results, timeout=5)
+    finally:
+        DummyTransport.network.on_send_cbs.remove(track_send)
+
+    assert all(result.get(block=False) for result in results)
+    assert [message.nonce for message in node1.messages] == range(2, 8)
+    assert node1.channel.partner_state.transferred_amount(node1.channel.our_state) == 60
+
+    # the window was sent without waiting for the Acks
+    assert sent_cmdids[:4] == [messages.DIRECTTRANSFER] * 4
+
+    stop_nodes(node0, node1)
+
+
+def test_hold_back_out_of_order():
+    node0, node1 = make_nodes(45111)
+    transfers = make_transfers(node0, 3)
+    protocol = node1.protocol
+
+    # the messages ahead of the channel nonce are not handled nor acknowledged
+    held_echohashes = [
+        receive(node1, transfers[2]),
+        receive(node1, transfers[1]),
+    ]
+    assert node1.messages == []
+    assert logged_identifiers(node1) == []
+    assert dispatched_identifiers(node1) == []
+    assert not any(
+        echohash in protocol.receivedhashes_to_acks
+        for echohash in held_echohashes
+    )
+
+    # and are handled once, when the gap is filled
+    echohash = receive(node1, transfers[0])
+    assert node1.messages == transfers
+    assert logged_identifiers(node1) == [1, 2, 3]
+    assert dispatched_identifiers(node1) == [1, 2, 3]
+    assert all(
+        echohash in protocol.receivedhashes_to_acks
+        for echohash in held_echohashes + [echohash]
+    )
+    assert protocol.channel_to_heldmessages == dict()
+    assert node1.channel.partner_state.transferred_amount(node1.channel.our_state) == 30
+
+    stop_nodes(node0, node1)
+
+
+def test_stale_message_acknowledged():
+    """ A replayed message is not handled again, but it's acknowledged so the
+    sender's queue is not blocked.
+    """
+    node0, node1 = make_nodes(45121)
+    transfer = make_transfers(node0, 1)[0]
+    protocol = node1.protocol
+
+    receive(node1, transfer)
+
+    replay = make_direct_transfer(
+        identifier=transfer.identifier,
+        nonce=transfer.nonce,
+        token=TOKEN_ADDRESS,
+        channel=CHANNEL_ADDRESS,
+        transferred_amount=transfer.transferred_amount + 10,
+        recipient=node1.address,
+    )
+    node0.sign(replay)
+    replay_data = replay.encode()
+    replay_echohash = sha3(replay_data + node1.address)
+    protocol.receive_message(replay_data, replay_echohash, replay)
+
+    assert node1.messages == [transfer]
+    assert logged_identifiers(node1) == [transfer.identifier]
+    assert dispatched_identifiers(node1) == [transfer.identifier]
+    assert replay_echohash in protocol.receivedhashes_to_acks
+
+    stop_nodes(node0, node1)
+
+
+def test_rejected_message_acknowledged():
+    """ A message the channel rejects can not be accepted by a retransmission,
+    it's acknowledged so the sender's queue is not blocked.
+    """
+    node0, node1 = make_nodes(45141)
+    transfer = make_transfers(node0, 1)[0]
+    protocol = node1.protocol
+
+    receive(node1, transfer)
+
+    negative_transfer = make_direct_transfer(
+        identifier=2,
+        nonce=transfer.nonce + 1,
+        token=TOKEN_ADDRESS,
+        channel=CHANNEL_ADDRESS,
+        transferred_amount=transfer.transferred_amount - 5,
+        recipient=node1.address,
+    )
+    node0.sign(negative_transfer)
+    data = negative_transfer.encode()
+    echohash = sha3(data + node1.address)
+    protocol.receive_message(data, echohash, negative_transfer)
+
+    assert node1.messages == [transfer]
+    assert echohash in protocol.receivedhashes_to_acks
+    assert node1.channel.get_next_partner_nonce() == transfer.nonce + 1
+
+    stop_nodes(node0, node1)
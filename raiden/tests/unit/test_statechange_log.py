@@ -1,13 +1,22 @@
 import os
 import sqlite3
+from collections import defaultdict
+
 import pytest
 
+from raiden.event_handler import StateMachineEventHandler
 from raiden.tests.utils import factories
 from raiden.tests.utils.log import get_all_state_events
+from raiden.transfer.architecture import StateManager
 from raiden.transfer.events import EventTransferSentFailed
 from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
-from raiden.transfer.mediated_transfer.state_change import ContractReceiveWithdraw
-from raiden.transfer.state_change import Block, ActionRouteChange
+from raiden.transfer.mediated_transfer import target
+from raiden.transfer.mediated_transfer.state_change import (
+    ActionInitTarget,
+    ContractReceiveWithdraw,
+    ReceiveSecretReveal,
+)
+from raiden.transfer.state_change import ActionTransferDirect, Block, ActionRouteChange
 from raiden.transfer.state import RouteState
 
 
@@ -81,3 +90,147 @@ def test_write_read_events(tmpdir, in_memory_database):
     assert(logged_events[0].identifier == 1)
     assert(logged_events[0].state_change_id == 1)
     assert(isinstance(logged_events[0].event_object, EventTransferSentFailed))
+
+
+def test_group_commit(tmpdir):
+    database_path = os.path.join(tmpdir.strpath, 'database.db')
+    storage = StateChangeLogSQLiteBackend(
+        database_path=database_path,
+        max_pending=3,
+        max_latency=3600,
+    )
+    log = StateChangeLog(storage_instance=storage)
+    reader = sqlite3.connect(database_path)
+
+    def durable_state_changes():
+        return reader.execute('SELECT count(*) FROM state_changes').fetchone()[0]
+
+    assert log.log(Block(1)) == 1
+    assert log.log(Block(2)) == 2
+
+    # the pending writes are visible to the log but not durable
+    assert isinstance(log.get_state_change_by_id(2), Block)
+    assert durable_state_changes() == 0
+
+    # size threshold
+    log.log_events(2, [EventTransferSentFailed(1, 'whatever')], 2)
+    assert durable_state_changes() == 2
+
+    log.log(Block(3))
+    assert durable_state_changes() == 2
+
+    # durability barrier
+    log.flush()
+    assert durable_state_changes() == 3
+    assert storage.pending == 0
+
+
+def test_group_commit_latency(tmpdir):
+    database_path = os.path.join(tmpdir.strpath, 'database.db')
+    storage = StateChangeLogSQLiteBackend(
+        database_path=database_path,
+        max_pending=100,
+        max_latency=0,
+    )
+    log = StateChangeLog(storage_instance=storage)
+    reader = sqlite3.connect(database_path)
+
+    log.log(Block(1))
+    assert reader.execute('SELECT count(*) FROM state_changes').fetchone()[0] == 1
+    assert reader.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_snapshot_compaction(tmpdir):
+    log = init_database(tmpdir, in_memory_database=False)
+    event = EventTransferSentFailed(1, 'whatever')
+
+    for block_number in range(1, 5):
+        log.log(Block(block_number))
+    log.log_events(2, [event], 2)
+
+    log.snapshot(3, {'state': 3})
+    assert log.get_snapshot() == (3, {'state': 3})
+
+    # the state change 2 is referenced by an event, only its data is removed
+    rows = log.storage.conn.execute('SELECT id, data FROM state_changes').fetchall()
+    assert rows[0] == (2, None)
+    assert [row[0] for row in rows] == [2, 3, 4]
+
+    assert len(get_all_state_events(log)) == 1
+    replayed = [state_change.block_number for _, _, state_change in log.get_state_changes_after(3)]
+    assert replayed == [4]
+
+
+def test_identifier_column_migration(tmpdir):
+    database_path = os.path.join(tmpdir.strpath, 'database.db')
+    conn = sqlite3.connect(database_path)
+    conn.execute(
+        'CREATE TABLE state_changes (id integer primary key autoincrement, data binary)'
+    )
+    conn.execute("INSERT INTO state_changes(id, data) VALUES(null, 'old')")
+    conn.commit()
+    conn.close()
+
+    storage = StateChangeLogSQLiteBackend(database_path=database_path)
+    assert storage.last_statechange_id == 1
+    assert storage.write_state_change('new', 7) == 2
+    assert list(storage.get_state_changes_after(None)) == [(1, None, 'old'), (2, 7, 'new')]
+
+
+class Raiden(object):
+    def __init__(self, transaction_log):
+        self.transaction_log = transaction_log
+        self.identifier_to_statemanagers = defaultdict(list)
+        self.identifier_to_results = defaultdict(list)
+
+
+def test_replay_after_snapshot(tmpdir):
+    log = init_database(tmpdir, in_memory_database=False)
+    live = defaultdict(list)
+    our_address = factories.ADDR
+    block_number = 1
+    identifier = 0
+
+    def log_init():
+        from_route, from_transfer = factories.make_from(
+            1,
+            our_address,
+            block_number + factories.UNIT_REVEAL_TIMEOUT,
+        )
+        init = ActionInitTarget(our_address, from_route, from_transfer, block_number)
+        log.log(init, identifier)
+        manager = StateManager(target.state_transition, None)
+        manager.dispatch(init)
+        live[identifier].append(manager)
+
+    log_init()
+    log.snapshot(log.last_state_change_id, {'transfers': live})
+
+    block = Block(block_number + 1)
+    log.log(block)
+    for manager in live[identifier]:
+        manager.dispatch(block)
+
+    log_init()
+
+    # not dispatched to the state managers
+    log.log(ActionTransferDirect(identifier, 1, factories.UNIT_TOKEN_ADDRESS, factories.HOP1))
+
+    reveal = ReceiveSecretReveal(factories.UNIT_SECRET, factories.HOP6)
+    log.log(reveal, identifier)
+    for manager in live[identifier]:
+        manager.dispatch(reveal)
+
+    state_change_id, data = log.get_snapshot()
+    raiden = Raiden(log)
+    raiden.identifier_to_statemanagers = data['transfers']
+
+    handler = StateMachineEventHandler(raiden)
+    assert handler.replay(log.get_state_changes_after(state_change_id)) == 3
+
+    recovered = [
+        manager.current_state
+        for manager in raiden.identifier_to_statemanagers[identifier]
+    ]
+    assert recovered == [manager.current_state for manager in live[identifier]]
+    assert [state.state for state in recovered] == ['reveal_secret', 'reveal_secret']
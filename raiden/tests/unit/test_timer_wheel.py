@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from raiden.utils.timer_wheel import TimerWheel
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timer_wheel():
+    clock = Clock()
+    wheel = TimerWheel(1, size=4, clock=clock)
+
+    wheel.schedule(3, 'c')
+    wheel.schedule(1, 'a')
+    wheel.schedule(1.5, 'b')
+    # more than one turn
+    wheel.schedule(9, 'd')
+    assert len(wheel) == 4
+
+    assert wheel.expire(0.5) == []
+    assert wheel.expire(1) == ['a']
+    assert wheel.expire(3) == ['b', 'c']
+    assert len(wheel) == 1
+
+    assert wheel.expire(8) == []
+    assert wheel.expire(100) == ['d']
+    assert len(wheel) == 0
+
+    # deadlines in the past expire on the next tick
+    wheel.schedule(0, 'late')
+    assert wheel.expire(100) == []
+    assert wheel.expire(101) == ['late']
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import gevent
+import pytest
+from pyethapp.rpc_client import JSONRPCClient
+
+from raiden.network.rpc.client import (
+    JSONRPCPollTimeoutException,
+    TransactionManager,
+    wait_mined,
+)
+from raiden.tests.utils.factories import make_address, make_privkey_address
+from raiden.tests.utils.jsonrpc import JSONRPCNodeMock
+
+ABI = [
+    {
+        'type': 'function',
+        'name': 'settle',
+        'constant': False,
+        'inputs': [],
+        'outputs': [],
+    },
+]
+GAS = 50000
+POLL_INTERVAL = 0.001
+
+
+def make_client(node, privkey=None):
+    if privkey is None:
+        privkey, _ = make_privkey_address()
+
+    return JSONRPCClient(privkey=privkey.secret, transport=node, print_communication=False)
+
+
+def test_transaction_manager_pipeline():
+    node = JSONRPCNodeMock()
+    client = make_client(node)
+    manager = TransactionManager(client, poll_interval=POLL_INTERVAL)
+    proxies = [client.new_contract_proxy(ABI, make_address()) for _ in range(5)]
+
+    # the transactions are sent without waiting for the previous ones
+    results = [manager.transact(proxy.settle, startgas=GAS) for proxy in proxies]
+    assert [transaction.nonce for transaction in node.pending_transactions] == range(5)
+    assert node.requests['eth_getTransactionCount'] == 1
+
+    gevent.sleep(POLL_INTERVAL * 5)
+    assert not any(result.ready() for result in results)
+
+    # the receipts of all the transactions are polled with one message
+    transaction_hashes = [
+        transaction.hash.encode('hex')
+        for transaction in node.pending_transactions
+    ]
+    messages = node.messages
+    node.mine()
+    gevent.sleep(POLL_INTERVAL * 5)
+    assert all(result.ready() for result in results)
+    assert node.messages - messages <= 5
+
+    mined = [result.get() for result in results]
+    assert [transaction.transaction_hash for transaction in mined] == transaction_hashes
+    assert not any(transaction.threw for transaction in mined)
+    assert manager.receipts_poller is None
+
+    # a transaction that uses all the gas threw
+    result = manager.transact(proxies[0].settle, startgas=GAS)
+    node.mine(threw=True)
+    assert result.get(timeout=1).threw
+
+
+def test_transaction_manager_nonce_out_of_sync():
+    node = JSONRPCNodeMock()
+    privkey, _ = make_privkey_address()
+    manager = TransactionManager(make_client(node, privkey), poll_interval=POLL_INTERVAL)
+    other_manager = TransactionManager(make_client(node, privkey), poll_interval=POLL_INTERVAL)
+    proxy = manager.client.new_contract_proxy(ABI, make_address())
+
+    manager.transact(proxy.settle, startgas=GAS)
+
+    # the account is used by another client, the nonce is queried again
+    other_manager.transact(proxy.settle, startgas=GAS)
+    manager.transact(proxy.settle, startgas=GAS)
+
+    assert [transaction.nonce for transaction in node.pending_transactions] == [0, 1, 2]
+    assert manager.nonce == 3
+    assert node.requests['eth_getTransactionCount'] == 3
+
+
+def test_transaction_manager_dropped_transaction():
+    node = JSONRPCNodeMock()
+    manager = TransactionManager(make_client(node), poll_interval=POLL_INTERVAL)
+    proxy = manager.client.new_contract_proxy(ABI, make_address())
+
+    dropped_result = manager.transact(proxy.settle, startgas=GAS)
+    queued_result = manager.transact(proxy.settle, startgas=GAS)
+    dropped, queued = node.pending_transactions
+
+    # the following transaction is not rejected, it waits behind the gap
+    node.drop(dropped)
+    node.mine()
+    assert node.queued_transactions == [queued]
+
+    with pytest.raises(JSONRPCPollTimeoutException):
+        wait_mined(dropped_result, timeout=POLL_INTERVAL * 5)
+
+    gevent.sleep(POLL_INTERVAL * 5)
+    assert dropped.hash.encode('hex') not in manager.transactionhash_to_pending
+
+    # the nonce is checked against the node and the gap is filled
+    result = manager.transact(proxy.settle, startgas=GAS)
+    assert [transaction.nonce for transaction in node.pending_transactions] == [0, 1]
+    assert node.queued_transactions == []
+
+    node.mine()
+    assert wait_mined(result, timeout=1)
+    assert wait_mined(queued_result, timeout=1)
+    assert manager.receipts_poller is None
+
@@ -393,6 +393,56 @@ def test_state_wait_unlock_invalid():
     assert_state_equal(current_state, before_state)
 
 
+def test_state_wait_unlock_other_part():
+    """ A secret reveal for the lock of another part must not unlock. """
+    identifier = 1
+    amount = factories.UNIT_TRANSFER_AMOUNT
+    block_number = 1
+    mediator_address = factories.HOP1
+    target_address = factories.HOP2
+    our_address = factories.ADDR
+    secret_generator = SequenceGenerator()
+    token = factories.UNIT_TOKEN_ADDRESS
+
+    routes = [factories.make_route(mediator_address, available_balance=amount)]
+    current_state = make_initiator_state(
+        routes,
+        target_address,
+        block_number=block_number,
+        our_address=our_address,
+        secret_generator=secret_generator,
+        identifier=identifier,
+        token=token,
+    )
+
+    secret = secret_generator.secrets[0]
+    assert secret != factories.UNIT_SECRET
+
+    current_state.revealsecret = SendRevealSecret(
+        identifier,
+        secret,
+        token,
+        target_address,
+        our_address,
+    )
+
+    before_state = deepcopy(current_state)
+
+    initiator_state_machine = StateManager(
+        initiator.state_transition,
+        current_state,
+    )
+
+    state_change = ReceiveSecretReveal(
+        secret=factories.UNIT_SECRET,
+        sender=mediator_address,
+    )
+    events = initiator_state_machine.dispatch(state_change)
+    assert len(events) == 0
+    assert initiator_state_machine.current_state.revealsecret is not None
+    assert_state_equal(initiator_state_machine.current_state, before_state)
+
+
 def test_refund_transfer_next_route():
     identifier = 1
     amount = factories.UNIT_TRANSFER_AMOUNT
@@ -419,6 +469,7 @@ def test_refund_transfer_next_route():
         our_address,
         target_address,
         block_number + factories.UNIT_SETTLE_TIMEOUT,
+        hashlock=current_state.transfer.hashlock,
     )
 
     state_change = ReceiveTransferRefund(
@@ -469,6 +520,7 @@ def test_refund_transfer_no_more_routes():
         our_address,
         target_address,
         block_number + factories.UNIT_SETTLE_TIMEOUT,
+        hashlock=current_state.transfer.hashlock,
     )
 
     state_change = ReceiveTransferRefund(
@@ -513,6 +565,7 @@ def test_refund_transfer_invalid_sender():
         our_address,
         target_address,
         block_number + factories.UNIT_SETTLE_TIMEOUT,
+        hashlock=current_state.transfer.hashlock,
     )
 
     state_change = ReceiveTransferRefund(
@@ -534,6 +587,57 @@ def test_refund_transfer_invalid_sender():
     assert_state_equal(initiator_state_machine.current_state, prior_state)
 
 
+def test_refund_transfer_other_part():
+    """ The parts of a transfer share the identifier, a refund for the lock of
+    another part must not cancel the route.
+    """
+    identifier = 1
+    amount = factories.UNIT_TRANSFER_AMOUNT
+    block_number = 1
+    mediator_address = factories.HOP1
+    target_address = factories.HOP2
+    our_address = factories.ADDR
+
+    routes = [
+        factories.make_route(mediator_address, available_balance=amount),
+        factories.make_route(factories.HOP3, available_balance=amount),
+    ]
+    current_state = make_initiator_state(
+        routes,
+        target_address,
+        block_number=block_number,
+        our_address=our_address,
+        secret_generator=SequenceGenerator(),
+        identifier=identifier,
+    )
+    assert current_state.transfer.hashlock != factories.UNIT_HASHLOCK
+
+    transfer = factories.make_transfer(
+        amount,
+        our_address,
+        target_address,
+        block_number + factories.UNIT_SETTLE_TIMEOUT,
+        hashlock=factories.UNIT_HASHLOCK,
+        identifier=identifier,
+    )
+
+    state_change = ReceiveTransferRefund(
+        sender=mediator_address,
+        transfer=transfer,
+    )
+
+    prior_state = deepcopy(current_state)
+
+    initiator_state_machine = StateManager(
+        initiator.state_transition,
+        current_state,
+    )
+
+    events = initiator_state_machine.dispatch(state_change)
+    assert len(events) == 0
+    assert_state_equal(initiator_state_machine.current_state, prior_state)
+
+
 def test_cancel_transfer():
     identifier = 1
     amount = factories.UNIT_TRANSFER_AMOUNT
@@ -2,9 +2,11 @@
 # pylint: disable=invalid-name,too-many-locals,too-many-arguments,too-many-lines
 from __future__ import division
 
+import cPickle as pickle
+
 import pytest
 
-from raiden.transfer.architecture import StateManager
+from raiden.transfer.architecture import copy_state, StateManager
 from raiden.transfer.state import (
     RoutesState,
 )
@@ -16,7 +18,9 @@ from raiden.transfer.mediated_transfer.state import (
 )
 from raiden.transfer.mediated_transfer.state_change import (
     ActionInitMediator,
+    ReceiveSecretReveal,
 )
+from raiden.transfer.state_change import Block
 from raiden.transfer.mediated_transfer.events import (
     ContractSendChannelClose,
     ContractSendWithdraw,
@@ -1081,6 +1085,44 @@ def test_events_for_withdraw_channel_open():
     assert len(events) == 0
 
 
+def test_next_deadline():
+    """ The mediator must be woken up at the first block that changes it. """
+    transfers_pair = make_transfers_pair(
+        factories.HOP1,
+        [factories.HOP2, factories.HOP3],
+        factories.HOP6,
+        amount=10,
+        secret=factories.UNIT_SECRET,
+    )
+    pair = transfers_pair[0]
+
+    state = MediatorState(
+        factories.ADDR,
+        RoutesState([]),
+        1,
+        factories.UNIT_HASHLOCK,
+    )
+    state.transfers_pair = transfers_pair
+
+    # the payee lock expires first
+    assert mediator.next_deadline(state) == pair.payee_transfer.expiration + 1
+
+    pair.payee_state = 'payee_expired'
+    assert mediator.next_deadline(state) == pair.payer_transfer.expiration + 1
+
+    # the payee was paid, the channel must be closed in the unsafe region
+    pair.payee_state = 'payee_balance_proof'
+    first_unsafe_block = pair.payer_transfer.expiration - pair.payer_route.reveal_timeout
+    assert mediator.next_deadline(state) == first_unsafe_block
+
+    # the withdraw is done with every block
+    pair.payer_route.state = CHANNEL_STATE_CLOSED
+    assert mediator.next_deadline(state) == state.block_number + 1
+
+    pair.payer_state = 'payer_contract_withdraw'
+    assert mediator.next_deadline(state) is None
+
+
 def test_secret_learned():
     from_route, from_transfer = factories.make_from(
         amount=factories.UNIT_TRANSFER_AMOUNT,
@@ -1109,12 +1151,17 @@ def test_secret_learned():
     )
     transfer_pair = iteration.new_state.transfers_pair[0]
 
+    # the secret is set in copies of the transfers
+    assert from_transfer.secret is None
+    from_transfer_with_secret = copy_state(from_transfer)
+    from_transfer_with_secret.secret = secret
+
     assert from_transfer.expiration > transfer_pair.payee_transfer.expiration
-    assert transfer_pair.payee_transfer.almost_equal(from_transfer)
+    assert transfer_pair.payee_transfer.almost_equal(from_transfer_with_secret)
     assert transfer_pair.payee_route == routes[0]
 
     assert transfer_pair.payer_route == from_route
-    assert transfer_pair.payer_transfer == from_transfer
+    assert transfer_pair.payer_transfer == from_transfer_with_secret
 
     assert iteration.new_state.secret == secret
     assert transfer_pair.payee_transfer.secret == secret
@@ -1222,6 +1269,53 @@ def test_init_mediator():
     assert mediated_transfer.hashlock == from_transfer.hashlock, 'wrong hashlock'
 
 
+def test_dispatch_does_not_modify_the_old_state():
+    """ The state transitions copy the changed nodes, the previous state is
+    never modified.
+    """
+    from_route, from_transfer = factories.make_from(
+        amount=factories.UNIT_TRANSFER_AMOUNT,
+        target=factories.HOP2,
+        from_expiration=factories.HOP1_TIMEOUT,
+    )
+
+    routes = [
+        factories.make_route(factories.HOP2, available_balance=factories.UNIT_TRANSFER_AMOUNT),
+    ]
+
+    init_state_change = make_init_statechange(
+        from_transfer,
+        from_route,
+        routes,
+    )
+
+    mediator_state_machine = StateManager(
+        mediator.state_transition,
+        None,
+    )
+    mediator_state_machine.dispatch(init_state_change)
+
+    old_state = mediator_state_machine.current_state
+    old_state_copy = pickle.loads(pickle.dumps(old_state, -1))
+
+    block_number = init_state_change.block_number + 1
+    mediator_state_machine.dispatch(Block(block_number))
+    mediator_state_machine.dispatch(ReceiveSecretReveal(factories.UNIT_SECRET, factories.HOP2))
+
+    new_state = mediator_state_machine.current_state
+    assert new_state.block_number == block_number
+    assert new_state.secret == factories.UNIT_SECRET
+    assert new_state.transfers_pair[0].payee_state == 'payee_balance_proof'
+    assert new_state.transfers_pair[0].payer_transfer.secret == factories.UNIT_SECRET
+
+    assert old_state == old_state_copy
+    assert old_state.secret is None
+    assert old_state.transfers_pair[0].payer_transfer.secret is None
+
+    # the unchanged nodes are shared
+    assert new_state.transfers_pair[0].payee_route is old_state.transfers_pair[0].payee_route
+
+
 def test_no_valid_routes():
     from_route, from_transfer = factories.make_from(
         amount=factories.UNIT_TRANSFER_AMOUNT,
@@ -317,6 +317,36 @@ def test_handle_block_lower_block_number():
     assert iteration.new_state.block_number == block_number
 
 
+def test_next_deadline():
+    """ The target must be woken up at the first block that changes it. """
+    initiator = factories.HOP6
+    our_address = factories.ADDR
+    amount = 3
+    block_number = 1
+    expire = block_number + 2 * factories.UNIT_REVEAL_TIMEOUT
+
+    state = make_target_state(
+        our_address,
+        amount,
+        block_number,
+        initiator,
+        expire,
+    )
+
+    # the lock expires without the secret
+    assert target.next_deadline(state) == expire + 1
+
+    # the channel is closed at the first unsafe block
+    state.from_transfer.secret = factories.UNIT_SECRET
+    assert target.next_deadline(state) == expire - factories.UNIT_REVEAL_TIMEOUT
+
+    state.block_number = expire
+    assert target.next_deadline(state) == expire + 1
+
+    state.state = 'waiting_close'
+    assert target.next_deadline(state) is None
+
+
 def test_clear_if_finalized_payed():
     """ Clear if the transfer is paid with a proof. """
     initiator = factories.HOP6
@@ -412,7 +442,7 @@ def test_state_transition():
     assert reveal_iteration.new_state.from_transfer.secret == factories.UNIT_SECRET
 
     second_new_block = Block(block_number + 2)
-    second_block_iteration = target.state_transition(init_transition.new_state, second_new_block)
+    second_block_iteration = target.state_transition(reveal_iteration.new_state, second_new_block)
     assert second_block_iteration.new_state.block_number == block_number + 2
 
     nonce = 11
@@ -436,7 +466,7 @@ def test_state_transition():
         balance_proof,
     )
     proof_iteration = target.state_transition(
-        init_transition.new_state,
+        second_block_iteration.new_state,
         balance_proof_state_change,
     )
     assert proof_iteration.new_state is None
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from collections import Counter
+
+import gevent
+import rlp
+from ethereum.abi import decode_abi, encode_abi
+from ethereum.transactions import Transaction
+from ethereum.utils import sha3
+from pyethapp.jsonrpc import (
+    address_decoder,
+    address_encoder,
+    data_decoder,
+    data_encoder,
+    quantity_encoder,
+)
+from pyethapp.rpc_client import JSONRPCClientReplyError, topic_encoder
+
+from raiden.network.rpc.client import BlockChainService
+
+
+class JSONRPCClientMock(object):
+    """ In memory stand-in for the JSON-RPC client, it serves the logs and
+    filters methods used to poll the blockchain events and the new blocks.
+
+    Every request is counted by method in `requests`, a non zero `latency`
+    is added to the `elapsed` time of each request, the round trips are not
+    really made.
+    """
+
+    def __init__(self, block_number=0, latency=0):
+        self.block_number = block_number
+        self.latency = latency
+        self.elapsed = 0
+        self.requests = Counter()
+
+        self.logs = list()
+        self.filters = dict()
+
+    def call(self, method, *args):
+        self.requests[method] += 1
+        self.elapsed += self.latency
+        return getattr(self, method)(*args)
+
+    def blocknumber(self):
+        return int(self.call('eth_blockNumber'), 16)
+
+    def next_block(self):
+        self.block_number += 1
+
+    def add_log(self, contract_address, translator, event_id, *args):
+        """ Emit the event `event_id` of `translator` from `contract_address`
+        in the current block, the events must not have indexed arguments.
+        """
+        event = translator.event_data[event_id]
+        assert not any(event['indexed'])
+
+        self.logs.append({
+            'address': address_encoder(contract_address),
+            'topics': [topic_encoder(event_id)],
+            'data': data_encoder(encode_abi(event['types'], args)),
+            'blockNumber': quantity_encoder(self.block_number),
+        })
+
+    def eth_blockNumber(self):  # pylint: disable=invalid-name
+        return quantity_encoder(self.block_number)
+
+    def eth_getLogs(self, json_data):  # pylint: disable=invalid-name
+        addresses = json_data['address']
+        if not isinstance(addresses, list):
+            addresses = [addresses]
+
+        return self._matching_logs(
+            self.logs,
+            set(addresses),
+            json_data.get('topics'),
+            int(json_data['fromBlock'], 16),
+            int(json_data['toBlock'], 16),
+        )
+
+    def eth_newFilter(self, json_data):  # pylint: disable=invalid-name
+        filter_id = quantity_encoder(len(self.filters))
+
+        # a filter reports the logs created after its installation
+        self.filters[filter_id] = (json_data, len(self.logs))
+
+        return filter_id
+
+    def eth_newBlockFilter(self):  # pylint: disable=invalid-name
+        filter_id = quantity_encoder(len(self.filters))
+        self.filters[filter_id] = (None, self.block_number)
+        return filter_id
+
+    def eth_getFilterChanges(self, filter_id):  # pylint: disable=invalid-name
+        if filter_id not in self.filters:
+            raise JSONRPCClientReplyError('filter not found')
+
+        json_data, position = self.filters[filter_id]
+
+        # the block filters report the hashes of the new blocks
+        if json_data is None:
+            self.filters[filter_id] = (None, self.block_number)
+            return [
+                data_encoder(sha3(str(block_number)))
+                for block_number in range(position + 1, self.block_number + 1)
+            ]
+
+        self.filters[filter_id] = (json_data, len(self.logs))
+
+        return self._matching_logs(
+            self.logs[position:],
+            set([json_data['address']]),
+            json_data.get('topics'),
+            0,
+            self.block_number,
+        )
+
+    def eth_uninstallFilter(self, filter_id):  # pylint: disable=invalid-name
+        return self.filters.pop(filter_id, None) is not None
+
+    @staticmethod
+    def _matching_logs(logs, addresses, topics, from_block, to_block):
+        return [
+            log_event
+            for log_event in logs
+            if (
+                log_event['address'] in addresses and
+                from_block <= int(log_event['blockNumber'], 16) <= to_block and
+                (not topics or log_event['topics'][0] in topics)
+            )
+        ]
+
+
+class BlockChainServiceMock(BlockChainService):
+    """ BlockChainService on top of a JSONRPCClientMock, once started it mines
+    a block every `block_time` seconds and records in `mined_at` the time each
+    block was mined.
+
+    The blocks of the client mock don't have timestamps, `block_time` is the
+    estimated block time.
+    """
+
+    def __init__(self, client, block_time):  # pylint: disable=super-init-not-called
+        self.client = client
+        self.block_time = block_time
+        self.mined_at = dict()
+        self.miner = None
+
+    def estimate_blocktime(self, oldest=256):
+        return self.block_time
+
+    def start_mining(self):
+        self.miner = gevent.spawn(self._mine)
+
+    def stop_mining(self):
+        self.miner.kill()
+
+    def _mine(self):
+        while True:
+            gevent.sleep(self.block_time)
+            self.client.next_block()
+            self.mined_at[self.client.block_number] = time.time()
+
+
+class JSONRPCNodeMock(object):
+    """ Replies to JSON-RPC messages, single requests and JSON-RPC 2.0
+    batches, with the state of the contracts and transactions registered in
+    it.
+
+    It can be used as the transport of a JSONRPCClient, every message is
+    counted in `messages` and every request by method in `requests`.
+
+    The raw transactions are pending until `mine` is called, they use half
+    of their startgas, or all of it if they threw. A transaction with a nonce
+    ahead of the sender's transaction count is queued until the gap is
+    filled, `drop` evicts a pending transaction and opens such a gap.
+    """
+
+    def __init__(self):
+        self.address_to_contract = dict()
+        self.transactions = dict()
+        self.pending_transactions = list()
+        self.queued_transactions = list()
+        self.sender_to_nonce = Counter()
+        self.block_number = 0
+        self.messages = 0
+        self.requests = Counter()
+
+    def add_contract(self, address, translator, **functions):
+        """ Register a contract, the keyword arguments map the name of each
+        constant function to a callable returning its outputs.
+        """
+        prefix_to_function = {
+            description['prefix']: (name, description)
+            for name, description in translator.function_data.items()
+            if name in functions
+        }
+        self.address_to_contract[address] = (prefix_to_function, functions)
+
+    def add_transaction(self, transaction_hash, gas, gas_used):
+        self.transactions[data_encoder(transaction_hash)] = (gas, gas_used, self.block_number)
+
+    def mine(self, threw=False):
+        self.block_number += 1
+
+        for transaction in self.pending_transactions:
+            gas_used = transaction.startgas if threw else transaction.startgas // 2
+            self.add_transaction(transaction.hash, transaction.startgas, gas_used)
+
+        self.pending_transactions = list()
+
+    def drop(self, transaction):
+        """ Evict the pending `transaction`, the following transactions of
+        its sender are queued until the nonce is used again.
+        """
+        sender = transaction.sender
+        self.sender_to_nonce[sender] = transaction.nonce
+
+        pending_transactions = list()
+        for pending in self.pending_transactions:
+            if pending.sender != sender or pending.nonce < transaction.nonce:
+                pending_transactions.append(pending)
+            elif pending is not transaction:
+                self.queued_transactions.append(pending)
+
+        self.pending_transactions = pending_transactions
+
+    def send_message(self, message, expect_reply=True):
+        self.messages += 1
+        request = json.loads(message)
+
+        if isinstance(request, list):
+            reply = [self.reply(item) for item in request]
+        else:
+            reply = self.reply(request)
+
+        if expect_reply:
+            return json.dumps(reply)
+
+    def reply(self, request):
+        method = request['method']
+        self.requests[method] += 1
+
+        response = {
+            'jsonrpc': '2.0',
+            'id': request['id'],
+        }
+
+        try:
+            response['result'] = getattr(self, method)(*request['params'])
+        except (AttributeError, KeyError, ValueError) as error:
+            response['error'] = {'code': -32000, 'message': str(error)}
+
+        return response
+
+    def eth_getCode(self, address, block):  # pylint: disable=invalid-name,unused-argument
+        if address_decoder(address) in self.address_to_contract:
+            return '0x6060'
+        return '0x'
+
+    def eth_call(self, json_data, block):  # pylint: disable=invalid-name,unused-argument
+        contract = self.address_to_contract.get(data_decoder(json_data['to']))
+
+        # calls to an address without code return no data
+        if contract is None:
+            return '0x'
+
+        prefix_to_function, functions = contract
+        data = data_decoder(json_data['data'])
+        prefix = int(data[:4].encode('hex'), 16)
+
+        name, description = prefix_to_function[prefix]
+        args = decode_abi(description['encode_types'], data[4:])
+        outputs = functions[name](*args)
+
+        if len(description['decode_types']) == 1:
+            outputs = [outputs]
+
+        return data_encoder(encode_abi(description['decode_types'], outputs))
+
+    def eth_getTransactionByHash(self, transaction_hash):  # pylint: disable=invalid-name
+        gas, _, _ = self.transactions[transaction_hash]
+        return {'hash': transaction_hash, 'gas': quantity_encoder(gas)}
+
+    def eth_getTransactionReceipt(self, transaction_hash):  # pylint: disable=invalid-name
+        if transaction_hash not in self.transactions:
+            return None
+
+        _, gas_used, block_number = self.transactions[transaction_hash]
+        return {
+            'transactionHash': transaction_hash,
+            'gasUsed': quantity_encoder(gas_used),
+            'blockNumber': quantity_encoder(block_number),
+        }
+
+    def eth_getTransactionCount(self, address, block):
+        # pylint: disable=invalid-name,unused-argument
+        return quantity_encoder(self.sender_to_nonce[address_decoder(address)])
+
+    def eth_sendRawTransaction(self, data):  # pylint: disable=invalid-name
+        transaction = rlp.decode(data_decoder(data), Transaction)
+
+        sender = transaction.sender
+
+        if transaction.nonce < self.sender_to_nonce[sender]:
+            raise ValueError('nonce too low')
+
+        self.queued_transactions.append(transaction)
+
+        # promote the queued transactions that follow the transaction count
+        promoted = True
+        while promoted:
+            promoted = False
+
+            for queued in list(self.queued_transactions):
+                if queued.sender == sender and queued.nonce == self.sender_to_nonce[sender]:
+                    self.queued_transactions.remove(queued)
+                    self.pending_transactions.append(queued)
+                    self.sender_to_nonce[sender] += 1
+                    promoted = True
+
+        return data_encoder(transaction.hash)
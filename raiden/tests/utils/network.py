@@ -7,6 +7,13 @@ from ethereum import slogging
 
 from raiden.app import App
 from raiden.network.transport import DummyPolicy
+from raiden.settings import (
+    DEFAULT_PROTOCOL_ACK_COALESCING_WINDOW,
+    DEFAULT_PROTOCOL_HASH_RETENTION,
+    DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE,
+    DEFAULT_PROTOCOL_RECOVERY_POOL_SIZE,
+    DEFAULT_PROTOCOL_SEND_WINDOW,
+)
 from raiden.utils import privatekey_to_address
 from raiden.tests.utils import OwnedNettingChannel
 
@@ -297,6 +304,11 @@ def create_apps(
                 'nat_invitation_timeout': nat_invitation_timeout,
                 'nat_keepalive_retries': nat_keepalive_retries,
                 'nat_keepalive_timeout': nat_keepalive_timeout,
+                'recovery_pool_size': DEFAULT_PROTOCOL_RECOVERY_POOL_SIZE,
+                'recovery_batch_size': DEFAULT_PROTOCOL_RECOVERY_BATCH_SIZE,
+                'hash_retention': DEFAULT_PROTOCOL_HASH_RETENTION,
+                'ack_coalescing_window': DEFAULT_PROTOCOL_ACK_COALESCING_WINDOW,
+                'send_window': DEFAULT_PROTOCOL_SEND_WINDOW,
             },
             'rpc': True,
             'console': False,
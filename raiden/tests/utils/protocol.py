@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+""" Utilities to run RaidenProtocol instances without a blockchain. """
+from raiden.channel import BalanceProof, Channel, ChannelEndState, ChannelExternalState
+from raiden.message_handler import RaidenMessageHandler
+from raiden.network.protocol import RaidenProtocol
+from raiden.network.transport import DummyTransport
+from raiden.tests.utils.factories import make_privkey_address
+from raiden.transfer.log import StateChangeLog, StateChangeLogSQLiteBackend
+
+TOKEN_ADDRESS = 'tokentokentokentoken'
+CHANNEL_ADDRESS = 'channelchannelchanne'
+
+
+class ProtocolNode(object):
+    """ The parts of RaidenService used by RaidenProtocol, the received
+    messages are stored in `messages`.
+    """
+
+    def __init__(
+            self,
+            discovery,
+            host,
+            port,
+            retry_interval=0.5,
+            retries_before_backoff=2,
+            nat_keepalive_retries=2,
+            nat_keepalive_timeout=5,
+            nat_invitation_timeout=5,
+            **kwargs):
+
+        self.private_key, self.address = make_privkey_address()
+        self.messages = list()
+
+        transport = DummyTransport(host, port)
+        self.protocol = RaidenProtocol(
+            transport,
+            discovery,
+            self,
+            retry_interval,
+            retries_before_backoff,
+            nat_keepalive_retries,
+            nat_keepalive_timeout,
+            nat_invitation_timeout,
+            **kwargs
+        )
+        transport.protocol = self.protocol
+
+        discovery.register(self.address, host, port)
+
+    def sign(self, message):
+        message.sign(self.private_key, self.address)
+
+    def on_message(self, message, echohash):  # pylint: disable=unused-argument
+        self.messages.append(message)
+
+
+class NettingChannelMock(object):
+    address = CHANNEL_ADDRESS
+
+
+class ChannelGraphMock(object):
+    def __init__(self, channel):
+        self.partneraddress_to_channel = {channel.partner_state.address: channel}
+
+    def has_channel(self, our_address, partner_address):  # pylint: disable=unused-argument
+        return partner_address in self.partneraddress_to_channel
+
+
+class RecordingEventHandler(object):
+    """ Records the state changes dispatched to the state machines. """
+
+    def __init__(self):
+        self.dispatched = list()
+
+    def log_and_dispatch_by_identifier(self, identifier, state_change):
+        self.dispatched.append((identifier, state_change))
+
+
+class ChannelNode(ProtocolNode):
+    """ A ProtocolNode with a netting channel, the received messages are
+    handled by the RaidenMessageHandler, so the envelope messages are
+    validated by the Channel as in the RaidenService.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.channel = None
+        kwargs.setdefault('expected_nonce', self.get_expected_nonce)
+        super(ChannelNode, self).__init__(*args, **kwargs)
+
+        self.token_to_channelgraph = dict()
+        self.state_machine_event_handler = RecordingEventHandler()
+        self.transaction_log = StateChangeLog(
+            storage_instance=StateChangeLogSQLiteBackend(database_path=':memory:'),
+        )
+        self.message_handler = RaidenMessageHandler(self)
+
+    def open_channel(self, partner_address, balance=1000, partner_balance=1000):
+        self.channel = Channel(
+            ChannelEndState(self.address, balance, BalanceProof(None)),
+            ChannelEndState(partner_address, partner_balance, BalanceProof(None)),
+            ChannelExternalState(None, NettingChannelMock(), blocks=(1, 0, 0)),
+            TOKEN_ADDRESS,
+            reveal_timeout=10,
+            settle_timeout=50,
+        )
+        self.token_to_channelgraph[TOKEN_ADDRESS] = ChannelGraphMock(self.channel)
+
+    def create_directtransfer(self, amount, identifier):
+        """ Return a signed DirectTransfer registered with the channel. """
+        transfer = self.channel.create_directtransfer(amount, identifier)
+        self.sign(transfer)
+        self.channel.register_transfer(self.get_block_number(), transfer)
+        return transfer
+
+    def get_block_number(self):  # pylint: disable=no-self-use
+        return 1
+
+    def get_expected_nonce(self, sender, channel_address):
+        channel = self.channel
+
+        if channel is None or channel_address != channel.channel_address:
+            return None
+
+        if sender != channel.partner_state.address:
+            return None
+
+        return channel.get_next_partner_nonce()
+
+    def on_message(self, message, echohash):
+        self.message_handler.on_message(message, echohash)
+        super(ChannelNode, self).on_message(message, echohash)
@@ -31,6 +31,7 @@ from raiden.blockchain.abi import (
     CONTRACT_NETTING_CHANNEL,
     CONTRACT_REGISTRY,
 
+    EVENT_ADDRESS_REGISTERED,
     EVENT_CHANNEL_NEW,
     EVENT_TOKEN_ADDED,
 )
@@ -216,6 +217,20 @@ class FilterTesterMock(object):
         self.events = list()
 
 
+class BlockFilterTesterMock(object):
+    def __init__(self, tester_state):
+        self.tester_state = tester_state
+        self.last_block_number = tester_state.block.number
+
+    def changes(self):
+        blocks = self.tester_state.blocks[self.last_block_number + 1:]
+        self.last_block_number = self.tester_state.block.number
+        return [block.hash for block in blocks]
+
+    def uninstall(self):
+        pass
+
+
 class BlockChainServiceTesterMock(object):
     def __init__(self, private_key, tester_state, registry_address, **kwargs):
         self.tester_state = tester_state
@@ -246,6 +261,9 @@ class BlockChainServiceTesterMock(object):
     def estimate_blocktime(self, *args):  # pylint: disable=no-self-use
         return 1
 
+    def new_block_filter(self):
+        return BlockFilterTesterMock(self.tester_state)
+
     def token(self, token_address):
         """ Return a proxy to interact with an token. """
         if token_address not in self.address_to_token:
@@ -396,6 +414,12 @@ class DiscoveryTesterMock(object):
     def version(self):
         return self.proxy.contract_version()
 
+    def addressregistered_filter(self):
+        topics = [CONTRACT_MANAGER.get_event_id(EVENT_ADDRESS_REGISTERED)]
+        filter_ = FilterTesterMock(self.address, topics, next(FILTER_ID_GENERATOR))
+        self.tester_state.block.log_listeners.append(filter_.event)
+        return filter_
+
 
 class TokenTesterMock(object):
     def __init__(self, tester_state, private_key, address):
@@ -680,6 +704,13 @@ class NettingChannelTesterMock(object):
             data[2],
         ))
 
+    def detail_and_blocks(self, our_address):
+        detail = self.detail(our_address)
+        return detail, (self.opened(), self.closed(), self.settled())
+
+    def invalidate_balances(self):
+        """ The calls to the tester are not cached. """
+
     def close(self, nonce, transferred_amount, locksroot, extra_hash, signature):
         # this transaction may fail if there is a race to close the channel
 
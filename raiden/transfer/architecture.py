@@ -2,7 +2,7 @@
 # pylint: disable=too-few-public-methods
 import types
 from collections import namedtuple
-from copy import deepcopy
+from copy import copy
 
 TransitionResult = namedtuple('TransitionResult', ('new_state', 'events'))
 
@@ -24,6 +24,9 @@ TransitionResult = namedtuple('TransitionResult', ('new_state', 'events'))
 # from the WAL and must produce the same result.
 # - StateChange must be idenpotent because the partner node might be recovering
 # from a failure and a Event might be produced more than once.
+# - A state_transition function must not modify the current state tree, the
+# nodes that change are copied first (path copying) and the untouched
+# subtrees are shared by the old and the new state.
 #
 # Requirements that are enforced:
 # - A state_transition function must not produce a result that must be further
@@ -40,8 +43,8 @@ class State(object):
     identifiers.
     - State objects may be nested.
     - State classes don't have logic by design.
-    - Each iteration must operate on fresh copy of the state, treating the old
-          objects as immutable.
+    - Each iteration must treat the old objects as immutable, a node is
+          copied with `copy_state` before it's changed.
     - This class is used as a marker for states.
     """
     __slots__ = ()
@@ -83,6 +86,16 @@ class Event(object):
     __slots__ = ()
 
 
+def copy_state(state):
+    """ Return a shallow copy of `state`, the children are shared.
+
+    A state transition copies every node it changes together with the path
+    from the root to it, the containers in a copied node are shared too and
+    must be replaced instead of modified in place.
+    """
+    return copy(state)
+
+
 class StateManager(object):
     """ The mutable storage for the application state, this storage can do
     state transitions by applying the StateChanges to the current State.
@@ -120,13 +133,10 @@ class StateManager(object):
         """
         assert isinstance(state_change, StateChange)
 
-        # the state objects must be treated as immutable, so make a copy of the
-        # current state and pass the copy to the state machine to be modified.
-        next_state = deepcopy(self.current_state)
-
-        # update the current state by applying the change
+        # the state objects must be treated as immutable, the state machine
+        # copies the nodes it changes, so the current state is not copied here
         iteration = self.state_transition(
-            next_state,
+            self.current_state,
             state_change,
         )
 
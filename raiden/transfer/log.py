@@ -2,17 +2,25 @@
 import pickle
 import sqlite3
 import threading
+import time
 from abc import ABCMeta, abstractmethod
 from collections import namedtuple
 
+from raiden.settings import (
+    DEFAULT_LOG_GROUP_COMMIT_LATENCY,
+    DEFAULT_LOG_GROUP_COMMIT_SIZE,
+)
+
 InternalEvent = namedtuple(
     'InternalEvent',
     ('identifier', 'state_change_id', 'block_number', 'event_object'),
 )
 
+ArchivedTransfer = namedtuple(
+    'ArchivedTransfer',
+    ('identifier', 'task', 'state_change_id', 'block_number', 'events'),
+)
 
-# TODO:
-# - snapshots should be used to reduce the log file size
 
 class StateChangeLogSerializer(object):
     """ StateChangeLogSerializer
@@ -64,23 +72,64 @@ class StateChangeLogStorageBackend(object):
     def write_state_snapshot(self, statechange_id, data):
         pass
 
+    @abstractmethod
+    def write_transfer_archive(self, identifier, task, statechange_id, block_number, data):
+        pass
+
+    @abstractmethod
+    def compact(self, statechange_id):
+        pass
+
     @abstractmethod
     def read(self):
         pass
 
+    @abstractmethod
+    def flush(self):
+        pass
+
 
 class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
+    """ SQLite storage with group commit.
+
+    The writes are done inside a single open transaction which is committed
+    once `max_pending` writes are pending or the oldest pending write is older
+    than `max_latency` seconds. Until then the writes are visible through this
+    connection but are not durable, `flush` must be called before anything
+    that depends on them leaves the node. A `max_pending` of one commits every
+    write.
+    """
+
+    def __init__(
+            self,
+            database_path,
+            max_pending=DEFAULT_LOG_GROUP_COMMIT_SIZE,
+            max_latency=DEFAULT_LOG_GROUP_COMMIT_LATENCY):
 
-    def __init__(self, database_path):
         self.conn = sqlite3.connect(database_path)
         self.conn.text_factory = str
+
+        if database_path != ':memory:':
+            # With the write ahead log a commit is a sequential append, and
+            # with synchronous=FULL every commit is still fsync'ed, the group
+            # commit is what amortizes the fsync.
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=FULL')
+
+        self.conn.execute('PRAGMA temp_store=MEMORY')
         self.conn.execute("PRAGMA foreign_keys=ON")
         cursor = self.conn.cursor()
         cursor.execute(
             'CREATE TABLE IF NOT EXISTS state_changes ('
-            '    id integer primary key autoincrement, data binary'
+            '    id integer primary key autoincrement, data binary, identifier integer'
             ')'
         )
+        self._add_column(
+            cursor,
+            'state_changes',
+            'identifier',
+            'ALTER TABLE state_changes ADD COLUMN identifier integer',
+        )
         cursor.execute(
             'CREATE TABLE IF NOT EXISTS state_snapshot ('
             'identifier integer primary key, statechange_id integer, data binary, '
@@ -94,6 +143,23 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
             'FOREIGN KEY(source_statechange_id) REFERENCES state_changes(id)'
             ')'
         )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS state_events_source_statechange_id '
+            'ON state_events(source_statechange_id)'
+        )
+        # The state changes are not referenced by the archive, the compaction
+        # can remove them
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS transfers_archive ('
+            'identifier integer, task text NOT NULL, statechange_id integer NOT NULL, '
+            'block_number integer NOT NULL, data binary, '
+            'UNIQUE(statechange_id, identifier, task)'
+            ')'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS transfers_archive_block_number '
+            'ON transfers_archive(block_number)'
+        )
         self.conn.commit()
         self.sanity_check()
         # When writting to a table where the primary key is the identifier and we want
@@ -110,6 +176,25 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
         # condition.
         self.write_lock = threading.Lock()
 
+        self.max_pending = max_pending
+        self.max_latency = max_latency
+        self.pending = 0
+        self.pending_since = None
+
+        self.last_statechange_id = next(
+            self.conn.execute('SELECT MAX(id) FROM state_changes')
+        )[0]
+
+    @staticmethod
+    def _add_column(cursor, table, column, alter):
+        """ Adds `column` to a `table` created by an older version. """
+        columns = [
+            row[1]
+            for row in cursor.execute('PRAGMA table_info({})'.format(table))
+        ]
+        if column not in columns:
+            cursor.execute(alter)
+
     def sanity_check(self):
         """ Ensures that NUL character can be safely inserted and recovered
         from the database.
@@ -132,23 +217,28 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
 
         self.conn.rollback()
 
-    def write_state_change(self, data):
+    def write_state_change(self, data, identifier=None):
+        """ Write a state change, `identifier` is the transfer identifier
+        the state change was dispatched to, if any.
+        """
         with self.write_lock:
             cursor = self.conn.cursor()
             cursor.execute(
-                'INSERT INTO state_changes(id, data) VALUES(null,?)',
-                (data,)
+                'INSERT INTO state_changes(id, data, identifier) VALUES(null,?,?)',
+                (data, identifier)
             )
             last_id = cursor.lastrowid
-            self.conn.commit()
+            self.last_statechange_id = last_id
+            self._pending_write()
 
         return last_id
 
     def write_state_snapshot(self, statechange_id, data):
-        # TODO: Snapshotting is not yet implemented. This is just skeleton code
-        # Issue: https://github.com/raiden-network/raiden/issues/593
-        # This skeleton code assumes we only keep a single snapshot and overwrite it each time.
+        """ Write the snapshot of the state after `statechange_id` was
+        applied, only the latest snapshot is kept.
 
+        The snapshot and the pending writes are committed together.
+        """
         with self.write_lock:
             cursor = self.conn.cursor()
             cursor.execute(
@@ -157,7 +247,7 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
                 (1, statechange_id, data)
             )
             last_id = cursor.lastrowid
-            self.conn.commit()
+            self._commit()
 
         return last_id
 
@@ -166,13 +256,71 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
         list of tuples of the form:
         (None, source_statechange_id, block_number, serialized_event_data)
         """
-        cursor = self.conn.cursor()
-        cursor.executemany(
-            'INSERT INTO state_events('
-            'identifier, source_statechange_id, block_number, data) VALUES(?,?,?,?)',
-            events_data
-        )
+        with self.write_lock:
+            cursor = self.conn.cursor()
+            cursor.executemany(
+                'INSERT INTO state_events('
+                'identifier, source_statechange_id, block_number, data) VALUES(?,?,?,?)',
+                events_data
+            )
+            self._pending_write()
+
+    def write_transfer_archive(self, identifier, task, statechange_id, block_number, data):
+        """ Write the summary of a finished transfer task, the summary of a
+        task that finished with `statechange_id` is written only once.
+        """
+        with self.write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                'INSERT OR IGNORE INTO transfers_archive('
+                'identifier, task, statechange_id, block_number, data) VALUES(?,?,?,?,?)',
+                (identifier, task, statechange_id, block_number, data)
+            )
+            self._pending_write()
+
+    def compact(self, statechange_id):
+        """ Remove the state changes that precede `statechange_id`.
+
+        The state changes that generated events are still referenced by them,
+        these rows are kept without the data.
+        """
+        with self.write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                'DELETE FROM state_changes WHERE id < ? AND id NOT IN ('
+                '    SELECT source_statechange_id FROM state_events'
+                '    WHERE source_statechange_id < ?'
+                ')',
+                (statechange_id, statechange_id),
+            )
+            cursor.execute(
+                'UPDATE state_changes SET data = NULL '
+                'WHERE id < ? AND data IS NOT NULL',
+                (statechange_id,),
+            )
+            self._commit()
+
+    def flush(self):
+        """ Durability barrier, commits the pending writes. """
+        if self.pending:
+            with self.write_lock:
+                self._commit()
+
+    def _pending_write(self):
+        now = time.time()
+
+        if self.pending == 0:
+            self.pending_since = now
+        self.pending += 1
+
+        expired = now - self.pending_since >= self.max_latency
+        if expired or self.pending >= self.max_pending:
+            self._commit()
+
+    def _commit(self):
         self.conn.commit()
+        self.pending = 0
+        self.pending_since = None
 
     def get_state_snapshot(self):
         """ Return the last state snapshot as a tuple of (state_change_id, data)"""
@@ -195,6 +343,19 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
             result = result[0][0]
         return result
 
+    def get_state_changes_after(self, statechange_id):
+        """ Return an iterator of (id, identifier, data) of the state
+        changes that follow `statechange_id`, in order.
+        """
+        if statechange_id is None:
+            statechange_id = 0
+
+        cursor = self.conn.cursor()
+        return cursor.execute(
+            'SELECT id, identifier, data FROM state_changes WHERE id > ? ORDER BY id',
+            (statechange_id,),
+        )
+
     def get_events_in_range(self, from_block, to_block):
         cursor = self.conn.cursor()
         if from_block is None:
@@ -212,10 +373,29 @@ class StateChangeLogSQLiteBackend(StateChangeLogStorageBackend):
         result = result.fetchall()
         return result
 
+    def get_transfer_archive_in_range(self, from_block, to_block):
+        cursor = self.conn.cursor()
+        if from_block is None:
+            from_block = 0
+        if to_block is None:
+            result = cursor.execute(
+                'SELECT identifier, task, statechange_id, block_number, data '
+                'FROM transfers_archive WHERE block_number >= ? ORDER BY rowid',
+                (from_block,)
+            )
+        else:
+            result = cursor.execute(
+                'SELECT identifier, task, statechange_id, block_number, data '
+                'FROM transfers_archive WHERE block_number BETWEEN ? AND ? ORDER BY rowid',
+                (from_block, to_block)
+            )
+        return result.fetchall()
+
     def read(self):
         pass
 
     def __del__(self):
+        self.flush()
         self.conn.close()
 
 
@@ -238,12 +418,18 @@ class StateChangeLog(object):
             )
         self.storage = storage_instance
 
-    def log(self, state_change):
-        """ Log a state change and return its identifier"""
-        # TODO: Issue 587
-        # Implement a queue of state changes for batch writting
+    def log(self, state_change, identifier=None):
+        """ Log a state change and return its identifier
+
+        `identifier` is the transfer identifier the state change is dispatched
+        to, it's used to replay the state change on recovery.
+        """
         serialized_data = self.serializer.serialize(state_change)
-        return self.storage.write_state_change(serialized_data)
+        return self.storage.write_state_change(serialized_data, identifier)
+
+    @property
+    def last_state_change_id(self):
+        return self.storage.last_statechange_id
 
     def log_events(self, state_change_id, events, current_block_number):
         """ Log the events that were generated by `state_change_id` into the write ahead Log
@@ -268,10 +454,67 @@ class StateChangeLog(object):
             for res in results
         ]
 
+    def archive_transfer(self, identifier, task, state_change_id, block_number, events):
+        """ Archive the summary of the finished transfer `task`, the `events`
+        are the ones generated by its last state change `state_change_id`.
+        """
+        self.storage.write_transfer_archive(
+            identifier,
+            task,
+            state_change_id,
+            block_number,
+            self.serializer.serialize(events),
+        )
+
+    def get_archived_transfers(self, from_block=None, to_block=None):
+        """Get the summaries of the transfer tasks that finished in the period
+        (inclusive) ranging from `from_block` to `to_block`.
+
+        This function returns a list of tuples of the form:
+        (identifier, task, state_change_id, block_number, events)
+        """
+        results = self.storage.get_transfer_archive_in_range(from_block, to_block)
+        return [
+            ArchivedTransfer(res[0], res[1], res[2], res[3], self.serializer.deserialize(res[4]))
+            for res in results
+        ]
+
     def get_state_change_by_id(self, identifier):
         serialized_data = self.storage.get_state_change_by_id(identifier)
         return self.serializer.deserialize(serialized_data)
 
+    def get_state_changes_after(self, state_change_id):
+        """ Iterate over the (state_change_id, identifier, state_change)
+        logged after `state_change_id`.
+        """
+        for state_change_id, identifier, data in self.storage.get_state_changes_after(
+                state_change_id):
+            yield state_change_id, identifier, self.serializer.deserialize(data)
+
+    def get_snapshot(self):
+        """ Return the latest snapshot as a (state_change_id, state) tuple,
+        or None.
+        """
+        result = self.storage.get_state_snapshot()
+
+        if result is None:
+            return None
+
+        state_change_id, serialized_data = result
+        return state_change_id, self.serializer.deserialize(serialized_data)
+
+    def flush(self):
+        """ Make the logged state changes and events durable, this must be
+        called before any message that depends on them leaves the node.
+        """
+        self.storage.flush()
+
     def snapshot(self, state_change_id, state):
+        """ Persist the `state` after `state_change_id` and compact the
+        state changes that are no longer needed for recovery.
+        """
         serialized_data = self.serializer.serialize(state)
         self.storage.write_state_snapshot(state_change_id, serialized_data)
+
+        if state_change_id is not None:
+            self.storage.compact(state_change_id)
@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
-from copy import deepcopy
-
-from raiden.transfer.architecture import TransitionResult
+from raiden.transfer.architecture import (
+    copy_state,
+    TransitionResult,
+)
 from raiden.transfer.mediated_transfer.state import (
     InitiatorState,
     LockedTransferState,
 )
-from raiden.transfer.mediated_transfer.transition import update_route
+from raiden.transfer.mediated_transfer.transition import (
+    copy_routes,
+    update_route,
+)
 from raiden.transfer.state_change import (
     ActionCancelTransfer,
     ActionRouteChange,
@@ -42,9 +46,11 @@ def cancel_current_route(state):
     """
     assert state.revealsecret is None, 'cannot cancel a transfer with a RevealSecret in flight'
 
+    state.routes = copy_routes(state.routes)
     state.routes.canceled_routes.append(state.route)
-    state.canceled_transfers.append(state.message)
+    state.canceled_transfers = state.canceled_transfers + [state.message]
 
+    state.transfer = copy_state(state.transfer)
     state.transfer.secret = None
     state.transfer.hashlock = None
     state.message = None
@@ -58,6 +64,7 @@ def user_cancel_transfer(state):
     """ Cancel the current in-transit message. """
     assert state.revealsecret is None, 'cannot cancel a transfer with a RevealSecret in flight'
 
+    state.transfer = copy_state(state.transfer)
     state.transfer.secret = None
     state.transfer.hashlock = None
     state.message = None
@@ -91,6 +98,7 @@ def try_new_route(state):
     # Find a single route that may fulfill the request, this uses a single
     # route intentionally
     try_route = None
+    state.routes = copy_routes(state.routes)
     while state.routes.available_routes:
         route = state.routes.available_routes.pop(0)
 
@@ -187,6 +195,17 @@ def handle_block(state, state_change):
     return iteration
 
 
+def next_deadline(state):
+    """ Return the first block that needs to be dispatched to the initiator
+    task, or None if only the block number is updated by a new block.
+
+    The initiator doesn't act on new blocks, it only needs to be up to date
+    when other state changes are applied.
+    """
+    # pylint: disable=unused-argument
+    return None
+
+
 def handle_routechange(state, state_change):
     update_route(state, state_change)
     iteration = TransitionResult(state, list())
@@ -194,7 +213,13 @@ def handle_routechange(state, state_change):
 
 
 def handle_transferrefund(state, state_change):
-    if state_change.sender == state.route.node_address:
+    # the parts of a transfer share the identifier, the lock tells them apart
+    valid_refund = (
+        state_change.sender == state.route.node_address and
+        state_change.transfer.hashlock == state.transfer.hashlock
+    )
+
+    if valid_refund:
         iteration = cancel_current_route(state)
     else:
         iteration = TransitionResult(state, list())
@@ -263,7 +288,12 @@ def handle_secretreveal(state, state_change):
     """ Send a balance proof to the next hop with the current mediated transfer
     lock removed and the balance updated.
     """
-    if state_change.sender == state.route.node_address:
+    valid_reveal = (
+        state_change.sender == state.route.node_address and
+        sha3(state_change.secret) == state.transfer.hashlock
+    )
+
+    if valid_reveal:
         # next hop learned the secret, unlock the token locally and send the
         # withdraw message to next hop
         transfer = state.transfer
@@ -310,7 +340,7 @@ def state_transition(state, state_change):
 
     if state is None:
         if isinstance(state_change, ActionInitInitiator):
-            routes = deepcopy(state_change.routes)
+            routes = copy_routes(state_change.routes)
 
             state = InitiatorState(
                 state_change.our_address,
@@ -323,6 +353,9 @@ def state_transition(state, state_change):
             iteration = try_new_route(state)
 
     elif state.revealsecret is None:
+        # path copying, the handlers change the copy of the root
+        state = copy_state(state)
+
         if isinstance(state_change, Block):
             iteration = handle_block(state, state_change)
 
@@ -342,6 +375,8 @@ def state_transition(state, state_change):
             iteration = handle_canceltransfer(state)
 
     elif state.revealsecret is not None:
+        state = copy_state(state)
+
         if isinstance(state_change, Block):
             iteration = handle_block(state, state_change)
 
@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 import itertools
 
-from raiden.transfer.architecture import TransitionResult
-from raiden.transfer.mediated_transfer.transition import update_route
+from raiden.transfer.architecture import (
+    copy_state,
+    TransitionResult,
+)
+from raiden.transfer.mediated_transfer.transition import (
+    copy_routes,
+    update_route,
+)
 from raiden.transfer.mediated_transfer.state import (
     LockedTransferState,
     MediationPairState,
@@ -335,7 +341,10 @@ def set_secret(state, secret):
     state.secret = secret
 
     for pair in state.transfers_pair:
+        pair.payer_transfer = copy_state(pair.payer_transfer)
         pair.payer_transfer.secret = secret
+
+        pair.payee_transfer = copy_state(pair.payee_transfer)
         pair.payee_transfer.secret = secret
 
 
@@ -644,6 +653,7 @@ def mediate_transfer(state, payer_route, payer_transfer):
     )
 
     if timeout_blocks > 0:
+        state.routes = copy_routes(state.routes)
         transfer_pair, mediated_events = next_transfer_pair(
             payer_route,
             payer_transfer,
@@ -672,7 +682,7 @@ def mediate_transfer(state, payer_route, payer_transfer):
     else:
         # the list must be ordered from high to low expiration, expiration
         # handling depends on it
-        state.transfers_pair.append(transfer_pair)
+        state.transfers_pair = state.transfers_pair + [transfer_pair]
         iteration = TransitionResult(state, mediated_events)
 
     return iteration
@@ -716,6 +726,46 @@ def handle_block(state, state_change):
     return iteration
 
 
+def next_deadline(state):
+    """ Return the first block after `state.block_number` in which a new block
+    changes the mediator task, or None if new blocks only update the block
+    number.
+
+    The blocks prior to the deadline can be skipped as long as the latest
+    block is dispatched before any other state change.
+    """
+    deadlines = list()
+
+    for pair in get_pending_transfer_pairs(state.transfers_pair):
+        payer_transfer = pair.payer_transfer
+        payer_route = pair.payer_route
+        payer_channel_open = payer_route.state == CHANNEL_STATE_OPENED
+
+        # the withdraw is emitted for every block
+        if not payer_channel_open and payer_transfer.secret is not None:
+            return state.block_number + 1
+
+        close_possible = (
+            pair.payee_state in STATE_TRANSFER_PAID and
+            pair.payer_state not in STATE_TRANSFER_PAID and
+            payer_channel_open and
+            pair.payer_state != 'payer_waiting_close'
+        )
+        if close_possible:
+            deadlines.append(payer_transfer.expiration - payer_route.reveal_timeout)
+
+        if pair.payee_state != 'payee_expired':
+            deadlines.append(pair.payee_transfer.expiration + 1)
+
+        if pair.payer_state != 'payer_expired':
+            deadlines.append(payer_transfer.expiration + 1)
+
+    if deadlines:
+        return max(min(deadlines), state.block_number + 1)
+
+    return None
+
+
 def handle_refundtransfer(state, state_change):
     """ Validate and handle a ReceiveTransferRefund state change.
 
@@ -904,6 +954,12 @@ def state_transition(state, state_change):
 
     iteration = TransitionResult(state, list())
 
+    if state is not None:
+        # path copying, the handlers change the copies of the root and of the
+        # transfer pairs, the routes and the transfers are copied on change
+        state = copy_state(state)
+        state.transfers_pair = [copy_state(pair) for pair in state.transfers_pair]
+
     if state is None:
         if isinstance(state_change, ActionInitMediator):
             routes = state_change.routes
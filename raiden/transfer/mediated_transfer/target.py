@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from raiden.utils import sha3
-from raiden.transfer.architecture import TransitionResult
+from raiden.transfer.architecture import (
+    copy_state,
+    TransitionResult,
+)
 from raiden.transfer.mediated_transfer.state import TargetState
 from raiden.transfer.state_change import (
     Block,
@@ -108,11 +111,12 @@ def handle_secretreveal(state, state_change):
     valid_secret = sha3(state_change.secret) == state.from_transfer.hashlock
 
     if valid_secret:
-        from_transfer = state.from_transfer
+        from_transfer = copy_state(state.from_transfer)
         from_route = state.from_route
 
         state.state = 'reveal_secret'
         from_transfer.secret = state_change.secret
+        state.from_transfer = from_transfer
         reveal = SendRevealSecret(
             from_transfer.identifier,
             from_transfer.secret,
@@ -161,6 +165,28 @@ def handle_block(state, state_change):
     return iteration
 
 
+def next_deadline(state):
+    """ Return the first block after `state.block_number` in which a new block
+    changes the target task, or None if new blocks only update the block
+    number.
+
+    The blocks prior to the deadline can be skipped as long as the latest
+    block is dispatched before any other state change.
+    """
+    from_transfer = state.from_transfer
+
+    # the lock expired without the secret being revealed
+    if from_transfer.secret is None:
+        return from_transfer.expiration + 1
+
+    # the channel must be closed once it's not safe to wait
+    if state.state != 'waiting_close':
+        unsafe_block = from_transfer.expiration - state.from_route.reveal_timeout
+        return max(unsafe_block, state.block_number + 1)
+
+    return None
+
+
 def handle_routechange(state, state_change):
     """ Handle an ActionRouteChange state change. """
     updated_route = state_change.route
@@ -223,6 +249,9 @@ def state_transition(state, state_change):
             iteration = handle_inittarget(state_change)
 
     elif state.from_transfer.secret is None:
+        # path copying, the handlers change the copy of the root
+        state = copy_state(state)
+
         if isinstance(state_change, ReceiveSecretReveal):
             iteration = handle_secretreveal(state, state_change)
 
@@ -230,6 +259,8 @@ def state_transition(state, state_change):
             iteration = handle_block(state, state_change)
 
     elif state.from_transfer.secret is not None:
+        state = copy_state(state)
+
         if isinstance(state_change, ReceiveBalanceProof):
             iteration = handle_balanceproof(state, state_change)
 
@@ -1,7 +1,20 @@
 # -*- coding: utf-8 -*-
+from raiden.transfer.architecture import copy_state
 from raiden.transfer.state import CHANNEL_STATE_OPENED
 
 
+def copy_routes(routes_state):
+    """ Copy of a RoutesState with its own route lists, the RouteStates are
+    shared.
+    """
+    routes = copy_state(routes_state)
+    routes.available_routes = list(routes_state.available_routes)
+    routes.ignored_routes = list(routes_state.ignored_routes)
+    routes.refunded_routes = list(routes_state.refunded_routes)
+    routes.canceled_routes = list(routes_state.canceled_routes)
+    return routes
+
+
 def update_route(next_state, route_state_change):
     new_route = route_state_change.route
 
@@ -37,4 +50,6 @@ def update_route(next_state, route_state_change):
                 # new channel opened, add the route for use
                 available_routes.append(new_route)
 
-    next_state.routes.available_routes = available_routes
+    routes = copy_state(next_state.routes)
+    routes.available_routes = available_routes
+    next_state.routes = routes
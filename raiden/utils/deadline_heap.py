@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+
+
+class DeadlineHeap(object):
+    """ Binary heap of items keyed by a deadline.
+
+    Meant for sparse and distant deadlines, e.g. block numbers, where the
+    cost of a wake up must depend on the number of expired items and not on
+    the number of scheduled ones.
+
+    Items are not cancelled, the owner of an item must ignore stale deadlines
+    instead, an item can be scheduled more than once.
+    """
+
+    def __init__(self):
+        self.heap = list()
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, deadline, item):
+        """ Schedule `item` to be returned by `expire` once `deadline` is
+        reached.
+        """
+        # the counter breaks ties, the items don't need to be comparable
+        heapq.heappush(self.heap, (deadline, next(self.counter), item))
+
+    def expire(self, now):
+        """ Remove and return the items with a deadline lower-or-equal to
+        `now`, in deadline order.
+        """
+        heap = self.heap
+        expired = list()
+
+        while heap and heap[0][0] <= now:
+            expired.append(heapq.heappop(heap)[2])
+
+        return expired
+
+    def clear(self):
+        del self.heap[:]
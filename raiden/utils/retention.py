@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import deque
+
+
+class RetentionMap(object):
+    """ A mapping that forgets its entries after a retention period.
+
+    Entries are evicted:
+
+    - After `horizon` seconds, unless `keep(value)` is true, in which case the
+      entry is retained for another period.
+    - Once the nonce of its group advanced past the entry's nonce, see
+      `retire`.
+
+    Lookups are a single dict access. The ageing is tracked with a FIFO of
+    insertion times and each group with a FIFO of nonces, the eviction is
+    done lazily on insertion and costs amortized O(1) per entry.
+    """
+
+    def __init__(self, horizon, keep=None, clock=time.time):
+        self.horizon = horizon
+        self.keep = keep
+        self.clock = clock
+
+        self.key_to_value = dict()
+
+        # (insertion time, key, group), ordered by insertion time
+        self.expiration_queue = deque()
+
+        # group -> deque of (nonce, key), ordered by nonce
+        self.group_to_nonces = dict()
+
+    def add(self, key, value, group=None, nonce=None):
+        """ Store `value` under `key`. If `group` is given the entry is
+        evicted by a call to `retire` with a nonce larger than `nonce`.
+        """
+        now = self.clock()
+        self.expire(now)
+
+        self.key_to_value[key] = value
+        self.expiration_queue.append((now, key, group))
+
+        if group is not None:
+            nonces = self.group_to_nonces.get(group)
+
+            if nonces is None:
+                nonces = self.group_to_nonces[group] = deque()
+
+            nonces.append((nonce, key))
+
+    def retire(self, group, nonce):
+        """ Evict the entries of `group` with a nonce smaller than `nonce`. """
+        nonces = self.group_to_nonces.get(group)
+
+        if nonces is None:
+            return
+
+        while nonces and nonces[0][0] < nonce:
+            _, key = nonces.popleft()
+            self.key_to_value.pop(key, None)
+
+        if not nonces:
+            del self.group_to_nonces[group]
+
+        # The retired entries are still in the expiration queue, drop them
+        # once they are the majority so the memory is proportional to the
+        # live entries.
+        if len(self.expiration_queue) > 2 * len(self.key_to_value) + 64:
+            self.expiration_queue = deque(
+                entry
+                for entry in self.expiration_queue
+                if entry[1] in self.key_to_value
+            )
+
+    def expire(self, now=None):
+        """ Evict the entries older than the horizon. """
+        if now is None:
+            now = self.clock()
+
+        limit = now - self.horizon
+        queue = self.expiration_queue
+
+        while queue and queue[0][0] < limit:
+            _, key, group = queue.popleft()
+
+            if key not in self.key_to_value:
+                # already retired
+                continue
+
+            if self.keep is not None and self.keep(self.key_to_value[key]):
+                queue.append((now, key, group))
+                continue
+
+            del self.key_to_value[key]
+
+            if group is not None:
+                self._compact_group(group)
+
+    def _compact_group(self, group):
+        """ Drop the expired entries from the front of the group index. """
+        nonces = self.group_to_nonces.get(group)
+
+        if nonces is None:
+            return
+
+        while nonces and nonces[0][1] not in self.key_to_value:
+            nonces.popleft()
+
+        if not nonces:
+            del self.group_to_nonces[group]
+
+    def __setitem__(self, key, value):
+        self.add(key, value)
+
+    def __getitem__(self, key):
+        return self.key_to_value[key]
+
+    def __contains__(self, key):
+        return key in self.key_to_value
+
+    def __len__(self):
+        return len(self.key_to_value)
+
+    def __eq__(self, other):
+        if isinstance(other, RetentionMap):
+            other = other.key_to_value
+        return self.key_to_value == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def get(self, key, default=None):
+        return self.key_to_value.get(key, default)
+
+    def itervalues(self):
+        return self.key_to_value.itervalues()
+
+    def iteritems(self):
+        return self.key_to_value.iteritems()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+
+
+class TimerWheel(object):
+    """ Hashed timer wheel.
+
+    Time is divided in ticks of `tick` seconds, a timer is stored in the slot
+    of its deadline tick modulo the number of slots. Scheduling is O(1) and
+    advancing the wheel only looks at the slots of the elapsed ticks, so
+    thousands of timers cost a single wake up per tick.
+
+    Timers are not cancelled, the owner of an item must ignore stale timers
+    instead, e.g. with a generation counter.
+    """
+
+    def __init__(self, tick, size=512, clock=time.time):
+        self.tick = tick
+        self.clock = clock
+        self.slots = [list() for _ in range(size)]
+        self.current = int(clock() / tick)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, deadline, item):
+        """ Schedule `item` to be returned by `expire` once `deadline` is
+        reached, the deadline is rounded up to the next tick.
+        """
+        index = max(int(math.ceil(deadline / self.tick)), self.current + 1)
+        self.slots[index % len(self.slots)].append((index, item))
+        self.count += 1
+
+    def expire(self, now=None):
+        """ Advance the wheel to `now` and return the expired items, in
+        deadline order.
+        """
+        if now is None:
+            now = self.clock()
+
+        target = int(now / self.tick)
+        if target <= self.current:
+            return list()
+
+        size = len(self.slots)
+        expired = list()
+
+        # after a full turn every slot has been visited
+        for index in range(self.current + 1, min(target, self.current + size) + 1):
+            slot = self.slots[index % size]
+
+            if not slot:
+                continue
+
+            pending = list()
+            for timer in slot:
+                if timer[0] <= target:
+                    expired.append(timer)
+                else:
+                    pending.append(timer)
+
+            self.slots[index % size] = pending
+
+        self.current = target
+        self.count -= len(expired)
+
+        expired.sort(key=lambda timer: timer[0])
+        return [item for _, item in expired]